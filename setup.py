@@ -74,7 +74,7 @@ core_deps = [
     "werkzeug>=2.2.3,<2.3",  # breaking changes can happen on minor version increases
     "wrapt>=1.15,<1.16",
     "zeroconf~=0.127",  # breaking changes can happen on minor version increases (despite semantic versioning)
-    "zipstream-ng>=1.7.1,<2.0.0",
+    "zipstream-ng>=1.9.3,<1.10",  # octoprint.util.zip relies on its private internals, verify before bumping
 ]
 vendored_deps = [
     "blinker>=1.6.3,<1.7.0",  # dependency of flask_principal, later versions require Python 3.8+
@@ -78,6 +78,7 @@ def cli():
 @click.option("--bed-z", "bedz", type=float, default=0)
 @click.option("--progress", "progress", is_flag=True)
 @click.option("--layers", "layers", is_flag=True)
+@click.option("--marker", "markers", multiple=True)
 @click.argument("path", type=click.Path())
 def gcode_command(
     path,
@@ -92,6 +93,7 @@ def gcode_command(
     bedz,
     progress,
     layers,
+    markers,
 ):
     """Runs a GCODE file analysis."""
 
@@ -124,7 +126,9 @@ def gcode_command(
         def progress_callback(percentage):
             click.echo(f"PROGRESS:{percentage}")
 
-    interpreter = gcode(progress_callback=progress_callback, incl_layers=layers)
+    interpreter = gcode(
+        progress_callback=progress_callback, incl_layers=layers, markers=markers
+    )
 
     interpreter.load(
         path,
@@ -233,13 +233,71 @@ def command(
 @click.option("--file-name", type=click.STRING)
 @click.option("--content-type", type=click.STRING)
 @click.option("--timeout", type=float, default=None, help="Request timeout in seconds")
+@click.option(
+    "--resumable",
+    is_flag=True,
+    help="Upload in chunks that get retried individually, for unreliable connections",
+)
+@click.option(
+    "--resume",
+    type=click.STRING,
+    default=None,
+    help="Resume the interrupted resumable upload with this id",
+)
+@click.option(
+    "--chunk-size", type=int, default=None, help="Chunk size of resumable uploads"
+)
+@click.option(
+    "--parallel",
+    type=int,
+    default=4,
+    help="Number of chunks of resumable uploads to send at once",
+)
 @click.pass_context
-def upload(ctx, path, file_path, params, file_name, content_type, timeout):
-    """Uploads the specified file to the specified server path."""
+def upload(
+    ctx,
+    path,
+    file_path,
+    params,
+    file_name,
+    content_type,
+    timeout,
+    resumable,
+    resume,
+    chunk_size,
+    parallel,
+):
+    """
+    Uploads the specified file to the specified server path.
+
+    Resumable uploads are only supported by OctoPrint's files API, e.g. api/files/local.
+    """
     data = {}
     for param in params:
         data[param[0]] = param[1]
 
+    if resumable or resume:
+        try:
+            r = ctx.obj.client.upload_resumable(
+                path,
+                file_path,
+                additional=data,
+                file_name=file_name,
+                chunk_size=chunk_size,
+                parallel=parallel,
+                resume=resume,
+                timeout=timeout,
+            )
+        except octoprint_client.ResumableUploadError as e:
+            click.echo(f"Upload failed: {e}", err=True)
+            if e.response is not None:
+                log_response(e.response)
+            if e.upload_id:
+                click.echo(f"Resume it with --resume {e.upload_id}", err=True)
+            ctx.exit(1)
+        log_response(r)
+        return
+
     r = ctx.obj.client.upload(
         path,
         file_path,
@@ -262,8 +320,13 @@ def delete(ctx, path, timeout):
 
 
 @cli.command("listen")
+@click.option(
+    "--binary",
+    is_flag=True,
+    help="Use the raw websocket endpoint and request binary encoded state updates",
+)
 @click.pass_context
-def listen(ctx):
+def listen(ctx, binary):
     def on_connect(ws):
         click.echo("--- Connected!")
 
@@ -289,6 +352,7 @@ def listen(ctx):
         on_sent=on_sent,
         on_heartbeat=on_heartbeat,
         on_message=on_message,
+        binary=binary,
     )
 
     click.echo("--- Waiting for client to exit")
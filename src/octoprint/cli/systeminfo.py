@@ -7,7 +7,7 @@ import logging
 import os
 
 import click
-from zipstream.ng import ZIP_DEFLATED, ZipStream
+from zipstream.ng import ZIP_DEFLATED, ZIP_STORED
 
 from octoprint.cli import init_platform_for_cli, standard_options
 
@@ -62,14 +62,17 @@ def get_systeminfo(
     return flattened
 
 
-def get_systeminfo_bundle(systeminfo, logbase, printer=None, plugin_manager=None):
+def get_systeminfo_bundle(
+    systeminfo, logbase, printer=None, plugin_manager=None, executor=None
+):
     from octoprint.util import to_bytes
+    from octoprint.util.zip import ZipBundle, is_compressed_file
 
     try:
-        z = ZipStream(compress_type=ZIP_DEFLATED)
+        z = ZipBundle(compress_type=ZIP_DEFLATED, executor=executor)
     except RuntimeError:
         # no zlib support
-        z = ZipStream(sized=True)
+        z = ZipBundle(sized=True)
 
     if printer and printer.is_operational():
         firmware_info = printer.firmware_info
@@ -135,7 +138,13 @@ def get_systeminfo_bundle(systeminfo, logbase, printer=None, plugin_manager=None
                     if isinstance(content, str):
                         # log path
                         if os.path.exists(content) and os.access(content, os.R_OK):
-                            z.add_path(content, arcname=log)
+                            z.add_path(
+                                content,
+                                arcname=log,
+                                compress_type=ZIP_STORED
+                                if is_compressed_file(content)
+                                else None,
+                            )
                     elif callable(content):
                         # content generating callable
                         try:
@@ -227,8 +236,13 @@ def systeminfo_command(ctx, short, path, **kwargs):
             )
             click.echo(f"Writing systeminfo bundle to {zipfilename}...")
 
+            from octoprint.util.zip import get_executor
+
             z = get_systeminfo_bundle(
-                systeminfo, settings.getBaseFolder("logs"), plugin_manager=plugin_manager
+                systeminfo,
+                settings.getBaseFolder("logs"),
+                plugin_manager=plugin_manager,
+                executor=get_executor(),
             )
             try:
                 with open(zipfilename, "wb") as f:
@@ -9,6 +9,7 @@ import queue
 import re
 import subprocess
 import threading
+import time
 
 import octoprint.plugin
 from octoprint.settings import settings
@@ -16,6 +17,9 @@ from octoprint.settings import settings
 # singleton
 _instance = None
 
+ALL_EVENTS = "*"
+"""Pseudo event name to subscribe to in order to receive all events."""
+
 
 def all_events():
     return [
@@ -150,6 +154,30 @@ class Events:
         return cls._all_cap_re.sub(r"\1_\2", s1).upper()
 
 
+def event_matches(event, subscriptions):
+    """
+    Checks whether ``event`` matches any of the provided ``subscriptions``.
+
+    A subscription ending in ``*`` is treated as a prefix, anything else needs to match exactly.
+
+    Example::
+
+        >>> event_matches("PrintStarted", ["ZChange", "Print*"])
+        True
+        >>> event_matches("PrintStarted", ["ZChange"])
+        False
+        >>> event_matches("PrintStarted", ["*"])
+        True
+    """
+    for subscription in subscriptions:
+        if subscription.endswith("*"):
+            if event.startswith(subscription[:-1]):
+                return True
+        elif subscription == event:
+            return True
+    return False
+
+
 def eventManager():
     global _instance
     if _instance is None:
@@ -164,6 +192,7 @@ class EventManager:
 
     def __init__(self):
         self._registeredListeners = collections.defaultdict(list)
+        self._immediateListeners = collections.defaultdict(list)
         self._logger = logging.getLogger(__name__)
         self._logger_fire = logging.getLogger(f"{__name__}.fire")
 
@@ -173,6 +202,17 @@ class EventManager:
         self._queue = queue.Queue()
         self._held_back = queue.Queue()
 
+        self._handler_index_generation = None
+        self._handler_index = {}
+        self._handler_index_lock = threading.RLock()
+
+        self._coalesce_windows = {}
+        self._coalesce_pending = {}
+        self._coalesce_last = {}
+        self._coalesce_lock = threading.RLock()
+        self._coalesced = collections.Counter()
+        self._dropped = 0
+
         self._worker = threading.Thread(target=self._work)
         self._worker.daemon = True
         self._worker.start()
@@ -180,37 +220,120 @@ class EventManager:
     def _work(self):
         try:
             while not self._shutdown_signaled:
-                event, payload = self._queue.get(True)
-                if event == Events.SHUTDOWN:
-                    # we've got the shutdown event here, stop event loop processing after this has been processed
-                    self._logger.info(
-                        "Processing shutdown event, this will be our last event"
-                    )
-                    self._shutdown_signaled = True
-
-                eventListeners = self._registeredListeners[event]
-                self._logger_fire.debug(f"Firing event: {event} (Payload: {payload!r})")
-
-                for listener in eventListeners:
-                    self._logger.debug(f"Sending action to {listener!r}")
-                    try:
-                        listener(event, payload)
-                    except Exception:
-                        self._logger.exception(
-                            "Got an exception while sending event {} (Payload: {!r}) to {}".format(
-                                event, payload, listener
-                            )
+                try:
+                    event, payload = self._queue.get(True, self._next_coalesced_timeout())
+                except queue.Empty:
+                    event = payload = None
+
+                if event is not None:
+                    if event == Events.SHUTDOWN:
+                        # we've got the shutdown event here, stop event loop processing after this has been processed
+                        self._logger.info(
+                            "Processing shutdown event, this will be our last event"
                         )
+                        self._shutdown_signaled = True
 
-                octoprint.plugin.call_plugin(
-                    octoprint.plugin.types.EventHandlerPlugin,
-                    "on_event",
-                    args=(event, payload),
-                )
+                    self._process_event(event, payload)
+
+                if not self._shutdown_signaled:
+                    for event, payload in self._due_coalesced():
+                        self._process_event(event, payload)
+
+            with self._coalesce_lock:
+                if self._coalesce_pending:
+                    self._logger.info(
+                        "Dropping {} coalesced events still pending on shutdown".format(
+                            len(self._coalesce_pending)
+                        )
+                    )
+                    self._dropped += len(self._coalesce_pending)
+                    self._coalesce_pending.clear()
             self._logger.info("Event loop shut down")
         except Exception:
             self._logger.exception("Ooops, the event bus worker loop crashed")
 
+    def _process_event(self, event, payload):
+        eventListeners = (
+            self._registeredListeners[event] + self._registeredListeners[ALL_EVENTS]
+        )
+        self._logger_fire.debug(f"Firing event: {event} (Payload: {payload!r})")
+
+        for listener in eventListeners:
+            self._logger.debug(f"Sending action to {listener!r}")
+            try:
+                listener(event, payload)
+            except Exception:
+                self._logger.exception(
+                    "Got an exception while sending event {} (Payload: {!r}) to {}".format(
+                        event, payload, listener
+                    )
+                )
+
+        self._call_event_handlers(event, payload)
+
+    def _call_event_handlers(self, event, payload):
+        for name, plugin in self._get_event_handlers(event):
+            try:
+                plugin.on_event(event, payload)
+            except Exception:
+                self._logger.exception(
+                    f"Error while calling plugin {name}",
+                    extra={"plugin": name},
+                )
+
+    def _get_event_handlers(self, event):
+        """
+        Returns the ``(identifier, implementation)`` tuples of all ``EventHandlerPlugin`` implementations
+        interested in ``event``, in plugin call order.
+
+        The result is cached per event name and the cache is dropped whenever the set of enabled plugin
+        implementations changes.
+        """
+
+        try:
+            manager = octoprint.plugin.plugin_manager()
+        except ValueError:
+            # plugin manager not yet initialized
+            return []
+
+        with self._handler_index_lock:
+            generation = manager.implementation_generation
+            if generation != self._handler_index_generation:
+                self._handler_index = {}
+                self._handler_index_generation = generation
+
+            handlers = self._handler_index.get(event)
+            if handlers is None:
+                handlers = [
+                    (plugin._identifier, plugin)
+                    for plugin in manager.get_implementations(
+                        octoprint.plugin.types.EventHandlerPlugin
+                    )
+                    if hasattr(plugin, "_identifier")
+                    and self._is_subscribed(plugin, event)
+                ]
+                self._handler_index[event] = handlers
+            return handlers
+
+    def _is_subscribed(self, plugin, event):
+        try:
+            subscriptions = plugin.get_event_subscriptions()
+        except Exception:
+            self._logger.exception(
+                f"Error while fetching event subscriptions of plugin {plugin._identifier}, "
+                "delivering all events to it",
+                extra={"plugin": plugin._identifier},
+            )
+            return True
+
+        if subscriptions is None:
+            return True
+
+        if isinstance(subscriptions, str):
+            subscriptions = [subscriptions]
+
+        return event_matches(event, subscriptions)
+
     def fire(self, event, payload=None):
         """
         Fire an event to anyone subscribed to it
@@ -222,6 +345,18 @@ class EventManager:
         payload being a payload object specific to the event.
         """
 
+        for listener in (
+            self._immediateListeners[event] + self._immediateListeners[ALL_EVENTS]
+        ):
+            try:
+                listener(event, payload)
+            except Exception:
+                self._logger.exception(
+                    "Got an exception while sending event {} (Payload: {!r}) to immediate listener {}".format(
+                        event, payload, listener
+                    )
+                )
+
         send_held_back = False
         if event == Events.STARTUP:
             self._logger.info("Processing startup event, this is our first event")
@@ -242,32 +377,170 @@ class EventManager:
                     break
 
     def _enqueue(self, event, payload):
+        if self._shutdown_signaled:
+            # the event loop is gone, nobody will ever see this
+            with self._coalesce_lock:
+                self._dropped += 1
+            return
+
         if self._startup_signaled:
+            if self._coalesce(event, payload):
+                return
             q = self._queue
         else:
             q = self._held_back
 
         q.put((event, payload))
 
-    def subscribe(self, event, callback):
+    def _coalesce(self, event, payload):
+        """
+        Coalesces ``event`` if it has a coalescing window configured and was already
+        delivered within it.
+
+        The first occurrence of an event is delivered right away. Further occurrences
+        within the window are held back and delivered once at the end of the window, with
+        the latest (or merged) payload.
+
+        Returns:
+            bool: True if the event was taken care of, False if it should be enqueued normally
+        """
+
+        window = self._coalesce_windows.get(event)
+        if not window:
+            return False
+
+        now = time.monotonic()
+        with self._coalesce_lock:
+            pending = self._coalesce_pending.get(event)
+            if pending is not None:
+                deadline, pending_payload = pending
+                self._coalesce_pending[event] = (
+                    deadline,
+                    self._merge_coalesced(event, pending_payload, payload),
+                )
+                self._coalesced[event] += 1
+                return True
+
+            last = self._coalesce_last.get(event)
+            if last is None or now - last >= window:
+                self._coalesce_last[event] = now
+                return False
+
+            self._coalesce_pending[event] = (last + window, payload)
+
+        # wake up the worker so it picks up the new deadline
+        self._queue.put((None, None))
+        return True
+
+    def _merge_coalesced(self, event, old, new):
+        if event == Events.Z_CHANGE and isinstance(old, dict) and isinstance(new, dict):
+            # keep the height we started from
+            merged = dict(new)
+            merged["old"] = old.get("old")
+            return merged
+        return new
+
+    def _next_coalesced_timeout(self):
+        with self._coalesce_lock:
+            if not self._coalesce_pending:
+                return None
+            deadline = min(d for d, _ in self._coalesce_pending.values())
+        return max(0, deadline - time.monotonic())
+
+    def _due_coalesced(self):
+        now = time.monotonic()
+        result = []
+        with self._coalesce_lock:
+            for event, (deadline, payload) in list(self._coalesce_pending.items()):
+                if deadline <= now:
+                    del self._coalesce_pending[event]
+                    self._coalesce_last[event] = now
+                    result.append((event, payload))
+        return result
+
+    def set_coalescing_windows(self, windows):
+        """
+        Configures the coalescing windows to use per event.
+
+        Events with a window will be delivered at most once per window, further occurrences
+        within it get merged into one delivery at the end of the window. Events without a
+        window are always delivered.
+
+        Arguments:
+            windows (dict): Mapping of event name to window length in seconds
+        """
+
+        valid = {}
+        for event, window in (windows or {}).items():
+            try:
+                window = float(window)
+            except (TypeError, ValueError):
+                self._logger.warning(
+                    f"Invalid coalescing window for event {event}: {window!r}"
+                )
+                continue
+            if window > 0:
+                valid[event] = window
+
+        with self._coalesce_lock:
+            self._coalesce_windows = valid
+
+        if valid:
+            self._logger.info(
+                "Coalescing events: {}".format(
+                    ", ".join(f"{k} ({v}s)" for k, v in sorted(valid.items()))
+                )
+            )
+
+    def get_statistics(self):
+        """
+        Returns:
+            dict: Counters of coalesced events (total and per event) and of dropped events
+        """
+
+        with self._coalesce_lock:
+            return {
+                "coalesced": sum(self._coalesced.values()),
+                "coalesced_by_event": dict(self._coalesced),
+                "dropped": self._dropped,
+            }
+
+    def subscribe(self, event, callback, immediate=False):
         """
         Subscribe a listener to an event -- pass in the event name (as a string) and the callback object
+
+        Subscribing to :data:`ALL_EVENTS` will have the callback receive all events.
+
+        Immediate listeners are called synchronously from :meth:`fire`, before the event is queued, held
+        back or coalesced. They are meant for cheap bookkeeping like cache invalidation that must have
+        happened before anyone else learns about the event, and must neither block nor fire events
+        themselves.
         """
 
-        if callback in self._registeredListeners[event]:
+        listeners = (
+            self._immediateListeners[event]
+            if immediate
+            else self._registeredListeners[event]
+        )
+        if callback in listeners:
             # callback is already subscribed to the event
             return
 
-        self._registeredListeners[event].append(callback)
+        listeners.append(callback)
         self._logger.debug(f"Subscribed listener {callback!r} for event {event}")
 
-    def unsubscribe(self, event, callback):
+    def unsubscribe(self, event, callback, immediate=False):
         """
         Unsubscribe a listener from an event -- pass in the event name (as string) and the callback object
         """
 
+        listeners = (
+            self._immediateListeners[event]
+            if immediate
+            else self._registeredListeners[event]
+        )
         try:
-            self._registeredListeners[event].remove(callback)
+            listeners.remove(callback)
         except ValueError:
             # not registered
             pass
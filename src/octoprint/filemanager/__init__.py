@@ -6,6 +6,7 @@ import logging
 import os
 import time
 from collections import namedtuple
+from contextlib import contextmanager
 
 import octoprint.plugin
 import octoprint.util
@@ -15,6 +16,7 @@ from octoprint.util import yaml
 
 from .analysis import AnalysisQueue, QueueEntry  # noqa: F401
 from .destinations import FileDestinations  # noqa: F401
+from .search import SearchIndex
 from .storage import LocalFileStorage  # noqa: F401
 from .util import AbstractFileWrapper, DiskFileWrapper, StreamWrapper  # noqa: F401
 
@@ -23,6 +25,15 @@ ContentTypeDetector = namedtuple("ContentTypeDetector", "extensions, detector")
 
 extensions = {}
 
+_SEARCH_UPDATE_EVENTS = (
+    Events.FILE_ADDED,
+    Events.FILE_REMOVED,
+    Events.FOLDER_ADDED,
+    Events.FOLDER_REMOVED,
+    Events.METADATA_ANALYSIS_FINISHED,
+    Events.METADATA_STATISTICS_UPDATED,
+)
+
 
 def full_extension_tree():
     result = {
@@ -234,6 +245,8 @@ class FileManager:
         self._storage_managers = {}
         if initial_storage_managers:
             self._storage_managers.update(initial_storage_managers)
+            for storage_type, storage_manager in initial_storage_managers.items():
+                self._listen_for_changes(storage_type, storage_manager)
 
         self._slicing_manager = slicing_manager
         self._printer_profile_manager = printer_profile_manager
@@ -257,11 +270,29 @@ class FileManager:
         )
         self._analyzeGcode = octoprint.settings.settings().get(["gcodeAnalysis", "runAt"])
 
+        self._search_indexes = {}
+        self._search_updates = {}
+        self._search_mutex = threading.RLock()
+        self._search_subscribed = False
+
+        # per thread, so only the operations of the batch itself get deferred
+        self._batch_state = threading.local()
+
     def initialize(self, process_backlog=False):
         self.reload_plugins()
         if process_backlog:
             self.process_backlog()
 
+    def close(self):
+        """
+        Closes all storages, persisting anything they still have pending. Called on shutdown.
+        """
+        for storage_type, storage_manager in self._storage_managers.items():
+            try:
+                storage_manager.close()
+            except Exception:
+                self._logger.exception(f"Error while closing storage {storage_type}")
+
     def process_backlog(self):
         # only check for a backlog if gcodeAnalysis is 'idle' or 'always'
         if self._analyzeGcode == "never":
@@ -335,8 +366,23 @@ class FileManager:
 
     def add_storage(self, storage_type, storage_manager):
         self._storage_managers[storage_type] = storage_manager
+        self._listen_for_changes(storage_type, storage_manager)
         self._determine_analysis_backlog(storage_type, storage_manager)
 
+    def _listen_for_changes(self, storage_type, storage_manager):
+        def on_change():
+            if self._storage_managers.get(storage_type) is not storage_manager:
+                return
+
+            self._logger.debug(f"Storage {storage_type} got changed externally")
+            with self._search_mutex:
+                # rebuilt from the file list on next use
+                self._search_indexes.pop(storage_type, None)
+                self._search_updates.pop(storage_type, None)
+            self._fire_updated_files()
+
+        storage_manager.add_change_listener(on_change)
+
     def remove_storage(self, type):
         if type not in self._storage_managers:
             return
@@ -684,6 +730,142 @@ class FileManager:
             )
         return result
 
+    def listing_index(self, location, path=None, recursive=False, force_refresh=False):
+        return self._storage(location).listing_index(
+            path=path, recursive=recursive, force_refresh=force_refresh
+        )
+
+    def list_files_page(
+        self,
+        location,
+        path=None,
+        sort="name",
+        order=None,
+        cursor=None,
+        limit=None,
+        filter=None,
+        prints=None,
+        query=None,
+        recursive=False,
+        force_refresh=False,
+    ):
+        return self._storage(location).list_files_page(
+            path=path,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            filter=filter,
+            prints=prints,
+            query=query,
+            recursive=recursive,
+            force_refresh=force_refresh,
+        )
+
+    def search_files(self, location, query, limit=None, force_refresh=False):
+        """
+        Searches the files and folders in ``location``.
+
+        The search index gets built from the storage's file list on first use and is then kept up to date through the
+        file and metadata events fired for the storage. See :meth:`octoprint.filemanager.search.SearchIndex.search`
+        for the query syntax and return value.
+        """
+        storage = self._storage(location)
+
+        with self._search_mutex:
+            index = self._search_indexes.get(location)
+            if index is None or force_refresh:
+                if not self._search_subscribed:
+                    for event in _SEARCH_UPDATE_EVENTS:
+                        eventManager().subscribe(
+                            event, self._on_search_update_event, immediate=True
+                        )
+                    self._search_subscribed = True
+
+                # updates queued until now are covered by the fresh file list
+                self._search_updates.pop(location, None)
+                index = SearchIndex(
+                    storage.list_files(recursive=True, force_refresh=force_refresh)
+                )
+                self._search_indexes[location] = index
+            else:
+                self._apply_search_updates(location, storage, index)
+
+        return index.search(query, limit=limit)
+
+    def _on_search_update_event(self, event, payload):
+        location = payload.get("storage", payload.get("origin"))
+        path = payload.get("path")
+        if path is None:
+            return
+
+        with self._search_mutex:
+            if location not in self._search_indexes:
+                return
+            folder = event in (Events.FOLDER_ADDED, Events.FOLDER_REMOVED)
+            self._search_updates.setdefault(location, []).append((path, folder))
+
+    def _apply_search_updates(self, location, storage, index):
+        updates = self._search_updates.pop(location, [])
+        for path, folder in updates:
+            path = storage.path_in_storage(path)
+            parent, name = storage.split_path(path)
+            try:
+                node = storage.list_files(path=parent, recursive=False).get(name)
+            except Exception:
+                # parent folder is gone as well
+                node = None
+
+            if folder:
+                index.remove(path, recursive=True)
+                if node is not None:
+                    index.add(node)
+                    index.add_all(storage.list_files(path=path, recursive=True))
+            elif node is not None:
+                index.add(node)
+            else:
+                index.remove(path)
+
+    @contextmanager
+    def batch(self, location):
+        """
+        Context manager for running a number of file operations on ``location`` as one batch.
+
+        The storage writes the metadata of every affected folder only once, when the batch ends, and instead of one
+        ``UpdatedFiles`` event per operation a single one gets fired at the end. The events about the individual files
+        and folders are still fired right away. Batches may be nested. Only operations of the thread running the batch
+        are part of it.
+
+        Example::
+
+            with file_manager.batch(FileDestinations.LOCAL):
+                for path in paths:
+                    file_manager.remove_file(FileDestinations.LOCAL, path)
+        """
+        storage = self._storage(location)
+        state = self._batch_state
+
+        if not getattr(state, "depth", 0):
+            state.depth = 0
+            state.updated = False
+        state.depth += 1
+
+        try:
+            with storage.batch():
+                yield
+        finally:
+            state.depth -= 1
+            if not state.depth and state.updated:
+                state.updated = False
+                eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+
+    def _fire_updated_files(self):
+        state = self._batch_state
+        if getattr(state, "depth", 0):
+            state.updated = True
+            return
+        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+
     def add_file(
         self,
         location,
@@ -734,14 +916,16 @@ class FileManager:
             display=display,
         )
 
-        queue_entry = self._analysis_queue_entry(
-            location,
-            path_in_storage,
-            printer_profile=printer_profile,
-            analysis=analysis,
-        )
-        if queue_entry:
-            self._analysis_queue.enqueue(queue_entry, high_priority=True)
+        # the storage might already know the analysis of this content, e.g. from an identical file
+        if analysis is not None or not self.has_analysis(location, path_in_storage):
+            queue_entry = self._analysis_queue_entry(
+                location,
+                path_in_storage,
+                printer_profile=printer_profile,
+                analysis=analysis,
+            )
+            if queue_entry:
+                self._analysis_queue.enqueue(queue_entry, high_priority=True)
 
         _, name = self._storage(location).split_path(path_in_storage)
         eventManager().fire(
@@ -754,7 +938,7 @@ class FileManager:
                 "operation": "add",
             },
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
         return path_in_storage
 
     def remove_file(self, location, path):
@@ -774,7 +958,7 @@ class FileManager:
                 "operation": "remove",
             },
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def copy_file(self, location, source, destination):
         path_in_storage = self._storage(location).copy_file(source, destination)
@@ -794,7 +978,7 @@ class FileManager:
                 "operation": "copy",
             },
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def move_file(self, location, source, destination):
         source_in_storage = self._storage(location).path_in_storage(source)
@@ -846,7 +1030,7 @@ class FileManager:
             },
         )
 
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def add_folder(self, location, path, ignore_existing=True, display=None):
         path_in_storage = self._storage(location).add_folder(
@@ -858,7 +1042,7 @@ class FileManager:
             Events.FOLDER_ADDED,
             {"storage": location, "path": path_in_storage, "name": name},
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
         return path_in_storage
 
     def remove_folder(self, location, path, recursive=True):
@@ -874,7 +1058,7 @@ class FileManager:
             Events.FOLDER_REMOVED,
             {"storage": location, "path": path_in_storage, "name": name},
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def copy_folder(self, location, source, destination):
         path_in_storage = self._storage(location).copy_folder(source, destination)
@@ -887,7 +1071,7 @@ class FileManager:
             Events.FOLDER_ADDED,
             {"storage": location, "path": path_in_storage, "name": name},
         )
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def move_folder(self, location, source, destination):
         source_in_storage = self._storage(location).path_in_storage(source)
@@ -929,7 +1113,7 @@ class FileManager:
             },
         )
 
-        eventManager().fire(Events.UPDATED_FILES, {"type": "printables"})
+        self._fire_updated_files()
 
     def get_size(self, location, path):
         try:
@@ -1047,6 +1231,9 @@ class FileManager:
     def path_on_disk(self, location, path):
         return self._storage(location).path_on_disk(path)
 
+    def staging_folder(self, location):
+        return self._storage(location).staging_folder
+
     def canonicalize(self, location, path):
         return self._storage(location).canonicalize(path)
 
@@ -1071,6 +1258,11 @@ class FileManager:
     def last_modified(self, location, path=None, recursive=False):
         return self._storage(location).last_modified(path=path, recursive=recursive)
 
+    def is_watched(self, location):
+        """Whether the storage at ``location`` notices changes made to it outside of OctoPrint."""
+        storage = self._storage_managers.get(location)
+        return storage is not None and storage.watched
+
     def _storage(self, location):
         if location not in self._storage_managers:
             raise NoSuchStorage(f"No storage configured for destination {location}")
@@ -1082,8 +1274,18 @@ class FileManager:
         if not result:
             return
 
+        result = dict(result)
+        markers = result.pop("markers", None)
+
         storage_manager = self._storage_managers[location]
-        storage_manager.set_additional_metadata(path, "analysis", result, overwrite=True)
+        with storage_manager.batch():
+            storage_manager.set_additional_metadata(
+                path, "analysis", result, overwrite=True
+            )
+            if markers:
+                storage_manager.set_additional_metadata(
+                    path, "markers", markers, overwrite=True
+                )
 
     def _on_analysis_finished(self, entry, result):
         self._add_analysis_result(entry.location, entry.path, result)
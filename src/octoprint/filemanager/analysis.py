@@ -141,6 +141,9 @@ class AnalysisQueue:
                     f"Error while pushing analysis data to callback {callback}",
                     extra={"callback": fqcn(callback)},
                 )
+
+        # the marker index is for internal lookups only and too large for the event bus
+        result = {key: value for key, value in result.items() if key != "markers"}
         eventManager().fire(
             Events.METADATA_ANALYSIS_FINISHED,
             {
@@ -481,6 +484,8 @@ class GcodeAnalysisQueue(AbstractAnalysisQueue):
                 command += ["--offset", str(offset[0]), str(offset[1])]
             if g90_extruder:
                 command += ["--g90-extruder"]
+            for marker in self._get_markers():
+                command += ["--marker", marker]
             command.append(self._current.absolute_path)
 
             self._logger.info(f"Invoking analysis command: {' '.join(command)}")
@@ -548,6 +553,10 @@ class GcodeAnalysisQueue(AbstractAnalysisQueue):
                             "length": analysis["extrusion_length"][i],
                             "volume": analysis["extrusion_volume"][i],
                         }
+                if analysis.get("slicer"):
+                    result["slicer"] = analysis["slicer"]
+                if analysis.get("markers"):
+                    result["markers"] = analysis["markers"]
 
             if self._current.analysis and isinstance(self._current.analysis, dict):
                 return dict_merge(result, self._current.analysis)
@@ -556,6 +565,27 @@ class GcodeAnalysisQueue(AbstractAnalysisQueue):
         finally:
             self._gcode = None
 
+    def _get_markers(self):
+        import octoprint.plugin
+
+        markers = list(settings().get(["gcodeAnalysis", "markers"]) or [])
+
+        hooks = octoprint.plugin.plugin_manager().get_hooks(
+            "octoprint.filemanager.analysis.markers"
+        )
+        for name, hook in hooks.items():
+            try:
+                hook_result = hook()
+                if hook_result:
+                    markers += [str(marker) for marker in hook_result]
+            except Exception:
+                self._logger.exception(
+                    f"Error while retrieving analysis markers from hook {name}",
+                    extra={"plugin": name},
+                )
+
+        return [marker for marker in dict.fromkeys(markers) if marker]
+
     def _do_abort(self, reenqueue=True):
         self._aborted = True
         self._reenqueue = reenqueue
@@ -0,0 +1,266 @@
+"""
+Compressed file storage.
+
+Files get compressed into a sequence of independent gzip members of :data:`BLOCK_SIZE` uncompressed bytes each,
+so the result is a regular gzip file that ``gzip``, ``zcat`` and browsers can decompress as usual. Every member
+carries its own compressed length in an extra field of its header, which allows to build an index of all members by
+hopping from header to header without decompressing anything. Each member is a sync point: seeking to any
+uncompressed offset only needs to decompress the single member containing it.
+
+:func:`open_file` and :func:`file_size` work for plain files as well, so consumers don't need to care whether a file
+is stored compressed or not.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import bisect
+import io
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+
+BLOCK_SIZE = 1024 * 1024
+"""Uncompressed bytes per gzip member, and thus maximum distance between two sync points."""
+
+DEFAULT_LEVEL = 6
+
+BUFFER_SIZE = 64 * 1024
+
+METHOD = "gzip"
+
+_MAGIC = b"\x1f\x8b"
+_FEXTRA = 0x04
+_SUBFIELD = b"OP"
+
+# magic, compression method, flags, mtime, extra flags, OS, extra length, then our subfield with its
+# length and the member's length
+_HEADER = struct.Struct("<2sBBIBBH2sHI")
+_TRAILER = struct.Struct("<II")
+
+
+class CompressionError(Exception):
+    pass
+
+
+Block = namedtuple("Block", "start offset length size")
+"""A gzip member: uncompressed start, compressed offset and length, uncompressed size."""
+
+
+def _member(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    length = _HEADER.size + len(deflated) + _TRAILER.size
+    return (
+        _HEADER.pack(
+            _MAGIC,
+            zlib.DEFLATED,
+            _FEXTRA,
+            0,
+            0,
+            255,
+            8,
+            _SUBFIELD,
+            4,
+            length,
+        )
+        + deflated
+        + _TRAILER.pack(zlib.crc32(data), len(data))
+    )
+
+
+def compress_file(source, destination, level=DEFAULT_LEVEL, block_size=BLOCK_SIZE):
+    """
+    Compresses ``source`` into ``destination``.
+
+    Arguments:
+        source (str): Path of the file to compress
+        destination (str): Path of the compressed file to create
+        level (int): zlib compression level
+        block_size (int): Uncompressed bytes per gzip member
+
+    Returns:
+        int: The uncompressed size
+    """
+    size = 0
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while True:
+            data = src.read(block_size)
+            if not data and size:
+                break
+
+            dst.write(_member(data, level))
+            size += len(data)
+
+            if not data:
+                # empty file, still write one member to mark it as compressed
+                break
+    return size
+
+
+def _read_header(f, offset):
+    f.seek(offset)
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+
+    magic, method, flags, _, _, _, xlen, subfield, sublen, length = _HEADER.unpack(header)
+    if (
+        magic != _MAGIC
+        or method != zlib.DEFLATED
+        or not flags & _FEXTRA
+        or xlen != 8
+        or subfield != _SUBFIELD
+        or sublen != 4
+    ):
+        return None
+    return length
+
+
+def is_compressed(path):
+    """
+    Returns ``True`` if the file at ``path`` was compressed by :func:`compress_file`, ``False`` otherwise. Plain
+    gzip files without the index information are not considered compressed.
+    """
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f, 0) is not None
+    except OSError:
+        return False
+
+
+_index_cache = OrderedDict()
+_index_cache_mutex = threading.Lock()
+_INDEX_CACHE_SIZE = 32
+
+
+def _index(path):
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _index_cache_mutex:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+    blocks = []
+    start = offset = 0
+    with open(path, "rb") as f:
+        while offset < stat.st_size:
+            length = _read_header(f, offset)
+            if length is None or offset + length > stat.st_size:
+                raise CompressionError(f"Invalid gzip member at {offset} in {path}")
+
+            f.seek(offset + length - _TRAILER.size)
+            _, size = _TRAILER.unpack(f.read(_TRAILER.size))
+
+            blocks.append(Block(start, offset, length, size))
+            start += size
+            offset += length
+
+    if not blocks:
+        raise CompressionError(f"{path} is not compressed")
+
+    with _index_cache_mutex:
+        _index_cache[key] = blocks
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return blocks
+
+
+def file_size(path):
+    """
+    Returns the uncompressed size of the file at ``path``, or its size on disk if it's not compressed.
+    """
+    if is_compressed(path):
+        last = _index(path)[-1]
+        return last.start + last.size
+    return os.stat(path).st_size
+
+
+class CompressedFile(io.RawIOBase):
+    """
+    Read-only, seekable raw stream of the uncompressed content of a file compressed by :func:`compress_file`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._blocks = _index(path)
+        self._starts = [block.start for block in self._blocks]
+        self._size = self._blocks[-1].start + self._blocks[-1].size
+        self._file = open(path, "rb")
+        self._pos = 0
+        self._current = None
+        self._data = b""
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        if self._pos >= self._size:
+            return 0
+
+        index = bisect.bisect_right(self._starts, self._pos) - 1
+        block = self._blocks[index]
+        if index != self._current:
+            self._file.seek(block.offset)
+            try:
+                self._data = zlib.decompress(
+                    self._file.read(block.length), 16 + zlib.MAX_WBITS
+                )
+            except zlib.error as exc:
+                raise CompressionError(
+                    f"Corrupt gzip member at {block.offset} in {self.path}"
+                ) from exc
+            self._current = index
+
+        start = self._pos - block.start
+        chunk = self._data[start : start + len(b)]
+        b[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self._data = b""
+        super().close()
+
+
+def open_file(path, buffer_size=BUFFER_SIZE):
+    """
+    Opens the file at ``path`` for reading its uncompressed content in binary mode, no matter whether it's stored
+    compressed or not. Wrap the result into an :class:`io.TextIOWrapper` for text access.
+
+    Returns:
+        A seekable, buffered binary file object
+    """
+    if is_compressed(path):
+        return io.BufferedReader(CompressedFile(path), buffer_size=buffer_size)
+    return open(path, "rb", buffering=buffer_size)
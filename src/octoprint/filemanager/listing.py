@@ -0,0 +1,364 @@
+"""
+Sorted, filtered and paginated views of file listings.
+
+A :class:`ListingIndex` gets built once from a recursive file listing as returned by
+:meth:`~octoprint.filemanager.storage.StorageInterface.list_files`. It precomputes the
+sort keys and print statistics of all entries, so that a page of the listing can be
+looked up through a binary search on an opaque cursor, instead of sorting and
+serializing the whole tree on every request.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import base64
+import bisect
+import functools
+import heapq
+import itertools
+import json
+import threading
+
+SORT_FIELDS = ("name", "date", "size", "last_print", "estimated_time")
+"""Fields listings can be sorted by."""
+
+SORT_ORDERS = ("asc", "desc")
+
+DEFAULT_SORT_ORDERS = {
+    "name": "asc",
+    "date": "desc",
+    "size": "desc",
+    "last_print": "desc",
+    "estimated_time": "asc",
+}
+
+PRINT_FILTERS = ("success", "failure", "none")
+"""Supported print result filters: printed successfully, failed, never printed."""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@functools.total_ordering
+class _Descending:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def print_summary(history):
+    """
+    Summarizes the print history of a file.
+
+    Arguments:
+        history (list): The ``history`` metadata of the file
+
+    Returns:
+        dict: ``success`` and ``failure`` counts plus the ``last`` print, or None if the
+            file has never been printed
+    """
+    success = 0
+    failure = 0
+    last = None
+    for entry in history:
+        success += 1 if "success" in entry and entry["success"] else 0
+        failure += 1 if "success" in entry and not entry["success"] else 0
+        if not last or (
+            "timestamp" in entry
+            and "timestamp" in last
+            and entry["timestamp"] > last["timestamp"]
+        ):
+            last = entry
+
+    if not last:
+        return None
+
+    prints = {
+        "success": success,
+        "failure": failure,
+        "last": {
+            "success": last["success"],
+            "date": last["timestamp"],
+        },
+    }
+    if "printTime" in last:
+        prints["last"]["printTime"] = last["printTime"]
+    return prints
+
+
+class _Entry:
+    __slots__ = ("node", "origin", "name", "display", "prints", "values")
+
+    def __init__(self, node, origin, prints):
+        self.node = node
+        self.origin = origin
+        self.name = node["name"].lower()
+        self.display = (node.get("display") or node["name"]).lower()
+        self.prints = prints
+
+        analysis = node.get("analysis") or node.get("gcodeAnalysis") or {}
+        last = prints.get("last") if prints else None
+        self.values = {
+            "name": self.display,
+            "date": node.get("date"),
+            "size": node.get("size"),
+            "last_print": last.get("date") if last else None,
+            "estimated_time": analysis.get("estimatedPrintTime"),
+        }
+
+    @property
+    def success(self):
+        return self.prints.get("success", 0) if self.prints else 0
+
+    @property
+    def failure(self):
+        return self.prints.get("failure", 0) if self.prints else 0
+
+    def key(self, sort, order):
+        value = self.values[sort]
+        expected = str if sort == "name" else (int, float)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            # entries without a value always go last
+            missing, value = 1, 0
+        else:
+            missing = 0
+
+        if order == "desc":
+            value = _Descending(value)
+
+        tie = self.display if sort != "name" else ""
+        return (
+            missing,
+            value,
+            tie,
+            self.node.get("path", self.node["name"]),
+            self.origin or "",
+        )
+
+    def matches(self, filter=None, prints=None, query=None):
+        folder = self.node.get("type") == "folder"
+        if filter is not None and not folder and not filter(self.node):
+            return False
+
+        if prints == "success" and not self.success:
+            return False
+        elif prints == "failure" and not self.failure:
+            return False
+        elif prints == "none" and (self.success or self.failure):
+            return False
+
+        if query and query not in self.display and query not in self.name:
+            return False
+
+        return True
+
+    def to_node(self):
+        node = dict(self.node)
+        if node.get("type") == "folder":
+            node.pop("children", None)
+            node["prints"] = {
+                "success": self.success,
+                "failure": self.failure,
+            }
+            if self.prints and "last" in self.prints:
+                node["prints"]["last"] = self.prints["last"]
+        if self.origin:
+            node["origin"] = self.origin
+        return node
+
+
+class ListingIndex:
+    """
+    Index over the entries of a file listing, with precomputed sort keys.
+
+    Arguments:
+        nodes (dict or list): The listing, as returned by ``list_files(recursive=True)``
+        recursive (bool): Whether to index all entries in the tree (True) or only those
+            on its top level (False). Folder statistics always cover the whole tree.
+        origin (str): Origin to tag entries with
+    """
+
+    def __init__(self, nodes, recursive=False, origin=None):
+        self.origin = origin
+        self._entries = []
+        self._collect(nodes, recursive, True)
+
+        self._mutex = threading.Lock()
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def page(
+        self,
+        sort="name",
+        order=None,
+        cursor=None,
+        limit=None,
+        filter=None,
+        prints=None,
+        query=None,
+    ):
+        """
+        Returns a page of the indexed entries.
+
+        See :func:`paginate` for the arguments and return value.
+        """
+        return paginate(
+            [self],
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            filter=filter,
+            prints=prints,
+            query=query,
+        )
+
+    def _collect(self, nodes, recursive, include):
+        if isinstance(nodes, dict):
+            nodes = nodes.values()
+
+        success = failure = 0
+        last = None
+        for node in nodes:
+            if node.get("type") == "folder":
+                prints = self._collect(
+                    node.get("children", {}), recursive, include and recursive
+                )
+            elif "prints" in node:
+                prints = node["prints"]
+            else:
+                prints = print_summary(node.get("history") or [])
+
+            if include:
+                self._entries.append(_Entry(node, self.origin, prints))
+
+            if prints:
+                success += prints.get("success", 0)
+                failure += prints.get("failure", 0)
+                node_last = prints.get("last")
+                if node_last and "date" in node_last:
+                    if last is None or node_last["date"] > last["date"]:
+                        last = node_last
+
+        result = {"success": success, "failure": failure}
+        if last:
+            result["last"] = last
+        return result
+
+    def _iter(self, sort, order, after=None):
+        with self._mutex:
+            if (sort, order) not in self._sorted:
+                keyed = sorted(
+                    ((entry.key(sort, order), entry) for entry in self._entries),
+                    key=lambda x: x[0],
+                )
+                self._sorted[(sort, order)] = (
+                    [key for key, _ in keyed],
+                    [entry for _, entry in keyed],
+                )
+            keys, entries = self._sorted[(sort, order)]
+
+        start = bisect.bisect_right(keys, after) if after is not None else 0
+        return zip(keys[start:], entries[start:])
+
+
+def paginate(
+    indexes,
+    sort="name",
+    order=None,
+    cursor=None,
+    limit=None,
+    filter=None,
+    prints=None,
+    query=None,
+):
+    """
+    Returns a page of the entries of one or more :class:`ListingIndex` instances, merged
+    into one sort order.
+
+    Arguments:
+        indexes (list): The indexes to page through
+        sort (str): The field to sort by, one of :data:`SORT_FIELDS`
+        order (str): ``asc`` or ``desc``, defaults to the field's natural order
+        cursor (str): The ``next`` cursor returned for the previous page, if any
+        limit (int): Maximum number of entries to return, all if None
+        filter (callable): Function called with a file's node, returning whether to
+            include it. Folders always pass this filter.
+        prints (str): Only include entries with the print result, one of :data:`PRINT_FILTERS`
+        query (str): Only include entries whose name or display name contain this
+
+    Returns:
+        tuple: A list of entry nodes (without children) and the cursor of the next page,
+            or None if this is the last page
+
+    Raises:
+        ValueError: Invalid sort field, order or print filter
+        InvalidCursor: The cursor is invalid or was created for a different sort order
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort field: {sort}")
+    if order is None:
+        order = DEFAULT_SORT_ORDERS[sort]
+    if order not in SORT_ORDERS:
+        raise ValueError(f"Invalid sort order: {order}")
+    if prints is not None and prints not in PRINT_FILTERS:
+        raise ValueError(f"Invalid print filter: {prints}")
+    if query:
+        query = query.lower()
+
+    after = _decode_cursor(cursor, sort, order) if cursor else None
+
+    merged = heapq.merge(
+        *[index._iter(sort, order, after=after) for index in indexes],
+        key=lambda x: x[0],
+    )
+    matching = (
+        (key, entry)
+        for key, entry in merged
+        if entry.matches(filter=filter, prints=prints, query=query)
+    )
+
+    page = list(itertools.islice(matching, limit))
+    if limit is None or not page or next(matching, None) is None:
+        return [entry.to_node() for _, entry in page], None
+
+    return [entry.to_node() for _, entry in page], _encode_cursor(
+        sort, order, page[-1][0]
+    )
+
+
+def _encode_cursor(sort, order, key):
+    missing, value, tie, path, origin = key
+    if isinstance(value, _Descending):
+        value = value.value
+
+    data = json.dumps([sort, order, missing, value, tie, path, origin])
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor, sort, order):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        cursor_sort, cursor_order, missing, value, tie, path, origin = data
+    except Exception as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from exc
+
+    if cursor_sort != sort or cursor_order != order:
+        raise InvalidCursor(
+            f"Cursor was created for sorting by {cursor_sort} {cursor_order}, not {sort} {order}"
+        )
+
+    if order == "desc":
+        value = _Descending(value)
+    return (missing, value, tie, path, origin)
@@ -0,0 +1,843 @@
+"""
+Persistence backends for the file metadata managed by
+:class:`~octoprint.filemanager.storage.LocalFileStorage`.
+
+Metadata is organized per folder, as a dictionary mapping the names of the folder's
+entries to their metadata. :class:`JsonMetadataBackend` stores it in a ``.metadata.json``
+file within each folder, :class:`SqliteMetadataBackend` in a single SQLite database in
+the storage's base folder, importing existing ``.metadata.json`` files on first access.
+Either one can be wrapped into a :class:`WriteBehindMetadataBackend` that keeps changes in
+memory and a journal and writes them to the wrapped backend only every now and then.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from octoprint.util import atomic_write, to_bytes, yaml
+
+METADATA_JSON = ".metadata.json"
+METADATA_YAML = ".metadata.yaml"
+METADATA_DB = ".metadata.db"
+METADATA_JOURNAL = ".metadata.journal"
+
+METADATA_DB_FILES = (
+    METADATA_DB,
+    METADATA_DB + "-wal",
+    METADATA_DB + "-shm",
+    METADATA_DB + "-journal",
+)
+"""Names of all files belonging to the metadata database."""
+
+
+class MetadataBackendError(Exception):
+    pass
+
+
+class MetadataBackend:
+    """
+    Interface for metadata backends.
+
+    All ``path`` arguments are absolute paths of folders within the storage.
+    """
+
+    def load(self, path):
+        """
+        Arguments:
+            path (str): The folder to load the metadata for
+
+        Returns:
+            dict: The metadata of the folder's entries, or None if there is none
+        """
+        raise NotImplementedError()
+
+    def save(self, path, metadata):
+        """
+        Replaces the metadata of the folder's entries.
+
+        Arguments:
+            path (str): The folder to save the metadata for
+            metadata (dict): The metadata of the folder's entries
+        """
+        raise NotImplementedError()
+
+    def delete(self, path):
+        """
+        Deletes the metadata of the folder and everything below it.
+
+        Arguments:
+            path (str): The folder to delete the metadata for
+        """
+        raise NotImplementedError()
+
+    def copy(self, source, destination):
+        """
+        Copies the metadata of the ``source`` folder and everything below it after the
+        folder was copied to ``destination``.
+        """
+        pass
+
+    def move(self, source, destination):
+        """
+        Moves the metadata of the ``source`` folder and everything below it after the
+        folder was moved to ``destination``.
+        """
+        pass
+
+    def last_modified(self, path):
+        """
+        Returns:
+            float: The time the folder's metadata was last modified, or None if unknown
+        """
+        return None
+
+    def flush(self):
+        """
+        Writes changes the backend might have deferred.
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+def _valid_json(value):
+    try:
+        json.dumps(value, allow_nan=False)
+        return True
+    except Exception:
+        return False
+
+
+class JsonMetadataBackend(MetadataBackend):
+    """
+    Stores the metadata of every folder in a ``.metadata.json`` file within it.
+
+    Metadata files move along with their folders, so copying and moving is taken care of
+    by the file operations themselves.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger(__name__)
+
+        self._lock_mutex = threading.RLock()
+        self._locks = {}
+
+    def load(self, path):
+        self._migrate(path)
+
+        metadata_path = os.path.join(path, METADATA_JSON)
+
+        metadata = None
+        with self._lock(path):
+            if os.path.exists(metadata_path):
+                with open(metadata_path, encoding="utf-8") as f:
+                    try:
+                        metadata = json.load(f)
+                    except Exception:
+                        self._logger.exception(
+                            f"Error while reading {METADATA_JSON} from {path}"
+                        )
+
+        if not isinstance(metadata, dict):
+            return None
+
+        valid = {k: v for k, v in metadata.items() if _valid_json(v)}
+        if len(valid) != len(metadata):
+            self._logger.info(
+                "Deleted {} invalid entries from metadata for path {}".format(
+                    len(metadata) - len(valid), path
+                )
+            )
+            self.save(path, valid)
+        return valid
+
+    def save(self, path, metadata):
+        with self._lock(path):
+            metadata_path = os.path.join(path, METADATA_JSON)
+            try:
+                with atomic_write(metadata_path, mode="wb") as f:
+                    f.write(
+                        to_bytes(json.dumps(metadata, indent=2, separators=(",", ": ")))
+                    )
+            except Exception:
+                self._logger.exception(f"Error while writing {METADATA_JSON} to {path}")
+
+    def delete(self, path):
+        with self._lock(path):
+            for metadata_file in (METADATA_JSON, METADATA_YAML):
+                metadata_path = os.path.join(path, metadata_file)
+                if os.path.exists(metadata_path):
+                    try:
+                        os.remove(metadata_path)
+                    except Exception:
+                        self._logger.exception(
+                            f"Error while deleting {metadata_file} from {path}"
+                        )
+
+    def last_modified(self, path):
+        try:
+            return os.stat(os.path.join(path, METADATA_JSON)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _migrate(self, path):
+        # we switched to json in 1.3.9 - if we still have yaml here, migrate it now
+        with self._lock(path):
+            metadata_path_yaml = os.path.join(path, METADATA_YAML)
+            metadata_path_json = os.path.join(path, METADATA_JSON)
+
+            if not os.path.exists(metadata_path_yaml):
+                # nothing to migrate
+                return
+
+            if os.path.exists(metadata_path_json):
+                # already migrated
+                try:
+                    os.remove(metadata_path_yaml)
+                except Exception:
+                    self._logger.exception(
+                        f"Error while removing {METADATA_YAML} from {path}"
+                    )
+                return
+
+            try:
+                metadata = yaml.load_from_file(path=metadata_path_yaml)
+            except Exception:
+                self._logger.exception(f"Error while reading {METADATA_YAML} from {path}")
+                return
+
+            if not isinstance(metadata, dict):
+                # looks invalid, ignore it
+                return
+
+            with atomic_write(metadata_path_json, mode="wb") as f:
+                f.write(to_bytes(json.dumps(metadata, indent=2, separators=(",", ": "))))
+
+            try:
+                os.remove(metadata_path_yaml)
+            except Exception:
+                self._logger.exception(
+                    f"Error while removing {METADATA_YAML} from {path}"
+                )
+
+    @contextmanager
+    def _lock(self, path):
+        with self._lock_mutex:
+            if path not in self._locks:
+                self._locks[path] = (0, threading.RLock())
+
+            counter, lock = self._locks[path]
+            counter += 1
+            self._locks[path] = (counter, lock)
+
+        try:
+            with lock:
+                yield lock
+        finally:
+            with self._lock_mutex:
+                counter = self._locks[path][0]
+                counter -= 1
+                if counter <= 0:
+                    del self._locks[path]
+                else:
+                    self._locks[path] = (counter, lock)
+
+
+class SqliteMetadataBackend(MetadataBackend):
+    """
+    Stores all metadata in a SQLite database ``.metadata.db`` in the storage's base folder.
+
+    The database runs in WAL mode, holds one row per entry keyed by folder and name, and
+    updates only the rows that actually changed, in a single transaction. Folders that
+    have no metadata in the database yet get imported from their ``.metadata.json`` on
+    first access, which takes care of migrating existing installations. Those files are
+    left in place but are no longer updated, :func:`export_metadata` allows writing
+    current ones for backups.
+
+    Arguments:
+        basefolder (str): The storage's base folder
+
+    Raises:
+        MetadataBackendError: The database could not be opened
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, basefolder):
+        self._logger = logging.getLogger(__name__)
+
+        self._basefolder = basefolder
+        self.path = os.path.join(basefolder, METADATA_DB)
+
+        self._json = JsonMetadataBackend()
+        self._mutex = threading.RLock()
+
+        try:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+        except sqlite3.Error as exc:
+            raise MetadataBackendError(f"Could not open {self.path}: {exc}") from exc
+
+        try:
+            self._initialize()
+        except Exception as exc:
+            self._connection.close()
+            if isinstance(exc, MetadataBackendError):
+                raise
+            raise MetadataBackendError(
+                f"Could not initialize {self.path}: {exc}"
+            ) from exc
+
+    def _initialize(self):
+        mode = self._connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            self._logger.warning(
+                f"Could not switch {self.path} to WAL mode, using {mode} instead"
+            )
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > self.SCHEMA_VERSION:
+            raise MetadataBackendError(
+                f"{self.path} has unknown schema version {version}"
+            )
+
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS folders ("
+                "folder TEXT PRIMARY KEY, modified REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "folder TEXT NOT NULL, name TEXT NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (folder, name)"
+                ") WITHOUT ROWID"
+            )
+            connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def load(self, path):
+        folder = self._relative(path)
+
+        with self._mutex:
+            known = self._connection.execute(
+                "SELECT 1 FROM folders WHERE folder = ?", (folder,)
+            ).fetchone()
+            if not known:
+                return self._import(path)
+
+            rows = self._connection.execute(
+                "SELECT name, data FROM entries WHERE folder = ?", (folder,)
+            ).fetchall()
+
+        return {name: json.loads(data) for name, data in rows}
+
+    def save(self, path, metadata):
+        folder = self._relative(path)
+
+        serialized = _serialize(metadata, path, self._logger)
+
+        with self._transaction() as connection:
+            existing = dict(
+                connection.execute(
+                    "SELECT name, data FROM entries WHERE folder = ?", (folder,)
+                )
+            )
+
+            changed = [
+                (folder, name, data)
+                for name, data in serialized.items()
+                if existing.get(name) != data
+            ]
+            removed = [(folder, name) for name in existing if name not in serialized]
+
+            if changed:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (folder, name, data) VALUES (?, ?, ?)",
+                    changed,
+                )
+            if removed:
+                connection.executemany(
+                    "DELETE FROM entries WHERE folder = ? AND name = ?", removed
+                )
+            connection.execute(
+                "INSERT OR {} INTO folders (folder, modified) VALUES (?, ?)".format(
+                    "REPLACE" if changed or removed else "IGNORE"
+                ),
+                (folder, time.time()),
+            )
+
+    def delete(self, path):
+        with self._transaction() as connection:
+            self._delete(connection, self._relative(path))
+
+    def copy(self, source, destination):
+        with self._transaction() as connection:
+            self._copy(connection, self._relative(source), self._relative(destination))
+
+    def move(self, source, destination):
+        source = self._relative(source)
+        with self._transaction() as connection:
+            self._copy(connection, source, self._relative(destination))
+            self._delete(connection, source)
+
+    def last_modified(self, path):
+        with self._mutex:
+            row = self._connection.execute(
+                "SELECT modified FROM folders WHERE folder = ?", (self._relative(path),)
+            ).fetchone()
+        if row:
+            return row[0]
+        return self._json.last_modified(path)
+
+    def export(self):
+        """
+        Returns:
+            dict: The metadata of all folders, indexed by their path relative to the base folder
+        """
+        with self._mutex:
+            return _read_all(self._connection)
+
+    def close(self):
+        with self._mutex:
+            self._connection.close()
+
+    def _import(self, path):
+        metadata = self._json.load(path)
+        if metadata is not None:
+            self._logger.debug(f"Importing {METADATA_JSON} from {path}")
+            self.save(path, metadata)
+        return metadata
+
+    def _relative(self, path):
+        relative = os.path.relpath(path, self._basefolder)
+        if relative == ".":
+            return ""
+        return relative.replace(os.sep, "/")
+
+    @contextmanager
+    def _transaction(self):
+        with self._mutex:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            else:
+                self._connection.execute("COMMIT")
+
+    @staticmethod
+    def _subtree(folder):
+        # folder itself and everything below, as index range, "0" sorts right after "/"
+        return (
+            "(folder = ? OR (folder >= ? AND folder < ?))",
+            (folder, folder + "/", folder + "0"),
+        )
+
+    def _delete(self, connection, folder):
+        condition, parameters = self._subtree(folder)
+        for table in ("entries", "folders"):
+            connection.execute(f"DELETE FROM {table} WHERE {condition}", parameters)
+
+    def _copy(self, connection, source, destination):
+        self._delete(connection, destination)
+
+        condition, parameters = self._subtree(source)
+        offset = len(source) + 1
+        connection.execute(
+            "INSERT INTO entries (folder, name, data) "
+            f"SELECT ? || substr(folder, ?), name, data FROM entries WHERE {condition}",
+            (destination, offset) + parameters,
+        )
+        connection.execute(
+            "INSERT INTO folders (folder, modified) "
+            f"SELECT ? || substr(folder, ?), ? FROM folders WHERE {condition}",
+            (destination, offset, time.time()) + parameters,
+        )
+
+
+class WriteBehindMetadataBackend(MetadataBackend):
+    """
+    Keeps metadata changes in memory and writes them to the wrapped ``backend`` only every ``interval`` seconds,
+    when the journal grows beyond ``journal_limit`` bytes, and on :func:`close`.
+
+    Every change gets appended to the journal ``.metadata.journal`` in the base folder right away, as a single line
+    containing only the entries that actually changed. The journal is synced to disk at most every ``sync_delay``
+    seconds, so a burst of changes costs a single sync. If the server doesn't get to flush its changes, e.g. due to a
+    crash, the journal gets replayed into the wrapped backend on the next start. A line that was only partially
+    written when that happened gets skipped, along with everything after it. On power loss, changes from the last
+    ``sync_delay`` seconds might be lost as well.
+
+    Copying, moving and deleting folders flushes all pending changes first and is then passed on right away.
+
+    Arguments:
+        backend (MetadataBackend): The backend to write the metadata to
+        basefolder (str): The storage's base folder
+        interval (float): Seconds to keep changes in memory before writing them
+        journal_limit (int): Size of the journal in bytes at which changes get written right away
+        sync_delay (float): Seconds to wait for further changes before syncing the journal to disk, 0 to sync
+            every change right away
+    """
+
+    DEFAULT_JOURNAL_LIMIT = 1024 * 1024
+    DEFAULT_SYNC_DELAY = 1.0
+
+    def __init__(
+        self,
+        backend,
+        basefolder,
+        interval=60.0,
+        journal_limit=DEFAULT_JOURNAL_LIMIT,
+        sync_delay=DEFAULT_SYNC_DELAY,
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self._backend = backend
+        self._basefolder = basefolder
+        self._interval = interval
+        self._journal_limit = journal_limit
+        self._sync_delay = sync_delay
+
+        self.journal_path = os.path.join(basefolder, METADATA_JOURNAL)
+
+        self._mutex = threading.RLock()
+        self._pending = {}
+        self._modified = {}
+        self._journal = None
+        self._timer = None
+        self._sync_timer = None
+
+        self._replay()
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def load(self, path):
+        with self._mutex:
+            pending = self._pending.get(path)
+            if pending is not None:
+                return {name: json.loads(data) for name, data in pending.items()}
+        return self._backend.load(path)
+
+    def save(self, path, metadata):
+        serialized = _serialize(metadata, path, self._logger)
+
+        with self._mutex:
+            current = self._pending.get(path)
+            if current is None:
+                current = _serialize(self._backend.load(path) or {}, path, self._logger)
+
+            changed = {
+                name: data
+                for name, data in serialized.items()
+                if current.get(name) != data
+            }
+            removed = [name for name in current if name not in serialized]
+            if not changed and not removed:
+                return
+
+            record = {"folder": self._relative(path)}
+            if changed:
+                record["set"] = {name: metadata[name] for name in changed}
+            if removed:
+                record["remove"] = removed
+
+            try:
+                size = self._append(record)
+            except Exception:
+                self._logger.exception(
+                    f"Error while writing to {self.journal_path}, saving metadata for {path} right away"
+                )
+                self._backend.save(path, metadata)
+                return
+
+            self._pending[path] = serialized
+            self._modified[path] = time.time()
+
+            if size >= self._journal_limit:
+                self.flush()
+            else:
+                self._schedule()
+
+    def delete(self, path):
+        with self._mutex:
+            self.flush()
+            self._backend.delete(path)
+
+    def copy(self, source, destination):
+        with self._mutex:
+            self.flush()
+            self._backend.copy(source, destination)
+
+    def move(self, source, destination):
+        with self._mutex:
+            self.flush()
+            self._backend.move(source, destination)
+
+    def last_modified(self, path):
+        with self._mutex:
+            modified = self._modified.get(path)
+        if modified is not None:
+            return modified
+        return self._backend.last_modified(path)
+
+    def flush(self):
+        """
+        Writes all pending changes to the wrapped backend and empties the journal.
+        """
+        with self._mutex:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._pending:
+                return
+
+            self._logger.debug(
+                f"Writing metadata of {len(self._pending)} folder(s) to {self._backend.__class__.__name__}"
+            )
+            failed = False
+            for path, serialized in self._pending.items():
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    self._backend.save(
+                        path,
+                        {name: json.loads(data) for name, data in serialized.items()},
+                    )
+                except Exception:
+                    self._logger.exception(f"Error while writing metadata for {path}")
+                    failed = True
+
+            if failed:
+                # keep everything in the journal and try again later
+                self._schedule()
+                return
+
+            self._pending.clear()
+            self._modified.clear()
+            self._truncate()
+
+    def close(self):
+        with self._mutex:
+            try:
+                self.flush()
+            except Exception:
+                self._logger.exception(
+                    f"Error while writing pending metadata, leaving it in {self.journal_path}"
+                )
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._journal is not None:
+                # whatever is left in there has to survive until the next start
+                self._sync()
+                self._journal.close()
+                self._journal = None
+            self._backend.close()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self._interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _append(self, record):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "ab")
+
+        self._journal.write(
+            to_bytes(json.dumps(record, allow_nan=False, separators=(",", ":")) + "\n")
+        )
+        self._journal.flush()
+
+        if not self._sync_delay:
+            os.fsync(self._journal.fileno())
+        elif self._sync_timer is None:
+            self._sync_timer = threading.Timer(self._sync_delay, self._sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+
+        return self._journal.tell()
+
+    def _sync(self):
+        with self._mutex:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._journal is None:
+                return
+            try:
+                os.fsync(self._journal.fileno())
+            except Exception:
+                self._logger.exception(f"Error while syncing {self.journal_path}")
+
+    def _truncate(self):
+        if self._sync_timer is not None:
+            # nothing left to sync
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+
+    def _replay(self):
+        if not os.path.isfile(self.journal_path):
+            return
+
+        folders = {}
+        count = 0
+        for folder, changed, removed in _read_journal(self.journal_path, self._logger):
+            path = os.path.join(self._basefolder, *filter(None, folder.split("/")))
+            if path not in folders:
+                folders[path] = self._backend.load(path) or {}
+            folders[path].update(changed)
+            for name in removed:
+                folders[path].pop(name, None)
+            count += 1
+
+        self._logger.info(
+            f"Replaying {count} metadata change(s) for {len(folders)} folder(s) from {self.journal_path}"
+        )
+        for path, metadata in folders.items():
+            if os.path.isdir(path):
+                self._backend.save(path, metadata)
+
+        self._truncate()
+
+    def _relative(self, path):
+        relative = os.path.relpath(path, self._basefolder)
+        if relative == ".":
+            return ""
+        return relative.replace(os.sep, "/")
+
+
+def _read_journal(path, logger):
+    """
+    Yields the ``(folder, set, remove)`` records from the journal at ``path``, up to the first incomplete or invalid
+    one.
+    """
+    with open(path, "rb") as f:
+        for count, line in enumerate(f):
+            try:
+                record = json.loads(line)
+                folder = record["folder"]
+                changed = record.get("set", {})
+                removed = record.get("remove", [])
+            except Exception:
+                logger.warning(
+                    f"Skipping incomplete or invalid record {count + 1} and everything after it in {path}"
+                )
+                return
+            yield folder, changed, removed
+
+
+def _serialize(metadata, path, logger):
+    serialized = {}
+    for name, entry in metadata.items():
+        try:
+            serialized[name] = json.dumps(entry, allow_nan=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            logger.warning(f"Not saving invalid metadata for {name} in {path}: {entry!r}")
+    return serialized
+
+
+def _read_all(connection):
+    result = {
+        folder: {} for (folder,) in connection.execute("SELECT folder FROM folders")
+    }
+    for folder, name, data in connection.execute(
+        "SELECT folder, name, data FROM entries ORDER BY folder, name"
+    ):
+        result.setdefault(folder, {})[name] = json.loads(data)
+    return result
+
+
+def _journal_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def export_metadata(basefolder):
+    """
+    Reads all metadata from the metadata database in ``basefolder``, including changes still pending in the journal
+    of a :class:`WriteBehindMetadataBackend`.
+
+    The database is opened read only and read in a single transaction, so this can be
+    used for consistent backups while the storage is in use. Without a database, only
+    the folders with pending changes in the journal get read, from their ``.metadata.json``.
+
+    Arguments:
+        basefolder (str): The storage's base folder
+
+    Returns:
+        dict: The metadata of all folders, indexed by their path relative to the base
+            folder with ``/`` as separator, or None if there is neither a database nor a journal
+    """
+    logger = logging.getLogger(__name__)
+
+    path = os.path.join(basefolder, METADATA_DB)
+    journal_path = os.path.join(basefolder, METADATA_JOURNAL)
+
+    for _ in range(3):
+        journal_id = _journal_id(journal_path)
+
+        records = []
+        if journal_id is not None:
+            try:
+                records = list(_read_journal(journal_path, logger))
+            except FileNotFoundError:
+                continue
+
+        if os.path.isfile(path):
+            connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                result = _read_all(connection)
+            finally:
+                connection.close()
+        elif records:
+            result = {}
+        else:
+            return None
+
+        if _journal_id(journal_path) != journal_id and journal_id is not None:
+            # the journal got flushed into the database while we were reading, its
+            # records might be older than the database by now
+            continue
+
+        json_backend = JsonMetadataBackend()
+        for folder, changed, removed in records:
+            if folder not in result:
+                result[folder] = (
+                    json_backend.load(
+                        os.path.join(basefolder, *filter(None, folder.split("/")))
+                    )
+                    or {}
+                )
+            result[folder].update(changed)
+            for name in removed:
+                result[folder].pop(name, None)
+
+        return result
+
+    raise MetadataBackendError(
+        f"The metadata in {basefolder} kept changing while trying to export it"
+    )
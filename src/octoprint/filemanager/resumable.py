@@ -0,0 +1,369 @@
+"""
+Resumable uploads.
+
+Instead of in one multipart request, large files can be uploaded in numbered chunks through
+a :class:`ResumableUpload`. Every chunk is written right to its offset within a sparse file
+preallocated to the announced size, so chunks may arrive in any order, in parallel and
+repeatedly. An interrupted upload only needs to resend the chunks that are still missing,
+and once all of them are there the file can be added to a storage like any other upload.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from octoprint.util import silent_remove
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 24 * 60 * 60
+DEFAULT_MAX_UPLOADS = 5
+
+BUFFER_SIZE = 64 * 1024
+
+
+class ResumableUploadError(Exception):
+    pass
+
+
+class UnknownUpload(ResumableUploadError):
+    pass
+
+
+class InvalidChunk(ResumableUploadError):
+    pass
+
+
+class IncompleteUpload(ResumableUploadError):
+    pass
+
+
+class TooManyUploads(ResumableUploadError):
+    pass
+
+
+class InsufficientStorage(ResumableUploadError):
+    pass
+
+
+class ResumableUpload:
+    """
+    An upload in progress, backed by a sparse file of the upload's full size.
+
+    Arguments:
+        id (str): The upload's id
+        path (str): Absolute path of the file to write the chunks to
+        filename (str): The name of the uploaded file
+        size (int): The size of the uploaded file in bytes
+        chunk_size (int): The size of all but the last chunk in bytes
+        owner (str): Name of the user the upload belongs to
+        parameters (dict): Additional parameters of the upload, to be evaluated once it's complete
+    """
+
+    def __init__(self, id, path, filename, size, chunk_size, owner=None, parameters=None):
+        self.id = id
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.owner = owner
+        self.parameters = parameters or {}
+
+        self.last_activity = time.monotonic()
+
+        self._mutex = threading.Lock()
+        self._received = set()
+        self._writers = 0
+        self._closed = False
+
+    @property
+    def chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    @property
+    def missing(self):
+        with self._mutex:
+            return [index for index in range(self.chunks) if index not in self._received]
+
+    @property
+    def complete(self):
+        with self._mutex:
+            return len(self._received) == self.chunks
+
+    @property
+    def outstanding(self):
+        """Number of bytes still to be written."""
+        with self._mutex:
+            return self.size - sum(self.chunk_length(index) for index in self._received)
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def write_chunk(self, index, stream, checksum=None):
+        """
+        Writes a chunk to its offset within the upload's file.
+
+        A chunk only counts as received if it was written completely and matches its
+        checksum. Chunks may be written again, e.g. after a failed attempt.
+
+        Arguments:
+            index (int): The index of the chunk
+            stream: File-like object to read the chunk's data from
+            checksum (str): Expected SHA1 hex digest of the chunk's data
+
+        Raises:
+            InvalidChunk: The index is out of range, or the data doesn't match the
+                chunk's length or checksum
+            UnknownUpload: The upload has already been finished or removed
+        """
+        if not 0 <= index < self.chunks:
+            raise InvalidChunk(f"Chunk {index} is out of range 0..{self.chunks - 1}")
+
+        with self._mutex:
+            if self._closed:
+                raise UnknownUpload(f"Upload {self.id} has already been closed")
+            self._writers += 1
+            self.last_activity = time.monotonic()
+
+        try:
+            expected = self.chunk_length(index)
+            written = 0
+            hash = hashlib.sha1()
+
+            with open(self.path, "r+b") as f:
+                f.seek(index * self.chunk_size)
+                while True:
+                    data = stream.read(min(BUFFER_SIZE, expected - written + 1))
+                    if not data:
+                        break
+
+                    written += len(data)
+                    if written > expected:
+                        raise InvalidChunk(
+                            f"Chunk {index} is longer than {expected} bytes"
+                        )
+                    f.write(data)
+                    hash.update(data)
+
+            if written != expected:
+                raise InvalidChunk(
+                    f"Chunk {index} has {written} bytes instead of {expected}"
+                )
+            if checksum and checksum.lower() != hash.hexdigest():
+                raise InvalidChunk(f"Checksum mismatch for chunk {index}")
+
+            with self._mutex:
+                self._received.add(index)
+                self.last_activity = time.monotonic()
+        finally:
+            with self._mutex:
+                self._writers -= 1
+
+    def close(self):
+        """
+        Closes the upload for further chunks.
+
+        Raises:
+            UnknownUpload: The upload has already been closed
+            IncompleteUpload: Chunks are still missing or being written
+        """
+        with self._mutex:
+            if self._closed:
+                raise UnknownUpload(f"Upload {self.id} has already been closed")
+            if len(self._received) != self.chunks or self._writers:
+                raise IncompleteUpload(f"Upload {self.id} is not complete yet")
+            self._closed = True
+
+    def reopen(self):
+        """
+        Reopens a closed upload, e.g. because adding it to a storage failed.
+        """
+        with self._mutex:
+            self._closed = False
+            self.last_activity = time.monotonic()
+
+    def to_dict(self):
+        missing = self.missing
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunkSize": self.chunk_size,
+            "chunks": self.chunks,
+            "missing": missing,
+            "complete": not missing,
+        }
+
+
+class ResumableUploadManager:
+    """
+    Keeps track of the resumable uploads in progress.
+
+    Uploads live in memory, their files in ``folder``. Uploads that have been idle for
+    longer than ``timeout`` get discarded.
+
+    Arguments:
+        folder (str): Folder to create the uploads' files in
+        chunk_size (int): Maximum chunk size in bytes
+        max_size (int): Maximum size of uploaded files in bytes, None for no limit
+        timeout (float): Seconds after which idle uploads get discarded
+        max_uploads (int): Maximum number of uploads in progress per owner, None for no limit
+    """
+
+    def __init__(
+        self,
+        folder,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_size=None,
+        timeout=DEFAULT_TIMEOUT,
+        max_uploads=DEFAULT_MAX_UPLOADS,
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.folder = folder
+        self.chunk_size = max(1, chunk_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uploads = max_uploads
+
+        self._mutex = threading.Lock()
+        self._uploads = {}
+
+    def create(self, filename, size, chunk_size=None, owner=None, parameters=None):
+        """
+        Creates a new upload and preallocates its file.
+
+        The file is sparse, so the free space in ``folder`` has to suffice for it and
+        everything the other uploads in progress are still going to write.
+
+        Arguments:
+            filename (str): The name of the file to upload
+            size (int): The size of the file in bytes
+            chunk_size (int): Requested chunk size, limited to the configured one
+            owner (str): Name of the user the upload belongs to
+            parameters (dict): Additional parameters of the upload
+
+        Returns:
+            ResumableUpload: The new upload
+
+        Raises:
+            ValueError: The size or chunk size is invalid
+            TooManyUploads: The owner already has the maximum number of uploads in progress
+            InsufficientStorage: There's not enough free space left for the upload
+        """
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValueError(f"Invalid size: {size!r}")
+        if self.max_size is not None and size > self.max_size:
+            raise ValueError(f"Size {size} exceeds the maximum of {self.max_size}")
+
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        elif not isinstance(chunk_size, int) or isinstance(chunk_size, bool):
+            raise ValueError(f"Invalid chunk size: {chunk_size!r}")
+        chunk_size = min(max(MIN_CHUNK_SIZE, chunk_size), self.chunk_size)
+
+        self.expire()
+
+        id = uuid.uuid4().hex
+        path = os.path.join(self.folder, f"resumable-{id}.part")
+        os.makedirs(self.folder, exist_ok=True)
+
+        upload = ResumableUpload(
+            id,
+            path,
+            filename,
+            size,
+            chunk_size,
+            owner=owner,
+            parameters=parameters,
+        )
+
+        with self._mutex:
+            if self.max_uploads is not None:
+                count = sum(1 for u in self._uploads.values() if u.owner == owner)
+                if count >= self.max_uploads:
+                    raise TooManyUploads(
+                        f"There are already {count} uploads in progress, the maximum is {self.max_uploads}"
+                    )
+
+            reserved = sum(u.outstanding for u in self._uploads.values())
+            free = shutil.disk_usage(self.folder).free
+            if size + reserved > free:
+                raise InsufficientStorage(
+                    f"Not enough free space for {size} bytes, {free} bytes free of which {reserved} are reserved"
+                )
+
+            self._uploads[id] = upload
+
+        try:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        except Exception:
+            with self._mutex:
+                self._uploads.pop(id, None)
+            silent_remove(path)
+            raise
+
+        self._logger.info(
+            f"Created resumable upload {id} for {filename} ({size} bytes in {upload.chunks} chunks)"
+        )
+        return upload
+
+    def get(self, id, owner=None):
+        """
+        Arguments:
+            id (str): The upload's id
+            owner (str): Name of the user the upload has to belong to
+
+        Returns:
+            ResumableUpload: The upload
+
+        Raises:
+            UnknownUpload: There's no such upload, or it belongs to another user
+        """
+        self.expire()
+
+        with self._mutex:
+            upload = self._uploads.get(id)
+        if upload is None or upload.owner != owner:
+            raise UnknownUpload(f"Unknown upload: {id}")
+        return upload
+
+    def remove(self, id, owner=None):
+        """
+        Discards an upload and its file.
+
+        Raises:
+            UnknownUpload: There's no such upload, or it belongs to another user
+        """
+        upload = self.get(id, owner=owner)
+        with self._mutex:
+            self._uploads.pop(id, None)
+        with upload._mutex:
+            upload._closed = True
+        silent_remove(upload.path)
+
+    def expire(self):
+        """
+        Discards all uploads that have been idle for longer than the timeout.
+        """
+        deadline = time.monotonic() - self.timeout
+        with self._mutex:
+            expired = [
+                upload
+                for upload in self._uploads.values()
+                if upload.last_activity < deadline
+            ]
+            for upload in expired:
+                del self._uploads[upload.id]
+
+        for upload in expired:
+            self._logger.info(f"Discarding idle resumable upload {upload.id}")
+            silent_remove(upload.path)
@@ -0,0 +1,539 @@
+"""
+Search over the entries of a file library.
+
+A :class:`SearchIndex` gets built once from a recursive file listing as returned by
+:meth:`~octoprint.filemanager.storage.StorageInterface.list_files` and is then kept up
+to date entry by entry through :meth:`SearchIndex.add` and :meth:`SearchIndex.remove`.
+
+Free text terms and ``field:value`` terms on text fields are looked up in inverted
+indexes over the words of the display names, paths, types and slicer information of
+all entries, with every word matching as a prefix. Numeric fields are kept in sorted
+columns, so ``field>value`` terms on the analysis results, slicer settings and print
+history of the entries are answered through a binary search as well, instead of
+looking at every entry. See :data:`NUMERIC_FIELDS` and :data:`TEXT_FIELDS` for the
+available fields.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import bisect
+import collections
+import re
+import threading
+
+from octoprint.filemanager.listing import PRINT_FILTERS, print_summary
+from octoprint.util.gcodeInterpreter import SLICER_SETTINGS
+
+NUMERIC_FIELDS = (
+    "size",
+    "date",
+    "time",
+    "width",
+    "depth",
+    "height",
+    "filament",
+    "volume",
+    "success",
+    "failure",
+    "last_print",
+)
+"""
+Fields that can be compared with ``:``, ``>``, ``>=``, ``<`` and ``<=``: file size in
+bytes, modification date and date of the last print as timestamps, estimated print time
+in seconds (or with a ``s``, ``m`` or ``h`` suffix), dimensions in mm, filament length
+in mm and volume in cm³ over all tools, and the number of successful and failed prints.
+"""
+
+TEXT_FIELDS = ("name", "path", "type", "slicer")
+"""Fields that can be searched with ``field:value``."""
+
+SLICER_FIELDS = tuple(sorted(set(SLICER_SETTINGS.values())))
+"""Slicer settings extracted during analysis, searchable like numeric or text fields."""
+
+_WEIGHTS = {"name": 3, "path": 2}
+
+_TIME_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+_EPSILON = 1e-6
+
+regex_term = re.compile(
+    r'(?:(?P<field>[a-z_]+)(?P<op>>=|<=|>|<|:))?(?P<value>"[^"]*"?|\S+)', re.I
+)
+regex_token = re.compile(r"[^\W_]+")
+regex_number = re.compile(r"^[-+]?\d+(?:\.\d+)?")
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def tokenize(text):
+    """Splits ``text`` into lower case words."""
+    return regex_token.findall(text.lower()) if text else []
+
+
+def _to_number(value, field=None):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return None
+
+    match = regex_number.match(value.strip())
+    if not match:
+        return None
+
+    number = float(match.group(0))
+    if field == "time":
+        unit = value.strip()[match.end() :].lower()
+        if unit and unit not in _TIME_UNITS:
+            return None
+        number *= _TIME_UNITS.get(unit, 1)
+    return number
+
+
+class _Document:
+    __slots__ = ("node", "path", "display", "numbers", "tokens", "field_tokens")
+
+    def __init__(self, node):
+        node = dict(node)
+        folder = node.get("type") == "folder"
+        if folder:
+            # folder sizes depend on their children, which aren't kept up to date here
+            node.pop("children", None)
+            node.pop("size", None)
+
+        self.node = node
+        self.path = node.get("path", node["name"])
+        self.display = (node.get("display") or node["name"]).lower()
+
+        analysis = node.get("analysis") or {}
+        dimensions = analysis.get("dimensions") or {}
+        filament = analysis.get("filament") or {}
+        slicer = analysis.get("slicer") or node.get("slicer") or {}
+        settings = slicer.get("settings") or {}
+
+        numbers = {
+            "size": node.get("size"),
+            "date": node.get("date"),
+            "time": analysis.get("estimatedPrintTime"),
+            "width": dimensions.get("width"),
+            "depth": dimensions.get("depth"),
+            "height": dimensions.get("height"),
+        }
+        if filament:
+            tools = [tool for tool in filament.values() if isinstance(tool, dict)]
+            numbers["filament"] = sum(
+                _to_number(tool.get("length")) or 0 for tool in tools
+            )
+            numbers["volume"] = sum(_to_number(tool.get("volume")) or 0 for tool in tools)
+        if not folder:
+            prints = print_summary(node.get("history") or []) or {}
+            numbers["success"] = prints.get("success", 0)
+            numbers["failure"] = prints.get("failure", 0)
+            if "last" in prints:
+                numbers["last_print"] = prints["last"].get("date")
+
+        texts = {
+            "name": node["name"] + " " + self.display,
+            "path": self.path,
+            "type": " ".join(node.get("typePath") or [node.get("type", "")]),
+            "slicer": slicer.get("name") or "",
+        }
+        for key, value in settings.items():
+            if key in SLICER_FIELDS and isinstance(value, str):
+                texts[key] = value
+                numbers[key] = _to_number(value)
+
+        self.numbers = {
+            field: value
+            for field, value in numbers.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+        self.tokens = {}
+        self.field_tokens = set()
+        for field, text in texts.items():
+            weight = _WEIGHTS.get(field, 1)
+            for token in tokenize(text):
+                if self.tokens.get(token, 0) < weight:
+                    self.tokens[token] = weight
+                self.field_tokens.add(field + ":" + token)
+
+
+class _TokenIndex:
+    """Maps tokens to the paths of the documents containing them, looked up by prefix."""
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+
+    def add(self, path, tokens, sort=True):
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if sort:
+                    bisect.insort(self._tokens, token)
+            postings[path] = weight
+
+    def remove(self, path, tokens):
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(path, None)
+            if not postings:
+                del self._postings[token]
+                pos = bisect.bisect_left(self._tokens, token)
+                if pos < len(self._tokens) and self._tokens[pos] == token:
+                    del self._tokens[pos]
+
+    def sort(self):
+        self._tokens = sorted(self._postings)
+
+    def lookup(self, prefix):
+        """Returns the paths matching ``prefix``, scored by weight and exact matches."""
+        matches = {}
+        start = bisect.bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            exact = 1 if token == prefix else 0
+            postings = self._postings[token]
+            if not matches:
+                matches = {path: weight * 2 + exact for path, weight in postings.items()}
+                continue
+            for path, weight in postings.items():
+                score = weight * 2 + exact
+                if matches.get(path, 0) < score:
+                    matches[path] = score
+        return matches
+
+    def paths(self, prefix):
+        """Returns the set of paths matching ``prefix``."""
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = bisect.bisect_left(self._tokens, prefix + "\U0010ffff", lo=start)
+        return set().union(*(self._postings[token] for token in self._tokens[start:end]))
+
+
+class _SortedColumn:
+    """Values of one numeric field, sorted for range lookups."""
+
+    def __init__(self):
+        self._values = []
+        self._paths = []
+
+    def add(self, path, value):
+        pos = bisect.bisect_right(self._values, value)
+        self._values.insert(pos, value)
+        self._paths.insert(pos, path)
+
+    def remove(self, path, value):
+        start = bisect.bisect_left(self._values, value)
+        end = bisect.bisect_right(self._values, value)
+        for pos in range(start, end):
+            if self._paths[pos] == path:
+                del self._values[pos]
+                del self._paths[pos]
+                return
+
+    def sort(self, entries):
+        entries = sorted(entries)
+        self._values = [value for value, _ in entries]
+        self._paths = [path for _, path in entries]
+
+    def entries(self):
+        return zip(self._values, self._paths)
+
+    def lookup(self, op, value):
+        if op == ">":
+            start, end = bisect.bisect_right(self._values, value), len(self._values)
+        elif op == ">=":
+            start, end = bisect.bisect_left(self._values, value), len(self._values)
+        elif op == "<":
+            start, end = 0, bisect.bisect_left(self._values, value)
+        elif op == "<=":
+            start, end = 0, bisect.bisect_right(self._values, value)
+        else:
+            start = bisect.bisect_left(self._values, value - _EPSILON)
+            end = bisect.bisect_right(self._values, value + _EPSILON)
+        return set(self._paths[start:end])
+
+
+class SearchIndex:
+    """
+    Inverted index over the entries of a file listing.
+
+    Arguments:
+        nodes (dict or list): The listing, as returned by ``list_files(recursive=True)``
+    """
+
+    def __init__(self, nodes=None):
+        self._mutex = threading.RLock()
+        self._documents = {}
+        self._words = _TokenIndex()
+        self._fields = _TokenIndex()
+        self._columns = {}
+        self._ordered = []
+
+        if nodes:
+            self.add_all(nodes)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, path):
+        return path in self._documents
+
+    def add(self, node):
+        """Adds ``node`` to the index, replacing any previous entry with the same path."""
+        with self._mutex:
+            document = self._add(node, sort=True)
+            for field, value in document.numbers.items():
+                self._column(field).add(document.path, value)
+            bisect.insort(self._ordered, (document.display, document.path))
+
+    def add_all(self, nodes):
+        """Adds all nodes of a recursive listing to the index."""
+        with self._mutex:
+            added = []
+            self._add_all(nodes, added)
+
+            # sort everything in one go instead of inserting entry by entry
+            self._words.sort()
+            self._fields.sort()
+            columns = {
+                field: list(column.entries()) for field, column in self._columns.items()
+            }
+            for document in added:
+                for field, value in document.numbers.items():
+                    columns.setdefault(field, []).append((value, document.path))
+            for field, entries in columns.items():
+                self._column(field).sort(entries)
+            self._ordered = sorted(
+                self._ordered + [(document.display, document.path) for document in added]
+            )
+
+    def _add_all(self, nodes, added):
+        if isinstance(nodes, dict):
+            nodes = nodes.values()
+
+        for node in nodes:
+            added.append(self._add(node, sort=False))
+            if node.get("type") == "folder":
+                self._add_all(node.get("children") or {}, added)
+
+    def _add(self, node, sort):
+        document = _Document(node)
+        self._remove(document.path)
+        self._documents[document.path] = document
+        self._words.add(document.path, document.tokens, sort=sort)
+        self._fields.add(
+            document.path, dict.fromkeys(document.field_tokens, 1), sort=sort
+        )
+        return document
+
+    def remove(self, path, recursive=False):
+        """Removes the entry at ``path`` and, if ``recursive`` is set, everything below it."""
+        with self._mutex:
+            self._remove(path)
+            if recursive:
+                prefix = path + "/"
+                for child in [p for p in self._documents if p.startswith(prefix)]:
+                    self._remove(child)
+
+    def _remove(self, path):
+        document = self._documents.pop(path, None)
+        if document is None:
+            return
+
+        self._words.remove(path, document.tokens)
+        self._fields.remove(path, document.field_tokens)
+        for field, value in document.numbers.items():
+            self._column(field).remove(path, value)
+
+        pos = bisect.bisect_left(self._ordered, (document.display, path))
+        if pos < len(self._ordered) and self._ordered[pos][1] == path:
+            del self._ordered[pos]
+
+    def _column(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = _SortedColumn()
+        return column
+
+    def search(self, query, limit=None):
+        """
+        Searches the index.
+
+        Arguments:
+            query (str): Space separated terms that all need to match. Plain terms match
+                the beginning of any word in the name, path, type or slicer information
+                of an entry, ``"quoted terms"`` match if all of their words do.
+                ``field:value`` terms match if a word in the field starts with the value
+                or, for numeric fields, if the field equals it. ``field>value``,
+                ``field>=value``, ``field<value`` and ``field<=value`` compare numeric
+                fields. ``prints:success``, ``prints:failure`` and ``prints:none``
+                filter by print results.
+            limit (int): Maximum number of entries to return, all if None
+
+        Returns:
+            tuple: The total number of matches and a list of matching entry nodes (without
+                children), best matches first
+
+        Raises:
+            InvalidQuery: The query is empty or contains an unknown field or invalid value
+        """
+        words, filters = _parse_query(query)
+
+        with self._mutex:
+            scores = None
+            for word in sorted(words, key=len, reverse=True):
+                if scores is not None and len(scores) * 4 < len(self._documents):
+                    # few candidates left, cheaper to check their words than to look
+                    # up all entries matching this one
+                    scores = self._refine(scores, word)
+                    if not scores:
+                        return 0, []
+                    continue
+
+                matches = self._words.lookup(word)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {
+                        path: score + matches[path]
+                        for path, score in scores.items()
+                        if path in matches
+                    }
+                if not scores:
+                    return 0, []
+
+            candidates = None
+            for field, op, value in filters:
+                matches = self._filter(field, op, value)
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return 0, []
+
+            if scores is None:
+                scores = dict.fromkeys(candidates, 0)
+            elif candidates is not None:
+                scores = {
+                    path: score for path, score in scores.items() if path in candidates
+                }
+
+            return len(scores), [
+                self._documents[path].node for path in self._rank(scores, limit)
+            ]
+
+    def _refine(self, scores, word):
+        refined = {}
+        for path, score in scores.items():
+            best = 0
+            for token, weight in self._documents[path].tokens.items():
+                if token.startswith(word):
+                    best = max(best, weight * 2 + (1 if token == word else 0))
+            if best:
+                refined[path] = score + best
+        return refined
+
+    def _filter(self, field, op, value):
+        if field == "prints":
+            if value == "success":
+                return self._column("success").lookup(">=", 1)
+            elif value == "failure":
+                return self._column("failure").lookup(">=", 1)
+            return self._column("success").lookup(":", 0) & self._column(
+                "failure"
+            ).lookup(":", 0)
+
+        if isinstance(value, (int, float)):
+            return self._column(field).lookup(op, value)
+
+        # all words of the value need to match words in the field
+        matches = None
+        for token in tokenize(value):
+            paths = self._fields.paths(field + ":" + token)
+            matches = paths if matches is None else matches & paths
+        return matches or set()
+
+    def _rank(self, scores, limit):
+        if len(scores) * 8 < len(self._ordered):
+            ranked = sorted(
+                scores, key=lambda path: (-scores[path], self._documents[path].display)
+            )
+            return ranked[:limit]
+
+        # many matches, walk the entries in display order instead of sorting them all,
+        # collecting only as many entries per score as are needed for the result
+        counts = collections.Counter(scores.values())
+        needed = {}
+        remaining = len(scores) if limit is None else limit
+        for score in sorted(counts, reverse=True):
+            if remaining <= 0:
+                break
+            needed[score] = min(counts[score], remaining)
+            remaining -= needed[score]
+
+        buckets = {score: [] for score in needed}
+        missing = sum(needed.values())
+        for _, path in self._ordered:
+            score = scores.get(path)
+            bucket = buckets.get(score)
+            if bucket is None or len(bucket) >= needed[score]:
+                continue
+            bucket.append(path)
+            missing -= 1
+            if not missing:
+                break
+
+        return [path for score in needed for path in buckets[score]]
+
+
+def _parse_query(query):
+    words = []
+    filters = []
+
+    for match in regex_term.finditer(query or ""):
+        field, op, value = match.group("field", "op", "value")
+        if value.startswith('"'):
+            value = value.strip('"')
+
+        if field is None:
+            words += tokenize(value)
+            continue
+
+        field = field.lower()
+        value = value.lower()
+        if field == "prints":
+            if op != ":" or value not in PRINT_FILTERS:
+                raise InvalidQuery("prints must be one of " + ", ".join(PRINT_FILTERS))
+            filters.append((field, op, value))
+            continue
+
+        if field in NUMERIC_FIELDS or field in SLICER_FIELDS:
+            number = _to_number(value, field=field)
+            if number is not None:
+                filters.append((field, op, number))
+                continue
+            elif op != ":" or field in NUMERIC_FIELDS:
+                raise InvalidQuery(f"{field} needs a number: {value}")
+
+        elif field not in TEXT_FIELDS:
+            raise InvalidQuery(f"Unknown search field: {field}")
+
+        elif op != ":":
+            raise InvalidQuery(f"{field} can only be searched with {field}:value")
+
+        if not tokenize(value):
+            raise InvalidQuery(f"{field} needs a value")
+        filters.append((field, op, value))
+
+    if not words and not filters:
+        raise InvalidQuery("Empty search query")
+
+    return words, filters
@@ -3,18 +3,35 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2014 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 import copy
+import json
 import logging
 import os
+import re
 import shutil
+import threading
+import uuid
 from contextlib import contextmanager
 from os import scandir, walk
 
 import pylru
 
 import octoprint.filemanager
+from octoprint.filemanager import compression
+from octoprint.filemanager.listing import ListingIndex
+from octoprint.filemanager.metadata import (
+    METADATA_DB_FILES,
+    METADATA_JOURNAL,
+    METADATA_JSON,
+    METADATA_YAML,
+    JsonMetadataBackend,
+    MetadataBackendError,
+    SqliteMetadataBackend,
+    WriteBehindMetadataBackend,
+)
 from octoprint.util import (
     atomic_write,
     is_hidden_path,
+    silent_remove,
     time_this,
     to_bytes,
     to_unicode,
@@ -22,6 +39,17 @@ from octoprint.util import (
 )
 from octoprint.util.files import sanitize_filename
 
+STAGING_FOLDER = ".staging"
+"""Name of the hidden folder within a :class:`LocalFileStorage` that uploads get received in."""
+
+BLOB_FOLDER = ".blobs"
+"""Name of the hidden folder within a deduplicating :class:`LocalFileStorage` that holds the content blobs."""
+
+SHARED_METADATA_KEYS = ("analysis", "markers")
+"""Metadata keys that only depend on a file's content and thus get shared between files with the same content."""
+
+_VALID_HASH = re.compile(r"^[0-9a-f]{40}$")
+
 
 class StorageInterface:
     """
@@ -180,6 +208,71 @@ class StorageInterface:
         """
         raise NotImplementedError()
 
+    def listing_index(self, path=None, recursive=False, force_refresh=False):
+        """
+        Returns a :class:`~octoprint.filemanager.listing.ListingIndex` over the files and folders in ``path``, for
+        sorted and paginated access to the file list. See :meth:`list_files_page`.
+
+        The default implementation builds a new index from :meth:`list_files` on every call, storage implementations
+        may cache it.
+
+        :param string path:        base path of the listing, optional, defaults to the root of the storage
+        :param bool recursive:     whether to index all entries below ``path`` or only those directly within it
+        :param bool force_refresh: whether to refresh any cached data
+        :return: the listing index
+        """
+        return ListingIndex(
+            self.list_files(path=path, recursive=True, force_refresh=force_refresh),
+            recursive=recursive,
+        )
+
+    def list_files_page(
+        self,
+        path=None,
+        sort="name",
+        order=None,
+        cursor=None,
+        limit=None,
+        filter=None,
+        prints=None,
+        query=None,
+        recursive=False,
+        force_refresh=False,
+    ):
+        """
+        List one page of the files and folders in ``path`` as a flat list, sorted and filtered.
+
+        Other than :meth:`list_files`, folder entries come without their ``children``, but with a ``prints`` summary of
+        all files below them. If ``recursive`` is set, files and folders from all sub folders are included in the list.
+
+        :param string path:        base path of the listing, optional, defaults to the root of the storage
+        :param str sort:           field to sort by, one of ``name``, ``date``, ``size``, ``last_print`` and
+                                   ``estimated_time``
+        :param str order:          ``asc`` or ``desc``, defaults to ascending for ``name`` and ``estimated_time`` and to
+                                   descending otherwise
+        :param str cursor:         the ``next`` cursor returned with the previous page, if any
+        :param int limit:          maximum number of entries on the page, all remaining ones if not set
+        :param function filter:    a filter that matches the files to return, called with a file's data, folders
+                                   are not subject to it
+        :param str prints:         only return entries printed successfully (``success``), ones with failed prints
+                                   (``failure``) or ones that were never printed (``none``)
+        :param str query:          only return entries whose name or display name contain this, case insensitive
+        :param bool recursive:     whether to list all entries below ``path`` or only those directly within it
+        :param bool force_refresh: whether to refresh any cached data
+        :return: a tuple of the list of entries and the cursor of the next page, or None if this was the last page
+        """
+        return self.listing_index(
+            path=path, recursive=recursive, force_refresh=force_refresh
+        ).page(
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            filter=filter,
+            prints=prints,
+            query=query,
+        )
+
     def add_folder(self, path, ignore_existing=True, display=None):
         """
         Adds a folder as ``path``
@@ -431,6 +524,16 @@ class StorageInterface:
         """
         raise NotImplementedError()
 
+    @property
+    def staging_folder(self):
+        """
+        Folder on disk to receive uploads in before they get added through :func:`add_file`, ideally on the same file
+        system as the storage itself.
+
+        Note: if the storage is not on disk, this property should raise an :class:`io.UnsupportedOperation`
+        """
+        raise NotImplementedError()
+
     def path_on_disk(self, path):
         """
         Retrieves the path on disk for ``path``.
@@ -456,6 +559,42 @@ class StorageInterface:
         """
         raise NotImplementedError()
 
+    def close(self):
+        """
+        Releases the storage's resources and persists anything still pending. Called on shutdown.
+
+        The default implementation does nothing.
+        """
+        pass
+
+    @property
+    def watched(self):
+        """
+        Whether the storage notices changes made by something else than itself, see :func:`add_change_listener`.
+
+        The default implementation doesn't.
+        """
+        return False
+
+    def add_change_listener(self, listener):
+        """
+        Registers ``listener`` to be called without arguments whenever the storage notices that its contents got
+        changed by something else than itself, e.g. files copied into its folder directly.
+
+        The default implementation never notices such changes.
+        """
+        pass
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager for running a number of operations as one batch. Storages may defer persisting changes made
+        within the batch until it ends. Batches may be nested, only the outermost one counts.
+
+        The default implementation doesn't defer anything.
+        """
+        yield
+
 
 class StorageError(Exception):
     UNKNOWN = "unknown"
@@ -481,13 +620,51 @@ class LocalFileStorage(StorageInterface):
     """
     The ``LocalFileStorage`` is a storage implementation which holds all files, folders and metadata on disk.
 
-    Metadata is managed inside ``.metadata.json`` files in the respective folders, indexed by the sanitized filenames
-    stored within the folder. Metadata access is managed through an LRU cache to minimize access overhead.
+    Metadata is indexed by the sanitized filenames stored within each folder and persisted through a
+    :class:`~octoprint.filemanager.metadata.MetadataBackend`, either inside ``.metadata.json`` files in the respective
+    folders or in a SQLite database ``.metadata.db`` in the base folder. Metadata access is managed through an LRU cache
+    to minimize access overhead.
+
+    If ``watch`` is enabled, a :class:`~octoprint.filemanager.watcher.FileTreeWatcher` keeps track of changes to the
+    folder tree, so cached folder listings and last modified dates only need to be refreshed for changed folders
+    instead of having to stat the whole tree on every access. Changes it notices that weren't done through the storage
+    are reported to the listeners registered via :func:`add_change_listener`.
+
+    Uploads can be received into the hidden :attr:`staging_folder` within the base folder, so that adding them to
+    the storage boils down to an atomic rename on the same file system. Their hash is reused if the file object
+    provides it.
+
+    If ``deduplicate`` is enabled, the content of every file is stored only once as a blob named after its hash
+    in the hidden ``.blobs`` folder, and all files with that content are hardlinks to it. Copying a file then
+    only creates another link, and content dependent metadata like the analysis is kept next to the blob and
+    shared by all its files. The blobs' link counts serve as reference counts: a blob only linked from the blob
+    folder itself is no longer used and gets removed. Files are never written to in place by the storage, but
+    anything else modifying a file in place modifies all files sharing its content.
+
+    If ``compress`` is enabled, added G-code files are stored compressed as described in
+    :mod:`~octoprint.filemanager.compression`. Their metadata then contains a ``compression`` entry, their hash and
+    listed size remain those of the uncompressed content. :func:`path_on_disk` returns the path of the compressed
+    file, use :func:`~octoprint.filemanager.compression.open_file` to read it.
+
+    If ``metadata_flush_interval`` is set, metadata changes are only journaled right away and written to the metadata
+    backend at most every that many seconds, see :class:`~octoprint.filemanager.metadata.WriteBehindMetadataBackend`.
+    :func:`close` writes whatever is still pending.
 
     This storage type implements :func:`path_on_disk`.
     """
 
-    def __init__(self, basefolder, create=False, really_universal=False):
+    def __init__(
+        self,
+        basefolder,
+        create=False,
+        really_universal=False,
+        watch=False,
+        force_polling=False,
+        metadata_backend="json",
+        deduplicate=False,
+        compress=False,
+        metadata_flush_interval=None,
+    ):
         """
         Initializes a ``LocalFileStorage`` instance under the given ``basefolder``, creating the necessary folder
         if necessary and ``create`` is set to ``True``.
@@ -495,6 +672,15 @@ class LocalFileStorage(StorageInterface):
         :param string basefolder:     the path to the folder under which to create the storage
         :param bool create:           ``True`` if the folder should be created if it doesn't exist yet, ``False`` otherwise
         :param bool really_universal: ``True`` if the file names should be forced to really universal, ``False`` otherwise
+        :param bool watch:            ``True`` if the folder tree should be watched for changes, ``False`` otherwise
+        :param bool force_polling:    ``True`` if the folder tree should be polled instead of relying on OS notifications
+        :param str metadata_backend:  where to persist metadata, ``json`` for ``.metadata.json`` files in every folder,
+                                      ``sqlite`` for a single database in the base folder
+        :param bool deduplicate:      ``True`` if files with the same content should share a single blob on disk,
+                                      ``False`` otherwise
+        :param bool compress:         ``True`` if added G-code files should be stored compressed, ``False`` otherwise
+        :param float metadata_flush_interval: seconds to keep metadata changes in memory and the journal before
+                                      writing them to the metadata backend, ``None`` or ``0`` to write them right away
         """
         self._logger = logging.getLogger(__name__)
 
@@ -509,20 +695,278 @@ class LocalFileStorage(StorageInterface):
 
         self._really_universal = really_universal
 
-        import threading
-
         self._metadata_lock_mutex = threading.RLock()
         self._metadata_locks = {}
-        self._persisted_metadata_lock_mutex = threading.RLock()
-        self._persisted_metadata_locks = {}
 
         self._metadata_cache = pylru.lrucache(100)
         self._filelist_cache = {}
         self._filelist_cache_mutex = threading.RLock()
+        self._lastmodified_cache = {}
+        self._listing_index_cache = {}
+
+        self._batch_mutex = threading.RLock()
+        self._batch_depth = 0
+        self._batch_pending = {}
+
+        self._change_listeners = []
+
+        self._watcher = None
+        if watch:
+            from octoprint.filemanager.watcher import FileTreeWatcher
+
+            watcher = FileTreeWatcher(
+                self.basefolder,
+                force_polling=force_polling,
+                ignored=[
+                    os.path.join(self.basefolder, name)
+                    for name in METADATA_DB_FILES
+                    + (METADATA_JOURNAL, STAGING_FOLDER, BLOB_FOLDER)
+                ],
+                on_change=self._on_external_change,
+            )
+            if watcher.start():
+                self._watcher = watcher
+
+        self._metadata_backend = self._create_metadata_backend(metadata_backend)
+        if metadata_flush_interval:
+            self._metadata_backend = WriteBehindMetadataBackend(
+                self._metadata_backend,
+                self.basefolder,
+                interval=metadata_flush_interval,
+            )
 
         self._old_metadata = None
         self._initialize_metadata()
 
+        self._staging_folder = os.path.join(self.basefolder, STAGING_FOLDER)
+        self._clean_staging_folder()
+
+        self._compress = compress
+
+        self._deduplicate = deduplicate
+        self._blob_folder = os.path.join(self.basefolder, BLOB_FOLDER)
+        self._blob_mutex = threading.RLock()
+        if self._deduplicate:
+            # files might have been deleted while we weren't looking
+            self._collect_blobs()
+
+    @property
+    def staging_folder(self):
+        """
+        Hidden folder within the base folder to receive uploads in before they get added to the storage. Gets
+        created on first access and emptied on startup.
+        """
+        os.makedirs(self._staging_folder, exist_ok=True)
+        return self._staging_folder
+
+    def _clean_staging_folder(self):
+        if not os.path.isdir(self._staging_folder):
+            return
+
+        for entry in os.scandir(self._staging_folder):
+            self._logger.info(f"Removing stale upload {entry.path}")
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except Exception:
+                self._logger.exception(f"Could not remove stale upload {entry.path}")
+
+    ##~~ content addressed blobs
+
+    @staticmethod
+    def _is_valid_hash(file_hash):
+        return isinstance(file_hash, str) and _VALID_HASH.match(file_hash) is not None
+
+    def _blob_path(self, file_hash):
+        if not self._is_valid_hash(file_hash):
+            raise ValueError(f"Not a valid content hash: {file_hash!r}")
+        return os.path.join(self._blob_folder, file_hash[:2], file_hash)
+
+    def _link_blob(self, file_path, file_hash):
+        """
+        Turns the file at ``file_path`` into a hardlink to the blob holding its content, or turns it into that
+        blob if the content isn't known yet.
+
+        Returns ``True`` if the content was already known, ``False`` otherwise. If linking fails, e.g. because
+        the file system doesn't support hardlinks, the file is kept as it is.
+        """
+        if not self._is_valid_hash(file_hash):
+            self._logger.warning(
+                f"Not deduplicating {file_path}, {file_hash!r} is not a valid content hash"
+            )
+            return False
+
+        blob_path = self._blob_path(file_hash)
+        with self._blob_mutex:
+            try:
+                file_stat = os.stat(file_path)
+                try:
+                    blob_stat = os.stat(blob_path)
+                except FileNotFoundError:
+                    blob_stat = None
+
+                if blob_stat is not None:
+                    if os.path.samestat(file_stat, blob_stat):
+                        return True
+
+                    if blob_stat.st_size == file_stat.st_size:
+                        self._replace_by_link(blob_path, file_path)
+                        return True
+
+                # new content or a damaged blob, the file becomes the blob
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                self._replace_by_link(file_path, blob_path)
+                return False
+            except OSError:
+                self._logger.exception(
+                    f"Could not deduplicate {file_path}, keeping it as a separate file"
+                )
+                return False
+
+    @staticmethod
+    def _replace_by_link(source, destination):
+        # link under a temporary name first, so that the destination gets replaced atomically
+        temp = os.path.join(os.path.dirname(destination), f".{uuid.uuid4().hex}.link")
+        os.link(source, temp)
+        try:
+            os.replace(temp, destination)
+        except Exception:
+            silent_remove(temp)
+            raise
+
+    def _release_blob(self, file_hash):
+        """
+        Removes the blob holding the content with ``file_hash`` if no file is linked to it anymore.
+        """
+        if not self._is_valid_hash(file_hash):
+            return
+
+        blob_path = self._blob_path(file_hash)
+        with self._blob_mutex:
+            try:
+                if os.stat(blob_path).st_nlink > 1:
+                    return
+            except FileNotFoundError:
+                pass
+            self._remove_blob(blob_path)
+
+    def _remove_blob(self, blob_path):
+        for path in (blob_path, blob_path + ".json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._logger.exception(f"Could not remove blob {path}")
+
+    def _collect_blobs(self):
+        """
+        Removes all blobs that no file is linked to anymore, e.g. because their files were deleted from outside
+        of OctoPrint or together with their folder.
+        """
+        if not os.path.isdir(self._blob_folder):
+            return
+
+        removed = 0
+        with self._blob_mutex:
+            for bucket in scandir(self._blob_folder):
+                if not bucket.is_dir(follow_symlinks=False):
+                    continue
+
+                for entry in scandir(bucket.path):
+                    if entry.name.startswith("."):
+                        # leftover of an interrupted link
+                        silent_remove(entry.path)
+                    elif entry.name.endswith(".json"):
+                        if not os.path.exists(entry.path[: -len(".json")]):
+                            silent_remove(entry.path)
+                    elif entry.stat(follow_symlinks=False).st_nlink <= 1:
+                        self._remove_blob(entry.path)
+                        removed += 1
+
+        if removed:
+            self._logger.info(f"Removed {removed} blob(s) no longer in use")
+
+    def _compress_file(self, file_path):
+        """
+        Replaces the file at ``file_path`` by its compressed version.
+
+        Returns the ``compression`` metadata entry, or ``None`` if the file couldn't be compressed and was kept as
+        it is.
+        """
+        if compression.is_compressed(file_path):
+            return {
+                "method": compression.METHOD,
+                "size": compression.file_size(file_path),
+            }
+
+        temp = os.path.join(
+            os.path.dirname(file_path), f".{uuid.uuid4().hex}.{compression.METHOD}"
+        )
+        try:
+            size = compression.compress_file(file_path, temp)
+            os.replace(temp, file_path)
+        except Exception:
+            self._logger.exception(
+                f"Could not compress {file_path}, keeping it uncompressed"
+            )
+            silent_remove(temp)
+            return None
+
+        return {"method": compression.METHOD, "size": size}
+
+    def _get_shared_metadata(self, file_hash):
+        if not self._is_valid_hash(file_hash):
+            return {}
+
+        try:
+            with open(self._blob_path(file_hash) + ".json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            self._logger.exception(f"Could not read the shared metadata of {file_hash}")
+            return {}
+
+    def _set_shared_metadata(self, file_hash, key, data):
+        if not self._is_valid_hash(file_hash):
+            return
+
+        blob_path = self._blob_path(file_hash)
+        with self._blob_mutex:
+            if not os.path.exists(blob_path):
+                return
+
+            shared = self._get_shared_metadata(file_hash)
+            if data is None:
+                shared.pop(key, None)
+            else:
+                shared[key] = data
+
+            try:
+                with atomic_write(blob_path + ".json", mode="wb") as f:
+                    f.write(to_bytes(json.dumps(shared)))
+            except Exception:
+                self._logger.exception(
+                    f"Could not write the shared metadata of {file_hash}"
+                )
+
+    def _create_metadata_backend(self, backend):
+        if backend == "sqlite":
+            try:
+                return SqliteMetadataBackend(self.basefolder)
+            except MetadataBackendError:
+                self._logger.exception(
+                    f"Could not open the metadata database for {self.basefolder}, falling back to {METADATA_JSON} files"
+                )
+        elif backend != "json":
+            self._logger.warning(
+                f"Unknown metadata backend {backend}, falling back to {METADATA_JSON} files"
+            )
+        return JsonMetadataBackend()
+
     def _initialize_metadata(self):
         self._logger.info(f"Initializing the file metadata for {self.basefolder}...")
 
@@ -605,17 +1049,73 @@ class LocalFileStorage(StorageInterface):
             path = os.path.join(self.basefolder, path)
 
         def last_modified_for_path(p):
-            metadata = os.path.join(p, ".metadata.json")
-            if os.path.exists(metadata):
-                return max(os.stat(p).st_mtime, os.stat(metadata).st_mtime)
+            metadata = self._metadata_backend.last_modified(p)
+            if metadata is not None:
+                return max(os.stat(p).st_mtime, metadata)
             else:
                 return os.stat(p).st_mtime
 
-        if recursive:
+        if recursive and self._watcher is not None:
+            return self._last_modified_recursive(path, last_modified_for_path)
+        elif recursive:
             return max(last_modified_for_path(root) for root, _, _ in walk(path))
         else:
             return last_modified_for_path(path)
 
+    def _last_modified_recursive(self, path, last_modified_for_path):
+        with self._filelist_cache_mutex:
+            cache = self._lastmodified_cache.get(path)
+            if cache and not self._watcher.changed_since(path, cache[0]):
+                return cache[1]
+
+            generation = self._watcher.generation
+            lm = last_modified_for_path(path)
+            for entry in scandir(path):
+                if entry.is_dir(follow_symlinks=False):
+                    lm = max(
+                        lm,
+                        self._last_modified_recursive(entry.path, last_modified_for_path),
+                    )
+
+            self._lastmodified_cache[path] = (generation, lm)
+            return lm
+
+    def _validate_cache(self, path, cache):
+        """
+        Checks whether ``cache``, a tuple of marker and cached data about the folder tree at ``path``, is still valid.
+
+        Returns the current marker to store with refreshed data and the result of the check.
+        """
+        if self._watcher is not None:
+            # no need to stat the whole tree, we know what changed
+            marker = self._watcher.generation
+            valid = cache is not None and not self._watcher.changed_since(path, cache[0])
+        else:
+            marker = self.last_modified(path, recursive=True)
+            valid = cache is not None and cache[0] >= marker
+        return marker, valid
+
+    def _mark_changed(self, path, folder=False):
+        if self._watcher is None:
+            return
+
+        self._watcher.mark_changed(path, folder=folder)
+
+        if folder:
+            # drop whatever we cached about the old folder tree
+            with self._filelist_cache_mutex:
+                for cache in (
+                    self._filelist_cache,
+                    self._lastmodified_cache,
+                    self._listing_index_cache,
+                ):
+                    for key in [
+                        key
+                        for key in cache
+                        if key == path or key.startswith(path + os.sep)
+                    ]:
+                        del cache[key]
+
     def get_size(self, path=None, recursive=False):
         if path is None:
             path = self.basefolder
@@ -625,7 +1125,7 @@ class LocalFileStorage(StorageInterface):
 
         # shortcut for individual files
         if os.path.isfile(path):
-            return os.stat(path).st_size
+            return compression.file_size(path)
 
         size = 0
         for entry in os.scandir(path):
@@ -727,6 +1227,25 @@ class LocalFileStorage(StorageInterface):
             result = apply_filter(result, filter)
         return result
 
+    def listing_index(self, path=None, recursive=False, force_refresh=False):
+        if path:
+            folder_path = self.sanitize_path(to_unicode(path))
+        else:
+            folder_path = self.basefolder
+
+        with self._filelist_cache_mutex:
+            caches = self._listing_index_cache.setdefault(folder_path, {})
+            marker, valid = self._validate_cache(folder_path, caches.get(recursive))
+            if not force_refresh and valid:
+                return caches[recursive][1]
+
+            index = ListingIndex(
+                self.list_files(path=path, recursive=True, force_refresh=force_refresh),
+                recursive=recursive,
+            )
+            caches[recursive] = (marker, index)
+            return index
+
     def add_folder(self, path, ignore_existing=True, display=None):
         display_path, display_name = self.canonicalize(path)
         path = self.sanitize_path(display_path)
@@ -744,6 +1263,7 @@ class LocalFileStorage(StorageInterface):
                 )
         else:
             os.mkdir(folder_path)
+            self._mark_changed(folder_path, folder=True)
 
         if display_name != name:
             metadata = self._get_metadata_entry(path, name, default={})
@@ -761,7 +1281,7 @@ class LocalFileStorage(StorageInterface):
 
         empty = True
         for entry in scandir(folder_path):
-            if entry.name == ".metadata.json" or entry.name == ".metadata.yaml":
+            if entry.name == METADATA_JSON or entry.name == METADATA_YAML:
                 continue
             empty = False
             break
@@ -775,9 +1295,14 @@ class LocalFileStorage(StorageInterface):
         import shutil
 
         shutil.rmtree(folder_path)
+        self._mark_changed(folder_path, folder=True)
 
+        self._delete_metadata(folder_path)
         self._remove_metadata_entry(path, name)
 
+        if self._deduplicate:
+            self._collect_blobs()
+
     def _get_source_destination_data(self, source, destination, must_not_equal=False):
         """Prepares data dicts about source and destination for copy/move."""
         source_path, source_name = self.sanitize(source)
@@ -872,8 +1397,16 @@ class LocalFileStorage(StorageInterface):
             source, destination, must_not_equal=True
         )
 
+        # the folder's metadata gets copied or moved along with it, so it needs to be up to date
+        self._flush_pending_metadata(source_data["fullpath"])
+        self._metadata_backend.flush()
+
         try:
-            shutil.copytree(source_data["fullpath"], destination_data["fullpath"])
+            shutil.copytree(
+                source_data["fullpath"],
+                destination_data["fullpath"],
+                copy_function=self._link_or_copy if self._deduplicate else shutil.copy2,
+            )
         except Exception as e:
             raise StorageError(
                 "Could not copy %s in %s to %s in %s"
@@ -885,7 +1418,11 @@ class LocalFileStorage(StorageInterface):
                 ),
                 cause=e,
             )
+        finally:
+            self._mark_changed(destination_data["fullpath"], folder=True)
 
+        self._forget_metadata(destination_data["fullpath"])
+        self._metadata_backend.copy(source_data["fullpath"], destination_data["fullpath"])
         self._set_display_metadata(destination_data, source_data=source_data)
 
         return self.path_in_storage(destination_data["fullpath"])
@@ -895,6 +1432,10 @@ class LocalFileStorage(StorageInterface):
             source, destination
         )
 
+        # the folder's metadata gets copied or moved along with it, so it needs to be up to date
+        self._flush_pending_metadata(source_data["fullpath"])
+        self._metadata_backend.flush()
+
         # only a display rename? Update that and bail early
         if source_data["fullpath"] == destination_data["fullpath"]:
             self._set_display_metadata(destination_data)
@@ -913,10 +1454,15 @@ class LocalFileStorage(StorageInterface):
                 ),
                 cause=e,
             )
+        finally:
+            self._mark_changed(source_data["fullpath"], folder=True)
+            self._mark_changed(destination_data["fullpath"], folder=True)
 
+        self._forget_metadata(source_data["fullpath"])
+        self._forget_metadata(destination_data["fullpath"])
+        self._metadata_backend.move(source_data["fullpath"], destination_data["fullpath"])
         self._set_display_metadata(destination_data, source_data=source_data)
         self._remove_metadata_entry(source_data["path"], source_data["name"])
-        self._delete_metadata(source_data["fullpath"])
 
         return self.path_in_storage(destination_data["fullpath"])
 
@@ -959,11 +1505,44 @@ class LocalFileStorage(StorageInterface):
             # TODO persist display names of path segments!
             os.makedirs(path)
 
+        old_hash = None
+        if self._deduplicate and os.path.exists(file_path):
+            # never write into the existing file, it might share its content with others
+            old_hash = self._get_metadata_entry(path, name, default={}).get("hash")
+            os.remove(file_path)
+
         # save the file
-        file_object.save(file_path)
+        try:
+            file_object.save(file_path)
+        finally:
+            self._mark_changed(file_path)
+
+        # save the file's hash to the metadata of the folder, reusing it if it was
+        # already computed while the file was received - if the file is going to be
+        # linked to the blob named after it, only a hash the server computed itself
+        # from the file's actual content counts
+        file_hash = getattr(file_object, "hash", None)
+        if not self._is_valid_hash(file_hash) or (
+            self._deduplicate and not getattr(file_object, "trusted", False)
+        ):
+            actual_hash = self._create_hash(file_path)
+            if file_hash and file_hash != actual_hash:
+                self._logger.warning(
+                    f"Supplied hash {file_hash!r} of {file_path} doesn't match its content, ignoring it"
+                )
+            file_hash = actual_hash
+
+        compressed = None
+        if self._compress and octoprint.filemanager.valid_file_type(name, type="gcode"):
+            compressed = self._compress_file(file_path)
+
+        shared = {}
+        if self._deduplicate:
+            if self._link_blob(file_path, file_hash):
+                shared = self._get_shared_metadata(file_hash)
+            if old_hash != file_hash:
+                self._release_blob(old_hash)
 
-        # save the file's hash to the metadata of the folder
-        file_hash = self._create_hash(file_path)
         metadata = self._get_metadata_entry(path, name, default={})
         metadata_dirty = False
         if "hash" not in metadata or metadata["hash"] != file_hash:
@@ -971,6 +1550,24 @@ class LocalFileStorage(StorageInterface):
             metadata = {"hash": file_hash}
             metadata_dirty = True
 
+        for key in SHARED_METADATA_KEYS:
+            if key in shared and key not in metadata:
+                # content is already known -> reuse what we know about it
+                metadata[key] = shared[key]
+                metadata_dirty = True
+
+        if metadata.get("compression") != compressed:
+            if compressed:
+                metadata["compression"] = compressed
+            else:
+                del metadata["compression"]
+            metadata_dirty = True
+
+        slicer = getattr(file_object, "slicer", None)
+        if slicer and metadata.get("slicer") != slicer:
+            metadata["slicer"] = slicer
+            metadata_dirty = True
+
         if "display" not in metadata and display_name != name:
             # display name is not the same as file name -> store in metadata
             metadata["display"] = display_name
@@ -995,6 +1592,7 @@ class LocalFileStorage(StorageInterface):
 
         # touch the file to set last access and modification time to now
         os.utime(file_path, None)
+        self._mark_changed(file_path)
 
         return self.path_in_storage((path, name))
 
@@ -1010,13 +1608,22 @@ class LocalFileStorage(StorageInterface):
                 code=StorageError.INVALID_FILE,
             )
 
+        file_hash = None
+        if self._deduplicate:
+            file_hash = self._get_metadata_entry(path, name, default={}).get("hash")
+
         try:
             os.remove(file_path)
         except Exception as e:
             raise StorageError(f"Could not delete {name} in {path}", cause=e)
+        finally:
+            self._mark_changed(file_path)
 
         self._remove_metadata_entry(path, name)
 
+        if self._deduplicate:
+            self._release_blob(file_hash)
+
     def copy_file(self, source, destination):
         source_data, destination_data = self._get_source_destination_data(
             source, destination, must_not_equal=True
@@ -1029,7 +1636,10 @@ class LocalFileStorage(StorageInterface):
             )
 
         try:
-            shutil.copy2(source_data["fullpath"], destination_data["fullpath"])
+            if self._deduplicate:
+                self._link_or_copy(source_data["fullpath"], destination_data["fullpath"])
+            else:
+                shutil.copy2(source_data["fullpath"], destination_data["fullpath"])
         except Exception as e:
             raise StorageError(
                 "Could not copy %s in %s to %s in %s"
@@ -1041,6 +1651,8 @@ class LocalFileStorage(StorageInterface):
                 ),
                 cause=e,
             )
+        finally:
+            self._mark_changed(destination_data["fullpath"])
 
         self._copy_metadata_entry(
             source_data["path"],
@@ -1050,8 +1662,27 @@ class LocalFileStorage(StorageInterface):
         )
         self._set_display_metadata(destination_data, source_data=source_data)
 
+        if self._deduplicate:
+            # the source might predate deduplication and not be linked to its blob yet
+            file_hash = self._get_metadata_entry(
+                destination_data["path"], destination_data["name"], default={}
+            ).get("hash")
+            if file_hash:
+                self._link_blob(destination_data["fullpath"], file_hash)
+
         return self.path_in_storage(destination_data["fullpath"])
 
+    @staticmethod
+    def _link_or_copy(source, destination):
+        # metadata files get rewritten, so only link the actual files
+        if not is_hidden_path(source):
+            try:
+                os.link(source, destination)
+                return destination
+            except OSError:
+                pass
+        return shutil.copy2(source, destination)
+
     def move_file(self, source, destination, allow_overwrite=False):
         source_data, destination_data = self._get_source_destination_data(
             source, destination
@@ -1068,6 +1699,7 @@ class LocalFileStorage(StorageInterface):
             self._set_display_metadata(destination_data)
             return self.path_in_storage(destination_data["fullpath"])
 
+        # a move within the storage is a rename that keeps the file linked to its blob
         try:
             shutil.move(source_data["fullpath"], destination_data["fullpath"])
         except Exception as e:
@@ -1081,6 +1713,9 @@ class LocalFileStorage(StorageInterface):
                 ),
                 cause=e,
             )
+        finally:
+            self._mark_changed(source_data["fullpath"])
+            self._mark_changed(destination_data["fullpath"])
 
         self._copy_metadata_entry(
             source_data["path"],
@@ -1162,6 +1797,7 @@ class LocalFileStorage(StorageInterface):
 
         if metadata_dirty:
             self._save_metadata(path, metadata)
+            self._share_metadata(metadata[name], key)
 
     def remove_additional_metadata(self, path, key):
         path, name = self.sanitize(path)
@@ -1176,6 +1812,14 @@ class LocalFileStorage(StorageInterface):
         metadata = self._copied_metadata(metadata, name)
         del metadata[name][key]
         self._save_metadata(path, metadata)
+        self._share_metadata(metadata[name], key)
+
+    def _share_metadata(self, entry, key):
+        if not self._deduplicate or key not in SHARED_METADATA_KEYS:
+            return
+        if not entry.get("hash"):
+            return
+        self._set_shared_metadata(entry["hash"], key, entry.get(key))
 
     def split_path(self, path):
         path = to_unicode(path)
@@ -1591,8 +2235,8 @@ class LocalFileStorage(StorageInterface):
         try:
             with self._filelist_cache_mutex:
                 cache = self._filelist_cache.get(path)
-                lm = self.last_modified(path, recursive=True)
-                if not force_refresh and cache and cache[0] >= lm:
+                marker, valid = self._validate_cache(path, cache)
+                if not force_refresh and valid:
                     return enrich_folders(cache[1])
 
                 metadata = self._get_metadata(path)
@@ -1667,6 +2311,7 @@ class LocalFileStorage(StorageInterface):
                                     save=False,
                                     metadata=metadata,
                                 )
+                                metadata[entry_name] = entry_metadata
                                 metadata_dirty = True
 
                             extended_entry_data = {}
@@ -1680,7 +2325,9 @@ class LocalFileStorage(StorageInterface):
                             extended_entry_data["typePath"] = type_path
                             stat = entry_stat
                             if stat:
-                                extended_entry_data["size"] = stat.st_size
+                                extended_entry_data["size"] = entry_metadata.get(
+                                    "compression", {}
+                                ).get("size", stat.st_size)
                                 extended_entry_data["date"] = int(stat.st_mtime)
 
                             result[entry_name] = extended_entry_data
@@ -1712,6 +2359,7 @@ class LocalFileStorage(StorageInterface):
                                     save=False,
                                     metadata=metadata,
                                 )
+                                metadata[entry_name] = entry_metadata
                                 metadata_dirty = True
                             else:
                                 entry_metadata = {}
@@ -1735,7 +2383,7 @@ class LocalFileStorage(StorageInterface):
                         continue
 
                 self._filelist_cache[path] = (
-                    lm,
+                    marker,
                     result,
                 )
                 return enrich_folders(result)
@@ -1800,7 +2448,7 @@ class LocalFileStorage(StorageInterface):
 
         blocksize = 65536
         hash = hashlib.sha1()
-        with open(path, "rb") as f:
+        with compression.open_file(path) as f:
             buffer = f.read(blocksize)
             while len(buffer) > 0:
                 hash.update(buffer)
@@ -1867,141 +2515,142 @@ class LocalFileStorage(StorageInterface):
             self._update_metadata_entry(destination_path, destination_name, source_data)
 
     def _get_metadata(self, path, force=False):
-        import json
+        with self._batch_mutex:
+            metadata = self._batch_pending.get(path)
+        if metadata is not None:
+            # not persisted yet, and the cache might already have evicted it
+            return metadata
 
         if not force:
             metadata = self._metadata_cache.get(path)
             if metadata:
                 return metadata
 
-        self._migrate_metadata(path)
-
-        metadata_path = os.path.join(path, ".metadata.json")
-
-        metadata = None
-        with self._get_persisted_metadata_lock(path):
-            if os.path.exists(metadata_path):
-                with open(metadata_path, encoding="utf-8") as f:
-                    try:
-                        metadata = json.load(f)
-                    except Exception:
-                        self._logger.exception(
-                            f"Error while reading .metadata.json from {path}"
-                        )
+        metadata = self._metadata_backend.load(path)
+        if not isinstance(metadata, dict) or not os.path.isdir(path):
+            return {}
 
-        def valid_json(value):
-            try:
-                json.dumps(value, allow_nan=False)
-                return True
-            except Exception:
-                return False
+        existing = {entry.name for entry in scandir(path)}
 
-        if isinstance(metadata, dict):
-            old_size = len(metadata)
-            metadata = {k: v for k, v in metadata.items() if valid_json(v)}
-            metadata = {
-                k: v for k, v in metadata.items() if os.path.exists(os.path.join(path, k))
-            }
-            new_size = len(metadata)
-            if new_size != old_size:
-                self._logger.info(
-                    "Deleted {} stale or invalid entries from metadata for path {}".format(
-                        old_size - new_size, path
-                    )
+        old_size = len(metadata)
+        metadata = {k: v for k, v in metadata.items() if k in existing}
+        new_size = len(metadata)
+        if new_size != old_size:
+            self._logger.info(
+                "Deleted {} stale entries from metadata for path {}".format(
+                    old_size - new_size, path
                 )
-                self._save_metadata(path, metadata)
-            else:
-                with self._get_metadata_lock(path):
-                    self._metadata_cache[path] = metadata
-            return metadata
+            )
+            self._save_metadata(path, metadata)
         else:
-            return {}
+            with self._get_metadata_lock(path):
+                self._metadata_cache[path] = metadata
+        return metadata
 
     def _save_metadata(self, path, metadata):
-        import json
-
         with self._get_metadata_lock(path):
             self._metadata_cache[path] = metadata
 
-        with self._get_persisted_metadata_lock(path):
-            metadata_path = os.path.join(path, ".metadata.json")
-            try:
-                with atomic_write(metadata_path, mode="wb") as f:
-                    f.write(
-                        to_bytes(json.dumps(metadata, indent=2, separators=(",", ": ")))
-                    )
-            except Exception:
-                self._logger.exception(f"Error while writing .metadata.json to {path}")
-
-    def _delete_metadata(self, path):
-        with self._get_metadata_lock(path):
-            if path in self._metadata_cache:
-                del self._metadata_cache[path]
-
-        with self._get_persisted_metadata_lock(path):
-            metadata_files = (".metadata.json", ".metadata.yaml")
-            for metadata_file in metadata_files:
-                metadata_path = os.path.join(path, metadata_file)
-                if os.path.exists(metadata_path):
-                    try:
-                        os.remove(metadata_path)
-                    except Exception:
-                        self._logger.exception(
-                            f"Error while deleting {metadata_file} from {path}"
-                        )
+        with self._batch_mutex:
+            if self._batch_depth:
+                # written once per folder when the batch ends
+                self._batch_pending[path] = metadata
+            else:
+                self._metadata_backend.save(path, metadata)
 
-    @staticmethod
-    def _copied_metadata(metadata, name):
-        metadata = copy.copy(metadata)
-        metadata[name] = copy.deepcopy(metadata.get(name, {}))
-        return metadata
+        if self._watcher is not None:
+            self._watcher.mark_folder_changed(path)
 
-    def _migrate_metadata(self, path):
-        # we switched to json in 1.3.9 - if we still have yaml here, migrate it now
-        import json
+    def _delete_metadata(self, path):
+        with self._batch_mutex:
+            for key in self._pending_metadata_paths(path):
+                del self._batch_pending[key]
+        self._forget_metadata(path)
+        self._metadata_backend.delete(path)
 
-        with self._get_persisted_metadata_lock(path):
-            metadata_path_yaml = os.path.join(path, ".metadata.yaml")
-            metadata_path_json = os.path.join(path, ".metadata.json")
+    def _forget_metadata(self, path):
+        with self._metadata_lock_mutex:
+            for key in [
+                key
+                for key in self._metadata_cache.keys()
+                if key == path or key.startswith(path + os.sep)
+            ]:
+                del self._metadata_cache[key]
 
-            if not os.path.exists(metadata_path_yaml):
-                # nothing to migrate
-                return
+    @property
+    def watched(self):
+        return self._watcher is not None
 
-            if os.path.exists(metadata_path_json):
-                # already migrated
-                try:
-                    os.remove(metadata_path_yaml)
-                except Exception:
-                    self._logger.exception(
-                        f"Error while removing .metadata.yaml from {path}"
-                    )
-                return
+    def add_change_listener(self, listener):
+        self._change_listeners.append(listener)
 
+    def _on_external_change(self):
+        for listener in self._change_listeners:
             try:
-                metadata = yaml.load_from_file(path=metadata_path_yaml)
+                listener()
             except Exception:
-                self._logger.exception(f"Error while reading .metadata.yaml from {path}")
-                return
+                self._logger.exception(
+                    f"Error while notifying {listener} about changes in {self.basefolder}"
+                )
 
-            if not isinstance(metadata, dict):
-                # looks invalid, ignore it
-                return
+    def close(self):
+        """
+        Writes pending metadata and closes the metadata backend.
+        """
+        with self._batch_mutex:
+            self._flush_metadata(list(self._batch_pending))
+        self._metadata_backend.close()
 
-            with atomic_write(metadata_path_json, mode="wb") as f:
-                f.write(to_bytes(json.dumps(metadata, indent=2, separators=(",", ": "))))
+    @contextmanager
+    def batch(self):
+        """
+        Defers writing metadata until the outermost batch ends, so every folder's metadata gets written only once no
+        matter how many of its entries got changed within the batch.
+        """
+        with self._batch_mutex:
+            self._batch_depth += 1
 
-            try:
-                os.remove(metadata_path_yaml)
-            except Exception:
-                self._logger.exception(f"Error while removing .metadata.yaml from {path}")
+        try:
+            yield
+        finally:
+            with self._batch_mutex:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush_metadata(list(self._batch_pending))
+
+    def _pending_metadata_paths(self, path):
+        with self._batch_mutex:
+            return [
+                key
+                for key in self._batch_pending
+                if key == path or key.startswith(path + os.sep)
+            ]
+
+    def _flush_pending_metadata(self, path):
+        self._flush_metadata(self._pending_metadata_paths(path))
+
+    def _flush_metadata(self, paths):
+        with self._batch_mutex:
+            for path in paths:
+                metadata = self._batch_pending.pop(path, None)
+                if metadata is None or not os.path.isdir(path):
+                    continue
+
+                try:
+                    self._metadata_backend.save(path, metadata)
+                except Exception:
+                    self._logger.exception(f"Error while saving metadata for {path}")
+
+    @staticmethod
+    def _copied_metadata(metadata, name):
+        metadata = copy.copy(metadata)
+        metadata[name] = copy.deepcopy(metadata.get(name, {}))
+        return metadata
 
     @contextmanager
     def _get_metadata_lock(self, path):
         with self._metadata_lock_mutex:
             if path not in self._metadata_locks:
-                import threading
-
                 self._metadata_locks[path] = (0, threading.RLock())
 
             counter, lock = self._metadata_locks[path]
@@ -2017,25 +2666,3 @@ class LocalFileStorage(StorageInterface):
                 del self._metadata_locks[path]
             else:
                 self._metadata_locks[path] = (counter, lock)
-
-    @contextmanager
-    def _get_persisted_metadata_lock(self, path):
-        with self._persisted_metadata_lock_mutex:
-            if path not in self._persisted_metadata_locks:
-                import threading
-
-                self._persisted_metadata_locks[path] = (0, threading.RLock())
-
-            counter, lock = self._persisted_metadata_locks[path]
-            counter += 1
-            self._persisted_metadata_locks[path] = (counter, lock)
-
-        yield lock
-
-        with self._persisted_metadata_lock_mutex:
-            counter = self._persisted_metadata_locks[path][0]
-            counter -= 1
-            if counter <= 0:
-                del self._persisted_metadata_locks[path]
-            else:
-                self._persisted_metadata_locks[path] = (counter, lock)
@@ -2,6 +2,7 @@ __author__ = "Gina Häußge <osd@foosel.net>"
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2015 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+import hashlib
 import io
 import os
 
@@ -48,16 +49,27 @@ class DiskFileWrapper(AbstractFileWrapper):
     will either copy the file to the new path (preserving file attributes) or -- if `move` is `True` (the default) --
     move the file.
 
+    If the file's ``hash`` and ``slicer`` information are already known, e.g. because they were collected through an
+    :class:`UploadIngest` while the file was received, storages will use them instead of reading the file again.
+    Storages that link files to shared content named after their hash only rely on a ``trusted`` hash though.
+
     Arguments:
         filename (str): The file's name
         path (str): The file's absolute path
         move (boolean): Whether to move the file upon saving (True, default) or copying.
+        hash (str): The file's SHA1 hash, if known
+        slicer (dict): Slicer information from the file's header and footer, if known
+        trusted (boolean): Whether ``hash`` was computed by the server itself from the file's actual content, e.g. by
+            an :class:`UploadIngest`, instead of being supplied by a client
     """
 
-    def __init__(self, filename, path, move=True):
+    def __init__(self, filename, path, move=True, hash=None, slicer=None, trusted=False):
         AbstractFileWrapper.__init__(self, filename)
         self.path = path
         self.move = move
+        self.hash = hash
+        self.slicer = slicer
+        self.trusted = trusted
 
     def save(self, path, permissions=None):
         import shutil
@@ -75,6 +87,101 @@ class DiskFileWrapper(AbstractFileWrapper):
         return open(self.path, "rb")
 
 
+class UploadIngest:
+    """
+    Wraps the file object an upload is streamed into, to compute the upload's SHA1 hash and size while its data
+    arrives. For GCODE files it also keeps the first and last :attr:`SLICER_BLOCK_SIZE` bytes, to extract the slicer
+    information the header and footer of the file contain. That way nothing needs to read the file again once it is
+    complete.
+
+    Arguments:
+        handle: The file object to write the upload to
+        slicer (bool): Whether to extract slicer information from the upload
+    """
+
+    SLICER_BLOCK_SIZE = 64 * 1024
+
+    ENVIRON_KEY = "octoprint.upload_ingests"
+    """
+    WSGI environment key under which :class:`~octoprint.server.util.tornado.UploadStorageFallbackHandler` supplies
+    the :meth:`parameters` of all ingested uploads, by form field name. They are passed out of band so that clients
+    can't spoof them via form fields.
+    """
+
+    def __init__(self, handle, slicer=False):
+        self.handle = handle
+        self.size = 0
+
+        self._hash = hashlib.sha1()
+        self._slicer = slicer
+        self._head = bytearray()
+        self._tail = bytearray()
+
+    @property
+    def name(self):
+        return self.handle.name
+
+    @property
+    def hash(self):
+        return self._hash.hexdigest()
+
+    @property
+    def slicer(self):
+        """
+        Returns:
+            dict: The slicer information found in the header and footer of the upload, or None
+        """
+        if not self._slicer:
+            return None
+
+        from octoprint.util.gcodeInterpreter import SlicerInfo
+
+        head = bytes(self._head)
+        tail = bytes(self._tail[-self.SLICER_BLOCK_SIZE :])
+        if len(head) + len(tail) == self.size:
+            lines = (head + tail).split(b"\n")
+        else:
+            # skip the lines cut off at the block boundaries
+            lines = head.split(b"\n")[:-1] + tail.split(b"\n")[1:]
+
+        info = SlicerInfo()
+        for line in lines:
+            info.parse_line(line.decode("utf-8", errors="replace"))
+        return info.to_dict()
+
+    def parameters(self):
+        """
+        Returns:
+            dict: The information gathered about the upload, ``hash`` and ``slicer`` (if found)
+        """
+        parameters = {"hash": self.hash}
+        slicer = self.slicer
+        if slicer:
+            parameters["slicer"] = slicer
+        return parameters
+
+    def write(self, data):
+        self.handle.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+        if not self._slicer:
+            return
+
+        missing = self.SLICER_BLOCK_SIZE - len(self._head)
+        if missing > 0:
+            self._head += data[:missing]
+            data = data[missing:]
+
+        if data:
+            self._tail += data
+            if len(self._tail) > 2 * self.SLICER_BLOCK_SIZE:
+                del self._tail[: -self.SLICER_BLOCK_SIZE]
+
+    def close(self):
+        self.handle.close()
+
+
 class StreamWrapper(AbstractFileWrapper):
     """
     A wrapper allowing processing of one or more consecutive streams.
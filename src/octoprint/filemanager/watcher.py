@@ -0,0 +1,306 @@
+"""
+Change tracking for folder trees.
+
+The :class:`FileTreeWatcher` receives file system notifications for a folder tree, either
+from the OS (inotify, FSEvents, ...) or by polling, and maintains a global generation
+counter plus the generation of the latest change below each folder. Caches of folder
+contents can use that to cheaply decide whether they are still valid, instead of having
+to walk the whole tree. Changes not done by the owner of the tree get reported to an
+``on_change`` callback, so caches elsewhere can be invalidated as well.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import logging
+import os
+import threading
+import time
+
+import watchdog.events
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+_IGNORED_EVENT_TYPES = (watchdog.events.EVENT_TYPE_CLOSED, "opened")
+
+OWN_CHANGE_WINDOW = 5.0
+"""
+Maximum number of seconds between a notification and the owner reporting a change of the same entry or its folder
+for the notification to count as caused by the owner.
+"""
+
+
+class FileTreeWatcher(watchdog.events.FileSystemEventHandler):
+    """
+    Tracks changes within ``folder``.
+
+    Every change increases :attr:`generation`. A change of an entry also marks its
+    folder and all of that folder's ancestors up to ``folder`` as changed. Folders that
+    get created, deleted or moved additionally invalidate everything below them.
+
+    Changes done by the owner of the watched tree should also be reported through
+    :meth:`mark_changed` or :meth:`mark_folder_changed`, since notifications arrive
+    asynchronously. All other changes get reported to ``on_change``, at most once every
+    ``notify_delay`` seconds. Notifications about entries or folders the owner reported
+    around the same time are attributed to the owner.
+
+    Polling has to walk the whole tree and is therefore only used if requested via
+    ``force_polling``, not as fallback for unavailable OS notifications.
+
+    Arguments:
+        folder (str): The folder to watch
+        force_polling (bool): Whether to poll the folder instead of relying on OS notifications
+        polling_interval (float): Interval in seconds between two polls
+        ignored (list): Absolute paths of files or folders whose notifications to ignore.
+            Entries moved out of an ignored folder into the tree are still tracked.
+        on_change (callable): Called without arguments after changes not reported by the owner
+        notify_delay (float): Seconds to collect further changes before calling ``on_change``
+    """
+
+    def __init__(
+        self,
+        folder,
+        force_polling=False,
+        polling_interval=10.0,
+        ignored=None,
+        on_change=None,
+        notify_delay=1.0,
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self._folder = os.path.realpath(os.path.abspath(folder))
+        self._ignored = {os.path.normpath(path) for path in ignored or ()}
+        self._force_polling = force_polling
+        self._polling_interval = polling_interval
+        self._on_change = on_change
+        self._notify_delay = notify_delay
+
+        self._mutex = threading.RLock()
+        self._generation = 0
+        self._changed = {}
+        self._reset = {}
+        self._owned = {}
+        self._notifications = []
+        self._notify_timer = None
+
+        self._observer = None
+
+    @property
+    def active(self):
+        return self._observer is not None
+
+    @property
+    def polling(self):
+        return isinstance(self._observer, PollingObserver)
+
+    @property
+    def generation(self):
+        with self._mutex:
+            return self._generation
+
+    def start(self):
+        """
+        Starts watching, via OS notifications or by polling if ``force_polling`` is set.
+
+        Returns:
+            bool: Whether the watcher could be started
+        """
+        if self._observer is not None:
+            return True
+
+        if self._force_polling:
+            observer = PollingObserver(timeout=self._polling_interval)
+        else:
+            observer = Observer()
+
+        try:
+            observer.schedule(self, self._folder, recursive=True)
+            observer.start()
+        except Exception as exc:
+            self._logger.warning(
+                f"Could not watch {self._folder} via {observer.__class__.__name__}: {exc}"
+            )
+            return False
+
+        self._observer = observer
+        self._logger.info(
+            f"Watching {self._folder} for changes via {observer.__class__.__name__}"
+        )
+        return True
+
+    def stop(self):
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+        with self._mutex:
+            timer, self._notify_timer = self._notify_timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def mark_changed(self, path, folder=False):
+        """
+        Marks ``path`` as changed.
+
+        Arguments:
+            path (str): Absolute path of the changed entry
+            folder (bool): Whether the entry is a folder that was created, deleted or
+                replaced, invalidating everything below it
+        """
+        path = os.path.normpath(path)
+
+        with self._mutex:
+            # parent folders the change implicitly created modify their own parent
+            parent = os.path.dirname(path)
+            self._own(path, parent, os.path.dirname(parent))
+            self._change(path, folder)
+
+    def mark_folder_changed(self, path):
+        """
+        Marks the entries of the folder ``path`` as changed, without invalidating
+        anything below them.
+
+        Arguments:
+            path (str): Absolute path of the folder
+        """
+        path = os.path.normpath(path)
+
+        with self._mutex:
+            self._own(path)
+            self._change_folder(path)
+
+    def changed_since(self, path, generation):
+        """
+        Arguments:
+            path (str): Absolute path of a folder
+            generation (int): The generation to compare against
+
+        Returns:
+            bool: Whether anything within ``path`` changed after ``generation``
+        """
+        path = os.path.normpath(path)
+
+        with self._mutex:
+            if self._changed.get(path, 0) > generation:
+                return True
+            return any(
+                self._reset.get(ancestor, 0) > generation
+                for ancestor in self._ancestors(path)
+            )
+
+    def on_any_event(self, event):
+        if event.event_type in _IGNORED_EVENT_TYPES:
+            return
+
+        src_path = os.path.normpath(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            dest_path = os.path.normpath(dest_path)
+            if self._is_ignored(dest_path):
+                dest_path = None
+
+        with self._mutex:
+            if self._is_ignored(src_path):
+                if dest_path:
+                    self._change(dest_path, event.is_directory)
+                    self._queue_notification(dest_path)
+                return
+
+            if (
+                event.is_directory
+                and event.event_type == watchdog.events.EVENT_TYPE_MODIFIED
+            ):
+                # only the folder's own entries changed
+                self._change_folder(src_path)
+                self._queue_notification(src_path)
+                return
+
+            self._change(src_path, event.is_directory)
+            self._queue_notification(src_path)
+
+            if dest_path:
+                self._change(dest_path, event.is_directory)
+                self._queue_notification(dest_path)
+
+    def _change(self, path, folder):
+        self._generation += 1
+        if folder:
+            self._reset[path] = self._generation
+            self._mark(path)
+        else:
+            self._mark(os.path.dirname(path))
+
+    def _change_folder(self, path):
+        self._generation += 1
+        self._mark(path)
+
+    def _own(self, *paths):
+        now = time.monotonic()
+        for path in paths:
+            self._owned[path] = now
+
+        # forget what's too old to matter anymore
+        if len(self._owned) > 1000:
+            self._owned = {
+                path: timestamp
+                for path, timestamp in self._owned.items()
+                if now - timestamp < 2 * OWN_CHANGE_WINDOW
+            }
+
+    def _owned_by_us(self, path, timestamp):
+        for candidate in (path, os.path.dirname(path)):
+            owned = self._owned.get(candidate)
+            if owned is not None and abs(owned - timestamp) < OWN_CHANGE_WINDOW:
+                return True
+        return False
+
+    def _queue_notification(self, path):
+        if self._on_change is None:
+            return
+
+        # the owner might only report its change after we got notified about it, so
+        # that gets decided once the notification is due
+        self._notifications.append((path, time.monotonic()))
+        if self._notify_timer is None:
+            self._notify_timer = threading.Timer(self._notify_delay, self._notify)
+            self._notify_timer.daemon = True
+            self._notify_timer.start()
+
+    def _notify(self):
+        with self._mutex:
+            self._notify_timer = None
+            notifications, self._notifications = self._notifications, []
+            external = [
+                path
+                for path, timestamp in notifications
+                if not self._owned_by_us(path, timestamp)
+            ]
+
+        if not external:
+            return
+
+        try:
+            self._on_change()
+        except Exception:
+            self._logger.exception(
+                f"Error while notifying about changes in {self._folder}"
+            )
+
+    def _is_ignored(self, path):
+        path = os.path.normpath(path)
+        return any(
+            path == ignored or path.startswith(ignored + os.sep)
+            for ignored in self._ignored
+        )
+
+    def _mark(self, folder):
+        for ancestor in self._ancestors(folder):
+            self._changed[ancestor] = self._generation
+
+    def _ancestors(self, path):
+        while path == self._folder or path.startswith(self._folder + os.sep):
+            yield path
+            if path == self._folder:
+                break
+            path = os.path.dirname(path)
@@ -888,6 +888,7 @@ class PluginManager:
         self.disabled_plugins = {}
         self.plugin_implementations = {}
         self.plugin_implementations_by_type = defaultdict(list)
+        self.implementation_generation = 0
 
         self._plugin_hooks = defaultdict(list)
 
@@ -1703,6 +1704,7 @@ class PluginManager:
 
             self.plugin_implementations[name] = plugin.implementation
             plugin.implementation.__timing_wrapped = True
+            self.implementation_generation += 1
 
     def _deactivate_plugin(self, name, plugin):
         for hook, definition in plugin.hooks.items():
@@ -1741,6 +1743,7 @@ class PluginManager:
                 except ValueError:
                     # that's ok, the plugin was just not registered for the type
                     pass
+            self.implementation_generation += 1
 
     def is_restart_needing_plugin(self, plugin):
         """Checks whether the plugin needs a restart on changes"""
@@ -2061,8 +2061,28 @@ class EventHandlerPlugin(OctoPrintPlugin):
 
     This mixin is especially interesting for plugins which want to react on things like print jobs finishing, timelapse
     videos rendering etc.
+
+    Plugins that are only interested in a few specific events should override :func:`get_event_subscriptions`, OctoPrint
+    will then only call :func:`on_event` for those events instead of for every single one.
     """
 
+    # noinspection PyMethodMayBeStatic
+    def get_event_subscriptions(self):
+        """
+        Called by OctoPrint to determine which events to deliver to :func:`on_event`.
+
+        Return a list of event names the plugin wants to receive. An entry ending in ``*`` will be treated as a prefix
+        and match all events starting with it, e.g. ``Print*`` or ``plugin_myplugin_*``. Return ``None`` (the default) to
+        receive all events.
+
+        The result is evaluated once and cached until the set of enabled plugins changes, so it must not depend on
+        state that changes at runtime.
+
+        Returns:
+            list or None: A list of event names and/or event name prefixes, or ``None`` to subscribe to all events.
+        """
+        return None
+
     # noinspection PyMethodMayBeStatic
     def on_event(self, event, payload):
         """
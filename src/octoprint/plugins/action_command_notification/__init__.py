@@ -55,6 +55,9 @@ class ActionCommandNotificationPlugin(
 
     # ~ EventHandlerPlugin
 
+    def get_event_subscriptions(self):
+        return [Events.DISCONNECTED]
+
     def on_event(self, event, payload):
         if event == Events.DISCONNECTED:
             self._clear_notifications()
@@ -83,6 +83,9 @@ class ActionCommandPromptPlugin(
 
     # ~ EventHandlerPlugin
 
+    def get_event_subscriptions(self):
+        return [Events.CONNECTED, Events.DISCONNECTED]
+
     def on_event(self, event, payload):
         if (
             event == Events.CONNECTED
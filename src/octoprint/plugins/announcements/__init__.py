@@ -324,6 +324,11 @@ class AnnouncementPlugin(
 
     ##~~ EventHandlerPlugin
 
+    def get_event_subscriptions(self):
+        from octoprint.events import Events
+
+        return [Events.CONNECTIVITY_CHANGED]
+
     def on_event(self, event, payload):
         from octoprint.events import Events
 
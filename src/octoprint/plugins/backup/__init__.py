@@ -5,6 +5,13 @@ import octoprint.plugin
 from octoprint.access import ADMIN_GROUP
 from octoprint.access.permissions import Permissions
 from octoprint.events import Events
+from octoprint.filemanager.metadata import (
+    METADATA_DB_FILES,
+    METADATA_JOURNAL,
+    METADATA_JSON,
+    export_metadata,
+)
+from octoprint.filemanager.storage import BLOB_FOLDER, STAGING_FOLDER
 from octoprint.server import NO_CONTENT
 from octoprint.server.util.flask import no_firstrun_access
 from octoprint.settings import default_settings
@@ -390,6 +397,9 @@ class BackupPlugin(
                 {
                     "path": plugin_folder,
                     "as_attachment": True,
+                    "sendfile": self._settings.global_get_boolean(
+                        ["server", "downloads", "sendfile"]
+                    ),
                     "path_validation": path_validation_factory(
                         path_check,
                         status_code=404,
@@ -1037,6 +1047,50 @@ class BackupPlugin(
                             elif os.path.isfile(source):
                                 zip.write(source, arcname=target)
 
+                        def add_uploads_to_zip(source, target, ignored=None):
+                            if ignored is None:
+                                ignored = []
+
+                            # uploads still being received are of no interest, neither are
+                            # the blobs of deduplicated files, which are backed up as files
+                            ignored = ignored + [
+                                os.path.join(source, STAGING_FOLDER),
+                                os.path.join(source, BLOB_FOLDER),
+                            ]
+
+                            # file metadata might be kept in a database or have changes
+                            # pending in the journal, export it into .metadata.json files to
+                            # keep the backup portable
+                            try:
+                                exported = export_metadata(source)
+                            except Exception:
+                                logger.exception(
+                                    f"Error while exporting the file metadata from {source}"
+                                )
+                                exported = None
+
+                            if exported is not None:
+                                ignored = ignored + [
+                                    os.path.join(source, name)
+                                    for name in METADATA_DB_FILES + (METADATA_JOURNAL,)
+                                ]
+                                for folder, data in exported.items():
+                                    path = os.path.join(source, *folder.split("/"))
+                                    if not os.path.isdir(path):
+                                        continue
+
+                                    ignored.append(os.path.join(path, METADATA_JSON))
+                                    zip.writestr(
+                                        "/".join(
+                                            filter(None, [target, folder, METADATA_JSON])
+                                        ),
+                                        json.dumps(
+                                            data, indent=2, separators=(",", ": ")
+                                        ),
+                                    )
+
+                            add_to_zip(source, target, ignored=ignored)
+
                         # add metadata
                         metadata = {
                             "version": get_octoprint_version_string(),
@@ -1058,7 +1112,10 @@ class BackupPlugin(
                             if folder in exclude or folder in exclude_by_default:
                                 continue
 
-                            add_to_zip(
+                            add_folder_to_zip = (
+                                add_uploads_to_zip if folder == "uploads" else add_to_zip
+                            )
+                            add_folder_to_zip(
                                 settings.global_get_basefolder(folder),
                                 "basedir/" + folder.replace("_", "/"),
                                 ignored=[
@@ -1,21 +1,42 @@
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2020 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+import hashlib
+import json
 import os
+import re
+import threading
 
 import flask
 from flask_babel import gettext
 
 import octoprint.plugin
+from octoprint.access.permissions import Permissions
+from octoprint.events import Events
+from octoprint.filemanager import valid_file_type
+from octoprint.filemanager.destinations import FileDestinations
+from octoprint.util import atomic_write, silent_remove
 from octoprint.util.files import search_through_file
 
+from . import layers
+
+LAYER_DATA_KEY = re.compile(r"^[0-9a-f]{40}$")
+
 
 class GcodeviewerPlugin(
     octoprint.plugin.AssetPlugin,
     octoprint.plugin.TemplatePlugin,
     octoprint.plugin.SettingsPlugin,
     octoprint.plugin.BlueprintPlugin,
+    octoprint.plugin.EventHandlerPlugin,
 ):
+    def __init__(self):
+        super().__init__()
+        self._layer_builds = {}
+        self._layer_failures = set()
+        self._layer_mutex = threading.Lock()
+        self._layer_build_mutex = threading.Lock()
+
     def get_assets(self):
         js = [
             "js/gcodeviewer.js",
@@ -56,6 +77,8 @@ class GcodeviewerPlugin(
             "skipUntilThis": None,
             "alwaysCompress": False,
             "compressionSizeThreshold": 200 * 1024 * 1024,
+            "serverSideLayers": True,
+            "layerCacheSize": 512 * 1024 * 1024,
         }
 
     def get_settings_version(self):
@@ -95,11 +118,244 @@ class GcodeviewerPlugin(
             # no skipUntilThis, no need to search, shortcut
             return flask.jsonify(present=False)
 
+        # use the marker index recorded during analysis if it knows our string, and
+        # only fall back to searching through the file if it doesn't
+        metadata = self._file_manager.get_metadata(origin, filename) or {}
+        strings = metadata.get("markers", {}).get("strings", {})
+        if skipUntilThis in strings:
+            offset = strings[skipUntilThis]
+            return flask.jsonify(present=offset is not None, offset=offset)
+
         return flask.jsonify(present=search_through_file(path, skipUntilThis))
 
+    ##~~ Analysis markers hook
+
+    def get_analysis_markers(self, *args, **kwargs):
+        skipUntilThis = self._settings.get(["skipUntilThis"])
+        if skipUntilThis:
+            return [skipUntilThis]
+        return []
+
+    @octoprint.plugin.BlueprintPlugin.route(
+        "/layers/<string:origin>/<path:filename>", methods=["GET"]
+    )
+    @Permissions.FILES_DOWNLOAD.require(403)
+    def get_layer_index(self, origin, filename):
+        if (
+            not self._settings.get_boolean(["serverSideLayers"])
+            or origin != FileDestinations.LOCAL
+            or not valid_file_type(filename, type="gcode")
+            or not self._file_manager.file_exists(origin, filename)
+        ):
+            flask.abort(404)
+
+        key = self._layer_data_key(origin, filename)
+        index = self._load_layer_index(key)
+        if index is None:
+            with self._layer_mutex:
+                if key in self._layer_failures:
+                    flask.abort(404)
+            progress = self._start_layer_build(origin, filename, key)
+            return flask.jsonify(progress=progress), 202
+
+        index["data"] = flask.url_for(".get_layer_data", key=key)
+        return flask.jsonify(index)
+
+    @octoprint.plugin.BlueprintPlugin.route("/layerdata/<string:key>", methods=["GET"])
+    @Permissions.FILES_DOWNLOAD.require(403)
+    def get_layer_data(self, key):
+        if not LAYER_DATA_KEY.match(key):
+            flask.abort(404)
+
+        path = self._layer_data_path(key)
+        if not os.path.isfile(path):
+            flask.abort(404)
+
+        # the key depends on the file's content, so the data never changes, and
+        # conditional responses take care of range requests for single layers
+        response = flask.send_file(
+            path,
+            mimetype="application/octet-stream",
+            conditional=True,
+            etag=key,
+            max_age=365 * 24 * 60 * 60,
+        )
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+
     def is_blueprint_csrf_protected(self):
         return True
 
+    ##~~ EventHandlerPlugin
+
+    def on_event(self, event, payload):
+        if (
+            event != Events.METADATA_ANALYSIS_FINISHED
+            or payload.get("origin") != FileDestinations.LOCAL
+            or not self._settings.get_boolean(["serverSideLayers"])
+        ):
+            return
+
+        path = payload.get("path")
+        if not valid_file_type(path, type="gcode"):
+            return
+
+        try:
+            key = self._layer_data_key(FileDestinations.LOCAL, path)
+        except Exception:
+            # file is already gone again
+            return
+
+        if not os.path.isfile(self._layer_index_path(key)):
+            self._start_layer_build(FileDestinations.LOCAL, path, key)
+
+    ##~~ layer data
+
+    @property
+    def _layer_cache_folder(self):
+        return os.path.join(self.get_plugin_data_folder(), "layers")
+
+    def _layer_data_path(self, key):
+        return os.path.join(self._layer_cache_folder, f"{key}.bin")
+
+    def _layer_index_path(self, key):
+        return os.path.join(self._layer_cache_folder, f"{key}.json")
+
+    def _layer_data_key(self, origin, path):
+        file_hash = (self._file_manager.get_metadata(origin, path) or {}).get("hash")
+        if not file_hash:
+            stat = os.stat(self._file_manager.path_on_disk(origin, path))
+            file_hash = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+        g90_extruder = self._settings.global_get_boolean(
+            ["feature", "g90InfluencesExtruder"]
+        )
+        return hashlib.sha1(
+            f"{file_hash}:{layers.FORMAT_VERSION}:{g90_extruder}".encode("utf-8")
+        ).hexdigest()
+
+    def _load_layer_index(self, key):
+        path = self._layer_index_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._logger.exception(f"Could not read layer index {path}")
+            return None
+
+        # keep track of usage for the cache cleanup
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return index
+
+    def _start_layer_build(self, origin, path, key):
+        with self._layer_mutex:
+            if key in self._layer_builds:
+                return self._layer_builds[key]
+            self._layer_builds[key] = 0.0
+
+        thread = threading.Thread(
+            target=self._build_layer_data,
+            args=(origin, path, key),
+            name=f"GcodeviewerLayers-{key[:8]}",
+        )
+        thread.daemon = True
+        thread.start()
+        return 0.0
+
+    def _build_layer_data(self, origin, path, key):
+        def progress_callback(progress):
+            with self._layer_mutex:
+                self._layer_builds[key] = progress
+
+        data_path = self._layer_data_path(key)
+        temp_path = data_path + ".tmp"
+
+        try:
+            # one build at a time, it's CPU heavy
+            with self._layer_build_mutex:
+                if os.path.isfile(self._layer_index_path(key)):
+                    return
+
+                self._logger.info(f"Preprocessing layer data of {origin}:{path}...")
+                throttle = None
+                if self._printer.is_printing():
+                    throttle = self._settings.global_get_float(
+                        ["gcodeAnalysis", "throttle_normalprio"]
+                    )
+
+                os.makedirs(self._layer_cache_folder, exist_ok=True)
+                with open(temp_path, "wb") as output:
+                    index = layers.build(
+                        self._file_manager.path_on_disk(origin, path),
+                        output,
+                        g90_extruder=self._settings.global_get_boolean(
+                            ["feature", "g90InfluencesExtruder"]
+                        ),
+                        progress_callback=progress_callback,
+                        throttle=throttle,
+                        throttle_lines=self._settings.global_get_int(
+                            ["gcodeAnalysis", "throttle_lines"]
+                        ),
+                    )
+                os.replace(temp_path, data_path)
+
+                with atomic_write(
+                    self._layer_index_path(key), mode="wt", max_permissions=0o666
+                ) as f:
+                    json.dump(index, f)
+
+                self._logger.info(
+                    f"Preprocessed layer data of {origin}:{path}, {len(index['layers'])} layers"
+                )
+
+            self._cleanup_layer_cache()
+        except Exception:
+            self._logger.exception(
+                f"Error while preprocessing layer data of {origin}:{path}"
+            )
+            silent_remove(temp_path)
+            with self._layer_mutex:
+                self._layer_failures.add(key)
+        finally:
+            with self._layer_mutex:
+                self._layer_builds.pop(key, None)
+
+    def _cleanup_layer_cache(self):
+        max_size = self._settings.get_int(["layerCacheSize"])
+        if not max_size or max_size <= 0:
+            return
+
+        entries = []
+        total = 0
+        for entry in os.scandir(self._layer_cache_folder):
+            if not entry.name.endswith(".json"):
+                continue
+
+            key = entry.name[: -len(".json")]
+            try:
+                size = entry.stat().st_size + os.path.getsize(self._layer_data_path(key))
+            except OSError:
+                continue
+
+            entries.append((entry.stat().st_mtime, key, size))
+            total += size
+
+        # least recently used first
+        for _, key, size in sorted(entries):
+            if total <= max_size:
+                break
+            self._logger.info(f"Removing layer data {key} from cache")
+            silent_remove(self._layer_index_path(key))
+            silent_remove(self._layer_data_path(key))
+            total -= size
+
 
 __plugin_name__ = gettext("GCode Viewer")
 __plugin_author__ = "Gina Häußge"
@@ -110,6 +366,6 @@ __plugin_disabling_discouraged__ = gettext(
 __plugin_license__ = "AGPLv3"
 __plugin_pythoncompat__ = ">=3.7,<4"
 __plugin_implementation__ = GcodeviewerPlugin()
-# __plugin_hooks__ = {
-# 	"octoprint.access.permissions": __plugin_implementation__.get_additional_permissions
-# }
+__plugin_hooks__ = {
+    "octoprint.filemanager.analysis.markers": __plugin_implementation__.get_analysis_markers
+}
@@ -0,0 +1,356 @@
+"""
+Server side preprocessing of GCODE files for the viewer.
+
+:func:`build` parses a GCODE file once into a compact binary file of line segments grouped by layer, and returns an
+index describing where each layer's segments are located within it. Instead of downloading and parsing the full GCODE
+file in the browser, the viewer fetches the index and then the byte ranges of the layers it needs.
+
+Every layer is a zlib compressed block of fixed size records of :data:`RECORD`, little endian:
+
+  * ``flags`` (uint8): a combination of :data:`FLAG_EXTRUDE`, :data:`FLAG_RETRACT`, :data:`FLAG_RESTART` and
+    :data:`FLAG_NO_XY`
+  * ``tool`` (uint8): the active tool
+  * ``speed`` (uint16): feedrate in mm/min
+  * ``x``, ``y`` (int32): end point in 1/:data:`SCALE` mm, without tool offsets
+  * ``extrusion`` (float32): extruded length in mm, negative for retractions
+  * ``offset`` (uint32): byte offset of the end of the segment's GCODE line, relative to the layer's ``base``
+
+A segment starts where the one before it ended, the first one of a layer at the layer's ``x`` and ``y``.
+Arcs get split into straight segments, moves along Z only are left out.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import math
+import re
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+FORMAT_VERSION = 1
+
+SCALE = 1000
+"""Coordinates are stored as integers in 1/SCALE mm."""
+
+RECORD = struct.Struct("<BBHiifI")
+
+FLAG_EXTRUDE = 0x01
+FLAG_RETRACT = 0x02
+FLAG_RESTART = 0x04
+FLAG_NO_XY = 0x08
+"""The segment doesn't move in X or Y, e.g. a retraction, or it just sets the position without any movement."""
+
+ARC_SEGMENT_LENGTH = 1.0
+"""Maximum length of the segments arcs get split into, in mm."""
+
+MAX_ARC_SEGMENTS = 128
+
+_INT32_MIN = -(2**31)
+_INT32_MAX = 2**31 - 1
+_UINT16_MAX = 2**16 - 1
+_UINT32_MAX = 2**32 - 1
+
+_WORD = re.compile(rb"([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+
+_MOVES = (b"G0", b"G1", b"G2", b"G3")
+
+_Record = namedtuple("_Record", "flags tool speed x y extrusion position start")
+
+
+def _quantize(value):
+    return min(max(int(round(value * SCALE)), _INT32_MIN), _INT32_MAX)
+
+
+def _arc(x0, y0, x1, y1, i, j, clockwise):
+    cx = x0 + i
+    cy = y0 + j
+    radius = math.hypot(i, j)
+
+    start = math.atan2(y0 - cy, x0 - cx)
+    sweep = math.atan2(y1 - cy, x1 - cx) - start
+    if clockwise and sweep >= 0:
+        sweep -= 2 * math.pi
+    elif not clockwise and sweep <= 0:
+        sweep += 2 * math.pi
+
+    count = min(
+        max(1, math.ceil(abs(sweep) * radius / ARC_SEGMENT_LENGTH)), MAX_ARC_SEGMENTS
+    )
+    points = [
+        (
+            cx + radius * math.cos(start + sweep * k / count),
+            cy + radius * math.sin(start + sweep * k / count),
+        )
+        for k in range(1, count)
+    ]
+    points.append((x1, y1))
+    return points
+
+
+class _LayerWriter:
+    def __init__(self, output):
+        self.output = output
+        self.layers = []
+
+        self._z = None
+        self._current = []
+        self._pending = []
+
+    def add(self, z, record):
+        if not record.flags & FLAG_EXTRUDE:
+            # travels and retractions belong to the layer of the next extrusion if they already
+            # happen at its height, otherwise to the layer before
+            self._pending.append((z, record))
+            return
+
+        if self._z is None:
+            self._z = z
+
+        if z != self._z:
+            split = len(self._pending)
+            while split and self._pending[split - 1][0] == z:
+                split -= 1
+
+            self._current += [record for _, record in self._pending[:split]]
+            self._finish()
+
+            self._z = z
+            self._current = [record for _, record in self._pending[split:]]
+        else:
+            self._current += [record for _, record in self._pending]
+
+        self._pending = []
+        self._current.append(record)
+
+    def close(self):
+        if self._pending:
+            if self._z is None:
+                self._z = self._pending[-1][0]
+            self._current += [record for _, record in self._pending]
+            self._pending = []
+        self._finish()
+
+    def _finish(self):
+        if not self._current:
+            return
+
+        first = self._current[0]
+        base = first.position
+        data = zlib.compress(
+            b"".join(
+                RECORD.pack(
+                    record.flags,
+                    record.tool,
+                    record.speed,
+                    record.x,
+                    record.y,
+                    record.extrusion,
+                    min(record.position - base, _UINT32_MAX),
+                )
+                for record in self._current
+            )
+        )
+
+        self.layers.append(
+            {
+                "z": self._z / SCALE,
+                "x": first.start[0],
+                "y": first.start[1],
+                "offset": self.output.tell(),
+                "length": len(data),
+                "count": len(self._current),
+                "base": base,
+                "empty": not any(record.flags & FLAG_EXTRUDE for record in self._current),
+            }
+        )
+        self.output.write(data)
+        self._current = []
+
+
+def build(
+    path,
+    output,
+    g90_extruder=False,
+    progress_callback=None,
+    throttle=None,
+    throttle_lines=100,
+):
+    """
+    Parses the GCODE file at ``path`` and writes its layer data to ``output``.
+
+    Arguments:
+        path (str): Path of the GCODE file, may be stored compressed
+        output: Binary file object to write the layer data to
+        g90_extruder (bool): Whether ``G90``/``G91`` also switch the extruder between absolute and relative mode
+        progress_callback (callable): Called with the progress in percent every 1000 lines
+        throttle (float): Pause every ``throttle_lines`` lines, in seconds
+
+    Returns:
+        dict: The index of the layer data
+    """
+    from octoprint.filemanager import compression
+
+    size = compression.file_size(path)
+    writer = _LayerWriter(output)
+
+    x = y = z = 0.0
+    speed = 4000.0
+    tool = 0
+    relative = relative_e = False
+    extruder = {}
+    retracted = set()
+
+    position = 0
+    last = (0, 0)
+
+    def add(flags, target, extrusion):
+        nonlocal last
+        end = (_quantize(target[0]), _quantize(target[1]))
+        writer.add(
+            _quantize(z),
+            _Record(
+                flags,
+                tool,
+                min(max(int(speed), 0), _UINT16_MAX),
+                end[0],
+                end[1],
+                extrusion,
+                position,
+                last,
+            ),
+        )
+        last = end
+
+    with compression.open_file(path) as f:
+        for line_no, line in enumerate(f):
+            position += len(line)
+
+            if progress_callback and line_no % 1000 == 0 and size:
+                progress_callback(position * 100 / size)
+            if throttle and line_no % throttle_lines == 0:
+                time.sleep(throttle)
+
+            code = line.split(b";", 1)[0].split(b"(", 1)[0].strip()
+            if not code:
+                continue
+
+            words = _WORD.findall(code.upper())
+            if not words:
+                continue
+
+            letter, number = words[0]
+            try:
+                command = letter + b"%d" % float(number)
+                params = {word: float(value) for word, value in words[1:]}
+            except ValueError:
+                continue
+
+            if command in _MOVES:
+                nx, ny = x, y
+                if b"X" in params:
+                    nx = x + params[b"X"] if relative else params[b"X"]
+                if b"Y" in params:
+                    ny = y + params[b"Y"] if relative else params[b"Y"]
+                if b"Z" in params:
+                    z = z + params[b"Z"] if relative else params[b"Z"]
+                if b"F" in params:
+                    speed = params[b"F"]
+
+                extrusion = 0.0
+                if b"E" in params:
+                    if relative or relative_e:
+                        extrusion = params[b"E"]
+                        extruder[tool] = extruder.get(tool, 0.0) + extrusion
+                    else:
+                        extrusion = params[b"E"] - extruder.get(tool, 0.0)
+                        extruder[tool] = params[b"E"]
+
+                flags = 0
+                if extrusion < 0:
+                    flags = FLAG_RETRACT
+                    retracted.add(tool)
+                elif extrusion > 0:
+                    flags = FLAG_EXTRUDE
+                    if tool in retracted:
+                        flags |= FLAG_RESTART
+                        retracted.discard(tool)
+
+                if (nx, ny) != (x, y):
+                    if command in (b"G2", b"G3") and (b"I" in params or b"J" in params):
+                        points = _arc(
+                            x,
+                            y,
+                            nx,
+                            ny,
+                            params.get(b"I", 0.0),
+                            params.get(b"J", 0.0),
+                            command == b"G2",
+                        )
+                    else:
+                        points = [(nx, ny)]
+
+                    for point in points:
+                        add(flags, point, extrusion / len(points))
+                elif extrusion:
+                    add(flags | FLAG_NO_XY, (x, y), extrusion)
+
+                x, y = nx, ny
+
+            elif command == b"G28":
+                axes = [axis for axis in (b"X", b"Y", b"Z") if axis in params]
+                if not axes:
+                    axes = [b"X", b"Y", b"Z"]
+
+                if b"Z" in axes:
+                    z = 0.0
+                nx = 0.0 if b"X" in axes else x
+                ny = 0.0 if b"Y" in axes else y
+                if (nx, ny) != (x, y):
+                    add(0, (nx, ny), 0.0)
+                x, y = nx, ny
+
+            elif command == b"G92":
+                if not params:
+                    x = y = z = 0.0
+                    extruder[tool] = 0.0
+                else:
+                    x = params.get(b"X", x)
+                    y = params.get(b"Y", y)
+                    z = params.get(b"Z", z)
+                    if b"E" in params:
+                        extruder[tool] = params[b"E"]
+
+                if (_quantize(x), _quantize(y)) != last:
+                    # no movement, just a new position to continue from
+                    add(FLAG_NO_XY, (x, y), 0.0)
+
+            elif command == b"G90":
+                relative = False
+                if g90_extruder:
+                    relative_e = False
+
+            elif command == b"G91":
+                relative = True
+                if g90_extruder:
+                    relative_e = True
+
+            elif command == b"M82":
+                relative_e = False
+
+            elif command == b"M83":
+                relative_e = True
+
+            elif letter == b"T":
+                tool = min(int(float(number)), 255)
+
+    writer.close()
+
+    return {
+        "version": FORMAT_VERSION,
+        "scale": SCALE,
+        "recordSize": RECORD.size,
+        "size": size,
+        "layers": writer.layers,
+    }
@@ -16,6 +16,14 @@ $(function () {
         self.ui_progress_text = ko.pureComputed(function () {
             var text = "";
             switch (self.ui_progress_type()) {
+                case "preparing": {
+                    text =
+                        gettext("Preparing...") +
+                        " (" +
+                        self.ui_progress_percentage().toFixed(0) +
+                        "%)";
+                    break;
+                }
                 case "parsing": {
                     text =
                         gettext("Parsing...") +
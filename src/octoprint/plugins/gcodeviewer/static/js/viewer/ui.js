@@ -89,6 +89,10 @@ GCODE.ui = (function () {
             case "analyzeProgress":
                 setProgress("analyzing", 50 + data.msg.progress / 2);
                 break;
+
+            case "preprocessProgress":
+                setProgress("preparing", data.msg.progress);
+                break;
         }
     };
 
@@ -53,6 +53,15 @@ var percentageByLayer = [];
 var mustCompress = false;
 var skipUntil = null;
 var skipUntilPresent = false;
+var skipUntilOffset = undefined;
+
+// layer data preprocessed by the server, see the plugin's layers.py
+var LAYER_DATA_VERSION = 1;
+var LAYER_DATA_BATCH_SIZE = 1024 * 1024;
+var LAYER_FLAG_EXTRUDE = 0x01;
+var LAYER_FLAG_RETRACT = 0x02;
+var LAYER_FLAG_RESTART = 0x04;
+var LAYER_FLAG_NO_XY = 0x08;
 
 importScripts("../lib/pako.js");
 
@@ -464,18 +473,6 @@ var doParse = async function () {
 
     var i, j, args;
 
-    // if skipUntil is set, get skipUntilPresent
-    skipUntilPresent = false;
-    if (skipUntil !== undefined && skipUntil !== "") {
-        result = await fetch(
-            baseUrl + "/plugin/gcodeviewer/skipuntilcheck/local/" + path
-        );
-        if (result.ok) {
-            response = await result.json();
-            skipUntilPresent = response.present;
-        }
-    }
-
     model = [];
     for await (let [line, percentage] of gCodeLineGenerator(url)) {
         x = undefined;
@@ -873,6 +870,167 @@ var doParse = async function () {
     sendLayersToParent(sendMultiLayer, 100);
 };
 
+var encodedPath = function () {
+    return path.split("/").map(encodeURIComponent).join("/");
+};
+
+var checkSkipUntil = async function () {
+    // if skipUntil is set, get skipUntilPresent and, if known, the offset of its line
+    skipUntilPresent = false;
+    skipUntilOffset = undefined;
+    if (skipUntil !== undefined && skipUntil !== null && skipUntil !== "") {
+        var result = await fetch(
+            baseUrl + "/plugin/gcodeviewer/skipuntilcheck/local/" + encodedPath()
+        );
+        if (result.ok) {
+            var response = await result.json();
+            skipUntilPresent = response.present;
+            if (response.present && response.offset !== undefined) {
+                skipUntilOffset = response.offset;
+            }
+        }
+    }
+};
+
+var fetchLayerIndex = async function () {
+    var indexUrl = baseUrl + "/plugin/gcodeviewer/layers/local/" + encodedPath();
+
+    for (;;) {
+        var response = await fetch(indexUrl);
+        if (response.status === 202) {
+            // the server is still preprocessing the file
+            var status = await response.json();
+            self.postMessage({
+                cmd: "preprocessProgress",
+                msg: {progress: status.progress}
+            });
+            await new Promise(function (resolve) {
+                setTimeout(resolve, 1000);
+            });
+            continue;
+        }
+
+        if (!response.ok) return undefined;
+
+        var index = await response.json();
+        if (index.version !== LAYER_DATA_VERSION) return undefined;
+        return index;
+    }
+};
+
+var decodeLayer = function (index, layer, data) {
+    var bytes = pako.inflate(data);
+    var view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    var scale = index.scale;
+
+    var cmds = [];
+    var x = layer.x,
+        y = layer.y;
+    for (var i = 0; i < layer.count; i++) {
+        var o = i * index.recordSize;
+        var flags = view.getUint8(o);
+        var tool = view.getUint8(o + 1);
+        var speed = view.getUint16(o + 2, true);
+        var prevX = x,
+            prevY = y;
+        x = view.getInt32(o + 4, true);
+        y = view.getInt32(o + 8, true);
+        var extrusion = view.getFloat32(o + 12, true);
+        var offset = layer.base + view.getUint32(o + 16, true);
+
+        // everything up to and including the skipUntil line is hidden
+        if (skipUntilPresent && offset <= skipUntilOffset) continue;
+
+        var noXY = flags & LAYER_FLAG_NO_XY;
+        var retract =
+            flags & LAYER_FLAG_RETRACT ? -1 : flags & LAYER_FLAG_RESTART ? 1 : 0;
+        var extrude = !!(flags & LAYER_FLAG_EXTRUDE);
+
+        // a position change without any movement
+        if (noXY && !extrude && !retract) continue;
+
+        var toolOffset = toolOffsets[tool] || {x: 0, y: 0};
+        cmds.push({
+            x: noXY ? undefined : x / scale + toolOffset.x,
+            y: noXY ? undefined : y / scale + toolOffset.y,
+            z: undefined,
+            extrude: extrude,
+            retract: retract,
+            noMove: false,
+            extrusion: extrusion,
+            prevX: prevX / scale + toolOffset.x,
+            prevY: prevY / scale + toolOffset.y,
+            prevZ: layer.z,
+            speed: speed,
+            percentage: index.size ? (offset * 100) / index.size : 100,
+            tool: tool
+        });
+    }
+    return cmds;
+};
+
+var loadLayerData = async function () {
+    // without the offset of the skipUntil line we can't tell which segments to hide
+    if (skipUntilPresent && skipUntilOffset === undefined) return false;
+
+    var index = await fetchLayerIndex();
+    if (!index) return false;
+
+    var layers = index.layers;
+    var total = 0;
+    if (layers.length > 0) {
+        total = layers[layers.length - 1].offset + layers[layers.length - 1].length;
+    }
+
+    model = [];
+    var first = 0;
+    while (first < layers.length) {
+        // fetch as many consecutive layers as fit into one batch with a single range request
+        var start = layers[first].offset;
+        var last = first;
+        while (
+            last + 1 < layers.length &&
+            layers[last + 1].offset + layers[last + 1].length - start <=
+                LAYER_DATA_BATCH_SIZE
+        ) {
+            last++;
+        }
+        var end = layers[last].offset + layers[last].length;
+
+        var response = await fetch(index.data, {
+            headers: {Range: "bytes=" + start + "-" + (end - 1)}
+        });
+        if (!response.ok) {
+            throw new Error("Could not fetch layer data: " + response.status);
+        }
+        var buffer = await response.arrayBuffer();
+
+        // the server might have ignored the range and sent everything
+        var shift = response.status === 206 ? start : 0;
+
+        var loaded = [];
+        for (var l = first; l <= last; l++) {
+            var layer = layers[l];
+            var cmds = decodeLayer(
+                index,
+                layer,
+                new Uint8Array(buffer, layer.offset - shift, layer.length)
+            );
+            if (cmds.length > 0) {
+                model[l] = cmds;
+                loaded.push(l);
+            }
+        }
+        if (loaded.length > 0) {
+            sendLayersToParent(loaded, (100 * end) / total);
+        }
+
+        first = last + 1;
+    }
+
+    return true;
+};
+
 var parseGCode = async function (message) {
     url = message.url;
     path = message.path;
@@ -886,7 +1044,10 @@ var parseGCode = async function (message) {
     mustCompress = message.options.compress;
     skipUntil = message.skipUntil;
 
-    await doParse();
+    await checkSkipUntil();
+    if (!(await loadLayerData())) {
+        await doParse();
+    }
     self.postMessage({
         cmd: "returnModel",
         msg: {}
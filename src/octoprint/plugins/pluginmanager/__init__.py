@@ -624,6 +624,16 @@ class PluginManagerPlugin(
 
     ##~~ EventHandlerPlugin
 
+    def get_event_subscriptions(self):
+        return [
+            Events.PRINT_STARTED,
+            Events.PRINT_DONE,
+            Events.PRINT_FAILED,
+            Events.MOVIE_DONE,
+            Events.USER_LOGGED_IN,
+            Events.CONNECTIVITY_CHANGED,
+        ]
+
     def on_event(self, event, payload):
         from octoprint.events import Events
 
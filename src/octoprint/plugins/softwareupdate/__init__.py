@@ -1544,6 +1544,17 @@ class SoftwareUpdatePlugin(
 
     ##~~ EventHandlerPlugin API
 
+    def get_event_subscriptions(self):
+        from octoprint.events import Events
+
+        return [
+            Events.PRINT_STARTED,
+            Events.PRINT_DONE,
+            Events.PRINT_FAILED,
+            Events.MOVIE_DONE,
+            Events.CONNECTIVITY_CHANGED,
+        ]
+
     def on_event(self, event, payload):
         from octoprint.events import Events
 
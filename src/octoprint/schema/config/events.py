@@ -2,7 +2,7 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2022 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from octoprint.schema import BaseModel
 from octoprint.vendor.with_attrs_docs import with_attrs_docs
@@ -34,6 +34,18 @@ class EventSubscription(BaseModel):
     """If set to `true`, OctoPrint will log the command after performing all placeholder replacements."""
 
 
+@with_attrs_docs
+class EventBridgeConfig(BaseModel):
+    enabled: bool = False
+    """Whether to publish all events to local out-of-process subscribers over a Unix domain socket."""
+
+    socket: Optional[str] = None
+    """Path of the Unix domain socket to listen on. Defaults to `eventbridge.sock` in OctoPrint's data folder."""
+
+    maxBuffer: int = 1024 * 1024
+    """Maximum number of bytes to buffer for a subscriber before disconnecting it as too slow."""
+
+
 @with_attrs_docs
 class EventsConfig(BaseModel):
     enabled: bool = True
@@ -41,3 +53,9 @@ class EventsConfig(BaseModel):
 
     subscriptions: List[EventSubscription] = []
     """A list of event subscriptions."""
+
+    coalesce: Dict[str, float] = {}
+    """Coalescing windows in seconds per event name. An event with a window is delivered at most once per window, with bursts within the window merged into one delivery carrying the latest payload."""
+
+    bridge: EventBridgeConfig = EventBridgeConfig()
+    """Configuration of the event bridge for out-of-process subscribers."""
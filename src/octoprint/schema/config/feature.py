@@ -1,12 +1,18 @@
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2022 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+from enum import Enum
 from typing import List
 
 from octoprint.schema import BaseModel
 from octoprint.vendor.with_attrs_docs import with_attrs_docs
 
 
+class MetadataBackendEnum(str, Enum):
+    json = "json"
+    sqlite = "sqlite"
+
+
 @with_attrs_docs
 class FeatureConfig(BaseModel):
     temperatureGraph: bool = True
@@ -21,6 +27,24 @@ class FeatureConfig(BaseModel):
     pollWatched: bool = False
     """Whether to actively poll the watched folder (true) or to rely on the OS's file system notifications instead (false)."""
 
+    watchUploads: bool = True
+    """Whether to watch the uploads folder for changes (true), so file listings only need to check changed folders, or to check the whole folder tree on every listing instead (false)."""
+
+    pollUploads: bool = False
+    """Whether to actively poll the uploads folder for changes (true) or to rely on the OS's file system notifications instead (false). Polling walks the whole folder tree every 10 seconds, so it is not used automatically if notifications are unavailable, the whole folder tree gets checked on every listing then instead."""
+
+    metadataBackend: MetadataBackendEnum = MetadataBackendEnum.sqlite
+    """Where to store the metadata of uploaded files, `sqlite` for a single database `.metadata.db` in the uploads folder, `json` for `.metadata.json` files in every folder. Existing `.metadata.json` files get imported into the database on first access."""
+
+    metadataFlushInterval: float = 0
+    """Seconds to keep changes to the metadata of uploaded files in memory before writing them to the metadata backend, 0 to write them right away. Changes are still appended to a small journal `.metadata.journal` in the uploads folder right away and synced to disk within a second, the journal gets replayed on the next start if the server didn't get to write them. Reduces writes to flash storage if plugins update file metadata frequently."""
+
+    deduplicateUploads: bool = False
+    """Whether to store the content of uploaded files only once, no matter how many copies of a file exist (true) or not (false). Copies are hardlinks to a shared blob in the hidden `.blobs` folder within the uploads folder and share their analysis. Requires a file system with hardlink support, and anything modifying an uploaded file in place modifies all its copies."""
+
+    compressUploads: bool = False
+    """Whether to store uploaded GCODE files gzip compressed (true) or not (false). Compressed files are decompressed on the fly for printing, analysis and downloads. Plugins reading uploaded files directly from disk need to support this."""
+
     modelSizeDetection: bool = True
     """Whether to enable model size detection and warning (true) or not (false)."""
 
@@ -2,6 +2,7 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2022 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 from enum import Enum
+from typing import List
 
 from octoprint.schema import BaseModel
 from octoprint.vendor.with_attrs_docs import with_attrs_docs
@@ -32,3 +33,6 @@ class GcodeAnalysisConfig(BaseModel):
 
     bedZ: float = 0.0
     """Z position considered the location of the bed."""
+
+    markers: List[str] = []
+    """Strings to record the first byte offset of during analysis, for fast lookups without scanning the file again."""
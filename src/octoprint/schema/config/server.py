@@ -12,6 +12,7 @@ CONST_1GB = 1024 * 1024 * 1024
 CONST_500MB = 500 * 1024 * 1024
 CONST_200MB = 200 * 1024 * 1024
 CONST_100KB = 100 * 1024
+CONST_512MB = 512 * 1024 * 1024
 
 
 @with_attrs_docs
@@ -57,6 +58,15 @@ class UploadsConfig(BaseModel):
     pathSuffix: str = "path"
     """Suffix used for storing the path to the temporary file in the file upload headers when streaming uploads."""
 
+    chunkSize: int = 4 * 1024 * 1024
+    """Maximum size of the chunks of resumable uploads in bytes, defaults to 4MB."""
+
+    resumableTimeout: int = 24 * 60 * 60
+    """Time in seconds after which idle resumable uploads get discarded, defaults to one day."""
+
+    resumableMaxPerUser: int = 5
+    """Maximum number of resumable uploads a user may have in progress at the same time."""
+
 
 @with_attrs_docs
 class CommandsConfig(BaseModel):
@@ -148,6 +158,48 @@ class CookiesConfig(BaseModel):
     """`SameSite` setting to use on the cookies. Possible values are `None`, `Lax` and `Strict`. Defaults to `Lax`. Be advised that if forced unset, this has security implications as many browsers now default to `Lax` unless you configure cookies to be set with `Secure` flag set, explicitly set `SameSite` setting here and also serve OctoPrint over https. The `Lax` setting is known to cause with embedding OctoPrint in frames. See also ["Feature: Cookies default to SameSite=Lax"](https://www.chromestatus.com/feature/5088147346030592), ["Feature: Reject insecure SameSite=None cookies"](https://www.chromestatus.com/feature/5633521622188032) and [issue #3482](https://github.com/OctoPrint/OctoPrint/issues/3482)."""
 
 
+@with_attrs_docs
+class PushCompressionConfig(BaseModel):
+    level: int = 1
+    """Compression level to use for the permessage-deflate websocket extension, 0 to 9. Higher values compress better but need more CPU time, e.g. level 6 with `memLevel` 6 for clients on slow connections to a server with CPU to spare."""
+
+    memLevel: int = 1
+    """Memory level to use for the permessage-deflate websocket extension, 1 to 9. Higher values compress better but need more memory per connection."""
+
+    windowBits: Optional[int] = None
+    """Maximum size of the compression window of the permessage-deflate websocket extension as a power of two, 9 to 15. Higher values compress better but need more memory per connection. Unset to use whatever the client offers."""
+
+
+@with_attrs_docs
+class PushConfig(BaseModel):
+    sendQueueLimit: int = 5 * 1024 * 1024
+    """Maximum number of bytes to queue for a push session that can't keep up before closing it, 0 for no limit. Defaults to 5MB."""
+
+    replaceQueued: List[str] = ["current"]
+    """Message types of which only the latest will be kept in the send queue of a push session that can't keep up. Note that replaced `current` messages also drop the temperature and log lines they carried."""
+
+    binary: bool = True
+    """Whether clients connected through the raw websocket endpoint may negotiate binary MessagePack encoded `current` and `history` messages."""
+
+    compression: PushCompressionConfig = PushCompressionConfig()
+    """Settings for the compression of websocket push connections."""
+
+
+@with_attrs_docs
+class DownloadsConfig(BaseModel):
+    sendfile: bool = True
+    """Whether to send file downloads directly from disk to the network connection via `sendfile` where supported by the platform. Not available for SSL connections."""
+
+    precompress: bool = True
+    """Whether to keep gzip compressed copies of compressible downloads like GCODE files and logs, to send to clients that accept gzip encoding instead of the full files."""
+
+    precompressCacheSize: int = CONST_512MB
+    """Maximum size of all compressed copies in bytes, least recently used ones get removed first."""
+
+    bundleThreads: Optional[int] = None
+    """Number of threads to compress zip bundles of logs, timelapses and system info with. Defaults to the number of CPU cores, but at most 4."""
+
+
 @with_attrs_docs
 class ServerConfig(BaseModel):
     host: Optional[str] = None
@@ -205,5 +257,11 @@ class ServerConfig(BaseModel):
     cookies: CookiesConfig = CookiesConfig()
     """Settings for further configuration of the cookies that OctoPrint sets (login, remember me, ...)."""
 
+    push: PushConfig = PushConfig()
+    """Configuration of the push socket."""
+
+    downloads: DownloadsConfig = DownloadsConfig()
+    """Configuration of file downloads."""
+
     allowedLoginRedirectPaths: List[str] = []
     """List of paths that are allowed to be used as redirect targets for the login page, in addition to the default ones (`/`, `/recovery/` and `/plugin/appkeys/auth/`)"""
@@ -380,7 +380,17 @@ class Server:
         # monkey patch/fix some stuff
         util.tornado.fix_json_encode()
         util.tornado.fix_websocket_check_origin()
-        util.tornado.enable_per_message_deflate_extension()
+        util.tornado.enable_per_message_deflate_extension(
+            compression_level=self._settings.getInt(
+                ["server", "push", "compression", "level"]
+            ),
+            mem_level=self._settings.getInt(
+                ["server", "push", "compression", "memLevel"]
+            ),
+            window_bits=self._settings.getInt(
+                ["server", "push", "compression", "windowBits"]
+            ),
+        )
         util.tornado.fix_tornado_xheader_handling()
 
         self._setup_mimetypes()
@@ -452,6 +462,14 @@ class Server:
             really_universal=self._settings.getBoolean(
                 ["feature", "enforceReallyUniversalFilenames"]
             ),
+            watch=self._settings.getBoolean(["feature", "watchUploads"]),
+            force_polling=self._settings.getBoolean(["feature", "pollUploads"]),
+            metadata_backend=self._settings.get(["feature", "metadataBackend"]),
+            deduplicate=self._settings.getBoolean(["feature", "deduplicateUploads"]),
+            compress=self._settings.getBoolean(["feature", "compressUploads"]),
+            metadata_flush_interval=self._settings.getFloat(
+                ["feature", "metadataFlushInterval"]
+            ),
         )
 
         fileManager = octoprint.filemanager.FileManager(
@@ -483,7 +501,44 @@ class Server:
         connectivityChecker = self._connectivity_checker
         environmentDetector = self._environment_detector
 
+        eventManager.set_coalescing_windows(self._settings.get(["events", "coalesce"]))
+
+        eventBridge = None
+        if self._settings.getBoolean(["events", "bridge", "enabled"]):
+            from octoprint.server.util.eventbridge import EventBridge, is_supported
+
+            if is_supported():
+                eventBridgePath = self._settings.get(["events", "bridge", "socket"])
+                if not eventBridgePath:
+                    eventBridgePath = os.path.join(
+                        self._settings.getBaseFolder("data"), "eventbridge.sock"
+                    )
+
+                try:
+                    eventBridge = EventBridge(
+                        eventBridgePath,
+                        event_manager=eventManager,
+                        max_buffer=self._settings.getInt(
+                            ["events", "bridge", "maxBuffer"]
+                        ),
+                    )
+                    eventBridge.start()
+                except Exception:
+                    self._logger.exception(
+                        f"Could not start event bridge on {eventBridgePath}"
+                    )
+                    eventBridge = None
+            else:
+                self._logger.warning(
+                    "Event bridge is enabled but Unix domain sockets are not supported on this platform"
+                )
+
         def on_settings_update(*args, **kwargs):
+            # make sure our event manager coalesces according to the latest settings
+            eventManager.set_coalescing_windows(
+                self._settings.get(["events", "coalesce"])
+            )
+
             # make sure our connectivity checker runs with the latest settings
             connectivityEnabled = self._settings.getBoolean(
                 ["server", "onlineCheck", "enabled"]
@@ -677,6 +732,11 @@ class Server:
         # register API blueprint
         self._setup_blueprints()
 
+        # invalidate cached API responses right when their events get fired
+        eventManager.subscribe(
+            events.ALL_EVENTS, util.flask.on_cache_invalidation_event, immediate=True
+        )
+
         ## Tornado initialization starts here
 
         ioloop = IOLoop.current()
@@ -691,6 +751,13 @@ class Server:
                 "websocket_allow_origin": "*" if enable_cors else "",
                 "jsessionid": False,
                 "sockjs_url": "../../static/js/lib/sockjs.min.js",
+                "send_queue_limit": self._settings.getInt(
+                    ["server", "push", "sendQueueLimit"]
+                )
+                or None,
+                "send_queue_replace": self._settings.get(
+                    ["server", "push", "replaceQueued"]
+                ),
             },
         )
 
@@ -709,7 +776,27 @@ class Server:
             if metadata and "display" in metadata:
                 return metadata["display"]
 
-        download_handler_kwargs = {"as_attachment": True, "allow_client_caching": False}
+        download_handler_kwargs = {
+            "as_attachment": True,
+            "allow_client_caching": False,
+            "sendfile": self._settings.getBoolean(["server", "downloads", "sendfile"]),
+        }
+
+        precompressed_cache = None
+        if self._settings.getBoolean(["server", "downloads", "precompress"]):
+            from octoprint.server.util.precompressed import PrecompressedCache
+
+            precompressed_cache = PrecompressedCache(
+                os.path.join(self._settings.getBaseFolder("generated"), "precompressed"),
+                max_size=self._settings.getInt(
+                    ["server", "downloads", "precompressCacheSize"]
+                ),
+            )
+        precompressed_kwargs = {"precompressed_cache": precompressed_cache}
+
+        from octoprint.util.zip import get_executor
+
+        get_executor(self._settings.getInt(["server", "downloads", "bundleThreads"]))
 
         additional_mime_types = {"mime_type_guesser": mime_type_guesser}
 
@@ -866,6 +953,7 @@ class Server:
                     {
                         "as_attachment": True,
                         "attachment_name": "octoprint-timelapses.zip",
+                        "compress": True,
                         "path_processor": lambda x: (
                             x,
                             os.path.join(self._settings.getBaseFolder("timelapse"), x),
@@ -884,9 +972,11 @@ class Server:
                         "path": self._settings.getBaseFolder("uploads"),
                         "as_attachment": True,
                         "name_generator": download_name_generator,
+                        "decompress": True,
                     },
                     download_permission_validator,
                     download_handler_kwargs,
+                    precompressed_kwargs,
                     no_hidden_files_validator,
                     only_known_types_validator,
                     additional_mime_types,
@@ -903,6 +993,7 @@ class Server:
                         "stream_body": True,
                     },
                     download_handler_kwargs,
+                    precompressed_kwargs,
                     log_permission_validator,
                     log_path_validator,
                 ),
@@ -915,6 +1006,7 @@ class Server:
                     {
                         "as_attachment": True,
                         "attachment_name": "octoprint-logs.zip",
+                        "compress": True,
                         "path_processor": lambda x: (
                             x,
                             os.path.join(self._settings.getBaseFolder("logs"), x),
@@ -1021,25 +1113,83 @@ class Server:
 
         from concurrent.futures import ThreadPoolExecutor
 
+        fallback_kwargs = {
+            "fallback": util.tornado.WsgiInputContainer(
+                app.wsgi_app,
+                executor=ThreadPoolExecutor(thread_name_prefix="WsgiRequestHandler"),
+                headers=headers,
+                removed_headers=removed_headers,
+            ),
+            "file_prefix": "octoprint-file-upload-",
+            "file_suffix": ".tmp",
+            "suffixes": upload_suffixes,
+        }
+
+        # frequently polled read-only API endpoints, served natively unless plugins
+        # hook into the API's request handling
+        if not pluginManager.get_hooks(
+            "octoprint.server.api.before_request"
+        ) and not pluginManager.get_hooks("octoprint.server.api.after_request"):
+            from octoprint.server.api.connection import get_connection_state
+            from octoprint.server.api.job import get_job_state
+            from octoprint.server.api.printer import get_printer_state
+
+            # the connection options enumerate the serial ports, which involves
+            # globbing and plugin hooks, so that one isn't built on the IOLoop
+            native_api_endpoints = [
+                (r"/api/job", lambda values: get_job_state(), False),
+                (r"/api/printer", get_printer_state, False),
+                (r"/api/connection", lambda values: get_connection_state(), True),
+            ]
+            for route, payload, blocking in native_api_endpoints:
+                server_routes.append(
+                    (
+                        route,
+                        util.tornado.NativeApiHandler,
+                        joined_dict(
+                            fallback_kwargs,
+                            {
+                                "app": app,
+                                "payload": payload,
+                                "permission": permissions.Permissions.STATUS,
+                                "blocking": blocking,
+                            },
+                        ),
+                    )
+                )
+        else:
+            self._logger.info(
+                "Plugins hook into API requests, serving all API endpoints through Flask"
+            )
+
+        def upload_ingest(filename, handle):
+            import octoprint.filemanager.util
+
+            return octoprint.filemanager.util.UploadIngest(
+                handle,
+                slicer=octoprint.filemanager.valid_file_type(filename, type="gcode"),
+            )
+
+        # file uploads get received right into the local storage's staging folder, hashed
+        # and inspected on the fly, so adding them is a mere rename without another read
         server_routes.append(
             (
-                r".*",
+                r"/api/files/[^/]+",
                 util.tornado.UploadStorageFallbackHandler,
-                {
-                    "fallback": util.tornado.WsgiInputContainer(
-                        app.wsgi_app,
-                        executor=ThreadPoolExecutor(
-                            thread_name_prefix="WsgiRequestHandler"
-                        ),
-                        headers=headers,
-                        removed_headers=removed_headers,
-                    ),
-                    "file_prefix": "octoprint-file-upload-",
-                    "file_suffix": ".tmp",
-                    "suffixes": upload_suffixes,
-                },
+                joined_dict(
+                    fallback_kwargs,
+                    {
+                        "path": storage_managers[
+                            octoprint.filemanager.FileDestinations.LOCAL
+                        ].staging_folder,
+                        "ingest": upload_ingest,
+                    },
+                ),
             )
         )
+        server_routes.append(
+            (r".*", util.tornado.UploadStorageFallbackHandler, fallback_kwargs)
+        )
 
         transforms = [
             util.tornado.GlobalHeaderTransform.for_headers(
@@ -1056,6 +1206,11 @@ class Server:
                 r"/api/files/([^/]*)",
                 self._settings.getInt(["server", "uploads", "maxSize"]),
             ),
+            (
+                "PUT",
+                r"/api/files/uploads/",
+                self._settings.getInt(["server", "uploads", "chunkSize"]),
+            ),
             ("POST", r"/api/languages", 5 * 1024 * 1024),
         ]
 
@@ -1351,6 +1506,12 @@ class Server:
                     )
                 )
 
+            if eventBridge is not None:
+                eventBridge.stop()
+
+            # plugins and event handlers might have changed file metadata until now
+            fileManager.close()
+
             if self._octoprint_daemon is not None:
                 self._logger.info("Cleaning up daemon pidfile")
                 self._octoprint_daemon.terminated()
@@ -14,6 +14,10 @@ from octoprint.settings import settings
 @api.route("/connection", methods=["GET"])
 @Permissions.STATUS.require(403)
 def connectionState():
+    return jsonify(get_connection_state())
+
+
+def get_connection_state():
     state, port, baudrate, printer_profile = printer.get_current_connection()
     current = {
         "state": state,
@@ -24,7 +28,7 @@ def connectionState():
         else "_default",
     }
 
-    return jsonify({"current": current, "options": _get_options()})
+    return {"current": current, "options": _get_options()}
 
 
 @api.route("/connection", methods=["POST"])
@@ -10,6 +10,7 @@ from urllib.parse import quote as urlquote
 
 import psutil
 from flask import abort, jsonify, make_response, request, url_for
+from werkzeug.exceptions import HTTPException
 
 import octoprint.filemanager
 import octoprint.filemanager.storage
@@ -18,6 +19,23 @@ import octoprint.slicing
 from octoprint.access.permissions import Permissions
 from octoprint.events import Events
 from octoprint.filemanager.destinations import FileDestinations
+from octoprint.filemanager.listing import (
+    PRINT_FILTERS,
+    SORT_FIELDS,
+    SORT_ORDERS,
+    ListingIndex,
+    paginate,
+    print_summary,
+)
+from octoprint.filemanager.resumable import (
+    IncompleteUpload,
+    InsufficientStorage,
+    InvalidChunk,
+    ResumableUploadManager,
+    TooManyUploads,
+    UnknownUpload,
+)
+from octoprint.filemanager.search import InvalidQuery
 from octoprint.filemanager.storage import StorageError
 from octoprint.server import (
     NO_CONTENT,
@@ -29,7 +47,9 @@ from octoprint.server import (
 )
 from octoprint.server.api import api
 from octoprint.server.util.flask import (
+    cached_api_response,
     get_json_command_from_request,
+    make_api_error,
     no_firstrun_access,
     with_revalidation_checking,
 )
@@ -95,7 +115,36 @@ def _create_lastmodified(path, recursive):
             return None
 
 
-def _create_etag(path, filter, recursive, lm=None):
+def _create_watched_lastmodified(path):
+    # Watched storages know their last modification without walking the folder tree, and
+    # might have been changed externally without that having been reported yet. All others
+    # rely on the cache being invalidated by events.
+    path = path[len("/api/files") :].strip("/")
+    storage, _, path_in_storage = path.partition("/")
+    storages = [storage] if storage else fileManager.registered_storages
+
+    lms = []
+    for storage in storages:
+        if not fileManager.is_watched(storage):
+            continue
+
+        try:
+            lms.append(
+                fileManager.last_modified(
+                    storage, path=path_in_storage or None, recursive=True
+                )
+            )
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "There was an error retrieving the last modified data from storage {}".format(
+                    storage
+                )
+            )
+            lms.append(None)
+    return tuple(lms)
+
+
+def _create_etag(path, filter, recursive, lm=None, paging=None, markers=False):
     if lm is None:
         lm = _create_lastmodified(path, recursive)
 
@@ -111,6 +160,10 @@ def _create_etag(path, filter, recursive, lm=None):
     hash_update(str(lm))
     hash_update(str(filter))
     hash_update(str(recursive))
+    if paging:
+        hash_update(repr(sorted(paging.items())))
+    if markers:
+        hash_update("markers")
 
     path = path[len("/api/files") :]
     if path.startswith("/"):
@@ -130,26 +183,112 @@ def _create_etag(path, filter, recursive, lm=None):
     return hash.hexdigest()
 
 
+_PAGING_PARAMS = ("limit", "cursor", "sort", "order", "path", "prints", "q")
+
+
+_SEARCH_DEFAULT_LIMIT = 100
+
+
+def _get_paging_args():
+    """
+    Returns the validated paging arguments of the current request, or None if the
+    request doesn't ask for a paginated listing.
+    """
+    if not any(param in request.values for param in _PAGING_PARAMS):
+        return None
+
+    limit = request.values.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(400, description="limit must be a positive integer")
+        if limit < 1:
+            abort(400, description="limit must be a positive integer")
+
+    sort = request.values.get("sort", "name")
+    if sort not in SORT_FIELDS:
+        abort(400, description="sort must be one of " + ", ".join(SORT_FIELDS))
+
+    order = request.values.get("order")
+    if order is not None and order not in SORT_ORDERS:
+        abort(400, description="order must be one of " + ", ".join(SORT_ORDERS))
+
+    prints = request.values.get("prints")
+    if prints is not None and prints not in PRINT_FILTERS:
+        abort(400, description="prints must be one of " + ", ".join(PRINT_FILTERS))
+
+    return {
+        "limit": limit,
+        "cursor": request.values.get("cursor"),
+        "sort": sort,
+        "order": order,
+        "path": request.values.get("path"),
+        "prints": prints,
+        "query": request.values.get("q"),
+    }
+
+
+def _bypass_cache():
+    return request.values.get("force", False) or request.values.get("_refresh", False)
+
+
+_cached_file_listing = cached_api_response(
+    "files",
+    [
+        Events.UPDATED_FILES,
+        Events.FILE_ADDED,
+        Events.FILE_MOVED,
+        Events.FILE_REMOVED,
+        Events.FOLDER_ADDED,
+        Events.FOLDER_MOVED,
+        Events.FOLDER_REMOVED,
+        Events.METADATA_ANALYSIS_FINISHED,
+        Events.METADATA_STATISTICS_UPDATED,
+    ],
+    unless=_bypass_cache,
+    key_values=lambda: (
+        printer.is_sd_ready(),
+        _create_watched_lastmodified(request.path),
+    ),
+)
+
+
 @api.route("/files", methods=["GET"])
 @Permissions.FILES_LIST.require(403)
+@_cached_file_listing
 @with_revalidation_checking(
     etag_factory=lambda lm=None: _create_etag(
         request.path,
         request.values.get("filter", False),
         request.values.get("recursive", False),
         lm=lm,
+        paging=_get_paging_args(),
     ),
     lastmodified_factory=lambda: _create_lastmodified(
         request.path, request.values.get("recursive", False)
     ),
-    unless=lambda: request.values.get("force", False)
-    or request.values.get("_refresh", False),
+    unless=_bypass_cache,
 )
 def readGcodeFiles():
     filter = request.values.get("filter", False)
     recursive = request.values.get("recursive", "false") in valid_boolean_trues
     force = request.values.get("force", "false") in valid_boolean_trues
 
+    paging = _get_paging_args()
+    if paging is not None:
+        files, next_cursor = _getFilePage(
+            [FileDestinations.LOCAL, FileDestinations.SDCARD],
+            filter=filter,
+            recursive=recursive,
+            allow_from_cache=not force,
+            **paging,
+        )
+        usage = psutil.disk_usage(
+            settings().getBaseFolder("uploads", check_writable=False)
+        )
+        return jsonify(files=files, next=next_cursor, free=usage.free, total=usage.total)
+
     files = _getFileList(
         FileDestinations.LOCAL,
         filter=filter,
@@ -215,20 +354,217 @@ def runFilesTest():
             return jsonify(exists=False)
 
 
+@api.route("/files/search", methods=["GET"])
+@Permissions.FILES_LIST.require(403)
+def searchFiles():
+    query = request.values.get("q")
+    if not query:
+        abort(400, description="q is required")
+
+    limit = request.values.get("limit", _SEARCH_DEFAULT_LIMIT)
+    try:
+        limit = int(limit)
+    except ValueError:
+        abort(400, description="limit must be a positive integer")
+    if limit < 1:
+        abort(400, description="limit must be a positive integer")
+
+    force = request.values.get("force", "false") in valid_boolean_trues
+
+    try:
+        total, nodes = fileManager.search_files(
+            FileDestinations.LOCAL, query, limit=limit, force_refresh=force
+        )
+    except InvalidQuery as e:
+        abort(400, description=str(e))
+
+    # PERF: Only retrieve the extension tree once
+    extension_tree = octoprint.filemanager.full_extension_tree()
+
+    files = []
+    for node in nodes:
+        parent = node["path"].rpartition("/")[0]
+        files += _analyse_local_files(
+            [node], extension_tree, path=parent + "/" if parent else ""
+        )
+    return jsonify(files=files, total=total)
+
+
+_resumable_uploads = None
+_resumable_uploads_mutex = threading.Lock()
+
+
+def _get_resumable_uploads():
+    global _resumable_uploads
+
+    with _resumable_uploads_mutex:
+        if _resumable_uploads is None:
+            _resumable_uploads = ResumableUploadManager(
+                fileManager.staging_folder(FileDestinations.LOCAL),
+                chunk_size=settings().getInt(["server", "uploads", "chunkSize"]),
+                max_size=settings().getInt(["server", "uploads", "maxSize"]),
+                timeout=settings().getInt(["server", "uploads", "resumableTimeout"]),
+                max_uploads=settings().getInt(
+                    ["server", "uploads", "resumableMaxPerUser"]
+                ),
+            )
+        return _resumable_uploads
+
+
+def _get_resumable_upload(upload_id):
+    try:
+        return _get_resumable_uploads().get(upload_id, owner=current_user.get_name())
+    except UnknownUpload:
+        abort(404)
+
+
+def _resumable_upload_response(upload, status=200):
+    location = url_for(".getResumableUpload", upload_id=upload.id, _external=True)
+
+    data = upload.to_dict()
+    data["target"] = upload.parameters["target"]
+    data["refs"] = {"resource": location}
+
+    r = make_response(jsonify(data), status)
+    if status == 201:
+        r.headers["Location"] = location
+    return r
+
+
+@api.route("/files/uploads", methods=["POST"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def createResumableUpload():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, description="Expected a JSON object")
+
+    target = data.get("target", FileDestinations.LOCAL)
+    if target not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
+        abort(400, description="target is invalid")
+
+    filename = data.get("filename")
+    if not isinstance(filename, str) or not octoprint.filemanager.valid_file_type(
+        filename
+    ):
+        abort(400, description="filename is missing or of an unsupported type")
+
+    if "userdata" in data and not isinstance(data["userdata"], dict):
+        abort(400, description="userdata must be an object")
+
+    parameters = {
+        key: data[key]
+        for key in ("path", "select", "print", "noOverwrite", "userdata")
+        if key in data
+    }
+    parameters["target"] = target
+
+    try:
+        upload = _get_resumable_uploads().create(
+            filename,
+            data.get("size"),
+            chunk_size=data.get("chunkSize"),
+            owner=current_user.get_name(),
+            parameters=parameters,
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+    except TooManyUploads as e:
+        return make_api_error(str(e), 409)
+    except InsufficientStorage as e:
+        # not known to werkzeug, so abort() can't be used
+        return make_api_error(str(e), 507)
+
+    return _resumable_upload_response(upload, status=201)
+
+
+@api.route("/files/uploads/<string:upload_id>", methods=["GET"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def getResumableUpload(upload_id):
+    return _resumable_upload_response(_get_resumable_upload(upload_id))
+
+
+@api.route("/files/uploads/<string:upload_id>/<int:index>", methods=["PUT"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def uploadResumableChunk(upload_id, index):
+    upload = _get_resumable_upload(upload_id)
+
+    if request.mimetype in ("application/x-www-form-urlencoded", "multipart/form-data"):
+        # the body would already have been consumed as form data
+        abort(415, description="Chunks must be sent as application/octet-stream")
+
+    try:
+        upload.write_chunk(
+            index, request.stream, checksum=request.headers.get("X-Chunk-Checksum")
+        )
+    except InvalidChunk as e:
+        abort(400, description=str(e))
+    except UnknownUpload:
+        abort(404)
+
+    return NO_CONTENT
+
+
+@api.route("/files/uploads/<string:upload_id>", methods=["POST"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def finishResumableUpload(upload_id):
+    upload = _get_resumable_upload(upload_id)
+
+    try:
+        upload.close()
+    except UnknownUpload:
+        abort(404)
+    except IncompleteUpload as e:
+        abort(409, description=str(e))
+
+    try:
+        response = _store_upload(
+            upload.parameters["target"],
+            octoprint.filemanager.util.DiskFileWrapper(upload.filename, upload.path),
+            upload.parameters,
+            userdata=upload.parameters.get("userdata"),
+        )
+    except Exception:
+        if os.path.exists(upload.path):
+            # nothing happened to the file, finishing can be retried
+            upload.reopen()
+        else:
+            _get_resumable_uploads().remove(upload.id, owner=upload.owner)
+        raise
+
+    _get_resumable_uploads().remove(upload.id, owner=upload.owner)
+    return response
+
+
+@api.route("/files/uploads/<string:upload_id>", methods=["DELETE"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def deleteResumableUpload(upload_id):
+    try:
+        _get_resumable_uploads().remove(upload_id, owner=current_user.get_name())
+    except UnknownUpload:
+        abort(404)
+    return NO_CONTENT
+
+
 @api.route("/files/<string:origin>", methods=["GET"])
 @Permissions.FILES_LIST.require(403)
+@_cached_file_listing
 @with_revalidation_checking(
     etag_factory=lambda lm=None: _create_etag(
         request.path,
         request.values.get("filter", False),
         request.values.get("recursive", False),
         lm=lm,
+        paging=_get_paging_args(),
     ),
     lastmodified_factory=lambda: _create_lastmodified(
         request.path, request.values.get("recursive", False)
     ),
-    unless=lambda: request.values.get("force", False)
-    or request.values.get("_refresh", False),
+    unless=_bypass_cache,
 )
 def readGcodeFilesForOrigin(origin):
     if origin not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
@@ -238,33 +574,47 @@ def readGcodeFilesForOrigin(origin):
     recursive = request.values.get("recursive", "false") in valid_boolean_trues
     force = request.values.get("force", "false") in valid_boolean_trues
 
-    files = _getFileList(
-        origin, filter=filter, recursive=recursive, allow_from_cache=not force
-    )
+    paging = _get_paging_args()
+    if paging is not None:
+        files, next_cursor = _getFilePage(
+            [origin],
+            filter=filter,
+            recursive=recursive,
+            allow_from_cache=not force,
+            **paging,
+        )
+        result = {"files": files, "next": next_cursor}
+    else:
+        result = {
+            "files": _getFileList(
+                origin, filter=filter, recursive=recursive, allow_from_cache=not force
+            )
+        }
 
     if origin == FileDestinations.LOCAL:
         usage = psutil.disk_usage(
             settings().getBaseFolder("uploads", check_writable=False)
         )
-        return jsonify(files=files, free=usage.free, total=usage.total)
-    else:
-        return jsonify(files=files)
+        result.update(free=usage.free, total=usage.total)
+    return jsonify(result)
 
 
 @api.route("/files/<string:target>/<path:filename>", methods=["GET"])
 @Permissions.FILES_LIST.require(403)
+@_cached_file_listing
 @with_revalidation_checking(
     etag_factory=lambda lm=None: _create_etag(
         request.path,
         request.values.get("filter", False),
         request.values.get("recursive", False),
         lm=lm,
+        paging=_get_paging_args(),
+        markers=request.values.get("markers", "false") in valid_boolean_trues,
     ),
     lastmodified_factory=lambda: _create_lastmodified(
         request.path, request.values.get("recursive", False)
     ),
-    unless=lambda: request.values.get("force", False)
-    or request.values.get("_refresh", False),
+    unless=_bypass_cache,
 )
 def readGcodeFile(target, filename):
     if target not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
@@ -281,6 +631,15 @@ def readGcodeFile(target, filename):
     if not file:
         abort(404)
 
+    if (
+        target == FileDestinations.LOCAL
+        and file["type"] != "folder"
+        and request.values.get("markers", "false") in valid_boolean_trues
+    ):
+        metadata = fileManager.get_metadata(target, filename)
+        if metadata and "markers" in metadata:
+            file["markers"] = metadata["markers"]
+
     return jsonify(file)
 
 
@@ -345,8 +704,8 @@ def _getFileList(
 
         filter_func = None
         if filter:
-            filter_func = lambda entry, entry_data: octoprint.filemanager.valid_file_type(
-                entry, type=filter, tree=extension_tree
+            filter_func = lambda node: octoprint.filemanager.valid_file_type(
+                node["name"], type=filter, tree=extension_tree
             )
 
         with _file_cache_mutex:
@@ -374,126 +733,173 @@ def _getFileList(
                 )
                 _file_cache[cache_key] = (files, lastmodified)
 
-        def analyse_recursively(files, path=None):
-            if path is None:
-                path = ""
+        files = _analyse_local_files(files, extension_tree)
 
-            result = []
-            for file_or_folder in files:
-                # make a shallow copy in order to not accidentally modify the cached data
-                file_or_folder = dict(file_or_folder)
+    return files
 
-                file_or_folder["origin"] = FileDestinations.LOCAL
 
-                if file_or_folder["type"] == "folder":
-                    if "children" in file_or_folder:
-                        children = analyse_recursively(
-                            file_or_folder["children"].values(),
-                            path + file_or_folder["name"] + "/",
-                        )
-                        latest_print = None
-                        success = 0
-                        failure = 0
-                        for child in children:
-                            if (
-                                "prints" not in child
-                                or "last" not in child["prints"]
-                                or "date" not in child["prints"]["last"]
-                            ):
-                                continue
-
-                            success += child["prints"].get("success", 0)
-                            failure += child["prints"].get("failure", 0)
-
-                            if (
-                                latest_print is None
-                                or child["prints"]["last"]["date"] > latest_print["date"]
-                            ):
-                                latest_print = child["prints"]["last"]
-
-                        file_or_folder["children"] = children
-                        file_or_folder["prints"] = {
-                            "success": success,
-                            "failure": failure,
-                        }
-                        if latest_print:
-                            file_or_folder["prints"]["last"] = latest_print
-
-                    file_or_folder["refs"] = {
-                        "resource": url_for(
-                            ".readGcodeFile",
-                            target=FileDestinations.LOCAL,
-                            filename=path + file_or_folder["name"],
-                            _external=True,
-                        )
-                    }
-                else:
+def _getFilePage(
+    origins,
+    path=None,
+    filter=None,
+    recursive=False,
+    sort="name",
+    order=None,
+    cursor=None,
+    limit=None,
+    prints=None,
+    query=None,
+    allow_from_cache=True,
+):
+    # PERF: Only retrieve the extension tree once
+    extension_tree = octoprint.filemanager.full_extension_tree()
+
+    filter_func = None
+    if filter:
+        filter_func = lambda node: octoprint.filemanager.valid_file_type(
+            node["name"], type=filter, tree=extension_tree
+        )
+
+    indexes = []
+    for origin in origins:
+        if origin == FileDestinations.SDCARD:
+            if path:
+                # no folders on the printer's SD card
+                continue
+            indexes.append(
+                ListingIndex(
+                    _getFileList(origin, allow_from_cache=allow_from_cache),
+                    origin=origin,
+                )
+            )
+        else:
+            if path and not _verifyFolderExists(origin, path):
+                abort(404)
+            indexes.append(
+                fileManager.listing_index(
+                    origin,
+                    path=path,
+                    recursive=recursive,
+                    force_refresh=not allow_from_cache,
+                )
+            )
+
+    try:
+        nodes, next_cursor = paginate(
+            indexes,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            filter=filter_func,
+            prints=prints,
+            query=query,
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    files = []
+    for node in nodes:
+        if node.get("origin") == FileDestinations.SDCARD:
+            files.append(node)
+        else:
+            parent = node["path"].rpartition("/")[0]
+            files += _analyse_local_files(
+                [node], extension_tree, path=parent + "/" if parent else ""
+            )
+    return files, next_cursor
+
+
+def _analyse_local_files(files, extension_tree, path=None):
+    if path is None:
+        path = ""
+
+    result = []
+    for file_or_folder in files:
+        # make a shallow copy in order to not accidentally modify the cached data
+        file_or_folder = dict(file_or_folder)
+
+        file_or_folder["origin"] = FileDestinations.LOCAL
+
+        if file_or_folder["type"] == "folder":
+            if "children" in file_or_folder:
+                children = _analyse_local_files(
+                    file_or_folder["children"].values(),
+                    extension_tree,
+                    path + file_or_folder["name"] + "/",
+                )
+                latest_print = None
+                success = 0
+                failure = 0
+                for child in children:
                     if (
-                        "analysis" in file_or_folder
-                        and octoprint.filemanager.valid_file_type(
-                            file_or_folder["name"], type="gcode", tree=extension_tree
-                        )
+                        "prints" not in child
+                        or "last" not in child["prints"]
+                        or "date" not in child["prints"]["last"]
                     ):
-                        file_or_folder["gcodeAnalysis"] = file_or_folder["analysis"]
-                        del file_or_folder["analysis"]
+                        continue
+
+                    success += child["prints"].get("success", 0)
+                    failure += child["prints"].get("failure", 0)
 
                     if (
-                        "history" in file_or_folder
-                        and octoprint.filemanager.valid_file_type(
-                            file_or_folder["name"], type="gcode", tree=extension_tree
-                        )
+                        latest_print is None
+                        or child["prints"]["last"]["date"] > latest_print["date"]
                     ):
-                        # convert print log
-                        history = file_or_folder["history"]
-                        del file_or_folder["history"]
-                        success = 0
-                        failure = 0
-                        last = None
-                        for entry in history:
-                            success += 1 if "success" in entry and entry["success"] else 0
-                            failure += (
-                                1 if "success" in entry and not entry["success"] else 0
-                            )
-                            if not last or (
-                                "timestamp" in entry
-                                and "timestamp" in last
-                                and entry["timestamp"] > last["timestamp"]
-                            ):
-                                last = entry
-                        if last:
-                            prints = {
-                                "success": success,
-                                "failure": failure,
-                                "last": {
-                                    "success": last["success"],
-                                    "date": last["timestamp"],
-                                },
-                            }
-                            if "printTime" in last:
-                                prints["last"]["printTime"] = last["printTime"]
-                            file_or_folder["prints"] = prints
-
-                    file_or_folder["refs"] = {
-                        "resource": url_for(
-                            ".readGcodeFile",
-                            target=FileDestinations.LOCAL,
-                            filename=file_or_folder["path"],
-                            _external=True,
-                        ),
-                        "download": url_for("index", _external=True)
-                        + "downloads/files/"
-                        + FileDestinations.LOCAL
-                        + "/"
-                        + urlquote(file_or_folder["path"]),
-                    }
+                        latest_print = child["prints"]["last"]
+
+                file_or_folder["children"] = children
+                file_or_folder["prints"] = {
+                    "success": success,
+                    "failure": failure,
+                }
+                if latest_print:
+                    file_or_folder["prints"]["last"] = latest_print
+
+            file_or_folder["refs"] = {
+                "resource": url_for(
+                    ".readGcodeFile",
+                    target=FileDestinations.LOCAL,
+                    filename=path + file_or_folder["name"],
+                    _external=True,
+                )
+            }
+        else:
+            if "analysis" in file_or_folder and octoprint.filemanager.valid_file_type(
+                file_or_folder["name"], type="gcode", tree=extension_tree
+            ):
+                file_or_folder["gcodeAnalysis"] = file_or_folder["analysis"]
+                del file_or_folder["analysis"]
 
-                result.append(file_or_folder)
+            # the marker index is only included on request, see readGcodeFile
+            file_or_folder.pop("markers", None)
 
-            return result
+            if "history" in file_or_folder and octoprint.filemanager.valid_file_type(
+                file_or_folder["name"], type="gcode", tree=extension_tree
+            ):
+                # convert print log
+                prints = print_summary(file_or_folder["history"])
+                del file_or_folder["history"]
+                if prints:
+                    file_or_folder["prints"] = prints
+
+            file_or_folder["refs"] = {
+                "resource": url_for(
+                    ".readGcodeFile",
+                    target=FileDestinations.LOCAL,
+                    filename=file_or_folder["path"],
+                    _external=True,
+                ),
+                "download": url_for("index", _external=True)
+                + "downloads/files/"
+                + FileDestinations.LOCAL
+                + "/"
+                + urlquote(file_or_folder["path"]),
+            }
 
-        files = analyse_recursively(files)
+        result.append(file_or_folder)
 
-    return files
+    return result
 
 
 def _verifyFileExists(origin, filename):
@@ -526,274 +932,292 @@ def _isBusy(target, path):
     )
 
 
-@api.route("/files/<string:target>", methods=["POST"])
-@no_firstrun_access
-@Permissions.FILES_UPLOAD.require(403)
-def uploadGcodeFile(target):
-    input_name = "file"
-    input_upload_name = (
-        input_name + "." + settings().get(["server", "uploads", "nameSuffix"])
-    )
-    input_upload_path = (
-        input_name + "." + settings().get(["server", "uploads", "pathSuffix"])
-    )
-    if input_upload_name in request.values and input_upload_path in request.values:
-        if target not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
-            abort(404)
-
-        upload = octoprint.filemanager.util.DiskFileWrapper(
-            request.values[input_upload_name], request.values[input_upload_path]
-        )
-
-        # Store any additional user data the caller may have passed.
-        userdata = None
-        if "userdata" in request.values:
-            import json
-
-            try:
-                userdata = json.loads(request.values["userdata"])
-            except Exception:
-                abort(400, description="userdata contains invalid JSON")
+def _store_upload(target, upload, values, userdata=None):
+    """
+    Adds an upload to the local storage, optionally streaming it on to the printer's SD
+    card and selecting or printing it as requested through ``values``.
 
-        # check preconditions for SD upload
-        if target == FileDestinations.SDCARD and not settings().getBoolean(
-            ["feature", "sdSupport"]
-        ):
-            abort(404)
+    Returns the response to the upload request.
+    """
 
-        sd = target == FileDestinations.SDCARD
-        if sd:
-            # validate that all preconditions for SD upload are met before attempting it
-            if not (
-                printer.is_operational()
-                and not (printer.is_printing() or printer.is_paused())
-            ):
-                abort(
-                    409,
-                    description="Can not upload to SD card, printer is either not operational or already busy",
-                )
-            if not printer.is_sd_ready():
-                abort(409, description="Can not upload to SD card, not yet initialized")
-
-        # evaluate select and print parameter and if set check permissions & preconditions
-        # and adjust as necessary
-        #
-        # we do NOT abort(409) here since this would be a backwards incompatible behaviour change
-        # on the API, but instead return the actually effective select and print flags in the response
-        #
-        # note that this behaviour might change in a future API version
-        select_request = (
-            "select" in request.values
-            and request.values["select"] in valid_boolean_trues
-            and Permissions.FILES_SELECT.can()
-        )
-        print_request = (
-            "print" in request.values
-            and request.values["print"] in valid_boolean_trues
-            and Permissions.PRINT.can()
-        )
+    # check preconditions for SD upload
+    if target == FileDestinations.SDCARD and not settings().getBoolean(
+        ["feature", "sdSupport"]
+    ):
+        abort(404)
 
-        to_select = select_request
-        to_print = print_request
-        if (to_select or to_print) and not (
+    sd = target == FileDestinations.SDCARD
+    if sd:
+        # validate that all preconditions for SD upload are met before attempting it
+        if not (
             printer.is_operational()
             and not (printer.is_printing() or printer.is_paused())
         ):
-            # can't select or print files if not operational or ready
-            to_select = to_print = False
-
-        # determine future filename of file to be uploaded, abort if it can't be uploaded
-        try:
-            # FileDestinations.LOCAL = should normally be target, but can't because SDCard handling isn't implemented yet
-            canonPath, canonFilename = fileManager.canonicalize(
-                FileDestinations.LOCAL, upload.filename
-            )
-            if request.values.get("path"):
-                canonPath = request.values.get("path")
-            if request.values.get("filename"):
-                canonFilename = request.values.get("filename")
-
-            futurePath = fileManager.sanitize_path(FileDestinations.LOCAL, canonPath)
-            futureFilename = fileManager.sanitize_name(
-                FileDestinations.LOCAL, canonFilename
-            )
-        except Exception:
-            canonFilename = None
-            futurePath = None
-            futureFilename = None
-
-        if futureFilename is None:
-            abort(400, description="Can not upload file, invalid file name")
-
-        # prohibit overwriting currently selected file while it's being printed
-        futureFullPath = fileManager.join_path(
-            FileDestinations.LOCAL, futurePath, futureFilename
-        )
-        futureFullPathInStorage = fileManager.path_in_storage(
-            FileDestinations.LOCAL, futureFullPath
-        )
-
-        if not printer.can_modify_file(futureFullPathInStorage, sd):
             abort(
                 409,
-                description="Trying to overwrite file that is currently being printed",
+                description="Can not upload to SD card, printer is either not operational or already busy",
             )
+        if not printer.is_sd_ready():
+            abort(409, description="Can not upload to SD card, not yet initialized")
+
+    # evaluate select and print parameter and if set check permissions & preconditions
+    # and adjust as necessary
+    #
+    # we do NOT abort(409) here since this would be a backwards incompatible behaviour change
+    # on the API, but instead return the actually effective select and print flags in the response
+    #
+    # note that this behaviour might change in a future API version
+    select_request = (
+        "select" in values
+        and values["select"] in valid_boolean_trues
+        and Permissions.FILES_SELECT.can()
+    )
+    print_request = (
+        "print" in values
+        and values["print"] in valid_boolean_trues
+        and Permissions.PRINT.can()
+    )
 
-        if (
-            fileManager.file_exists(FileDestinations.LOCAL, futureFullPathInStorage)
-            and request.values.get("noOverwrite") in valid_boolean_trues
-        ):
-            abort(409, description="File already exists and noOverwrite was set")
+    to_select = select_request
+    to_print = print_request
+    if (to_select or to_print) and not (
+        printer.is_operational() and not (printer.is_printing() or printer.is_paused())
+    ):
+        # can't select or print files if not operational or ready
+        to_select = to_print = False
+
+    # determine future filename of file to be uploaded, abort if it can't be uploaded
+    try:
+        # FileDestinations.LOCAL = should normally be target, but can't because SDCard handling isn't implemented yet
+        canonPath, canonFilename = fileManager.canonicalize(
+            FileDestinations.LOCAL, upload.filename
+        )
+        if values.get("path"):
+            canonPath = values.get("path")
+        if values.get("filename"):
+            canonFilename = values.get("filename")
+
+        futurePath = fileManager.sanitize_path(FileDestinations.LOCAL, canonPath)
+        futureFilename = fileManager.sanitize_name(FileDestinations.LOCAL, canonFilename)
+    except Exception:
+        canonFilename = None
+        futurePath = None
+        futureFilename = None
+
+    if futureFilename is None:
+        abort(400, description="Can not upload file, invalid file name")
+
+    # prohibit overwriting currently selected file while it's being printed
+    futureFullPath = fileManager.join_path(
+        FileDestinations.LOCAL, futurePath, futureFilename
+    )
+    futureFullPathInStorage = fileManager.path_in_storage(
+        FileDestinations.LOCAL, futureFullPath
+    )
 
-        if (
-            fileManager.file_exists(FileDestinations.LOCAL, futureFullPathInStorage)
-            and not Permissions.FILES_DELETE.can()
-        ):
-            abort(
-                403,
-                description="File already exists, cannot overwrite due to a lack of permissions",
-            )
+    if not printer.can_modify_file(futureFullPathInStorage, sd):
+        abort(
+            409,
+            description="Trying to overwrite file that is currently being printed",
+        )
 
-        reselect = printer.is_current_file(futureFullPathInStorage, sd)
+    if (
+        fileManager.file_exists(FileDestinations.LOCAL, futureFullPathInStorage)
+        and values.get("noOverwrite") in valid_boolean_trues
+    ):
+        abort(409, description="File already exists and noOverwrite was set")
 
-        user = current_user.get_name()
+    if (
+        fileManager.file_exists(FileDestinations.LOCAL, futureFullPathInStorage)
+        and not Permissions.FILES_DELETE.can()
+    ):
+        abort(
+            403,
+            description="File already exists, cannot overwrite due to a lack of permissions",
+        )
 
-        def fileProcessingFinished(filename, absFilename, destination):
-            """
-            Callback for when the file processing (upload, optional slicing, addition to analysis queue) has
-            finished.
+    reselect = printer.is_current_file(futureFullPathInStorage, sd)
 
-            Depending on the file's destination triggers either streaming to SD card or directly calls to_select.
-            """
+    user = current_user.get_name()
 
-            if (
-                destination == FileDestinations.SDCARD
-                and octoprint.filemanager.valid_file_type(filename, "machinecode")
-            ):
-                return filename, printer.add_sd_file(
-                    filename,
-                    absFilename,
-                    on_success=selectAndOrPrint,
-                    tags={"source:api", "api:files.sd"},
-                )
-            else:
-                selectAndOrPrint(filename, absFilename, destination)
-                return filename
-
-        def selectAndOrPrint(filename, absFilename, destination):
-            """
-            Callback for when the file is ready to be selected and optionally printed. For SD file uploads this is only
-            the case after they have finished streaming to the printer, which is why this callback is also used
-            for the corresponding call to addSdFile.
-
-            Selects the just uploaded file if either to_select or to_print are True, or if the
-            exact file is already selected, such reloading it.
-            """
-            if octoprint.filemanager.valid_file_type(added_file, "gcode") and (
-                to_select or to_print or reselect
-            ):
-                printer.select_file(
-                    absFilename,
-                    destination == FileDestinations.SDCARD,
-                    to_print,
-                    user,
-                )
+    def fileProcessingFinished(filename, absFilename, destination):
+        """
+        Callback for when the file processing (upload, optional slicing, addition to analysis queue) has
+        finished.
 
-        try:
-            added_file = fileManager.add_file(
-                FileDestinations.LOCAL,
-                futureFullPathInStorage,
-                upload,
-                allow_overwrite=True,
-                display=canonFilename,
+        Depending on the file's destination triggers either streaming to SD card or directly calls to_select.
+        """
+
+        if (
+            destination == FileDestinations.SDCARD
+            and octoprint.filemanager.valid_file_type(filename, "machinecode")
+        ):
+            return filename, printer.add_sd_file(
+                filename,
+                absFilename,
+                on_success=selectAndOrPrint,
+                tags={"source:api", "api:files.sd"},
             )
-        except (OSError, StorageError) as e:
-            _abortWithException(e)
         else:
-            filename = fileProcessingFinished(
-                added_file,
-                fileManager.path_on_disk(FileDestinations.LOCAL, added_file),
-                target,
-            )
-            done = not sd
+            selectAndOrPrint(filename, absFilename, destination)
+            return filename
 
-        if userdata is not None:
-            # upload included userdata, add this now to the metadata
-            fileManager.set_additional_metadata(
-                FileDestinations.LOCAL, added_file, "userdata", userdata
+    def selectAndOrPrint(filename, absFilename, destination):
+        """
+        Callback for when the file is ready to be selected and optionally printed. For SD file uploads this is only
+        the case after they have finished streaming to the printer, which is why this callback is also used
+        for the corresponding call to addSdFile.
+
+        Selects the just uploaded file if either to_select or to_print are True, or if the
+        exact file is already selected, such reloading it.
+        """
+        if octoprint.filemanager.valid_file_type(added_file, "gcode") and (
+            to_select or to_print or reselect
+        ):
+            printer.select_file(
+                absFilename,
+                destination == FileDestinations.SDCARD,
+                to_print,
+                user,
             )
 
-        sdFilename = None
-        if isinstance(filename, tuple):
-            filename, sdFilename = filename
-
-        payload = {
-            "name": futureFilename,
-            "path": filename,
-            "target": target,
-            "select": select_request,
-            "print": print_request,
-            "effective_select": to_select,
-            "effective_print": to_print,
+    try:
+        added_file = fileManager.add_file(
+            FileDestinations.LOCAL,
+            futureFullPathInStorage,
+            upload,
+            allow_overwrite=True,
+            display=canonFilename,
+        )
+    except (OSError, StorageError) as e:
+        _abortWithException(e)
+    else:
+        filename = fileProcessingFinished(
+            added_file,
+            fileManager.path_on_disk(FileDestinations.LOCAL, added_file),
+            target,
+        )
+        done = not sd
+
+    if userdata is not None:
+        # upload included userdata, add this now to the metadata
+        fileManager.set_additional_metadata(
+            FileDestinations.LOCAL, added_file, "userdata", userdata
+        )
+
+    sdFilename = None
+    if isinstance(filename, tuple):
+        filename, sdFilename = filename
+
+    payload = {
+        "name": futureFilename,
+        "path": filename,
+        "target": target,
+        "select": select_request,
+        "print": print_request,
+        "effective_select": to_select,
+        "effective_print": to_print,
+    }
+    if userdata is not None:
+        payload["userdata"] = userdata
+    eventManager.fire(Events.UPLOAD, payload)
+
+    files = {}
+    location = url_for(
+        ".readGcodeFile",
+        target=FileDestinations.LOCAL,
+        filename=filename,
+        _external=True,
+    )
+    files.update(
+        {
+            FileDestinations.LOCAL: {
+                "name": futureFilename,
+                "path": filename,
+                "origin": FileDestinations.LOCAL,
+                "refs": {
+                    "resource": location,
+                    "download": url_for("index", _external=True)
+                    + "downloads/files/"
+                    + FileDestinations.LOCAL
+                    + "/"
+                    + urlquote(filename),
+                },
+            }
         }
-        if userdata is not None:
-            payload["userdata"] = userdata
-        eventManager.fire(Events.UPLOAD, payload)
+    )
 
-        files = {}
+    if sd and sdFilename:
         location = url_for(
             ".readGcodeFile",
-            target=FileDestinations.LOCAL,
-            filename=filename,
+            target=FileDestinations.SDCARD,
+            filename=sdFilename,
             _external=True,
         )
         files.update(
             {
-                FileDestinations.LOCAL: {
-                    "name": futureFilename,
-                    "path": filename,
-                    "origin": FileDestinations.LOCAL,
-                    "refs": {
-                        "resource": location,
-                        "download": url_for("index", _external=True)
-                        + "downloads/files/"
-                        + FileDestinations.LOCAL
-                        + "/"
-                        + urlquote(filename),
-                    },
+                FileDestinations.SDCARD: {
+                    "name": sdFilename,
+                    "path": sdFilename,
+                    "origin": FileDestinations.SDCARD,
+                    "refs": {"resource": location},
                 }
             }
         )
 
-        if sd and sdFilename:
-            location = url_for(
-                ".readGcodeFile",
-                target=FileDestinations.SDCARD,
-                filename=sdFilename,
-                _external=True,
-            )
-            files.update(
-                {
-                    FileDestinations.SDCARD: {
-                        "name": sdFilename,
-                        "path": sdFilename,
-                        "origin": FileDestinations.SDCARD,
-                        "refs": {"resource": location},
-                    }
-                }
-            )
+    r = make_response(
+        jsonify(
+            files=files,
+            done=done,
+            effectiveSelect=to_select,
+            effectivePrint=to_print,
+        ),
+        201,
+    )
+    r.headers["Location"] = location
+    return r
+
+
+@api.route("/files/<string:target>", methods=["POST"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def uploadGcodeFile(target):
+    input_name = "file"
+    input_upload_name = (
+        input_name + "." + settings().get(["server", "uploads", "nameSuffix"])
+    )
+    input_upload_path = (
+        input_name + "." + settings().get(["server", "uploads", "pathSuffix"])
+    )
+    if input_upload_name in request.values and input_upload_path in request.values:
+        if target not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
+            abort(404)
 
-        r = make_response(
-            jsonify(
-                files=files,
-                done=done,
-                effectiveSelect=to_select,
-                effectivePrint=to_print,
-            ),
-            201,
+        # hash and slicer information gathered while the upload was received, these
+        # never come from the request itself
+        ingest = request.environ.get(
+            octoprint.filemanager.util.UploadIngest.ENVIRON_KEY, {}
+        ).get(input_name, {})
+
+        upload = octoprint.filemanager.util.DiskFileWrapper(
+            request.values[input_upload_name],
+            request.values[input_upload_path],
+            hash=ingest.get("hash"),
+            slicer=ingest.get("slicer"),
+            trusted="hash" in ingest,
         )
-        r.headers["Location"] = location
-        return r
+
+        # Store any additional user data the caller may have passed.
+        userdata = None
+        if "userdata" in request.values:
+            import json
+
+            try:
+                userdata = json.loads(request.values["userdata"])
+            except Exception:
+                abort(400, description="userdata contains invalid JSON")
+
+        return _store_upload(target, upload, request.values, userdata=userdata)
 
     elif "foldername" in request.values:
         foldername = request.values["foldername"]
@@ -801,27 +1225,9 @@ def uploadGcodeFile(target):
         if target not in [FileDestinations.LOCAL]:
             abort(400, description="target is invalid")
 
-        canonPath, canonName = fileManager.canonicalize(target, foldername)
-        futurePath = fileManager.sanitize_path(target, canonPath)
-        futureName = fileManager.sanitize_name(target, canonName)
-        if not futureName or not futurePath:
-            abort(400, description="folder name is empty")
-
-        if "path" in request.values and request.values["path"]:
-            futurePath = fileManager.sanitize_path(
-                FileDestinations.LOCAL, request.values["path"]
-            )
-
-        futureFullPath = fileManager.join_path(target, futurePath, futureName)
-        if octoprint.filemanager.valid_file_type(futureName):
-            abort(409, description="Can't create folder, please try another name")
-
-        try:
-            added_folder = fileManager.add_folder(
-                target, futureFullPath, display=canonName
-            )
-        except (OSError, StorageError) as e:
-            _abortWithException(e)
+        futureName, added_folder = _addFolder(
+            target, foldername, path=request.values.get("path")
+        )
 
         location = url_for(
             ".readGcodeFile",
@@ -1140,95 +1546,10 @@ def gcodeFileCommand(filename, target):
             if target not in [FileDestinations.LOCAL]:
                 abort(400, description=f"Unsupported target for {command}")
 
-            if not _verifyFileExists(target, filename) and not _verifyFolderExists(
-                target, filename
-            ):
-                abort(404)
-
-            path, name = fileManager.split_path(target, filename)
-
-            destination = data["destination"]
-            dst_path, dst_name = fileManager.split_path(target, destination)
-            sanitized_destination = fileManager.join_path(
-                target, dst_path, fileManager.sanitize_name(target, dst_name)
+            name, destination, is_file = _copyOrMove(
+                target, filename, command, data["destination"]
             )
 
-            # Check for exception thrown by _verifyFolderExists, if outside the root directory
-            try:
-                if (
-                    _verifyFolderExists(target, destination)
-                    and sanitized_destination != filename
-                ):
-                    # destination is an existing folder and not ourselves (= display rename), we'll assume we are supposed
-                    # to move filename to this folder under the same name
-                    destination = fileManager.join_path(target, destination, name)
-
-                if _verifyFileExists(target, destination) or _verifyFolderExists(
-                    target, destination
-                ):
-                    abort(409, description="File or folder does already exist")
-
-            except Exception:
-                abort(
-                    409, description="Exception thrown by storage, bad folder/file name?"
-                )
-
-            is_file = fileManager.file_exists(target, filename)
-            is_folder = fileManager.folder_exists(target, filename)
-
-            if not (is_file or is_folder):
-                abort(400, description=f"Neither file nor folder, can't {command}")
-
-            try:
-                if command == "copy":
-                    # destination already there? error...
-                    if _verifyFileExists(target, destination) or _verifyFolderExists(
-                        target, destination
-                    ):
-                        abort(409, description="File or folder does already exist")
-
-                    if is_file:
-                        fileManager.copy_file(target, filename, destination)
-                    else:
-                        fileManager.copy_folder(target, filename, destination)
-
-                elif command == "move":
-                    with Permissions.FILES_DELETE.require(403):
-                        if _isBusy(target, filename):
-                            abort(
-                                409,
-                                description="Trying to move a file or folder that is currently in use",
-                            )
-
-                        # destination already there AND not ourselves (= display rename)? error...
-                        if (
-                            _verifyFileExists(target, destination)
-                            or _verifyFolderExists(target, destination)
-                        ) and sanitized_destination != filename:
-                            abort(409, description="File or folder does already exist")
-
-                        # deselect the file if it's currently selected
-                        currentOrigin, currentFilename = _getCurrentFile()
-                        if currentFilename is not None and filename == currentFilename:
-                            printer.unselect_file()
-
-                        if is_file:
-                            fileManager.move_file(target, filename, destination)
-                        else:
-                            fileManager.move_folder(target, filename, destination)
-
-            except octoprint.filemanager.storage.StorageError as e:
-                if e.code == octoprint.filemanager.storage.StorageError.INVALID_FILE:
-                    abort(
-                        415,
-                        description=f"Could not {command} {filename} to {destination}, invalid type",
-                    )
-                else:
-                    abort(
-                        500,
-                        description=f"Could not {command} {filename} to {destination}",
-                    )
-
             location = url_for(
                 ".readGcodeFile",
                 target=target,
@@ -1272,6 +1593,198 @@ def deleteGcodeFile(filename, target):
     if target not in [FileDestinations.LOCAL, FileDestinations.SDCARD]:
         abort(404)
 
+    _delete(target, filename)
+
+    return NO_CONTENT
+
+
+# valid batch commands, dict mapping command name to mandatory parameters
+_BATCH_COMMANDS = {
+    "copy": ["path", "destination"],
+    "move": ["path", "destination"],
+    "delete": ["path"],
+    "addFolder": ["path"],
+}
+
+
+@api.route("/files/batch", methods=["POST"])
+@no_firstrun_access
+@Permissions.FILES_UPLOAD.require(403)
+def batchFileOperations():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("operations"), list):
+        abort(400, description="Expected a JSON object with a list of operations")
+
+    target = data.get("target", FileDestinations.LOCAL)
+    if target not in [FileDestinations.LOCAL]:
+        abort(400, description="target is invalid")
+
+    # one metadata write per folder and one UpdatedFiles event for the whole batch
+    with fileManager.batch(target):
+        results = [
+            _runBatchOperation(target, operation) for operation in data["operations"]
+        ]
+
+    return jsonify(results=results, done=all(result["success"] for result in results))
+
+
+def _runBatchOperation(target, operation):
+    command = operation.get("command") if isinstance(operation, dict) else None
+    result = {"command": command}
+
+    try:
+        if command not in _BATCH_COMMANDS:
+            abort(400, description=f"Unknown command: {command}")
+        for parameter in _BATCH_COMMANDS[command]:
+            if not isinstance(operation.get(parameter), str):
+                abort(400, description=f"Mandatory parameter {parameter} is missing")
+
+        path = result["path"] = operation["path"]
+
+        if command == "addFolder":
+            _, result["path"] = _addFolder(target, path)
+
+        elif command == "delete":
+            with Permissions.FILES_DELETE.require(403):
+                if not _validate(target, path):
+                    abort(404)
+                if not _verifyFileExists(target, path) and not _verifyFolderExists(
+                    target, path
+                ):
+                    abort(404)
+                _delete(target, path)
+
+        else:
+            if not _validate(target, path):
+                abort(404)
+            _, result["destination"], _ = _copyOrMove(
+                target, path, command, operation["destination"]
+            )
+
+    except HTTPException as e:
+        result.update(success=False, status=e.code, error=e.description)
+    except Exception as e:
+        # don't let one failing operation take down the rest of the batch
+        logging.getLogger(__name__).exception(
+            f"Error while running batch operation {command} on {result.get('path')}"
+        )
+        result.update(success=False, status=500, error=str(e))
+    else:
+        result["success"] = True
+
+    return result
+
+
+def _addFolder(target, foldername, path=None):
+    canonPath, canonName = fileManager.canonicalize(target, foldername)
+    futurePath = fileManager.sanitize_path(target, canonPath)
+    futureName = fileManager.sanitize_name(target, canonName)
+    if not futureName or not futurePath:
+        abort(400, description="folder name is empty")
+
+    if path:
+        futurePath = fileManager.sanitize_path(FileDestinations.LOCAL, path)
+
+    futureFullPath = fileManager.join_path(target, futurePath, futureName)
+    if octoprint.filemanager.valid_file_type(futureName):
+        abort(409, description="Can't create folder, please try another name")
+
+    try:
+        added_folder = fileManager.add_folder(target, futureFullPath, display=canonName)
+    except (OSError, StorageError) as e:
+        _abortWithException(e)
+
+    return futureName, added_folder
+
+
+def _copyOrMove(target, filename, command, destination):
+    if not _verifyFileExists(target, filename) and not _verifyFolderExists(
+        target, filename
+    ):
+        abort(404)
+
+    path, name = fileManager.split_path(target, filename)
+
+    dst_path, dst_name = fileManager.split_path(target, destination)
+    sanitized_destination = fileManager.join_path(
+        target, dst_path, fileManager.sanitize_name(target, dst_name)
+    )
+
+    # Check for exception thrown by _verifyFolderExists, if outside the root directory
+    try:
+        if _verifyFolderExists(target, destination) and sanitized_destination != filename:
+            # destination is an existing folder and not ourselves (= display rename), we'll assume we are supposed
+            # to move filename to this folder under the same name
+            destination = fileManager.join_path(target, destination, name)
+
+        if _verifyFileExists(target, destination) or _verifyFolderExists(
+            target, destination
+        ):
+            abort(409, description="File or folder does already exist")
+
+    except Exception:
+        abort(409, description="Exception thrown by storage, bad folder/file name?")
+
+    is_file = fileManager.file_exists(target, filename)
+    is_folder = fileManager.folder_exists(target, filename)
+
+    if not (is_file or is_folder):
+        abort(400, description=f"Neither file nor folder, can't {command}")
+
+    try:
+        if command == "copy":
+            # destination already there? error...
+            if _verifyFileExists(target, destination) or _verifyFolderExists(
+                target, destination
+            ):
+                abort(409, description="File or folder does already exist")
+
+            if is_file:
+                fileManager.copy_file(target, filename, destination)
+            else:
+                fileManager.copy_folder(target, filename, destination)
+
+        elif command == "move":
+            with Permissions.FILES_DELETE.require(403):
+                if _isBusy(target, filename):
+                    abort(
+                        409,
+                        description="Trying to move a file or folder that is currently in use",
+                    )
+
+                # destination already there AND not ourselves (= display rename)? error...
+                if (
+                    _verifyFileExists(target, destination)
+                    or _verifyFolderExists(target, destination)
+                ) and sanitized_destination != filename:
+                    abort(409, description="File or folder does already exist")
+
+                # deselect the file if it's currently selected
+                currentOrigin, currentFilename = _getCurrentFile()
+                if currentFilename is not None and filename == currentFilename:
+                    printer.unselect_file()
+
+                if is_file:
+                    fileManager.move_file(target, filename, destination)
+                else:
+                    fileManager.move_folder(target, filename, destination)
+
+    except octoprint.filemanager.storage.StorageError as e:
+        if e.code == octoprint.filemanager.storage.StorageError.INVALID_FILE:
+            abort(
+                415,
+                description=f"Could not {command} {filename} to {destination}, invalid type",
+            )
+        else:
+            abort(
+                500,
+                description=f"Could not {command} {filename} to {destination}",
+            )
+
+    return name, destination, is_file
+
+
+def _delete(target, filename):
     if _verifyFileExists(target, filename):
         if _isBusy(target, filename):
             abort(409, description="Trying to delete a file that is currently in use")
@@ -1316,8 +1829,6 @@ def deleteGcodeFile(filename, target):
         except (OSError, StorageError) as e:
             _abortWithException(e)
 
-    return NO_CONTENT
-
 
 def _abortWithException(error):
     if type(error) is StorageError:
@@ -71,6 +71,10 @@ def controlJob():
 @api.route("/job", methods=["GET"])
 @Permissions.STATUS.require(403)
 def jobState():
+    return jsonify(**get_job_state())
+
+
+def get_job_state():
     currentData = printer.get_current_data()
     response = {
         "job": currentData["job"],
@@ -80,4 +84,4 @@ def jobState():
     if currentData["state"]["error"]:
         response["error"] = currentData["state"]["error"]
 
-    return jsonify(**response)
+    return response
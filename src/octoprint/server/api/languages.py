@@ -13,7 +13,11 @@ from flask_babel import Locale
 from octoprint.access.permissions import Permissions
 from octoprint.plugin import plugin_manager
 from octoprint.server.api import api
-from octoprint.server.util.flask import no_firstrun_access
+from octoprint.server.util.flask import (
+    cached_api_response,
+    invalidate_cache,
+    no_firstrun_access,
+)
 from octoprint.settings import settings
 from octoprint.util import yaml
 
@@ -21,7 +25,12 @@ from octoprint.util import yaml
 @api.route("/languages", methods=["GET"])
 @no_firstrun_access
 @Permissions.SETTINGS.require(403)
+@cached_api_response("languages", [])
 def getInstalledLanguagePacks():
+    return _get_installed_language_packs()
+
+
+def _get_installed_language_packs():
     translation_folder = settings().getBaseFolder("translations", check_writable=False)
     if not os.path.exists(translation_folder):
         return jsonify(language_packs={"_core": []})
@@ -146,7 +155,8 @@ def uploadLanguagePack():
     if not _validate_and_install_language_pack(upload_path, target_path):
         abort(400, description="Invalid language pack archive")
 
-    return getInstalledLanguagePacks()
+    invalidate_cache("languages")
+    return _get_installed_language_packs()
 
 
 @api.route("/languages/<string:locale>/<string:pack>", methods=["DELETE"])
@@ -165,7 +175,8 @@ def deleteInstalledLanguagePack(locale, pack):
 
         shutil.rmtree(target_path)
 
-    return getInstalledLanguagePacks()
+    invalidate_cache("languages")
+    return _get_installed_language_packs()
 
 
 def _validate_and_install_language_pack(path, target):
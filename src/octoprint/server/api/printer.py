@@ -19,13 +19,28 @@ from octoprint.settings import settings, valid_boolean_trues
 @api.route("/printer", methods=["GET"])
 @Permissions.STATUS.require(403)
 def printerState():
-    if not printer.is_operational():
+    result = get_printer_state(request.values)
+    if result is None:
         abort(409, description="Printer is not operational")
+    return jsonify(result)
+
+
+def get_printer_state(values):
+    """
+    Returns the printer state as served on ``GET /api/printer``, or ``None`` if the
+    printer is not operational.
+
+    Arguments:
+        values (dict): The request's query values, used for ``exclude``, ``history``
+            and ``limit``
+    """
+    if not printer.is_operational():
+        return None
 
     # process excludes
     excludes = []
-    if "exclude" in request.values:
-        excludeStr = request.values["exclude"]
+    if "exclude" in values:
+        excludeStr = values["exclude"]
         if len(excludeStr.strip()) > 0:
             excludes = list(
                 filter(
@@ -48,7 +63,7 @@ def printerState():
         elif not heated_chamber:
             processor = _delete_chamber
 
-        result.update({"temperature": _get_temperature_data(processor)})
+        result.update({"temperature": _get_temperature_data(processor, values=values)})
 
     # add sd information
     if "sd" not in excludes and settings().getBoolean(["feature", "sdSupport"]):
@@ -59,7 +74,7 @@ def printerState():
         state = printer.get_current_data()["state"]
         result.update({"state": state})
 
-    return jsonify(result)
+    return result
 
 
 # ~~ Tool
@@ -450,18 +465,21 @@ def getCustomControls():
     return jsonify(controls=customControls)
 
 
-def _get_temperature_data(preprocessor):
+def _get_temperature_data(preprocessor, values=None):
     if not printer.is_operational():
         abort(409, description="Printer is not operational")
 
+    if values is None:
+        values = request.values
+
     tempData = printer.get_current_temperatures()
 
-    if "history" in request.values and request.values["history"] in valid_boolean_trues:
+    if "history" in values and values["history"] in valid_boolean_trues:
         history = printer.get_temperature_history()
 
         limit = 300
-        if "limit" in request.values and str(request.values["limit"]).isnumeric():
-            limit = int(request.values["limit"])
+        if "limit" in values and str(values["limit"]).isnumeric():
+            limit = int(values["limit"])
 
         limit = min(limit, len(history))
 
@@ -8,10 +8,16 @@ import copy
 from flask import abort, jsonify, request, url_for
 
 from octoprint.access.permissions import Permissions
+from octoprint.events import Events
 from octoprint.printer.profile import CouldNotOverwriteError, InvalidProfileError
 from octoprint.server import printerProfileManager
 from octoprint.server.api import NO_CONTENT, api, valid_boolean_trues
-from octoprint.server.util.flask import no_firstrun_access, with_revalidation_checking
+from octoprint.server.util.flask import (
+    cached_api_response,
+    no_firstrun_access,
+    with_revalidation_checking,
+)
+from octoprint.settings import settings
 from octoprint.util import dict_merge
 
 
@@ -37,7 +43,26 @@ def _etag(lm=None):
     return hash.hexdigest()
 
 
+def _cache_key_values():
+    current = printerProfileManager.get_current()
+    return (
+        current.get("id") if current else None,
+        settings().get(["printerProfiles", "default"]),
+    )
+
+
 @api.route("/printerprofiles", methods=["GET"])
+@cached_api_response(
+    "printerProfiles",
+    [
+        Events.PRINTER_PROFILE_ADDED,
+        Events.PRINTER_PROFILE_MODIFIED,
+        Events.PRINTER_PROFILE_DELETED,
+        Events.SETTINGS_UPDATED,
+    ],
+    unless=lambda: request.values.get("force", "false") in valid_boolean_trues,
+    key_values=_cache_key_values,
+)
 @with_revalidation_checking(
     etag_factory=_etag,
     lastmodified_factory=_lastmodified,
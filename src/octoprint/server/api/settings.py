@@ -11,9 +11,11 @@ from flask_login import current_user
 import octoprint.plugin
 import octoprint.util
 from octoprint.access.permissions import Permissions
+from octoprint.events import Events
 from octoprint.server import pluginManager, printer, userManager
 from octoprint.server.api import NO_CONTENT, api
 from octoprint.server.util.flask import (
+    cached_api_response,
     credentials_checked_recently,
     no_firstrun_access,
     with_revalidation_checking,
@@ -101,13 +103,30 @@ def _etag(lm=None):
     return hash.hexdigest()
 
 
+def _bypass_cache():
+    return (
+        request.values.get("force", "false") in valid_boolean_trues
+        or settings().getBoolean(["server", "firstRun"])
+        or not userManager.has_been_customized()
+    )
+
+
 @api.route("/settings", methods=["GET"])
+@cached_api_response(
+    "settings",
+    [
+        Events.SETTINGS_UPDATED,
+        Events.CONNECTIONS_AUTOREFRESHED,
+        Events.CONNECTED,
+        Events.DISCONNECTED,
+    ],
+    unless=_bypass_cache,
+    key_values=lambda: (_lastmodified(), credentials_checked_recently()),
+)
 @with_revalidation_checking(
     etag_factory=_etag,
     lastmodified_factory=_lastmodified,
-    unless=lambda: request.values.get("force", "false") in valid_boolean_trues
-    or settings().getBoolean(["server", "firstRun"])
-    or not userManager.has_been_customized(),
+    unless=_bypass_cache,
 )
 def getSettings():
     if not Permissions.SETTINGS_READ.can() and not (
@@ -5,9 +5,14 @@ __copyright__ = "Copyright (C) 2014 The OctoPrint Project - Released under terms
 from flask import abort, jsonify, make_response, request, url_for
 
 from octoprint.access.permissions import Permissions
+from octoprint.events import Events
 from octoprint.server import slicingManager
 from octoprint.server.api import NO_CONTENT, api
-from octoprint.server.util.flask import no_firstrun_access, with_revalidation_checking
+from octoprint.server.util.flask import (
+    cached_api_response,
+    no_firstrun_access,
+    with_revalidation_checking,
+)
 from octoprint.settings import settings as s
 from octoprint.settings import valid_boolean_trues
 from octoprint.slicing import (
@@ -66,6 +71,16 @@ def _etag(configured, lm=None):
 
 
 @api.route("/slicing", methods=["GET"])
+@cached_api_response(
+    "slicing",
+    [
+        Events.SLICING_PROFILE_ADDED,
+        Events.SLICING_PROFILE_MODIFIED,
+        Events.SLICING_PROFILE_DELETED,
+        Events.SETTINGS_UPDATED,
+    ],
+    unless=lambda: request.values.get("force", "false") in valid_boolean_trues,
+)
 @with_revalidation_checking(
     etag_factory=lambda lm=None: _etag(
         request.values.get("configured", "false") in valid_boolean_trues, lm=lm
@@ -11,11 +11,16 @@ from flask import abort, jsonify, request, url_for
 from flask_babel import gettext
 
 from octoprint.access.permissions import Permissions
+from octoprint.events import Events
 from octoprint.logging import prefix_multilines
 from octoprint.plugin import plugin_manager
 from octoprint.server import NO_CONTENT
 from octoprint.server.api import api
-from octoprint.server.util.flask import no_firstrun_access
+from octoprint.server.util.flask import (
+    cached_api_response,
+    get_cache_statistics,
+    no_firstrun_access,
+)
 from octoprint.settings import settings as s
 from octoprint.systemcommands import system_command_manager
 from octoprint.util.commandline import CommandlineCaller
@@ -36,9 +41,11 @@ def getSystemInfo():
     from octoprint.server import (
         connectivityChecker,
         environmentDetector,
+        eventManager,
         printer,
         safe_mode,
     )
+    from octoprint.server.util.sockjs import PrinterStateConnection
     from octoprint.util import dict_flatten
 
     systeminfo = get_systeminfo(
@@ -51,6 +58,12 @@ def getSystemInfo():
             "systeminfo.generator": "systemapi",
         },
     )
+    if eventManager:
+        systeminfo.update(dict_flatten(eventManager.get_statistics(), prefix="events"))
+    systeminfo.update(
+        dict_flatten(PrinterStateConnection.get_statistics(), prefix="push")
+    )
+    systeminfo.update(dict_flatten(get_cache_statistics(), prefix="cache"))
 
     if printer and printer.is_operational():
         firmware_info = printer.firmware_info
@@ -112,6 +125,7 @@ def performSystemAction():
 @api.route("/system/commands", methods=["GET"])
 @no_firstrun_access
 @Permissions.SYSTEM.require(403)
+@cached_api_response("systemCommands", [Events.SETTINGS_UPDATED])
 def retrieveSystemCommands():
     return jsonify(
         core=_to_client_specs(_get_core_command_specs()),
@@ -123,6 +137,7 @@ def retrieveSystemCommands():
 @api.route("/system/commands/<string:source>", methods=["GET"])
 @no_firstrun_access
 @Permissions.SYSTEM.require(403)
+@cached_api_response("systemCommands", [Events.SETTINGS_UPDATED])
 def retrieveSystemCommandsForSource(source):
     if source == "core":
         specs = _get_core_command_specs()
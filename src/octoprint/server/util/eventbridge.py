@@ -0,0 +1,341 @@
+"""
+Publishes the event bus to out-of-process subscribers over a local Unix domain socket.
+
+The protocol is line based, every line is one JSON object. Clients send
+
+    {"subscribe": ["PrintStarted", "Print*"]}
+
+to set their subscriptions (``["*"]`` for everything, replacing any earlier ones) and receive
+one line per matching event:
+
+    {"event": "PrintStarted", "payload": {...}}
+
+Every event is serialized only once regardless of the number of connected subscribers,
+fan-out and socket I/O happen on a single dedicated thread so the event loop only pays for
+one serialization and a queue append per event.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import collections
+import logging
+import os
+import selectors
+import socket
+import stat
+import threading
+
+import octoprint.events
+from octoprint.util.json import dumps, loads
+
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+class EventBridge:
+    """
+    Arguments:
+        path (str): Path of the Unix domain socket to listen on
+        event_manager (octoprint.events.EventManager): The event manager to publish, defaults
+            to the global instance
+        max_buffer (int): Maximum number of bytes to buffer per subscriber before it gets
+            disconnected as too slow
+        max_line (int): Maximum length of a line a subscriber may send before it gets
+            disconnected
+    """
+
+    def __init__(
+        self, path, event_manager=None, max_buffer=1024 * 1024, max_line=64 * 1024
+    ):
+        if event_manager is None:
+            event_manager = octoprint.events.eventManager()
+
+        self._path = path
+        self._event_manager = event_manager
+        self._max_buffer = max_buffer
+        self._max_line = max_line
+
+        self._logger = logging.getLogger(__name__)
+
+        self._selector = None
+        self._server = None
+        self._wakeup_r = None
+        self._wakeup_w = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+        self._outbox = collections.deque()
+        self._connections = set()
+
+        self._published = 0
+        self._disconnected_slow = 0
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def subscriber_count(self):
+        return len(self._connections)
+
+    def start(self):
+        if not is_supported():
+            raise RuntimeError("Unix domain sockets are not supported on this platform")
+
+        self._remove_stale_socket()
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self._path)
+        os.chmod(self._path, 0o600)
+        self._server.listen()
+        self._server.setblocking(False)
+
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="EventBridge")
+        self._thread.daemon = True
+        self._thread.start()
+
+        self._event_manager.subscribe(octoprint.events.ALL_EVENTS, self._on_event)
+        self._logger.info(f"Event bridge listening on {self._path}")
+
+    def stop(self, timeout=5.0):
+        self._event_manager.unsubscribe(octoprint.events.ALL_EVENTS, self._on_event)
+
+        self._stopped.set()
+        self._wakeup()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        for connection in list(self._connections):
+            self._close(connection)
+
+        for sock in (self._server, self._wakeup_r, self._wakeup_w):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        self._server = self._wakeup_r = self._wakeup_w = None
+
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+        self._remove_stale_socket()
+
+    def get_statistics(self):
+        return {
+            "subscribers": len(self._connections),
+            "published": self._published,
+            "disconnected_slow": self._disconnected_slow,
+        }
+
+    ##~~ event loop side, keep this cheap
+
+    def _on_event(self, event, payload):
+        if not self._connections:
+            return
+
+        try:
+            line = (dumps({"event": event, "payload": payload}) + "\n").encode("utf-8")
+        except Exception:
+            self._logger.exception(f"Could not serialize event {event} for the bridge")
+            return
+
+        self._outbox.append((event, line))
+        self._published += 1
+        self._wakeup()
+
+    def _wakeup(self):
+        if self._wakeup_w is None:
+            return
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            # buffer full means a wakeup is pending anyhow
+            pass
+
+    ##~~ I/O thread
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                for key, mask in self._selector.select(timeout=1.0):
+                    if key.fileobj is self._server:
+                        self._accept()
+                    elif key.fileobj is self._wakeup_r:
+                        self._drain_wakeup()
+                    else:
+                        connection = key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read(connection)
+                        if (
+                            mask & selectors.EVENT_WRITE
+                            and connection in self._connections
+                        ):
+                            self._write(connection)
+
+                self._distribute()
+        except Exception:
+            self._logger.exception("The event bridge crashed")
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except OSError:
+            return
+
+        sock.setblocking(False)
+        connection = _EventBridgeConnection(sock, max_line=self._max_line)
+        self._connections.add(connection)
+        self._selector.register(sock, selectors.EVENT_READ, data=connection)
+        self._logger.info(
+            f"Event bridge subscriber connected, {len(self._connections)} connected"
+        )
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self._close(connection)
+            return
+
+        try:
+            lines = connection.feed(data)
+        except ValueError:
+            self._logger.warning(
+                "Event bridge subscriber sent an overlong line, disconnecting it"
+            )
+            self._close(connection)
+            return
+
+        for line in lines:
+            try:
+                message = loads(line)
+                subscriptions = message["subscribe"]
+                if isinstance(subscriptions, str):
+                    subscriptions = [subscriptions]
+                connection.subscriptions = [str(x) for x in subscriptions]
+            except Exception:
+                self._logger.debug(f"Ignoring invalid event bridge message: {line!r}")
+
+    def _distribute(self):
+        while self._outbox:
+            event, line = self._outbox.popleft()
+            for connection in list(self._connections):
+                if not connection.subscriptions or not octoprint.events.event_matches(
+                    event, connection.subscriptions
+                ):
+                    continue
+
+                connection.queue(line)
+                if connection.pending > self._max_buffer:
+                    self._logger.warning(
+                        "Event bridge subscriber is too slow, disconnecting it"
+                    )
+                    self._disconnected_slow += 1
+                    self._close(connection)
+                    continue
+
+                self._write(connection)
+
+    def _write(self, connection):
+        try:
+            connection.flush()
+        except OSError:
+            self._close(connection)
+            return
+
+        events = selectors.EVENT_READ
+        if connection.pending:
+            events |= selectors.EVENT_WRITE
+        if connection.registered_events != events:
+            self._selector.modify(connection.sock, events, data=connection)
+            connection.registered_events = events
+
+    def _close(self, connection):
+        if connection not in self._connections:
+            return
+        self._connections.discard(connection)
+
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+
+        try:
+            connection.sock.close()
+        except OSError:
+            pass
+
+        self._logger.info(
+            f"Event bridge subscriber disconnected, {len(self._connections)} connected"
+        )
+
+    def _remove_stale_socket(self):
+        try:
+            if stat.S_ISSOCK(os.stat(self._path).st_mode):
+                os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+
+class _EventBridgeConnection:
+    def __init__(self, sock, max_line=64 * 1024):
+        self.sock = sock
+        self.max_line = max_line
+        self.subscriptions = []
+        self.registered_events = selectors.EVENT_READ
+
+        self._inbuffer = b""
+        self._outbuffer = collections.deque()
+        self._offset = 0
+        self.pending = 0
+
+    def feed(self, data):
+        self._inbuffer += data
+        *lines, self._inbuffer = self._inbuffer.split(b"\n")
+        if any(len(line) > self.max_line for line in lines + [self._inbuffer]):
+            raise ValueError(f"Line exceeds the maximum length of {self.max_line} bytes")
+        return [line for line in lines if line.strip()]
+
+    def queue(self, line):
+        self._outbuffer.append(line)
+        self.pending += len(line)
+
+    def flush(self):
+        while self._outbuffer:
+            chunk = self._outbuffer[0]
+            try:
+                sent = self.sock.send(memoryview(chunk)[self._offset :])
+            except BlockingIOError:
+                return
+
+            self._offset += sent
+            self.pending -= sent
+            if self._offset >= len(chunk):
+                self._outbuffer.popleft()
+                self._offset = 0
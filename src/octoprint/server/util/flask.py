@@ -4,6 +4,7 @@ __author__ = "Gina Häußge <osd@foosel.net>"
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2014 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+import collections
 import functools
 import hashlib
 import hmac
@@ -813,7 +814,7 @@ class LessSimpleCache(BaseCache):
     def _prune(self):
         if self.over_threshold():
             now = time.time()
-            for idx, (key, (expires, _)) in enumerate(self._cache.items()):
+            for idx, (key, (expires, _)) in enumerate(list(self._cache.items())):
                 if expires is not None and expires <= now or idx % 3 == 0:
                     with self._mutex:
                         self._cache.pop(key, None)
@@ -848,6 +849,11 @@ class LessSimpleCache(BaseCache):
         with self._mutex:
             self._cache.pop(key, None)
 
+    def delete_by_prefix(self, prefix):
+        with self._mutex:
+            for key in [key for key in self._cache if key.startswith(prefix)]:
+                del self._cache[key]
+
     def calculate_timeout(self, timeout=None):
         if timeout is None:
             timeout = self.default_timeout
@@ -874,6 +880,10 @@ class LessSimpleCache(BaseCache):
         with self._mutex:
             return key in self._cache
 
+    def __len__(self):
+        with self._mutex:
+            return len(self._cache)
+
     def set_bypassed(self, key):
         with self._mutex:
             self._bypassed.add(key)
@@ -885,6 +895,11 @@ class LessSimpleCache(BaseCache):
 
 _cache = LessSimpleCache()
 
+_cache_invalidation_mutex = threading.RLock()
+_cache_invalidation_events = collections.defaultdict(set)
+_cache_generations = collections.Counter()
+_cache_statistics = collections.defaultdict(collections.Counter)
+
 
 def cached(
     timeout=5 * 60,
@@ -892,13 +907,36 @@ def cached(
     unless=None,
     refreshif=None,
     unless_response=None,
+    name=None,
+    invalidated_by=None,
 ):
+    """
+    Caches the responses of the decorated view.
+
+    If a ``name`` is provided, cache keys get prefixed with it, hits and misses are
+    counted under it (see :func:`get_cache_statistics`) and all of its entries can be
+    dropped through :func:`invalidate_cache`. ``invalidated_by`` is a list of events
+    that do that automatically once :func:`on_cache_invalidation_event` is subscribed
+    to the event bus. Responses computed while an invalidation happened don't get stored.
+    """
+
+    if invalidated_by:
+        if name is None:
+            raise ValueError("Event invalidated caches need a name")
+        with _cache_invalidation_mutex:
+            for event in invalidated_by:
+                _cache_invalidation_events[event].add(name)
+
     def decorator(f):
         @functools.wraps(f)
         def decorated_function(*args, **kwargs):
             logger = logging.getLogger(__name__)
 
             cache_key = key()
+            if name is not None:
+                cache_key = f"{name}:{cache_key}"
+                with _cache_invalidation_mutex:
+                    generation = _cache_generations[name]
 
             def f_with_duration(*args, **kwargs):
                 start_time = time.time()
@@ -943,8 +981,15 @@ def cached(
                 )
                 if "X-From-Cache" not in rv.headers:
                     rv.headers["X-From-Cache"] = "true"
+                if name is not None:
+                    with _cache_invalidation_mutex:
+                        _cache_statistics[name]["hits"] += 1
                 return rv
 
+            if name is not None:
+                with _cache_invalidation_mutex:
+                    _cache_statistics[name]["misses"] += 1
+
             # get value from wrapped function
             logger.debug(
                 "No cache entry or refreshing cache for {path} (key: {key}), calling wrapped function".format(
@@ -963,8 +1008,13 @@ def cached(
                 _cache.set_bypassed(cache_key)
                 return rv
 
-            # store it in the cache
-            _cache.set(cache_key, rv, timeout=timeout)
+            # store it in the cache, unless it got invalidated while we were busy
+            if name is not None:
+                with _cache_invalidation_mutex:
+                    if generation == _cache_generations[name]:
+                        _cache.set(cache_key, rv, timeout=timeout)
+            else:
+                _cache.set(cache_key, rv, timeout=timeout)
 
             return rv
 
@@ -973,6 +1023,123 @@ def cached(
     return decorator
 
 
+def invalidate_cache(name):
+    """
+    Drops all entries of the named cache, see :func:`cached`.
+    """
+    with _cache_invalidation_mutex:
+        _cache_generations[name] += 1
+        _cache_statistics[name]["invalidations"] += 1
+        _cache.delete_by_prefix(f"{name}:")
+
+
+def on_cache_invalidation_event(event, payload):
+    """
+    Event listener invalidating all caches registered for ``event`` through
+    :func:`cached`'s ``invalidated_by``. Should be subscribed as immediate listener
+    for all events, so caches are invalidated before anyone is notified about the event.
+    """
+    with _cache_invalidation_mutex:
+        names = list(_cache_invalidation_events.get(event, ()))
+        for name in names:
+            invalidate_cache(name)
+
+
+def get_cache_statistics():
+    """
+    Returns:
+        dict: The number of cache entries and per named cache the hits, misses and invalidations
+    """
+    with _cache_invalidation_mutex:
+        result = {"entries": len(_cache)}
+        for name, counters in _cache_statistics.items():
+            result[name] = {
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "invalidations": counters["invalidations"],
+            }
+        return result
+
+
+def api_cache_key(*extra):
+    """
+    Builds a cache key for an API response from the requesting user's permission set, the
+    locale, the url root, the path, the query and any ``extra`` values.
+    """
+    user = flask_login.current_user
+    needs = sorted(repr(need) for need in user.needs) if user else []
+
+    return "api:{}:{}".format(
+        hashlib.sha1(
+            repr(
+                (
+                    needs,
+                    str(flask.g.get("locale")),
+                    flask.request.url_root,
+                    flask.request.path,
+                    sorted(flask.request.args.items(multi=True)),
+                    extra,
+                )
+            ).encode("utf-8")
+        ).hexdigest(),
+        flask.request.path,
+    )
+
+
+def cached_api_response(name, invalidated_by, unless=None, key_values=None):
+    """
+    Caches successful responses of a GET API endpoint until one of the ``invalidated_by``
+    events is fired.
+
+    Entries are kept per permission set and locale, see :func:`api_cache_key`, and
+    ``key_values`` may return additional values the response depends on. Conditional
+    requests are answered from the cached response's ``ETag`` and ``Last-Modified``
+    headers, so this should be applied outside of :func:`with_revalidation_checking`.
+    """
+
+    def key():
+        return api_cache_key(*(key_values() if callable(key_values) else ()))
+
+    def decorator(f):
+        view = cached(
+            timeout=-1,
+            key=key,
+            unless=unless,
+            unless_response=lambda response: cache_check_status_code(response, [200]),
+            name=name,
+            invalidated_by=invalidated_by,
+        )(f)
+
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            from octoprint.server import NOT_MODIFIED
+
+            response = view(*args, **kwargs)
+            if not isinstance(response, flask.Response) or response.status_code != 200:
+                return response
+
+            etag, _ = response.get_etag()
+            if flask.request.if_none_match and flask.request.if_modified_since:
+                not_modified = check_etag(etag) and check_lastmodified(
+                    response.last_modified
+                )
+            elif flask.request.if_none_match:
+                not_modified = check_etag(etag)
+            elif flask.request.if_modified_since:
+                not_modified = check_lastmodified(response.last_modified)
+            else:
+                not_modified = False
+
+            if not_modified and not (callable(unless) and unless()):
+                return NOT_MODIFIED
+
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
 def is_in_cache(key=lambda: "view:%s" % flask.request.path):
     if callable(key):
         key = key()
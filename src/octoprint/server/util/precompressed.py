@@ -0,0 +1,138 @@
+"""
+On-disk cache of gzip compressed copies of downloadable files.
+
+Compressible downloads like GCODE files or logs can be sent to clients accepting gzip encoding as compressed copies
+from this cache, without having to compress them again on every request.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import concurrent.futures
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+from octoprint.util import silent_remove
+
+COMPRESSION_LEVEL = 6
+
+
+class PrecompressedCache:
+    """
+    Cache of gzip compressed copies of files, stored in ``folder``.
+
+    Copies are identified by the path, modification time and size of the original file, so a changed file
+    automatically invalidates its copy. Missing copies are created in the background, in the meantime the original
+    file should be served. Once the cache grows beyond ``max_size`` the least recently used copies are removed.
+
+    Arguments:
+        folder (str): The folder to store the compressed copies in
+        max_size (int): Maximum combined size of all compressed copies in bytes
+        min_size (int): Files smaller than this aren't worth compressing and won't be cached
+        min_age (int): Files modified less than this many seconds ago are probably still being written to, e.g.
+            the current log file, and won't be cached either
+    """
+
+    def __init__(self, folder, max_size=512 * 1024 * 1024, min_size=1024, min_age=60):
+        self._logger = logging.getLogger(__name__)
+
+        self._folder = folder
+        self._max_size = max_size
+        self._min_size = min_size
+        self._min_age = min_age
+
+        self._pending = set()
+        self._mutex = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        os.makedirs(folder, exist_ok=True)
+
+    def get(self, path):
+        """
+        Returns the path of the compressed copy of ``path``, if there is one.
+
+        If there isn't, the copy gets created in the background if the file qualifies for caching.
+
+        Arguments:
+            path (str): The path of the original file
+
+        Returns:
+            str or None: The path of the compressed copy, or None if there's none (yet)
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        if stat.st_size < self._min_size or time.time() - stat.st_mtime < self._min_age:
+            return None
+
+        key = self._key(path)
+        cached = os.path.join(self._folder, f"{key}-{stat.st_mtime_ns}-{stat.st_size}.gz")
+        if os.path.isfile(cached):
+            try:
+                # mark as recently used
+                os.utime(cached)
+            except OSError:
+                pass
+            return cached
+
+        with self._mutex:
+            if cached not in self._pending:
+                self._pending.add(cached)
+                self._executor.submit(self._compress, path, key, cached)
+
+        return None
+
+    def _key(self, path):
+        return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+
+    def _compress(self, path, key, cached):
+        temp = cached + ".tmp"
+        try:
+            with open(path, "rb") as source, gzip.open(
+                temp, "wb", compresslevel=COMPRESSION_LEVEL
+            ) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+            # make sure the file didn't change while we were compressing it
+            stat = os.stat(path)
+            if not cached.endswith(f"-{stat.st_mtime_ns}-{stat.st_size}.gz"):
+                silent_remove(temp)
+                return
+
+            os.replace(temp, cached)
+            self._logger.debug(f"Created compressed copy of {path} at {cached}")
+
+            # remove outdated copies of the same file
+            for entry in os.scandir(self._folder):
+                if entry.name.startswith(key + "-") and entry.path != cached:
+                    silent_remove(entry.path)
+
+            self._cleanup()
+        except Exception:
+            self._logger.exception(f"Error while creating compressed copy of {path}")
+            silent_remove(temp)
+        finally:
+            with self._mutex:
+                self._pending.discard(cached)
+
+    def _cleanup(self):
+        entries = []
+        for entry in os.scandir(self._folder):
+            if not entry.is_file() or not entry.name.endswith(".gz"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self._max_size:
+                break
+            silent_remove(path)
+            total -= size
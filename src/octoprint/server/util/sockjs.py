@@ -2,10 +2,14 @@ __author__ = "Gina Häußge <osd@foosel.net>"
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2014 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+import copy
+import heapq
+import itertools
 import logging
 import re
 import threading
 import time
+import weakref
 
 import wrapt
 
@@ -18,6 +22,7 @@ import octoprint.timelapse
 import octoprint.vendor.sockjs.tornado
 import octoprint.vendor.sockjs.tornado.proto
 import octoprint.vendor.sockjs.tornado.session
+import octoprint.vendor.sockjs.tornado.transports.rawwebsocket
 import octoprint.vendor.sockjs.tornado.util
 from octoprint.access.groups import GroupChangeListener
 from octoprint.access.permissions import Permissions
@@ -26,6 +31,8 @@ from octoprint.events import Events
 from octoprint.settings import settings
 from octoprint.util import RepeatedTimer
 from octoprint.util.json import dumps as json_dumps
+from octoprint.util.msgpack import packb as msgpack_packb
+from octoprint.util.msgpack import packb_map_header, packb_map_items
 from octoprint.util.version import get_python_version_string
 
 
@@ -70,6 +77,376 @@ class JsonEncodingSessionWrapper(wrapt.ObjectProxy):
             stats,
         )
 
+    def send_encoded(self, frame, stats=True, kind=None):
+        """Sends an already JSON encoded message frame as is."""
+        self.send_jsonified(frame, stats, kind=kind)
+
+
+class SplicedPayload(dict):
+    """
+    A payload made up of a part ``shared`` between all sessions and a session specific
+    part ``extras``.
+
+    Behaves like the merged ``dict`` of both for anything looking at it, but allows the
+    frame encoders to encode the shared part only once per :class:`Broadcast`.
+    """
+
+    def __init__(self, shared, extras):
+        dict.__init__(self, shared)
+        self.update(extras)
+        self.shared = shared
+        self.extras = extras
+
+
+class FrameEncoder:
+    """
+    Encodes push messages into JSON frames.
+
+    Keeps count of the frames it had to encode for broadcasts (misses) and of those it
+    could share with other sessions instead (hits).
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._prefixes = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, type, payload):
+        return self._dumps({type: payload})
+
+    def encode_shared(self, shared):
+        """Encodes the shared part of a :class:`SplicedPayload` for :meth:`splice`."""
+        return self._dumps(shared)
+
+    def splice(self, type, shared, extras):
+        """
+        Combines the ``shared`` part of a payload as encoded by :meth:`encode_shared` with
+        the session specific ``extras`` into a frame of ``type``.
+        """
+        extras = self._dumps(extras)
+
+        # '{...}' + '{...}' => '{"<type>":{...,...}}'
+        if extras == "{}":
+            merged = shared
+        elif shared == "{}":
+            merged = extras
+        else:
+            merged = shared[:-1] + "," + extras[1:]
+        prefix = self._prefixes.get(type)
+        if prefix is None:
+            prefix = self._prefixes[type] = self._dumps({type: 0})[:-2]
+        return prefix + merged + "}"
+
+    def _dumps(self, obj):
+        return json_dumps(obj)
+
+    def record(self, hit):
+        with self._mutex:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_statistics(self):
+        with self._mutex:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class BinaryFrameEncoder(FrameEncoder):
+    """
+    Like :class:`FrameEncoder`, but encodes push messages into binary MessagePack frames.
+
+    MessagePack maps can't be concatenated, so the shared part of spliced payloads is
+    packed into map entries without a header, which get combined with the session
+    specific entries under a new header.
+    """
+
+    def encode_shared(self, shared):
+        return len(shared), packb_map_items(shared)
+
+    def splice(self, type, shared, extras):
+        count, items = shared
+
+        prefix = self._prefixes.get(type)
+        if prefix is None:
+            prefix = self._prefixes[type] = packb_map_header(1) + self._dumps(type)
+
+        return b"".join(
+            (
+                prefix,
+                packb_map_header(count + len(extras)),
+                items,
+                packb_map_items(extras),
+            )
+        )
+
+    def _dumps(self, obj):
+        return msgpack_packb(obj)
+
+
+class Broadcast:
+    """
+    A push message sent to any number of sessions.
+
+    The :class:`PushBroadcaster` creates a single broadcast per printer update, event or
+    plugin message and hands it to all sessions. Its frames are encoded by the first
+    session of every group of sessions (see :meth:`PrinterStateConnection._get_group`)
+    and then shared with all other members of that group.
+
+    ``payload`` is shared by all sessions as well and must not be modified.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+
+        self._frames = {}
+        self._mutex = threading.Lock()
+
+    def frame(self, group, encoder, encode):
+        """
+        Returns the frame of ``group`` encoded by ``encoder``, calling ``encode`` to create
+        it if this is the first member of the group asking for it.
+        """
+        key = (group, encoder)
+        with self._mutex:
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = self._frames[key] = encode()
+                encoder.record(False)
+            else:
+                encoder.record(True)
+            return frame
+
+
+class PushBroadcaster(octoprint.printer.PrinterCallback):
+    """
+    Fans printer updates, events and plugin messages out to the push sessions.
+
+    Instead of every session, only the broadcaster is registered with the printer, the
+    event manager and the plugin manager. It wraps each message into a single
+    :class:`Broadcast` shared by all sessions, so the printer state is copied once per
+    update instead of once per session, and every message gets encoded once per group of
+    sessions.
+
+    Sessions receive plugin messages once they have been added via :meth:`add_receiver`,
+    and printer updates and events once they have been registered via :meth:`register`.
+    Use :meth:`get` to get the broadcaster for a set of components.
+    """
+
+    _instances = {}
+    _instances_mutex = threading.Lock()
+
+    @classmethod
+    def get(cls, printer, event_manager, plugin_manager):
+        key = (id(printer), id(event_manager), id(plugin_manager))
+        with cls._instances_mutex:
+            broadcaster = cls._instances.get(key)
+            if broadcaster is None:
+                broadcaster = cls._instances[key] = cls(
+                    printer, event_manager, plugin_manager
+                )
+            return broadcaster
+
+    def __init__(self, printer, event_manager, plugin_manager):
+        self._logger = logging.getLogger(__name__)
+
+        self._printer = printer
+        self._event_manager = event_manager
+        self._plugin_manager = plugin_manager
+
+        self._receivers = []
+        self._registered = []
+        self._awaiting_initial = []
+        self._mutex = threading.RLock()
+
+    def add_receiver(self, connection):
+        """Adds ``connection`` to the receivers of plugin messages."""
+        with self._mutex:
+            if connection in self._receivers:
+                return
+            self._receivers.append(connection)
+            if len(self._receivers) == 1:
+                self._plugin_manager.register_message_receiver(self.on_plugin_message)
+
+    def remove_receiver(self, connection):
+        with self._mutex:
+            if connection not in self._receivers:
+                return
+            self._receivers.remove(connection)
+            if not self._receivers:
+                self._plugin_manager.unregister_message_receiver(self.on_plugin_message)
+
+    def register(self, connection):
+        """Adds ``connection`` to the receivers of printer updates and events."""
+        with self._mutex:
+            if connection in self._registered:
+                return
+            self._registered.append(connection)
+            if len(self._registered) == 1:
+                self._printer.register_callback(self)
+                for event in octoprint.events.all_events():
+                    self._event_manager.subscribe(event, self._on_event)
+
+    def unregister(self, connection):
+        with self._mutex:
+            if connection in self._awaiting_initial:
+                self._awaiting_initial.remove(connection)
+            if connection not in self._registered:
+                return
+            self._registered.remove(connection)
+            if not self._registered:
+                self._printer.unregister_callback(self)
+                for event in octoprint.events.all_events():
+                    self._event_manager.unsubscribe(event, self._on_event)
+
+    def send_initial_data(self, connection):
+        """Has the printer send its initial data to the registered ``connection``."""
+        with self._mutex:
+            if connection not in self._registered:
+                return
+            if connection not in self._awaiting_initial:
+                self._awaiting_initial.append(connection)
+        self._printer.send_initial_callback(self)
+
+    def on_printer_send_initial_data(self, data):
+        with self._mutex:
+            connections = self._awaiting_initial
+            self._awaiting_initial = []
+
+        for index, connection in enumerate(connections):
+            # every session gets its own initial data to keep
+            self._call(
+                connection.on_printer_send_initial_data,
+                data if index == 0 else copy.deepcopy(data),
+            )
+
+    def on_printer_send_current_data(self, data):
+        broadcast = Broadcast(data)
+        for connection in self._get_registered():
+            self._call(connection.on_printer_send_current_data, data, broadcast=broadcast)
+
+    def on_printer_add_log(self, data):
+        for connection in self._get_registered():
+            self._call(connection.on_printer_add_log, data)
+
+    def on_printer_add_message(self, data):
+        for connection in self._get_registered():
+            self._call(connection.on_printer_add_message, data)
+
+    def on_printer_add_temperature(self, data):
+        for connection in self._get_registered():
+            self._call(connection.on_printer_add_temperature, data)
+
+    def on_plugin_message(self, plugin, data, permissions=None):
+        broadcast = Broadcast(data)
+        with self._mutex:
+            connections = list(self._receivers)
+
+        for connection in connections:
+            self._call(
+                connection.on_plugin_message,
+                plugin,
+                data,
+                permissions=permissions,
+                broadcast=broadcast,
+            )
+
+    def _on_event(self, event, payload):
+        broadcast = Broadcast(payload)
+        for connection in self._get_registered():
+            self._call(connection._onEvent, event, payload, broadcast=broadcast)
+
+    def _get_registered(self):
+        with self._mutex:
+            return list(self._registered)
+
+    def _call(self, callback, *args, **kwargs):
+        try:
+            callback(*args, **kwargs)
+        except Exception:
+            self._logger.exception(f"Error while broadcasting to {callback!r}")
+
+
+class ThrottleScheduler:
+    """
+    Runs delayed calls for any number of keys on a single shared thread.
+
+    Every key has at most one pending call, scheduling a new call for a key replaces its
+    pending one. Used to flush throttled push updates without spinning up a new timer
+    thread per held back update.
+    """
+
+    def __init__(self, name="ThrottleScheduler"):
+        self._name = name
+        self._logger = logging.getLogger(__name__)
+
+        self._pending = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, delay, callback, *args):
+        """
+        Schedules ``callback`` to be called with ``args`` after ``delay`` seconds, replacing
+        any call still pending for ``key``.
+        """
+        deadline = time.monotonic() + delay
+        with self._condition:
+            self._pending[key] = (deadline, callback, args)
+            heapq.heappush(self._heap, (deadline, next(self._counter), key))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name)
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._condition.notify()
+
+    def cancel(self, key):
+        """Cancels the call pending for ``key``, if any."""
+        with self._condition:
+            self._pending.pop(key, None)
+
+    def is_pending(self, key):
+        with self._condition:
+            return key in self._pending
+
+    def _next(self):
+        with self._condition:
+            while True:
+                # drop cancelled or replaced entries
+                while self._heap:
+                    deadline, _, key = self._heap[0]
+                    pending = self._pending.get(key)
+                    if pending is not None and pending[0] == deadline:
+                        break
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                deadline, _, key = self._heap[0]
+                timeout = deadline - time.monotonic()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+
+                heapq.heappop(self._heap)
+                _, callback, args = self._pending.pop(key)
+                return callback, args
+
+    def _run(self):
+        while True:
+            callback, args = self._next()
+            try:
+                callback(*args)
+            except Exception:
+                self._logger.exception(f"Error while running scheduled call {callback!r}")
+
 
 class PrinterStateConnection(
     octoprint.vendor.sockjs.tornado.SockJSConnection,
@@ -101,6 +478,7 @@ class PrinterStateConnection(
     _emit_permissions = {
         "connected": [],
         "reauthRequired": [],
+        "transport": [],
         "plugin": lambda payload: (
             []
             if payload.get("plugin") in ("backup", "softwareupdate")
@@ -112,6 +490,38 @@ class PrinterStateConnection(
 
     _unauthed_backlog_max = 100
 
+    _frame_encoder = FrameEncoder()
+    _binary_frame_encoder = BinaryFrameEncoder()
+
+    _transport_encodings = ("json", "msgpack")
+    _binary_types = ("current", "history")
+    _throttle_scheduler = ThrottleScheduler(name="PushThrottle")
+
+    _connections = weakref.WeakSet()
+
+    @classmethod
+    def get_statistics(cls):
+        """
+        Returns:
+            dict: Number of open push sessions, their send queue depths in messages and
+                bytes and the frame encoders' counts of shared (hits) and encoded (misses)
+                broadcast frames
+        """
+        depths = []
+        sizes = []
+        for connection in list(cls._connections):
+            session = connection.session
+            depths.append(getattr(session, "send_queue_depth", 0))
+            sizes.append(getattr(session, "send_queue_size", 0))
+
+        return {
+            "sessions": len(depths),
+            "queue_depths": depths,
+            "queue_sizes": sizes,
+            "frames": cls._frame_encoder.get_statistics(),
+            "binary_frames": cls._binary_frame_encoder.get_statistics(),
+        }
+
     def __init__(
         self,
         printer,
@@ -157,9 +567,10 @@ class PrinterStateConnection(
         self._last_current = 0
         self._base_rate_limit = 0.5
 
-        self._held_back_current = None
         self._held_back_mutex = threading.RLock()
 
+        self._encoding = "json"
+
         self._register_hooks = self._pluginManager.get_hooks(
             "octoprint.server.sockjs.register"
         )
@@ -168,6 +579,11 @@ class PrinterStateConnection(
         )
         self._emit_hooks = self._pluginManager.get_hooks("octoprint.server.sockjs.emit")
 
+        self._broadcaster = PushBroadcaster.get(
+            self._printer, self._eventManager, self._pluginManager
+        )
+        self._group = None
+
         self._registered = False
         self._authed = False
         self._initial_data_sent = False
@@ -179,6 +595,8 @@ class PrinterStateConnection(
             60, self._keep_alive_callback, condition=lambda: self._authed
         )
 
+        self._connections.add(self)
+
     @staticmethod
     def _get_remote_address(info):
         from octoprint.util.net import get_http_client_ip
@@ -205,7 +623,7 @@ class PrinterStateConnection(
             return f"Unconnected {self!r}"
 
     def on_open(self, info):
-        self._pluginManager.register_message_receiver(self.on_plugin_message)
+        self._broadcaster.add_receiver(self)
         self._remoteAddress = self._get_remote_address(info)
         self._logger.info("New connection from client: %s" % self._remoteAddress)
 
@@ -264,6 +682,7 @@ class PrinterStateConnection(
         self._userManager.unregister_login_status_listener(self)
 
         self._unregister()
+        self._throttle_scheduler.cancel(self)
         self._eventManager.fire(
             Events.CLIENT_CLOSED, {"remoteAddress": self._remoteAddress}
         )
@@ -272,7 +691,7 @@ class PrinterStateConnection(
 
         self._on_logout()
         self._remoteAddress = None
-        self._pluginManager.unregister_message_receiver(self.on_plugin_message)
+        self._broadcaster.remove_receiver(self)
 
     def on_message(self, message):
         try:
@@ -334,6 +753,37 @@ class PrinterStateConnection(
                     )
                 )
 
+        elif "transport" in message:
+            try:
+                encoding = message["transport"].get("encoding", "json")
+                if encoding not in self._transport_encodings:
+                    raise ValueError(f"unknown encoding {encoding}")
+            except (AttributeError, ValueError) as e:
+                self._logger.warning(
+                    "Got invalid transport message from client {}, ignoring: {!r} ({})".format(
+                        self._remoteAddress, message["transport"], str(e)
+                    )
+                )
+            else:
+                if encoding == "msgpack" and not self._supports_binary():
+                    encoding = "json"
+
+                self._encoding = encoding
+                self._logger.debug(
+                    "Set transport encoding for client {} to {}".format(
+                        self._remoteAddress, self._encoding
+                    )
+                )
+                self._emit(
+                    "transport",
+                    {
+                        "encoding": self._encoding,
+                        "types": list(self._binary_types)
+                        if self._encoding == "msgpack"
+                        else [],
+                    },
+                )
+
         elif "subscribe" in message:
             if not self._subscriptions_active:
                 self._subscriptions_active = True
@@ -387,16 +837,17 @@ class PrinterStateConnection(
                 self._subscriptions["state"] = state
                 self._subscriptions["plugins"] = plugins
                 self._subscriptions["events"] = events
+                self._group = None
 
                 if state and state != old_state:
                     # state is requested and was changed from previous state
                     # we should send a history message to send the update data
-                    self._printer.send_initial_callback(self)
+                    self._broadcaster.send_initial_data(self)
                 elif old_state and not state:
                     # we no longer should send state updates
                     self._initial_data_sent = False
 
-    def on_printer_send_current_data(self, data):
+    def on_printer_send_current_data(self, data, broadcast=None):
         if not self._user.has_permission(Permissions.STATUS):
             return
 
@@ -407,24 +858,21 @@ class PrinterStateConnection(
             self._logger.debug("Initial data not yet send, dropping current message")
             return
 
-        # make sure we rate limit the updates according to our throttle factor
+        # make sure we rate limit the updates according to our throttle factor,
+        # holding back only the latest update until we are allowed to send again
         with self._held_back_mutex:
-            if self._held_back_current is not None:
-                self._held_back_current.cancel()
-                self._held_back_current = None
-
-            now = time.time()
+            now = time.monotonic()
             delta = (
                 self._last_current + self._base_rate_limit * self._throttle_factor - now
             )
             if delta > 0:
-                self._held_back_current = threading.Timer(
-                    delta, lambda: self.on_printer_send_current_data(data)
+                self._throttle_scheduler.schedule(
+                    self, delta, self.on_printer_send_current_data, data, broadcast
                 )
-                self._held_back_current.start()
                 return
 
-        self._last_current = now
+            self._throttle_scheduler.cancel(self)
+            self._last_current = now
 
         # add current temperature, log and message backlogs to sent data
         with self._temperatureBacklogMutex:
@@ -459,22 +907,23 @@ class PrinterStateConnection(
                 }
             )
 
-        data.update(
-            {
-                "serverTime": time.time(),
-                "temps": temperatures,
-                "busyFiles": busy_files,
-                "markings": list(self._printer.get_markings()),
-            }
-        )
+        extras = {
+            "serverTime": time.time(),
+            "temps": temperatures,
+            "busyFiles": busy_files,
+            "markings": list(self._printer.get_markings()),
+        }
         if self._user.has_permission(Permissions.MONITOR_TERMINAL):
-            data.update(
+            extras.update(
                 {
                     "logs": self._filter_logs(logs),
                     "messages": messages,
                 }
             )
-        self._emit("current", payload=data)
+
+        if broadcast is None:
+            broadcast = Broadcast(data)
+        self._emit("current", payload=SplicedPayload(data, extras), broadcast=broadcast)
 
     def on_printer_send_initial_data(self, data):
         self._initial_data_sent = True
@@ -507,7 +956,7 @@ class PrinterStateConnection(
     def _filter_messages(self, messages):
         return self._filter_state_subscription("messages", messages)
 
-    def sendEvent(self, type, payload=None):
+    def sendEvent(self, type, payload=None, broadcast=None):
         permissions = self._event_permissions.get(type, self._event_permissions["*"])
         permissions = [x(self._user) if callable(x) else x for x in permissions]
         if not self._user or not all(
@@ -521,7 +970,9 @@ class PrinterStateConnection(
         for processor in processors:
             payload = processor(self._user, payload)
 
-        self._emit("event", payload={"type": type, "payload": payload})
+        self._emit(
+            "event", payload={"type": type, "payload": payload}, broadcast=broadcast
+        )
 
     def sendTimelapseConfig(self, timelapseConfig):
         self._emit("timelapse", payload=timelapseConfig)
@@ -544,7 +995,7 @@ class PrinterStateConnection(
     def sendRenderProgress(self, progress):
         self._emit("renderProgress", {"progress": progress})
 
-    def on_plugin_message(self, plugin, data, permissions=None):
+    def on_plugin_message(self, plugin, data, permissions=None, broadcast=None):
         if (
             self._subscriptions_active
             and self._subscriptions["plugins"] is not None
@@ -553,7 +1004,10 @@ class PrinterStateConnection(
             return
 
         self._emit(
-            "plugin", payload={"plugin": plugin, "data": data}, permissions=permissions
+            "plugin",
+            payload={"plugin": plugin, "data": data},
+            permissions=permissions,
+            broadcast=broadcast,
         )
 
     def on_printer_add_log(self, data):
@@ -585,6 +1039,7 @@ class PrinterStateConnection(
 
     def on_user_modified(self, user):
         if user.get_id() == self._user.get_id():
+            self._group = None
             self._sendReauthRequired("modified")
 
     def on_user_removed(self, userid):
@@ -594,14 +1049,16 @@ class PrinterStateConnection(
             self._sendReauthRequired("removed")
 
     def on_group_permissions_changed(self, group, added=None, removed=None):
+        self._group = None
         if self._user.is_anonymous and group == self._groupManager.guest_group:
             self._sendReauthRequired("modified")
 
     def on_group_subgroups_changed(self, group, added=None, removed=None):
+        self._group = None
         if self._user.is_anonymous and group == self._groupManager.guest_group:
             self._sendReauthRequired("modified")
 
-    def _onEvent(self, event, payload):
+    def _onEvent(self, event, payload, broadcast=None):
         if (
             self._subscriptions_active
             and self._subscriptions["events"] is not None
@@ -609,7 +1066,7 @@ class PrinterStateConnection(
         ):
             return
 
-        self.sendEvent(event, payload)
+        self.sendEvent(event, payload, broadcast=broadcast)
 
     def _register(self):
         """Register this socket with the system if STATUS permission is available."""
@@ -633,17 +1090,13 @@ class PrinterStateConnection(
         if not self._user.has_permission(Permissions.STATUS):
             return
 
-        # printer
-        self._printer.register_callback(self)
-        self._printer.send_initial_callback(self)
+        # printer & events
+        self._broadcaster.register(self)
+        self._broadcaster.send_initial_data(self)
 
         # files
         self._fileManager.register_slicingprogress_callback(self)
 
-        # events
-        for event in octoprint.events.all_events():
-            self._eventManager.subscribe(event, self._onEvent)
-
         # timelapse
         octoprint.timelapse.register_callback(self)
         octoprint.timelapse.notify_callback(self, timelapse=octoprint.timelapse.current)
@@ -664,11 +1117,9 @@ class PrinterStateConnection(
     def _unregister(self):
         """Unregister this socket from the system"""
 
-        self._printer.unregister_callback(self)
+        self._broadcaster.unregister(self)
         self._fileManager.unregister_slicingprogress_callback(self)
         octoprint.timelapse.unregister_callback(self)
-        for event in octoprint.events.all_events():
-            self._eventManager.unsubscribe(event, self._onEvent)
 
     def _reregister(self):
         """Unregister and register again"""
@@ -678,7 +1129,13 @@ class PrinterStateConnection(
     def _sendReauthRequired(self, reason):
         self._emit("reauthRequired", payload={"reason": reason})
 
-    def _emit(self, type, payload=None, permissions=None):
+    def _emit(self, type, payload=None, permissions=None, broadcast=None):
+        if self._emit_hooks and broadcast is not None:
+            # the payload is shared with all other sessions, hooks get their own copy
+            # to modify
+            payload = copy.deepcopy(payload)
+            broadcast = None
+
         proceed = True
         for name, hook in self._emit_hooks.items():
             try:
@@ -720,11 +1177,35 @@ class PrinterStateConnection(
                         )
             return
 
-        self._do_emit(type, payload)
+        self._do_emit(type, payload, broadcast=broadcast)
+
+    def _supports_binary(self):
+        """Binary frames can only be sent to clients connected through the raw websocket."""
+        return isinstance(
+            self.session,
+            octoprint.vendor.sockjs.tornado.transports.rawwebsocket.RawSession,
+        ) and settings().getBoolean(["server", "push", "binary"])
 
-    def _do_emit(self, type, payload):
+    def _do_emit(self, type, payload, broadcast=None):
         try:
-            self.send({type: payload})
+            if self._encoding == "msgpack" and type in self._binary_types:
+                self.send(
+                    self._encode(self._binary_frame_encoder, type, payload, broadcast),
+                    binary=True,
+                )
+            elif isinstance(self.session, JsonEncodingSessionWrapper):
+                if not self.is_closed:
+                    self.session.send_encoded(
+                        self._encode(self._frame_encoder, type, payload, broadcast),
+                        kind=type,
+                    )
+            elif isinstance(
+                self.session,
+                octoprint.vendor.sockjs.tornado.transports.rawwebsocket.RawSession,
+            ):
+                self.send(self._encode(self._frame_encoder, type, payload, broadcast))
+            else:
+                self.send({type: payload})
         except Exception as e:
             if self._logger.isEnabledFor(logging.DEBUG):
                 self._logger.exception(
@@ -737,8 +1218,55 @@ class PrinterStateConnection(
                     )
                 )
 
+    def _encode(self, encoder, type, payload, broadcast):
+        if broadcast is None:
+            return encoder.encode(type, payload)
+
+        if isinstance(payload, SplicedPayload):
+            # the shared part is the same for everyone allowed to see it
+            shared = broadcast.frame(
+                None, encoder, lambda: encoder.encode_shared(payload.shared)
+            )
+            return encoder.splice(type, shared, payload.extras)
+
+        return broadcast.frame(
+            self._get_group(), encoder, lambda: encoder.encode(type, payload)
+        )
+
+    def _get_group(self):
+        """
+        Sessions with the same effective permissions and subscriptions get the same
+        messages, so they share the encoded frames of broadcasts.
+        """
+        group = self._group
+        if group is None:
+
+            def subscription_key(value):
+                if isinstance(value, re.Pattern):
+                    return value.pattern
+                elif isinstance(value, dict):
+                    return tuple(
+                        sorted((k, subscription_key(v)) for k, v in value.items())
+                    )
+                elif isinstance(value, list):
+                    return tuple(str(x) for x in value)
+                return value
+
+            permissions = frozenset(p.key for p in self._user.effective_permissions)
+            subscriptions = (
+                tuple(
+                    subscription_key(self._subscriptions[key])
+                    for key in ("state", "plugins", "events")
+                )
+                if self._subscriptions_active
+                else None
+            )
+            group = self._group = (permissions, subscriptions)
+        return group
+
     def _on_login(self, user):
         self._user = user
+        self._group = None
         self._logger.info(
             "User {} logged in on the socket from client {}".format(
                 user.get_name(), self._remoteAddress
@@ -779,6 +1307,7 @@ class PrinterStateConnection(
 
     def _on_logout(self):
         self._user = self._userManager.anonymous_user_factory()
+        self._group = None
         self._authed = False
 
         for name, hook in self._authed_hooks.items():
@@ -8,7 +8,8 @@ import mimetypes
 import os
 import re
 import sys
-from urllib.parse import urlparse
+import time
+from urllib.parse import parse_qsl, urlparse
 
 import tornado
 import tornado.escape
@@ -24,7 +25,6 @@ import tornado.util
 import tornado.web
 from tornado.concurrent import dummy_executor
 from tornado.ioloop import IOLoop
-from zipstream.ng import ZIP_DEFLATED, ZipStream
 
 import octoprint.util
 import octoprint.util.net
@@ -50,18 +50,61 @@ def fix_json_encode():
     tornado.escape.json_encode = fixed_json_encode
 
 
-def enable_per_message_deflate_extension():
+def enable_per_message_deflate_extension(
+    compression_level=1, mem_level=1, window_bits=None
+):
     """
     This configures tornado.websocket.WebSocketHandler.get_compression_options to support the permessage-deflate extension
     to the websocket protocol, minimizing data bandwidth if clients support the extension as well
+
+    If ``window_bits`` is set, the server side compression window is limited to that many bits by adding a
+    ``server_max_window_bits`` parameter to the client's extension offer unless it already asks for a smaller
+    window, which tornado then uses and confirms in its response as allowed by RFC 7692, Section 7.1.2.1.
     """
 
+    compression_level = min(max(int(compression_level), 0), 9)
+    mem_level = min(max(int(mem_level), 1), 9)
+    if window_bits is not None:
+        window_bits = min(max(int(window_bits), 9), 15)
+
     def get_compression_options(self):
-        return {"compression_level": 1, "mem_level": 1}
+        if window_bits is not None:
+            _limit_server_window_bits(self.request.headers, window_bits)
+        return {"compression_level": compression_level, "mem_level": mem_level}
 
     tornado.websocket.WebSocketHandler.get_compression_options = get_compression_options
 
 
+def _limit_server_window_bits(headers, window_bits):
+    header = headers.get("Sec-WebSocket-Extensions")
+    if not header:
+        return
+
+    extensions = []
+    for extension in header.split(","):
+        params = [param.strip() for param in extension.split(";")]
+        if params[0] == "permessage-deflate":
+            offered = None
+            for index, param in enumerate(params[1:], 1):
+                name, _, value = param.partition("=")
+                if name.strip() == "server_max_window_bits":
+                    offered = index, value.strip().strip('"')
+
+            if offered is None:
+                params.append(f"server_max_window_bits={window_bits}")
+            else:
+                index, value = offered
+                try:
+                    value = int(value)
+                except ValueError:
+                    value = 15
+                params[index] = f"server_max_window_bits={min(value, window_bits)}"
+
+        extensions.append("; ".join(params))
+
+    headers["Sec-WebSocket-Extensions"] = ", ".join(extensions)
+
+
 def fix_websocket_check_origin():
     """
     This fixes tornado.websocket.WebSocketHandler.check_origin to do the same origin check against the Host
@@ -258,13 +301,26 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
 
     The underlying application can then access the contained files via their respective paths and just move them
     where necessary.
+
+    If an ``ingest`` factory is configured, it gets called with the filename and the handle of the temporary file of
+    every uploaded file and has to return a file-like object to write the upload's data to instead, e.g. an
+    :class:`~octoprint.filemanager.util.UploadIngest`. That object's ``size`` replaces the size on disk, and what its
+    ``parameters`` method returns gets supplied to the ``fallback`` out of band, in the WSGI environment under
+    :attr:`~octoprint.filemanager.util.UploadIngest.ENVIRON_KEY`. Form fields of the request itself that collide with
+    any of the generated fields are dropped.
     """
 
     BODY_METHODS = ("POST", "PATCH", "PUT")
     """ The request methods that may contain a request body. """
 
     def initialize(
-        self, fallback, file_prefix="tmp", file_suffix="", path=None, suffixes=None
+        self,
+        fallback,
+        file_prefix="tmp",
+        file_suffix="",
+        path=None,
+        suffixes=None,
+        ingest=None,
     ):
         if not suffixes:
             suffixes = {}
@@ -273,6 +329,7 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
         self._file_prefix = file_prefix
         self._file_suffix = file_suffix
         self._path = path
+        self._ingest = ingest
 
         self._suffixes = {key: key for key in ("name", "path", "content_type", "size")}
         for suffix_type, suffix in suffixes.items():
@@ -490,7 +547,8 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
         * ``path``: path to the temporary file storing the file's data
         * ``content_type``: content type of the part
         * ``file``: file handle for the temporary file (mode "wb", not deleted on close, will be deleted however after
-          handling of the request has finished in :func:`_handle_method`)
+          handling of the request has finished in :func:`_handle_method`), wrapped by the ``ingest`` if configured
+        * ``ingest``: the ``ingest`` wrapping the file handle, if configured
 
         Structure of ``data`` parts:
 
@@ -514,13 +572,18 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
                 dir=self._path,
                 delete=False,
             )
-            return {
+            part = {
                 "name": tornado.escape.utf8(name),
                 "filename": tornado.escape.utf8(filename),
                 "path": tornado.escape.utf8(handle.name),
                 "content_type": tornado.escape.utf8(content_type),
                 "file": handle,
             }
+            if self._ingest is not None:
+                part["file"] = part["ingest"] = self._ingest(
+                    octoprint.util.to_unicode(filename), handle
+                )
+            return part
 
         else:
             return {
@@ -561,28 +624,36 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
         logged parts, turning ``file`` parts into new ``data`` parts.
         """
 
+        files = {}
+        ingests = {}
+        for name, part in self._parts.items():
+            if "filename" not in part or "path" not in part:
+                continue
+
+            # add form fields for filename, path, size and content_type for all files contained in the request
+            parameters = {"name": part["filename"], "path": part["path"]}
+            if "ingest" in part:
+                parameters["size"] = str(part["ingest"].size)
+                ingests[octoprint.util.to_unicode(name)] = part["ingest"].parameters()
+            else:
+                parameters["size"] = str(os.stat(part["path"]).st_size)
+            if "content_type" in part:
+                parameters["content_type"] = part["content_type"]
+
+            files[name] = {
+                name + b"." + octoprint.util.to_bytes(self._suffixes.get(key, key)): value
+                for (key, value) in parameters.items()
+                if self._suffixes.get(key, key) is not None and value is not None
+            }
+        generated = {key for fields in files.values() for key in fields}
+
+        # never supplied as form fields, so they can't be spoofed by the client
+        self.request.upload_ingests = ingests
+
         self._new_body = b""
         for name, part in self._parts.items():
             if "filename" in part:
-                # add form fields for filename, path, size and content_type for all files contained in the request
-                if "path" not in part:
-                    continue
-
-                parameters = {
-                    "name": part["filename"],
-                    "path": part["path"],
-                    "size": str(os.stat(part["path"]).st_size),
-                }
-                if "content_type" in part:
-                    parameters["content_type"] = part["content_type"]
-
-                fields = {
-                    self._suffixes[key]: value for (key, value) in parameters.items()
-                }
-                for n, p in fields.items():
-                    if n is None or p is None:
-                        continue
-                    key = name + b"." + octoprint.util.to_bytes(n)
+                for key, p in files.get(name, {}).items():
                     self._new_body += b"--%s\r\n" % self._multipart_boundary
                     self._new_body += (
                         b'Content-Disposition: form-data; name="%s"\r\n' % key
@@ -590,7 +661,7 @@ class UploadStorageFallbackHandler(RequestlessExceptionLoggingMixin, CorsSupport
                     self._new_body += b"Content-Type: text/plain; charset=utf-8\r\n"
                     self._new_body += b"\r\n"
                     self._new_body += octoprint.util.to_bytes(p) + b"\r\n"
-            elif "data" in part:
+            elif "data" in part and name not in generated:
                 self._new_body += b"--%s\r\n" % self._multipart_boundary
                 value = part["data"]
                 self._new_body += b'Content-Disposition: form-data; name="%s"\r\n' % name
@@ -748,6 +819,11 @@ class WsgiInputContainer:
         """
         Wraps the call against the WSGI app, deriving the WSGI environment from the supplied Tornado ``HTTPServerRequest``.
 
+        Responses consisting of a single chunk are written in one go with a ``Content-Length``. Responses consisting
+        of more chunks are streamed to the client as the WSGI app produces them, using chunked transfer encoding if
+        the app didn't set a ``Content-Length``. The next chunk is only requested from the app once the previous one
+        has been flushed to the client.
+
         :param request: the ``tornado.httpserver.HTTPServerRequest`` to derive the WSGI environment from
         :param body: an optional body  to use as ``wsgi.input`` instead of ``request.body``, can be a string or a stream
         :param future: a future to complete after the request has been handled
@@ -761,6 +837,7 @@ class WsgiInputContainer:
             data["headers"] = response_headers
             return response.append
 
+        headers_written = False
         try:
             loop = IOLoop.current()
             app_response = await loop.run_in_executor(
@@ -778,54 +855,79 @@ class WsgiInputContainer:
                     except StopIteration:
                         return None
 
-                while True:
+                # read ahead until we know whether there's more than one chunk
+                while len(response) < 2:
                     chunk = await loop.run_in_executor(self.executor, next_chunk)
                     if chunk is None:
                         break
                     response.append(chunk)
+                streaming = len(response) > 1
+
+                if not data:
+                    raise Exception("WSGI app did not call start_response")
+
+                status_code_str, reason = data["status"].split(" ", 1)
+                status_code = int(status_code_str)
+                headers = data["headers"]
+                header_set = {k.lower() for (k, v) in headers}
+                body = tornado.escape.utf8(response[0] if response else b"")
+                if status_code != 304:
+                    if "content-length" not in header_set and not streaming:
+                        headers.append(("Content-Length", str(len(body))))
+                    if "content-type" not in header_set:
+                        headers.append(("Content-Type", "text/html; charset=UTF-8"))
+
+                header_set = {k.lower() for (k, v) in headers}
+                for header, value in self.headers.items():
+                    if header.lower() not in header_set:
+                        headers.append((header, value))
+                for header, value in self.forced_headers.items():
+                    headers.append((header, value))
+                headers = [
+                    (header, value)
+                    for header, value in headers
+                    if header.lower() not in self.removed_headers
+                ]
+
+                start_line = tornado.httputil.ResponseStartLine(
+                    "HTTP/1.1", status_code, reason
+                )
+                header_obj = tornado.httputil.HTTPHeaders()
+                for key, value in headers:
+                    header_obj.add(key, value)
+                assert request.connection is not None
+                headers_written = True
+                await request.connection.write_headers(start_line, header_obj, chunk=body)
+
+                if streaming:
+                    for chunk in response[1:]:
+                        await request.connection.write(tornado.escape.utf8(chunk))
+
+                    while True:
+                        # only fetch the next chunk once the previous one has been flushed
+                        chunk = await loop.run_in_executor(self.executor, next_chunk)
+                        if chunk is None:
+                            break
+                        if chunk:
+                            await request.connection.write(tornado.escape.utf8(chunk))
+
+                request.connection.finish()
+                self._log(status_code, request)
+
             finally:
                 if hasattr(app_response, "close"):
                     app_response.close()
-            body = b"".join(response)
-            if not data:
-                raise Exception("WSGI app did not call start_response")
-
-            status_code_str, reason = data["status"].split(" ", 1)
-            status_code = int(status_code_str)
-            headers = data["headers"]
-            header_set = {k.lower() for (k, v) in headers}
-            body = tornado.escape.utf8(body)
-            if status_code != 304:
-                if "content-length" not in header_set:
-                    headers.append(("Content-Length", str(len(body))))
-                if "content-type" not in header_set:
-                    headers.append(("Content-Type", "text/html; charset=UTF-8"))
-
-            header_set = {k.lower() for (k, v) in headers}
-            for header, value in self.headers.items():
-                if header.lower() not in header_set:
-                    headers.append((header, value))
-            for header, value in self.forced_headers.items():
-                headers.append((header, value))
-            headers = [
-                (header, value)
-                for header, value in headers
-                if header.lower() not in self.removed_headers
-            ]
-
-            start_line = tornado.httputil.ResponseStartLine(
-                "HTTP/1.1", status_code, reason
+
+        except tornado.iostream.StreamClosedError:
+            logging.getLogger(__name__).debug(
+                "Client closed the connection while streaming the response"
             )
-            header_obj = tornado.httputil.HTTPHeaders()
-            for key, value in headers:
-                header_obj.add(key, value)
-            assert request.connection is not None
-            request.connection.write_headers(start_line, header_obj, chunk=body)
-            request.connection.finish()
-            self._log(status_code, request)
 
         except Exception:
             logging.getLogger(__name__).exception("Exception in WSGI application")
+            if headers_written:
+                # we can't send an error response anymore, abort the connection
+                request.connection.close()
 
         finally:
             if future is not None:
@@ -895,6 +997,10 @@ class WsgiInputContainer:
 
         for key, value in request.headers.items():
             environ["HTTP_" + key.replace("-", "_").upper()] = value
+
+        from octoprint.filemanager.util import UploadIngest
+
+        environ[UploadIngest.ENVIRON_KEY] = getattr(request, "upload_ingests", {})
         return environ
 
     def _log(self, status_code, request):
@@ -911,6 +1017,147 @@ class WsgiInputContainer:
         log_method("%d %s %.2fms", status_code, summary, request_time)
 
 
+# ~~ Native API endpoints
+
+
+class NativeApiHandler(UploadStorageFallbackHandler):
+    """
+    An :class:`UploadStorageFallbackHandler` that answers ``GET`` requests for a read-only
+    API endpoint directly from Tornado, without dispatching them to the WSGI ``fallback``
+    on the executor.
+
+    Only requests authenticated through an API key or a login session whose user has
+    the required ``permission`` are answered natively, with the same body and headers the
+    Flask ``api`` blueprint would produce. Everything else, including all error
+    responses, is forwarded to the ``fallback``.
+
+    Arguments:
+        app (flask.Flask): The Flask app whose JSON provider, session interface and
+            login manager to use
+        payload (callable): Called with the request's query values, returns the data
+            to respond with or ``None`` if the request must be handled by the ``fallback``
+        permission (OctoPrintPermission): The permission a user needs for the endpoint
+        blocking (bool): Whether ``payload`` might block, e.g. because it does I/O, in
+            which case the response gets created on the ``fallback``'s executor instead
+            of the IOLoop
+    """
+
+    def initialize(
+        self, app=None, payload=None, permission=None, blocking=False, **kwargs
+    ):
+        super().initialize(**kwargs)
+        self._app = app
+        self._payload = payload
+        self._permission = permission
+        self._blocking = blocking
+
+    def prepare(self):
+        if self.request.method != "GET":
+            super().prepare()
+
+    async def get(self, *args, **kwargs):
+        start_time = time.monotonic()
+
+        if self._blocking:
+            response = await IOLoop.current().run_in_executor(
+                self._fallback.executor, self._native_response
+            )
+        else:
+            response = self._native_response()
+        if response is None:
+            try:
+                await self._fallback(self.request, b"")
+            finally:
+                self._finished = True
+                self.on_finish()
+            return
+
+        duration_ms = int((time.monotonic() - start_time) * 1000)
+        response.headers.add("Server-Timing", f"app;dur={duration_ms}")
+
+        self.set_status(response.status_code)
+        self.clear_header("Date")
+        for key in {key for key, _ in response.headers.items()}:
+            self.clear_header(key)
+        for key, value in response.headers.items():
+            self.add_header(key, value)
+        self.finish(response.get_data())
+
+    def compute_etag(self):
+        # the Flask endpoints don't send an ETag, so neither do we
+        return None
+
+    def _native_response(self):
+        import flask
+        import flask_login
+
+        from octoprint.server.util import get_api_key, get_user_for_apikey
+
+        values = {}
+        for key, value in parse_qsl(self.request.query, keep_blank_values=True):
+            values.setdefault(key, value)
+
+        if "perfprofile" in values:
+            return None
+
+        authorization = self.request.headers.get("Authorization")
+        if authorization and not authorization.startswith("Bearer "):
+            # might be basic authentication, leave that to the fallback
+            return None
+
+        apikey = values["apikey"] if "apikey" in values else get_api_key(self.request)
+        if apikey:
+            # no session involved, the api blueprint doesn't save it for API key logins
+            return self._create_response(get_user_for_apikey(apikey), values)
+
+        with self._app.request_context(
+            WsgiInputContainer.environ(self.request, body=b"")
+        ):
+            session = flask.session
+            if "_user_id" not in session or "_remember" in session:
+                return None
+
+            response = self._create_response(
+                flask_login.current_user._get_current_object(), values
+            )
+            if response is not None:
+                self._app.session_interface.save_session(self._app, session, response)
+            return response
+
+    def _create_response(self, user, values):
+        from werkzeug.exceptions import HTTPException
+
+        from octoprint.server.util.flask import add_no_max_age_response_headers
+        from octoprint.settings import settings
+
+        if (
+            user is None
+            or user.is_anonymous
+            or not user.is_active
+            or not user.has_permission(self._permission)
+        ):
+            return None
+
+        try:
+            payload = self._payload(values)
+        except HTTPException:
+            return None
+
+        if payload is None:
+            return None
+
+        response = self._app.json.response(payload)
+        add_no_max_age_response_headers(response)
+        response.headers.add("X-Clacks-Overhead", "GNU Terry Pratchett")
+
+        # same as octoprint.server.util.corsResponseHandler on the api blueprint
+        origin = self.request.headers.get("Origin")
+        if origin and settings().getBoolean(["api", "allowCrossOrigin"]):
+            response.headers["Access-Control-Allow-Origin"] = origin
+
+        return response
+
+
 # ~~ customized HTTP1Connection implementation
 
 
@@ -1134,6 +1381,21 @@ class CustomHTTP1ConnectionParameters(tornado.http1connection.HTTP1ConnectionPar
 # ~~ customized large response handler
 
 
+def _can_mark_response_complete(connection):
+    """
+    Whether ``connection`` tracks the announced content length in the way :func:`_mark_response_complete` expects.
+
+    That's a private detail of tornado's ``HTTP1Connection``, so other versions might not have it.
+    """
+    return hasattr(connection, "_expected_content_remaining")
+
+
+def _mark_response_complete(connection):
+    """Lets ``connection`` know the announced content has been written past it, e.g. via ``sendfile``."""
+    if _can_mark_response_complete(connection):
+        connection._expected_content_remaining = 0
+
+
 class LargeResponseHandler(
     RequestlessExceptionLoggingMixin, CorsSupportMixin, tornado.web.StaticFileHandler
 ):
@@ -1170,6 +1432,14 @@ class LargeResponseHandler(
            response. Will be called with the requested path on disk as parameter.
        is_pre_compressed (bool): if the file is expected to be pre-compressed, i.e, if there is a file in the same
            directory with the same name, but with '.gz' appended and gzip-encoded
+       decompress (bool): Whether files stored compressed by :mod:`octoprint.filemanager.compression` should be
+           served with their uncompressed content. Clients accepting gzip encoding get the compressed file as is,
+           unless they request a range. Defaults to ``False``.
+       sendfile (bool): Whether to send plain file content directly from the file to the socket via ``sendfile``
+           where the platform and connection support it. Defaults to ``False``.
+       precompressed_cache (octoprint.server.util.precompressed.PrecompressedCache): Cache of gzip compressed copies
+           of the served files, to send to clients accepting gzip encoding that don't request a range. Defaults to
+           ``None``.
     """
 
     def initialize(
@@ -1185,6 +1455,9 @@ class LargeResponseHandler(
         mime_type_guesser=None,
         is_pre_compressed=False,
         stream_body=False,
+        decompress=False,
+        sendfile=False,
+        precompressed_cache=None,
     ):
         tornado.web.StaticFileHandler.initialize(
             self, os.path.abspath(path), default_filename
@@ -1198,13 +1471,158 @@ class LargeResponseHandler(
         self._mime_type_guesser = mime_type_guesser
         self._is_pre_compressed = is_pre_compressed
         self._stream_body = stream_body
+        self._decompress = decompress
+        self._compressed = None
+        self._sendfile = sendfile
+        self._sendfile_args = None
+        self._precompressed_cache = precompressed_cache
+        self._precompressed = None
 
     def should_use_precompressed(self):
         return self._is_pre_compressed and "gzip" in self.request.headers.get(
             "Accept-Encoding", ""
         )
 
-    def get(self, path, include_body=True):
+    def is_compressed_file(self):
+        """Whether the requested file is stored compressed and needs to be decompressed for the client"""
+        if self._compressed is None:
+            from octoprint.filemanager import compression
+
+            self._compressed = self._decompress and compression.is_compressed(
+                self.absolute_path
+            )
+        return self._compressed
+
+    def should_send_compressed(self):
+        """Whether to send a compressed file as is, with gzip content encoding"""
+        return (
+            self.is_compressed_file()
+            and "gzip" in self.request.headers.get("Accept-Encoding", "")
+            and "Range" not in self.request.headers
+        )
+
+    def get_precompressed_path(self):
+        """The path of a gzip compressed copy of the requested file to send instead, if there is one"""
+        if self._precompressed is None:
+            self._precompressed = False
+            if (
+                self._precompressed_cache is not None
+                and "gzip" in self.request.headers.get("Accept-Encoding", "")
+                and "Range" not in self.request.headers
+                and not self.is_compressed_file()
+            ):
+                self._precompressed = (
+                    self._precompressed_cache.get(self.absolute_path) or False
+                )
+        return self._precompressed or None
+
+    def get_content_size(self):
+        if self.is_compressed_file() and not self.should_send_compressed():
+            from octoprint.filemanager import compression
+
+            return compression.file_size(self.absolute_path)
+
+        precompressed = self.get_precompressed_path()
+        if precompressed:
+            return os.stat(precompressed).st_size
+
+        return tornado.web.StaticFileHandler.get_content_size(self)
+
+    def get_original_content_size(self):
+        """The size of the requested file's content, regardless of the encoding it's sent with"""
+        if self.should_send_compressed():
+            from octoprint.filemanager import compression
+
+            return compression.file_size(self.absolute_path)
+
+        if self.get_precompressed_path():
+            return tornado.web.StaticFileHandler.get_content_size(self)
+
+        return self.get_content_size()
+
+    def get_content(self, abspath, start=None, end=None):
+        if self.is_compressed_file() and not self.should_send_compressed():
+            return self._get_decompressed_content(abspath, start=start, end=end)
+
+        precompressed = self.get_precompressed_path()
+        if precompressed:
+            abspath = precompressed
+
+        if self.can_sendfile():
+            # the content gets sent by get once the headers are out
+            self._sendfile_args = (abspath, start, end)
+            return []
+
+        return tornado.web.StaticFileHandler.get_content(abspath, start=start, end=end)
+
+    def can_sendfile(self):
+        """Whether the response body can be sent directly from the file to the socket"""
+        if not self._sendfile or self._stream_body or not hasattr(os, "sendfile"):
+            return False
+
+        connection = self.request.connection
+        if not isinstance(
+            connection, tornado.http1connection.HTTP1Connection
+        ) or not _can_mark_response_complete(connection):
+            return False
+
+        stream = connection.stream
+        if isinstance(stream, tornado.iostream.SSLIOStream) or not isinstance(
+            stream, tornado.iostream.IOStream
+        ):
+            return False
+
+        return isinstance(asyncio.get_event_loop(), asyncio.SelectorEventLoop)
+
+    async def _send_file(self, path, start, end):
+        if start is None:
+            start = 0
+        if end is None:
+            end = self.get_content_size()
+        count = end - start
+
+        connection = self.request.connection
+        stream = connection.stream
+
+        try:
+            # send the headers first, then the body past tornado straight to the socket
+            await self.flush()
+            if count > 0:
+                with open(path, "rb") as f:
+                    sent = await asyncio.get_running_loop().sock_sendfile(
+                        stream.socket, f, offset=start, count=count
+                    )
+                if sent != count:
+                    # the file got truncated, we can't fulfill the announced content length
+                    stream.close()
+                    return
+        except (tornado.iostream.StreamClosedError, OSError):
+            stream.close()
+            return
+
+        _mark_response_complete(connection)
+
+    @staticmethod
+    def _get_decompressed_content(abspath, start=None, end=None):
+        from octoprint.filemanager import compression
+
+        with compression.open_file(abspath) as f:
+            if start is not None:
+                f.seek(start)
+            remaining = end - (start or 0) if end is not None else None
+
+            while remaining is None or remaining > 0:
+                chunk_size = 64 * 1024
+                if remaining is not None:
+                    chunk_size = min(chunk_size, remaining)
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    async def get(self, path, include_body=True):
         if self._access_validation is not None:
             self._access_validation(self.request)
         if self._path_validation is not None:
@@ -1224,11 +1642,11 @@ class LargeResponseHandler(
                 )
 
         if self._stream_body:
-            return self.streamed_get(path, include_body=include_body)
+            await self.streamed_get(path, include_body=include_body)
         else:
-            return tornado.web.StaticFileHandler.get(
-                self, path, include_body=include_body
-            )
+            await tornado.web.StaticFileHandler.get(self, path, include_body=include_body)
+            if self._sendfile_args is not None:
+                await self._send_file(*self._sendfile_args)
 
     @tornado.gen.coroutine
     def streamed_get(self, path, include_body=True):
@@ -1283,7 +1701,14 @@ class LargeResponseHandler(
             self.set_header("Cache-Control", "max-age=0, must-revalidate, private")
             self.set_header("Expires", "-1")
 
-        self.set_header("X-Original-Content-Length", str(self.get_content_size()))
+        if self.is_compressed_file() or self._precompressed_cache is not None:
+            self.add_header("Vary", "Accept-Encoding")
+            if self.should_send_compressed() or self.get_precompressed_path():
+                self.set_header("Content-Encoding", "gzip")
+
+        self.set_header(
+            "X-Original-Content-Length", str(self.get_original_content_size())
+        )
 
     @property
     def original_absolute_path(self):
@@ -1298,6 +1723,10 @@ class LargeResponseHandler(
         else:
             etag = str(self.get_content_version(self.absolute_path))
 
+        if self.should_send_compressed() or self.get_precompressed_path():
+            # the compressed representation needs an etag of its own
+            etag = etag.strip('"') + "-gzip"
+
         if not etag.endswith('"'):
             etag = f'"{etag}"'
         return etag
@@ -1600,7 +2029,41 @@ class DeprecatedEndpointHandler(CorsSupportMixin, tornado.web.RequestHandler):
     options = _handle_method
 
 
+@tornado.gen.coroutine
+def _write_zip(handler, z):
+    """
+    Writes the zip stream ``z`` as response body of ``handler``.
+
+    The stream gets generated on the default executor, so reading and compressing its members doesn't block the
+    IOLoop.
+    """
+    if z.sized:
+        handler.set_header("Content-Length", len(z))
+    handler.set_header("Last-Modified", z.last_modified)
+
+    chunks = iter(z)
+    while True:
+        chunk = yield IOLoop.current().run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        if not chunk:
+            continue
+
+        try:
+            handler.write(chunk)
+            yield handler.flush()
+        except tornado.iostream.StreamClosedError:
+            return
+
+
 class StaticZipBundleHandler(CorsSupportMixin, tornado.web.RequestHandler):
+    """
+    Serves a zip bundle of ``files``.
+
+    If ``compress`` is set, members get deflated on a shared thread pool, except for ones that are already compressed
+    like videos or images, which are stored as is. Bundles of only stored members are sent with a ``Content-Length``.
+    """
+
     def initialize(
         self,
         files=None,
@@ -1646,34 +2109,25 @@ class StaticZipBundleHandler(CorsSupportMixin, tornado.web.RequestHandler):
                 f'attachment; filename="{self.get_attachment_name()}"',
             )
 
-        z = ZipStream(sized=True)
-        if self._compress:
-            try:
-                z = ZipStream(compress_type=ZIP_DEFLATED)
-            except RuntimeError:
-                # no zlib support
-                pass
+        from octoprint.util.zip import create_bundle, get_executor
 
+        members = []
         for f in self.normalize_files(files):
             name = f.get("name")
             path = f.get("path")
             data = f.get("iter") or f.get("content")
 
             if path:
-                z.add_path(path, arcname=name)
+                members.append({"path": path, "arcname": name})
             elif data and name:
-                z.add(data, arcname=name)
-
-        if z.sized:
-            self.set_header("Content-Length", len(z))
-        self.set_header("Last-Modified", z.last_modified)
+                members.append({"data": data, "arcname": name})
 
-        for chunk in z:
-            try:
-                self.write(chunk)
-                yield self.flush()
-            except tornado.iostream.StreamClosedError:
-                return
+        z = create_bundle(
+            members,
+            compress=self._compress,
+            executor=get_executor() if self._compress else None,
+        )
+        yield _write_zip(self, z)
 
 
 class DynamicZipBundleHandler(StaticZipBundleHandler):
@@ -1761,11 +2215,15 @@ class SystemInfoBundleHandler(CorsSupportMixin, tornado.web.RequestHandler):
         from octoprint.server import (
             connectivityChecker,
             environmentDetector,
+            eventManager,
             pluginManager,
             printer,
             safe_mode,
         )
+        from octoprint.server.util.flask import get_cache_statistics
+        from octoprint.server.util.sockjs import PrinterStateConnection
         from octoprint.settings import settings
+        from octoprint.util import dict_flatten
 
         systeminfo = get_systeminfo(
             environmentDetector,
@@ -1777,12 +2235,23 @@ class SystemInfoBundleHandler(CorsSupportMixin, tornado.web.RequestHandler):
                 "systeminfo.generator": "zipapi",
             },
         )
+        if eventManager:
+            systeminfo.update(
+                dict_flatten(eventManager.get_statistics(), prefix="events")
+            )
+        systeminfo.update(
+            dict_flatten(PrinterStateConnection.get_statistics(), prefix="push")
+        )
+        systeminfo.update(dict_flatten(get_cache_statistics(), prefix="cache"))
+
+        from octoprint.util.zip import get_executor
 
         z = get_systeminfo_bundle(
             systeminfo,
             settings().getBaseFolder("logs"),
             printer=printer,
             plugin_manager=pluginManager,
+            executor=get_executor(),
         )
 
         self.set_header("Content-Type", "application/zip")
@@ -1790,16 +2259,7 @@ class SystemInfoBundleHandler(CorsSupportMixin, tornado.web.RequestHandler):
             "Content-Disposition",
             f'attachment; filename="{get_systeminfo_bundle_name()}"',
         )
-        if z.sized:
-            self.set_header("Content-Length", len(z))
-        self.set_header("Last-Modified", z.last_modified)
-
-        for chunk in z:
-            try:
-                self.write(chunk)
-                yield self.flush()
-            except tornado.iostream.StreamClosedError:
-                return
+        yield _write_zip(self, z)
 
     def get_attachment_name(self):
         import time
@@ -7,6 +7,166 @@
 })(this, function (OctoPrintClient, $, _, SockJS) {
     var normalClose = 1000;
 
+    var decodeMsgpack = function (buffer) {
+        // minimal MessagePack decoder, counterpart of octoprint.util.msgpack
+        var view = new DataView(buffer);
+        var bytes = new Uint8Array(buffer);
+        var decoder = new TextDecoder("utf-8");
+        var offset = 0;
+
+        var str = function (length) {
+            var value = decoder.decode(bytes.subarray(offset, offset + length));
+            offset += length;
+            return value;
+        };
+
+        var bin = function (length) {
+            var value = bytes.slice(offset, offset + length);
+            offset += length;
+            return value;
+        };
+
+        var array = function (length) {
+            var value = [];
+            for (var i = 0; i < length; i++) {
+                value.push(next());
+            }
+            return value;
+        };
+
+        var map = function (length) {
+            var value = {};
+            for (var i = 0; i < length; i++) {
+                var key = next();
+                value[key] = next();
+            }
+            return value;
+        };
+
+        var fixed = function (getter, size) {
+            var value = view[getter](offset);
+            offset += size;
+            return value;
+        };
+
+        var next = function () {
+            var marker = view.getUint8(offset++);
+
+            if (marker < 0x80) return marker;
+            if (marker >= 0xe0) return marker - 0x100;
+            if (marker >= 0xa0 && marker <= 0xbf) return str(marker & 0x1f);
+            if (marker >= 0x90 && marker <= 0x9f) return array(marker & 0x0f);
+            if (marker >= 0x80 && marker <= 0x8f) return map(marker & 0x0f);
+
+            switch (marker) {
+                case 0xc0:
+                    return null;
+                case 0xc2:
+                    return false;
+                case 0xc3:
+                    return true;
+                case 0xc4:
+                    return bin(fixed("getUint8", 1));
+                case 0xc5:
+                    return bin(fixed("getUint16", 2));
+                case 0xc6:
+                    return bin(fixed("getUint32", 4));
+                case 0xca:
+                    return fixed("getFloat32", 4);
+                case 0xcb:
+                    return fixed("getFloat64", 8);
+                case 0xcc:
+                    return fixed("getUint8", 1);
+                case 0xcd:
+                    return fixed("getUint16", 2);
+                case 0xce:
+                    return fixed("getUint32", 4);
+                case 0xcf:
+                    return Number(fixed("getBigUint64", 8));
+                case 0xd0:
+                    return fixed("getInt8", 1);
+                case 0xd1:
+                    return fixed("getInt16", 2);
+                case 0xd2:
+                    return fixed("getInt32", 4);
+                case 0xd3:
+                    return Number(fixed("getBigInt64", 8));
+                case 0xd9:
+                    return str(fixed("getUint8", 1));
+                case 0xda:
+                    return str(fixed("getUint16", 2));
+                case 0xdb:
+                    return str(fixed("getUint32", 4));
+                case 0xdc:
+                    return array(fixed("getUint16", 2));
+                case 0xdd:
+                    return array(fixed("getUint32", 4));
+                case 0xde:
+                    return map(fixed("getUint16", 2));
+                case 0xdf:
+                    return map(fixed("getUint32", 4));
+            }
+
+            throw new Error(
+                "Unsupported MessagePack type 0x" +
+                    marker.toString(16) +
+                    " at offset " +
+                    (offset - 1)
+            );
+        };
+
+        return next();
+    };
+
+    var RawSocket = function (url) {
+        // wraps a native WebSocket connected to the raw websocket endpoint,
+        // providing the same interface as SockJS
+        var self = this;
+
+        this.onopen = undefined;
+        this.onclose = undefined;
+        this.onmessage = undefined;
+
+        this.ws = new WebSocket(url);
+        this.ws.binaryType = "arraybuffer";
+        this.ws.onopen = function () {
+            if (self.onopen) self.onopen();
+        };
+        this.ws.onclose = function (e) {
+            if (self.onclose) self.onclose(e);
+        };
+        this.ws.onmessage = function (e) {
+            var data;
+            try {
+                if (e.data instanceof ArrayBuffer) {
+                    data = decodeMsgpack(e.data);
+                } else {
+                    data = JSON.parse(e.data);
+                }
+            } catch (exc) {
+                console.warn("Could not decode message from socket: " + exc);
+                return;
+            }
+            if (self.onmessage) self.onmessage({data: data});
+        };
+    };
+
+    RawSocket.prototype.send = function (data) {
+        this.ws.send(data);
+    };
+
+    RawSocket.prototype.close = function () {
+        this.ws.close();
+    };
+
+    var rawSocketSupported = function () {
+        return (
+            typeof WebSocket !== "undefined" &&
+            typeof TextDecoder !== "undefined" &&
+            typeof URL !== "undefined"
+        );
+    };
+
     var OctoPrintSocketClient = function (base) {
         var self = this;
 
@@ -16,10 +176,12 @@
             timeouts: [0, 1, 1, 2, 3, 5, 8, 13, 20, 40, 100],
             connectTimeout: 5000,
             transportTimeout: 4000,
-            rateSlidingWindowSize: 20
+            rateSlidingWindowSize: 20,
+            binary: false
         };
 
         this.socket = undefined;
+        this.binary = false;
         this.reconnecting = false;
         this.reconnectTrial = 0;
         this.registeredHandlers = {};
@@ -36,6 +198,11 @@
                 clearTimeout(self.connectTimeout);
                 self.connectTimeout = undefined;
             }
+
+            if (self.binary) {
+                // ask for binary encoded state updates
+                self.sendMessage("transport", {encoding: "msgpack"});
+            }
         });
     };
 
@@ -126,6 +293,13 @@
             delete opts.connectTimeout;
         }
 
+        var binary = self.options.binary;
+        if (opts.hasOwnProperty("binary")) {
+            binary = opts.binary;
+            delete opts.binary;
+        }
+        self.binary = binary && rawSocketSupported();
+
         var onOpen = function () {
             self.reconnecting = false;
             self.reconnectTrial = 0;
@@ -194,7 +368,15 @@
         }
         opts.timeout = transportTimeout;
 
-        self.socket = new SockJS(url + "sockjs", undefined, opts);
+        if (self.binary) {
+            // the raw websocket endpoint skips the SockJS protocol and allows for
+            // binary frames
+            var wsUrl = new URL(url + "sockjs/websocket", window.location.href);
+            wsUrl.protocol = wsUrl.protocol === "https:" ? "wss:" : "ws:";
+            self.socket = new RawSocket(wsUrl.toString());
+        } else {
+            self.socket = new SockJS(url + "sockjs", undefined, opts);
+        }
         self.socket.onopen = onOpen;
         self.socket.onclose = onClose;
         self.socket.onmessage = onMessage;
@@ -245,6 +427,8 @@
         this.decreaseRate();
     };
 
+    OctoPrintSocketClient.decodeMsgpack = decodeMsgpack;
+
     OctoPrintClient.registerComponent("socket", OctoPrintSocketClient);
     return OctoPrintSocketClient;
 });
@@ -1082,14 +1082,19 @@ def get_bom(filename, encoding):
     Check if the file has a BOM and if so return it.
 
     Params:
-        filename (str): The file to check.
+        filename (str): The file to check, or a seekable binary file object positioned at its start, which will
+            be rewound afterwards.
         encoding (str): The encoding to check for.
 
     Returns:
         (bytes) the BOM or None if there is no BOM.
     """
-    with open(filename, mode="rb") as f:
-        header = f.read(4)
+    if hasattr(filename, "read"):
+        header = filename.read(4)
+        filename.seek(0)
+    else:
+        with open(filename, mode="rb") as f:
+            header = f.read(4)
 
     for enc, bom in BOMS.items():
         if header.startswith(bom) and encoding.lower() == enc:
@@ -11,6 +11,7 @@ import contextlib
 import copy
 import fnmatch
 import glob
+import io
 import logging
 import os
 import queue
@@ -24,7 +25,7 @@ import wrapt
 
 import octoprint.plugin
 from octoprint.events import Events, eventManager
-from octoprint.filemanager import valid_file_type
+from octoprint.filemanager import compression, valid_file_type
 from octoprint.filemanager.destinations import FileDestinations
 from octoprint.settings import settings
 from octoprint.systemcommands import system_command_manager
@@ -5889,7 +5890,7 @@ class PrintingGcodeFileInformation(PrintingFileInformation):
 
         if not os.path.exists(self._filename) or not os.path.isfile(self._filename):
             raise OSError("File %s does not exist" % self._filename)
-        self._size = os.stat(self._filename).st_size
+        self._size = compression.file_size(self._filename)
         self._pos = 0
         self._read_lines = 0
 
@@ -5908,9 +5909,11 @@ class PrintingGcodeFileInformation(PrintingFileInformation):
         """
         PrintingFileInformation.start(self)
         with self._handle_mutex:
-            bom = get_bom(self._filename, encoding="utf-8-sig")
-            self._handle = open(
-                self._filename, encoding="utf-8-sig", errors="replace", newline=""
+            # the file might be stored compressed, positions and size refer to the uncompressed content
+            handle = compression.open_file(self._filename)
+            bom = get_bom(handle, encoding="utf-8-sig")
+            self._handle = io.TextIOWrapper(
+                handle, encoding="utf-8-sig", errors="replace", newline=""
             )
             self._pos = self._handle.tell()
             if bom:
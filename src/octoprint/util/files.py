@@ -2,6 +2,7 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2021 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 import datetime
+import io
 import itertools
 import logging
 import os.path
@@ -283,6 +284,12 @@ def search_through_file(path, term, regex=False):
 
     logger = logging.getLogger(__name__)
 
+    from octoprint.filemanager import compression
+
+    if compression.is_compressed(path):
+        # grep can't search through compressed files
+        return search_through_file_python(path, term, compiled)
+
     try:
         try:
             # try native grep
@@ -311,9 +318,13 @@ def search_through_file(path, term, regex=False):
 
 
 def search_through_file_python(path, term, compiled):
-    with open(path, encoding="utf8", errors="replace") as f:
+    from octoprint.filemanager import compression
+
+    with io.TextIOWrapper(
+        compression.open_file(path), encoding="utf8", errors="replace"
+    ) as f:
         for line in f:
-            if term in line or compiled.match(term):
+            if term in line or compiled.search(line):
                 return True
     return False
 
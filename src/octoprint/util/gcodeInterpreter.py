@@ -222,9 +222,167 @@ regex_command = re.compile(
 )
 """Regex for a GCODE command."""
 
+regex_slicer = re.compile(
+    r"generated (?:by|with)\s+(?P<name>.+?)(?:\s+on\s+\d.*)?$", re.I
+)
+"""Regex for the slicer comment, e.g. ``generated by PrusaSlicer 2.6.0 on 2023-08-01``."""
+
+regex_slicer_setting = re.compile(r"^(?P<key>[A-Za-z][\w .]*?)\s*[=:]\s*(?P<value>.+)$")
+"""Regex for a slicer setting comment, e.g. ``layer_height = 0.2`` or ``Layer height: 0.2``."""
+
+SLICER_SETTINGS = {
+    "bed_temperature": "bed_temperature",
+    "brim_width": "brim_width",
+    "fill_density": "fill_density",
+    "fill_pattern": "fill_pattern",
+    "filament_settings_id": "filament_settings_id",
+    "filament_type": "filament_type",
+    "first_layer_height": "first_layer_height",
+    "first_layer_temperature": "first_layer_temperature",
+    "flavor": "flavor",
+    "gcode_flavor": "flavor",
+    "infill_sparse_density": "fill_density",
+    "layer_height": "layer_height",
+    "material_bed_temperature": "bed_temperature",
+    "material_print_temperature": "temperature",
+    "material_type": "filament_type",
+    "nozzle_diameter": "nozzle_diameter",
+    "perimeters": "perimeters",
+    "print_settings_id": "print_settings_id",
+    "printer_model": "printer_model",
+    "printer_settings_id": "printer_settings_id",
+    "support_material": "support_material",
+    "target_machine_name": "printer_model",
+    "temperature": "temperature",
+    "wall_line_count": "perimeters",
+}
+"""
+Slicer settings to extract from GCODE comments, mapping the normalized setting names
+of the various slicers to the name they are reported under.
+"""
+
+MAX_SLICER_SETTING_LENGTH = 100
+
+
+class SlicerInfo:
+    """
+    Collects the slicer name and settings from the comments of a GCODE file.
+
+    The first value found for a setting wins.
+    """
+
+    def __init__(self):
+        self.name = None
+        self.settings = {}
+
+    def parse_line(self, line):
+        """
+        Parses a line of GCODE, ignoring anything but its comment.
+
+        Arguments:
+            line (str): The line to parse
+        """
+        if ";" not in line:
+            return
+        self.parse_comment(line[line.find(";") + 1 :].strip())
+
+    def parse_comment(self, comment):
+        """
+        Parses a GCODE comment, without its leading ``;``.
+
+        Arguments:
+            comment (str): The comment to parse
+        """
+        if self.name is None and comment[:20].lower().startswith("generated "):
+            match = regex_slicer.match(comment)
+            if match:
+                self.name = match.group("name").strip()[:MAX_SLICER_SETTING_LENGTH]
+                return
+
+        match = regex_slicer_setting.match(comment)
+        if not match:
+            return
+
+        key = match.group("key").strip().lower().replace(" ", "_").replace(".", "_")
+        if key in SLICER_SETTINGS:
+            value = match.group("value").strip()[:MAX_SLICER_SETTING_LENGTH]
+            if value:
+                self.settings.setdefault(SLICER_SETTINGS[key], value)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: ``name`` and ``settings`` of the slicer, or None if nothing was found
+        """
+        if not self.name and not self.settings:
+            return None
+        return {"name": self.name, "settings": dict(self.settings)}
+
+
+regex_layer_comment = re.compile(r"^(LAYER:|LAYER_CHANGE$|layer \d)")
+"""Regex for a layer change comment, e.g. ``LAYER:12`` (Cura), ``LAYER_CHANGE`` (PrusaSlicer) or ``layer 12, Z = 2.4`` (Simplify3D)."""
+
+PAUSE_COMMANDS = ("M0", "M1", "M25", "M125", "M226", "M600", "M601")
+"""Commands pausing the print or changing the filament."""
+
+MAX_PAUSE_MARKERS = 1000
+
+
+class MarkerIndex:
+    """
+    Collects the byte offsets of markers in a GCODE file: layer change comments, the first ``;TYPE:`` comment of
+    every feature type, pauses and filament changes, and the first occurrence of any configured ``strings``.
+
+    Arguments:
+        strings (list): Strings to look for anywhere in a line
+    """
+
+    def __init__(self, strings=None):
+        self.strings = {string: None for string in strings or () if string}
+        self.layers = []
+        self.features = {}
+        self.pauses = []
+
+        self._missing = list(self.strings)
+
+    def record(self, offset, line, comment=None, command=None):
+        """
+        Records the markers on a line.
+
+        Arguments:
+            offset (int): Byte offset of the line within the file
+            line (str): The full line, including any comment
+            comment (str): The line's comment without the leading ``;``, if any
+            command (str): The line's command, e.g. ``M600``, if any
+        """
+        if self._missing:
+            for string in [string for string in self._missing if string in line]:
+                self.strings[string] = offset
+                self._missing.remove(string)
+
+        if comment:
+            if regex_layer_comment.match(comment):
+                self.layers.append(offset)
+            elif comment.startswith("TYPE:"):
+                self.features.setdefault(comment[5:].strip(), offset)
+
+        if len(self.pauses) < MAX_PAUSE_MARKERS:
+            if command in PAUSE_COMMANDS:
+                self.pauses.append({"offset": offset, "command": command})
+            elif line.lstrip().startswith("@pause"):
+                self.pauses.append({"offset": offset, "command": "@pause"})
+
+    def to_dict(self):
+        return {
+            "strings": dict(self.strings),
+            "layers": list(self.layers),
+            "features": dict(self.features),
+            "pauses": list(self.pauses),
+        }
+
 
 class gcode:
-    def __init__(self, incl_layers=False, progress_callback=None):
+    def __init__(self, incl_layers=False, progress_callback=None, markers=None):
         self._logger = logging.getLogger(__name__)
         self.extrusionAmount = [0]
         self.extrusionVolume = [0]
@@ -233,6 +391,8 @@ class gcode:
         self._abort = False
         self._reenqueue = True
         self._filamentDiameter = 0
+        self._slicer = SlicerInfo()
+        self._markers = MarkerIndex(strings=markers)
         self._print_minMax = MinMax3D()
         self._travel_minMax = MinMax3D()
         self._progress_callback = progress_callback
@@ -310,10 +470,17 @@ class gcode:
     ):
         self._print_minMax.min.z = self._travel_minMax.min.z = bed_z
         if os.path.isfile(filename):
-            self.filename = filename
-            self._fileSize = os.stat(filename).st_size
+            from octoprint.filemanager import compression
 
-            with codecs.open(filename, encoding="utf-8", errors="replace") as f:
+            self.filename = filename
+            self._fileSize = compression.file_size(filename)
+
+            with io.TextIOWrapper(
+                compression.open_file(filename),
+                encoding="utf-8",
+                errors="replace",
+                newline="",
+            ) as f:
                 self._load(
                     f,
                     throttle=throttle,
@@ -367,7 +534,10 @@ class gcode:
             if self._abort:
                 raise AnalysisAborted(reenqueue=self._reenqueue)
             lineNo += 1
+            offset = readBytes
             readBytes += len(line.encode("utf-8"))
+            fullLine = line
+            comment = None
 
             if isinstance(gcodeFile, (io.IOBase, codecs.StreamReaderWriter)):
                 percentage = readBytes / self._fileSize
@@ -426,6 +596,7 @@ class gcode:
                         self._filamentDiameter = float(filamentValue)
                     except ValueError:
                         self._filamentDiameter = 0.0
+                self._slicer.parse_comment(comment)
                 line = line[0 : line.find(";")]
 
             match = regex_command.search(line)
@@ -438,6 +609,8 @@ class gcode:
                     gcode = values["codeT"]
                     tool = int(values["tool"])
 
+            self._markers.record(offset, fullLine, comment=comment, command=gcode)
+
             # G codes
             if gcode in ("G0", "G1", "G00", "G01"):  # Move
                 x = getCodeFloat(line, "X")
@@ -835,6 +1008,10 @@ class gcode:
             "travel_dimensions": self.travel_dimensions,
             "travel_area": self.travel_area,
         }
+        slicer = self._slicer.to_dict()
+        if slicer:
+            result["slicer"] = slicer
+        result["markers"] = self._markers.to_dict()
         if self._incl_layers:
             result["layers"] = self.layers
 
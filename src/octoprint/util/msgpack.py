@@ -0,0 +1,283 @@
+"""
+Minimal MessagePack encoder and decoder.
+
+Supports the subset of the `MessagePack format <https://github.com/msgpack/msgpack/blob/master/spec.md>`_
+needed for push messages: nil, booleans, integers, floats, strings, binary data, arrays
+and maps. Everything else is converted through :class:`~octoprint.util.json.JsonEncoding`
+first, so the result decodes to the same values as the JSON encoding of the same object
+would.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import struct
+
+from octoprint.util.json import JsonEncoding
+
+_float = struct.Struct(">d")
+
+
+class UnpackException(ValueError):
+    pass
+
+
+def packb(obj):
+    """
+    Packs ``obj`` into MessagePack.
+
+    Bytes are packed as strings like the JSON encoding does, so consumers see the same
+    values regardless of the encoding.
+
+    Arguments:
+        obj: The object to pack
+
+    Returns:
+        bytes: The packed object
+
+    Raises:
+        TypeError: An object of an unserializable type was encountered
+        ValueError: An integer was out of range
+
+    Example::
+
+        >>> packb({"a": [1, True, None]})
+        b'\\x81\\xa1a\\x93\\x01\\xc3\\xc0'
+    """
+    buffer = bytearray()
+    _pack(obj, buffer)
+    return bytes(buffer)
+
+
+def packb_map_header(length):
+    """
+    Packs the header of a map with ``length`` entries.
+
+    Together with :func:`packb_map_items` this allows packing a map from parts packed
+    separately, e.g. to pack a part shared by several maps only once.
+
+    Arguments:
+        length (int): The number of entries of the map
+
+    Returns:
+        bytes: The packed header
+
+    Example::
+
+        >>> packb_map_header(2) + packb_map_items({"a": 1}) + packb_map_items({"b": 2})
+        b'\\x82\\xa1a\\x01\\xa1b\\x02'
+    """
+    buffer = bytearray()
+    _pack_length(length, buffer, 0x80, 0xDE)
+    return bytes(buffer)
+
+
+def packb_map_items(obj):
+    """
+    Packs the entries of the map ``obj`` without a header, see :func:`packb_map_header`.
+
+    Arguments:
+        obj (dict): The map to pack the entries of
+
+    Returns:
+        bytes: The packed entries
+
+    Raises:
+        TypeError: An object of an unserializable type was encountered
+        ValueError: An integer was out of range
+    """
+    buffer = bytearray()
+    _pack_items(obj, buffer)
+    return bytes(buffer)
+
+
+def unpackb(data):
+    """
+    Unpacks MessagePack ``data``.
+
+    Arguments:
+        data (bytes): The data to unpack
+
+    Returns:
+        The unpacked object
+
+    Raises:
+        UnpackException: The data is invalid, truncated or contains unsupported types
+
+    Example::
+
+        >>> unpackb(b'\\x81\\xa1a\\x93\\x01\\xc3\\xc0') == {'a': [1, True, None]}
+        True
+    """
+    data = memoryview(data)
+    try:
+        obj, offset = _unpack(data, 0)
+    except (IndexError, struct.error, UnicodeDecodeError) as exc:
+        raise UnpackException(f"Invalid data: {exc}") from exc
+
+    if offset != len(data):
+        raise UnpackException(f"Extra data after offset {offset}")
+    return obj
+
+
+def _pack(obj, buffer):
+    if obj is None:
+        buffer.append(0xC0)
+    elif obj is True:
+        buffer.append(0xC3)
+    elif obj is False:
+        buffer.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(obj, buffer)
+    elif isinstance(obj, float):
+        buffer.append(0xCB)
+        buffer += _float.pack(obj)
+    elif isinstance(obj, str):
+        _pack_str(obj, buffer)
+    elif isinstance(obj, dict):
+        _pack_length(len(obj), buffer, 0x80, 0xDE)
+        _pack_items(obj, buffer)
+    elif isinstance(obj, (list, tuple)):
+        _pack_length(len(obj), buffer, 0x90, 0xDC)
+        for value in obj:
+            _pack(value, buffer)
+    else:
+        _pack(JsonEncoding.encode(obj), buffer)
+
+
+def _pack_items(obj, buffer):
+    for key, value in obj.items():
+        _pack(key, buffer)
+        _pack(value, buffer)
+
+
+def _pack_int(value, buffer):
+    if 0 <= value < 0x80:
+        buffer.append(value)
+    elif -0x20 <= value < 0:
+        buffer.append(value & 0xFF)
+    elif 0 < value <= 0xFF:
+        buffer += struct.pack(">BB", 0xCC, value)
+    elif 0 < value <= 0xFFFF:
+        buffer += struct.pack(">BH", 0xCD, value)
+    elif 0 < value <= 0xFFFFFFFF:
+        buffer += struct.pack(">BI", 0xCE, value)
+    elif 0 < value <= 0xFFFFFFFFFFFFFFFF:
+        buffer += struct.pack(">BQ", 0xCF, value)
+    elif -0x80 <= value < 0:
+        buffer += struct.pack(">Bb", 0xD0, value)
+    elif -0x8000 <= value < 0:
+        buffer += struct.pack(">Bh", 0xD1, value)
+    elif -0x80000000 <= value < 0:
+        buffer += struct.pack(">Bi", 0xD2, value)
+    elif -0x8000000000000000 <= value < 0:
+        buffer += struct.pack(">Bq", 0xD3, value)
+    else:
+        raise ValueError(f"Integer out of range: {value}")
+
+
+def _pack_str(value, buffer):
+    data = value.encode("utf-8")
+    length = len(data)
+    if length < 0x20:
+        buffer.append(0xA0 | length)
+    elif length <= 0xFF:
+        buffer += struct.pack(">BB", 0xD9, length)
+    elif length <= 0xFFFF:
+        buffer += struct.pack(">BH", 0xDA, length)
+    else:
+        buffer += struct.pack(">BI", 0xDB, length)
+    buffer += data
+
+
+def _pack_length(length, buffer, fix, marker):
+    if length < 0x10:
+        buffer.append(fix | length)
+    elif length <= 0xFFFF:
+        buffer += struct.pack(">BH", marker, length)
+    else:
+        buffer += struct.pack(">BI", marker + 1, length)
+
+
+_fixed_width = {
+    0xCA: struct.Struct(">f"),
+    0xCB: _float,
+    0xCC: struct.Struct(">B"),
+    0xCD: struct.Struct(">H"),
+    0xCE: struct.Struct(">I"),
+    0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"),
+    0xD1: struct.Struct(">h"),
+    0xD2: struct.Struct(">i"),
+    0xD3: struct.Struct(">q"),
+}
+
+_lengths = {
+    # marker: (length format, kind)
+    0xC4: (struct.Struct(">B"), "bin"),
+    0xC5: (struct.Struct(">H"), "bin"),
+    0xC6: (struct.Struct(">I"), "bin"),
+    0xD9: (struct.Struct(">B"), "str"),
+    0xDA: (struct.Struct(">H"), "str"),
+    0xDB: (struct.Struct(">I"), "str"),
+    0xDC: (struct.Struct(">H"), "array"),
+    0xDD: (struct.Struct(">I"), "array"),
+    0xDE: (struct.Struct(">H"), "map"),
+    0xDF: (struct.Struct(">I"), "map"),
+}
+
+
+def _unpack(data, offset):
+    marker = data[offset]
+    offset += 1
+
+    if marker < 0x80:
+        return marker, offset
+    elif marker >= 0xE0:
+        return marker - 0x100, offset
+    elif marker == 0xC0:
+        return None, offset
+    elif marker == 0xC2:
+        return False, offset
+    elif marker == 0xC3:
+        return True, offset
+    elif 0xA0 <= marker <= 0xBF:
+        return _unpack_sized("str", marker & 0x1F, data, offset)
+    elif 0x90 <= marker <= 0x9F:
+        return _unpack_sized("array", marker & 0x0F, data, offset)
+    elif 0x80 <= marker <= 0x8F:
+        return _unpack_sized("map", marker & 0x0F, data, offset)
+    elif marker in _fixed_width:
+        fmt = _fixed_width[marker]
+        (value,) = fmt.unpack_from(data, offset)
+        return value, offset + fmt.size
+    elif marker in _lengths:
+        fmt, kind = _lengths[marker]
+        (length,) = fmt.unpack_from(data, offset)
+        return _unpack_sized(kind, length, data, offset + fmt.size)
+
+    raise UnpackException(f"Unsupported type 0x{marker:02x} at offset {offset - 1}")
+
+
+def _unpack_sized(kind, length, data, offset):
+    if kind in ("str", "bin"):
+        end = offset + length
+        if end > len(data):
+            raise UnpackException(f"Truncated {kind} at offset {offset}")
+        chunk = data[offset:end]
+        return (str(chunk, "utf-8") if kind == "str" else bytes(chunk)), end
+
+    elif kind == "array":
+        result = []
+        for _ in range(length):
+            value, offset = _unpack(data, offset)
+            result.append(value)
+        return result, offset
+
+    else:
+        result = {}
+        for _ in range(length):
+            key, offset = _unpack(data, offset)
+            value, offset = _unpack(data, offset)
+            result[key] = value
+        return result, offset
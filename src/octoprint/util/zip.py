@@ -0,0 +1,345 @@
+"""
+Helpers for generating zip bundles with :mod:`zipstream.ng`.
+
+:class:`ZipBundle` deflates its members block by block on a thread pool instead of on the thread iterating over it,
+stored members like timelapse videos or rotated, already compressed logs are streamed out as is.
+
+To do that it hooks into private internals of ``zipstream-ng``, which is why ``setup.py`` pins the versions this was
+written against. If those internals don't look as expected, bundles get compressed the regular way.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import collections
+import concurrent.futures
+import inspect
+import logging
+import os
+import threading
+import zlib
+
+from zipstream.ng import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipStream, ZipStreamInfo
+
+BLOCK_SIZE = 1024 * 1024
+"""Size of the blocks members get split into for compression, in bytes."""
+
+MAX_PENDING = 8
+"""Maximum number of blocks being compressed at the same time per member."""
+
+DICTIONARY_SIZE = 32 * 1024
+
+COMPRESSED_EXTENSIONS = (
+    ".7z",
+    ".bz2",
+    ".gif",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".mkv",
+    ".mp4",
+    ".mpg",
+    ".png",
+    ".tgz",
+    ".webm",
+    ".webp",
+    ".xz",
+    ".zip",
+)
+"""Extensions of files that are already compressed and won't get any smaller by deflating them again."""
+
+_executor = None
+_executor_mutex = threading.Lock()
+
+_FILE_ENTRY_PARAMETERS = {
+    "path",
+    "iterable",
+    "data",
+    "size",
+    "arcname",
+    "compress_type",
+    "compress_level",
+}
+
+
+def _has_zipstream_internals():
+    """Whether the private parts of ``zipstream-ng`` that :class:`ZipBundle` relies on are present."""
+    try:
+        parameters = inspect.signature(ZipStream._gen_file_entry).parameters
+        if not _FILE_ENTRY_PARAMETERS.issubset(parameters):
+            return False
+
+        z = ZipStream()
+        zinfo = ZipStreamInfo("test")
+        return (
+            callable(getattr(z, "_track", None))
+            and isinstance(getattr(z, "_pos", None), int)
+            and isinstance(getattr(z, "_filelist", None), list)
+            and hasattr(z, "_compress_type")
+            and hasattr(z, "_compress_level")
+            and hasattr(zinfo, "_compresslevel")
+            and callable(getattr(zinfo, "FileHeader", None))
+            and callable(getattr(zinfo, "DataDescriptor", None))
+            and callable(getattr(ZipStreamInfo, "from_file", None))
+        )
+    except Exception:
+        return False
+
+
+PARALLEL_COMPRESSION = _has_zipstream_internals()
+"""Whether :class:`ZipBundle` is able to compress on a thread pool with the installed ``zipstream-ng``."""
+
+if not PARALLEL_COMPRESSION:
+    logging.getLogger(__name__).warning(
+        "The installed version of zipstream-ng isn't supported for parallel compression, "
+        "zip bundles will be compressed on a single thread"
+    )
+
+
+def is_compressed_file(name):
+    """Whether ``name`` looks like the name of an already compressed file."""
+    return name.lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def get_executor(workers=None):
+    """
+    Returns the thread pool shared by all zip bundles, creating it with ``workers`` threads on first use.
+
+    Arguments:
+        workers (int): Number of threads, defaults to the number of CPUs but at most 4
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: the thread pool
+    """
+    global _executor
+
+    with _executor_mutex:
+        if _executor is None:
+            if not workers:
+                workers = min(os.cpu_count() or 1, 4)
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="ZipBundle"
+            )
+        return _executor
+
+
+def _deflate(data, level, zdict, final):
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelDeflater:
+    """
+    Drop-in replacement for a raw deflate ``zlib.compressobj`` that compresses on a thread pool.
+
+    Data gets split into blocks of ``block_size``. Every block is compressed independently, primed with the end of
+    the block before it as dictionary and ending on a byte boundary, so the compressed blocks can be concatenated into
+    a single deflate stream. Output of finished blocks is returned in order, at most ``max_pending`` blocks are being
+    compressed at any time.
+    """
+
+    def __init__(
+        self,
+        executor,
+        level=zlib.Z_DEFAULT_COMPRESSION,
+        block_size=BLOCK_SIZE,
+        max_pending=MAX_PENDING,
+    ):
+        self._executor = executor
+        self._level = level
+        self._block_size = block_size
+        self._max_pending = max_pending
+
+        self._buffer = bytearray()
+        self._zdict = None
+        self._pending = collections.deque()
+
+    def compress(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[: self._block_size])
+            del self._buffer[: self._block_size]
+            self._submit(block, False)
+
+        return self._collect()
+
+    def flush(self):
+        self._submit(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        return b"".join(future.result() for future in self._drain())
+
+    def _submit(self, block, final):
+        self._pending.append(
+            self._executor.submit(_deflate, block, self._level, self._zdict, final)
+        )
+        self._zdict = block[-DICTIONARY_SIZE:]
+
+    def _collect(self):
+        result = []
+        while self._pending and (
+            self._pending[0].done() or len(self._pending) > self._max_pending
+        ):
+            result.append(self._pending.popleft().result())
+        return b"".join(result)
+
+    def _drain(self):
+        while self._pending:
+            yield self._pending.popleft()
+
+
+class ZipBundle(ZipStream):
+    """
+    :class:`~zipstream.ng.ZipStream` that compresses deflated members on ``executor``.
+
+    Without an executor, or if the installed ``zipstream-ng`` isn't supported (see :data:`PARALLEL_COMPRESSION`), it
+    behaves exactly like a regular ``ZipStream``.
+
+    Arguments:
+        executor (concurrent.futures.Executor): Thread pool to compress on, see :func:`get_executor`
+        block_size (int): Size of the blocks compressed in parallel
+    """
+
+    def __init__(self, *, executor=None, block_size=BLOCK_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self._executor = executor if PARALLEL_COMPRESSION else None
+        self._block_size = block_size
+
+    def _gen_file_entry(
+        self,
+        *,
+        path=None,
+        iterable=None,
+        data=None,
+        size=None,
+        arcname,
+        compress_type=None,
+        compress_level=None,
+    ):
+        if compress_type is None:
+            compress_type = self._compress_type
+        if compress_level is None:
+            compress_level = self._compress_level
+
+        if self._executor is None or compress_type != ZIP_DEFLATED:
+            yield from super()._gen_file_entry(
+                path=path,
+                iterable=iterable,
+                data=data,
+                size=size,
+                arcname=arcname,
+                compress_type=compress_type,
+                compress_level=compress_level,
+            )
+            return
+
+        # mirrors ZipStream._gen_file_entry and ZipStreamInfo._file_data, just with a parallel compressor
+
+        if path:
+            zinfo = ZipStreamInfo.from_file(path, arcname)
+            iterable = self._read_file(path)
+        else:
+            zinfo = ZipStreamInfo(arcname)
+            zinfo.external_attr = 0o600 << 16
+            if data is not None:
+                zinfo.file_size = len(data)
+                iterable = [data]
+            elif size is not None:
+                zinfo.file_size = size
+
+        zinfo.compress_type = ZIP_DEFLATED
+        zinfo._compresslevel = compress_level
+        zinfo.header_offset = self._pos
+        zinfo.flag_bits |= 1 << 3  # sizes and CRC follow in the data descriptor
+
+        zip64 = (path is None and data is None and size is None) or (
+            zinfo.file_size * 1.05 > ZIP64_LIMIT
+        )
+        yield self._track(zinfo.FileHeader(zip64))
+
+        deflater = ParallelDeflater(
+            self._executor,
+            level=compress_level
+            if compress_level is not None
+            else zlib.Z_DEFAULT_COMPRESSION,
+            block_size=self._block_size,
+        )
+        crc = file_size = compress_size = 0
+        for buf in iterable:
+            file_size += len(buf)
+            crc = zlib.crc32(buf, crc)
+            buf = deflater.compress(buf)
+            if buf:
+                compress_size += len(buf)
+                yield self._track(buf)
+
+        buf = deflater.flush()
+        compress_size += len(buf)
+        yield self._track(buf)
+
+        zinfo.CRC = crc
+        zinfo.file_size = file_size
+        zinfo.compress_size = compress_size
+
+        if not zip64 and max(file_size, compress_size) > ZIP64_LIMIT:
+            raise RuntimeError(
+                f"Adding file '{arcname}' unexpectedly required using Zip64 extensions"
+            )
+
+        yield self._track(zinfo.DataDescriptor(zip64))
+        self._filelist.append(zinfo)
+
+    def _read_file(self, path):
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(self._block_size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+def create_bundle(files, compress=False, executor=None):
+    """
+    Creates a :class:`ZipBundle` of ``files``.
+
+    If ``compress`` is set, all members that aren't already compressed get deflated. The others are stored, and if
+    that's all of them, the bundle is sized, so its final length is known upfront.
+
+    Arguments:
+        files (list): Members to add, dicts with either a ``path`` and optional ``arcname``, or ``data``, an
+            ``arcname`` and the ``size`` of the data if known
+        compress (bool): Whether to deflate compressible members
+        executor (concurrent.futures.Executor): Thread pool to compress on
+
+    Returns:
+        ZipBundle: the bundle
+    """
+
+    def compressible(f):
+        return compress and not is_compressed_file(f.get("arcname") or f.get("path"))
+
+    if any(compressible(f) for f in files):
+        try:
+            z = ZipBundle(compress_type=ZIP_DEFLATED, executor=executor)
+        except RuntimeError:
+            # no zlib support
+            compress = False
+            z = ZipBundle(sized=True)
+    else:
+        z = ZipBundle(sized=True)
+
+    for f in files:
+        kwargs = {"arcname": f.get("arcname")}
+        if not z.sized and not compressible(f):
+            kwargs["compress_type"] = ZIP_STORED
+
+        if "path" in f:
+            z.add_path(f["path"], **kwargs)
+        else:
+            z.add(f["data"], size=f.get("size"), **kwargs)
+
+    return z
@@ -2,6 +2,7 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2015 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 import json
+import logging
 import time
 
 import requests
@@ -218,6 +219,135 @@ class SocketClient:
         return False
 
 
+class EventBridgeClient:
+    """
+    Client for OctoPrint's event bridge, receiving events over a local Unix domain socket.
+
+    Example:
+
+    .. sourcecode:: python
+
+       def on_event(event, payload):
+           print(event, payload)
+
+       client = EventBridgeClient("/home/pi/.octoprint/data/eventbridge.sock",
+                                  events=["PrintStarted", "Print*"],
+                                  on_event=on_event)
+       client.connect()
+       client.wait()
+
+    Arguments:
+        path (str): Path of the event bridge socket
+        events (list): Events to subscribe to, entries ending in ``*`` are prefixes,
+            defaults to all events
+        on_event (callable): Called with ``event`` and ``payload`` for every received event
+        on_close (callable): Called without arguments when the connection closes
+        daemon (bool): Whether the receiving thread should be a daemon thread
+    """
+
+    def __init__(self, path, events=None, on_event=None, on_close=None, daemon=True):
+        self._path = path
+        self._events = list(events) if events else ["*"]
+        self._on_event = on_event
+        self._on_close = on_close
+        self._daemon = daemon
+
+        self._sock = None
+        self._thread = None
+
+        self._logger = logging.getLogger(__name__)
+
+    def connect(self):
+        """Connects to the event bridge and starts receiving events."""
+        import socket
+        import threading
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self._path)
+        self.subscribe(self._events)
+
+        self._thread = threading.Thread(target=self._on_thread_run)
+        self._thread.daemon = self._daemon
+        self._thread.start()
+
+    def subscribe(self, events):
+        """Replaces the current subscriptions with ``events``."""
+        self._events = list(events)
+        if self._sock is not None:
+            self._sock.sendall(
+                (json.dumps({"subscribe": self._events}) + "\n").encode("utf-8")
+            )
+
+    def _on_thread_run(self):
+        buffer = b""
+        try:
+            while True:
+                data = self._sock.recv(65536)
+                if not data:
+                    break
+
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if not line:
+                        continue
+
+                    try:
+                        message = json.loads(line)
+                        event, payload = message["event"], message.get("payload")
+                    except Exception:
+                        self._logger.warning(
+                            f"Ignoring invalid event bridge message: {line!r}"
+                        )
+                        continue
+
+                    if callable(self._on_event):
+                        try:
+                            self._on_event(event, payload)
+                        except Exception:
+                            self._logger.exception(
+                                f"Error while handling event {event} from the event bridge"
+                            )
+        except OSError:
+            pass
+        finally:
+            if callable(self._on_close):
+                self._on_close()
+
+    def wait(self, timeout=None):
+        """Waits for the closing of the connection or the timeout."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def is_connected(self):
+        """Whether the client is connected or not."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def disconnect(self):
+        """Disconnects from the event bridge."""
+        import socket
+
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+
+
+class ResumableUploadError(Exception):
+    """
+    Raised if a resumable upload could not be completed. It can be resumed later through
+    ``upload_id``, unless that is None.
+    """
+
+    def __init__(self, message, upload_id=None, response=None):
+        super().__init__(message)
+        self.upload_id = upload_id
+        self.response = response
+
+
 class Client:
     def __init__(self, baseurl, apikey):
         self.baseurl = baseurl
@@ -242,6 +372,7 @@ class Client:
         encoding=None,
         params=None,
         timeout=None,
+        headers=None,
     ):
         if timeout is None:
             timeout = 30
@@ -253,6 +384,8 @@ class Client:
                 request.prepare_body(None, None, json=data)
             else:
                 request.prepare_body(data, files=files)
+        if headers:
+            request.headers.update(headers)
         response = s.send(request, timeout=timeout)
         return response
 
@@ -303,6 +436,119 @@ class Client:
 
         return response
 
+    def upload_resumable(
+        self,
+        path,
+        file_path,
+        additional=None,
+        file_name=None,
+        chunk_size=None,
+        parallel=4,
+        retries=3,
+        resume=None,
+        timeout=None,
+    ):
+        """
+        Uploads a file in chunks through a resumable upload, sending up to ``parallel``
+        chunks at once and retrying failed chunks up to ``retries`` times.
+
+        Arguments:
+            path (str): The regular upload endpoint of the target, e.g. ``api/files/local``
+            file_path (str): The file to upload
+            additional (dict): Additional upload parameters like ``select``, ``print``,
+                ``path`` or ``userdata``
+            file_name (str): The name to upload the file as, defaults to its own name
+            chunk_size (int): Requested chunk size, the server might use a smaller one
+            parallel (int): Number of chunks to send at once
+            retries (int): Number of retries per chunk
+            resume (str): The id of an interrupted upload, to only send its missing chunks
+            timeout (float): Timeout per request in seconds
+
+        Returns:
+            requests.Response: The response of the request finishing the upload
+
+        Raises:
+            ResumableUploadError: The upload could not be completed
+        """
+        import concurrent.futures
+        import hashlib
+        import os
+
+        if not os.path.isfile(file_path):
+            raise ValueError(f"{file_path} cannot be uploaded since it is not a file")
+
+        if file_name is None:
+            file_name = os.path.basename(file_path)
+
+        base, target = path.rstrip("/").rsplit("/", 1)
+        uploads = base + "/uploads"
+
+        if resume:
+            response = self.get(f"{uploads}/{resume}", timeout=timeout)
+        else:
+            data = dict(additional or {})
+            if isinstance(data.get("userdata"), str):
+                data["userdata"] = json.loads(data["userdata"])
+            data.update(
+                target=target, filename=file_name, size=os.path.getsize(file_path)
+            )
+            if chunk_size:
+                data["chunkSize"] = chunk_size
+            response = self.post_json(uploads, data, timeout=timeout)
+
+        if response.status_code not in (200, 201):
+            raise ResumableUploadError(
+                f"Could not start the upload: {response.status_code}",
+                upload_id=resume,
+                response=response,
+            )
+        status = response.json()
+        upload_id = status["id"]
+        size = status["chunkSize"]
+
+        def send(index):
+            with open(file_path, "rb") as f:
+                f.seek(index * size)
+                chunk = f.read(size)
+            headers = {"X-Chunk-Checksum": hashlib.sha1(chunk).hexdigest()}
+
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(min(2**attempt, 30))
+                try:
+                    r = self.request(
+                        "PUT",
+                        f"{uploads}/{upload_id}/{index}",
+                        data=chunk,
+                        headers=headers,
+                        timeout=timeout,
+                    )
+                except requests.RequestException:
+                    continue
+                if r.status_code == 204:
+                    return True
+                if r.status_code in (403, 404):
+                    break
+            return False
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            results = list(pool.map(send, status["missing"]))
+
+        if not all(results):
+            raise ResumableUploadError(
+                f"{results.count(False)} chunks could not be uploaded",
+                upload_id=upload_id,
+            )
+
+        response = self.request("POST", f"{uploads}/{upload_id}", timeout=timeout)
+        if response.status_code != 201:
+            raise ResumableUploadError(
+                f"Could not finish the upload: {response.status_code}",
+                upload_id=upload_id,
+                response=response,
+            )
+        return response
+
     def delete(self, path, params=None, timeout=None):
         return self.request("DELETE", path, params=params, timeout=timeout)
 
@@ -317,19 +563,33 @@ class Client:
         )
 
     def create_socket(self, **kwargs):
+        """
+        Creates and connects a socket to OctoPrint's push API.
+
+        If ``binary`` is set to ``True``, the socket will connect to the raw websocket
+        endpoint instead of speaking the SockJS protocol and negotiate the compact binary
+        MessagePack encoding for ``current`` and ``history`` messages, falling back to
+        JSON if the server doesn't allow it.
+        """
         import random
         import uuid
 
-        # creates websocket URL for SockJS according to
-        # - http://sockjs.github.io/sockjs-protocol/sockjs-protocol-0.3.3.html#section-37
-        # - http://sockjs.github.io/sockjs-protocol/sockjs-protocol-0.3.3.html#section-50
-        url = "ws://{}/sockjs/{:0>3d}/{}/websocket".format(
-            self.baseurl[
-                self.baseurl.find("//") + 2 :
-            ],  # host + port + prefix, but no protocol
-            random.randrange(0, stop=999),  # server_id
-            uuid.uuid4(),  # session_id
-        )
+        binary = kwargs.get("binary", False)
+
+        host = self.baseurl[
+            self.baseurl.find("//") + 2 :
+        ]  # host + port + prefix, but no protocol
+        if binary:
+            url = f"ws://{host}/sockjs/websocket"
+        else:
+            # creates websocket URL for SockJS according to
+            # - http://sockjs.github.io/sockjs-protocol/sockjs-protocol-0.3.3.html#section-37
+            # - http://sockjs.github.io/sockjs-protocol/sockjs-protocol-0.3.3.html#section-50
+            url = "ws://{}/sockjs/{:0>3d}/{}/websocket".format(
+                host,
+                random.randrange(0, stop=999),  # server_id
+                uuid.uuid4(),  # session_id
+            )
         use_ssl = self.baseurl.startswith("https:")
 
         on_open_cb = kwargs.get("on_open", None)
@@ -341,7 +601,10 @@ class Client:
         daemon = kwargs.get("daemon", True)
 
         def send(ws, data):
-            payload = '["' + json.dumps(data).replace('"', '\\"') + '"]'
+            if binary:
+                payload = json.dumps(data)
+            else:
+                payload = '["' + json.dumps(data).replace('"', '\\"') + '"]'
             ws.send(payload)
             if callable(on_sent_cb):
                 on_sent_cb(ws, data)
@@ -358,6 +621,29 @@ class Client:
             # send it
             send(ws, auth_message)
 
+        def dispatch(ws, data):
+            for d in data:
+                for internal_type, internal_message in d.items():
+                    on_message_cb(ws, internal_type, internal_message)
+                    if internal_type == "connected":
+                        # we just got connected to the server, authenticate
+                        authenticate(ws)
+                        if binary:
+                            send(ws, {"transport": {"encoding": "msgpack"}})
+
+        def on_raw_message(ws, message):
+            if not callable(on_message_cb):
+                return
+
+            if isinstance(message, bytes):
+                from octoprint.util.msgpack import unpackb
+
+                data = unpackb(message)
+            else:
+                data = json.loads(message)
+
+            dispatch(ws, [data])
+
         def on_message(ws, message):
             message_type = message[0]
 
@@ -387,12 +673,7 @@ class Client:
                     data,
                 ]
 
-            for d in data:
-                for internal_type, internal_message in d.items():
-                    on_message_cb(ws, internal_type, internal_message)
-                    if internal_type == "connected":
-                        # we just got connected to the server, authenticate
-                        authenticate(ws)
+            dispatch(ws, data)
 
         def on_open(ws):
             if callable(on_open_cb):
@@ -421,7 +702,7 @@ class Client:
             use_ssl=use_ssl,
             daemon=daemon,
             on_open=on_open,
-            on_message=on_message,
+            on_message=on_raw_message if binary else on_message,
             on_close=on_close,
             on_error=on_error,
         )
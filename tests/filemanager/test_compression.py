@@ -0,0 +1,99 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from ddt import data, ddt
+
+from octoprint.filemanager import compression
+
+BLOCK_SIZE = 1000
+CONTENT = b"".join(b"G1 X%d Y%d E%.5f\n" % (i, i * 2, i / 7) for i in range(2000))
+
+
+@ddt
+class CompressionTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.plain = self._file("plain.gcode", CONTENT)
+        self.compressed = os.path.join(self.folder, "compressed.gcode")
+        self.size = compression.compress_file(
+            self.plain, self.compressed, block_size=BLOCK_SIZE
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_compress_file(self):
+        self.assertEqual(len(CONTENT), self.size)
+        self.assertLess(os.path.getsize(self.compressed), len(CONTENT))
+        self.assertTrue(compression.is_compressed(self.compressed))
+        self.assertFalse(compression.is_compressed(self.plain))
+
+        # still a regular gzip file
+        with gzip.open(self.compressed, "rb") as f:
+            self.assertEqual(CONTENT, f.read())
+
+    def test_plain_gzip(self):
+        path = self._file("plain.gz", gzip.compress(CONTENT))
+        self.assertFalse(compression.is_compressed(path))
+
+    def test_file_size(self):
+        self.assertEqual(len(CONTENT), compression.file_size(self.compressed))
+        self.assertEqual(len(CONTENT), compression.file_size(self.plain))
+
+    def test_open_file(self):
+        for path in (self.plain, self.compressed):
+            with compression.open_file(path) as f:
+                self.assertEqual(CONTENT, f.read())
+
+    @data(0, 1, BLOCK_SIZE - 1, BLOCK_SIZE, 5 * BLOCK_SIZE + 17, len(CONTENT) - 3)
+    def test_seek(self, offset):
+        with compression.open_file(self.compressed) as f:
+            f.seek(len(CONTENT) // 2)
+            f.read(BLOCK_SIZE * 3)
+
+            f.seek(offset)
+            self.assertEqual(offset, f.tell())
+            self.assertEqual(CONTENT[offset : offset + 2500], f.read(2500))
+
+    def test_seek_beyond_end(self):
+        with compression.open_file(self.compressed) as f:
+            f.seek(len(CONTENT) + 10)
+            self.assertEqual(b"", f.read())
+
+    def test_text(self):
+        with io.TextIOWrapper(
+            compression.open_file(self.compressed), encoding="utf-8", newline=""
+        ) as f:
+            lines = f.readlines()
+        self.assertEqual(2000, len(lines))
+        self.assertEqual("G1 X1999 Y3998 E285.57143\n", lines[-1])
+
+    def test_empty(self):
+        path = self._file("empty.gcode", b"")
+        compressed = os.path.join(self.folder, "empty.compressed.gcode")
+
+        self.assertEqual(0, compression.compress_file(path, compressed))
+        self.assertTrue(compression.is_compressed(compressed))
+        self.assertEqual(0, compression.file_size(compressed))
+        with compression.open_file(compressed) as f:
+            self.assertEqual(b"", f.read())
+
+    def test_corrupt(self):
+        with open(self.compressed, "r+b") as f:
+            f.truncate(os.path.getsize(self.compressed) - 10)
+        self.assertRaises(
+            compression.CompressionError, compression.file_size, self.compressed
+        )
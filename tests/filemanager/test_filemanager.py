@@ -302,6 +302,180 @@ class FileManagerTest(unittest.TestCase):
         ]
         self.fire_event.call_args_list = expected_events
 
+    def test_batch(self):
+        local = octoprint.filemanager.FileDestinations.LOCAL
+        self.local_storage.path_in_storage.side_effect = lambda path: path
+        self.local_storage.split_path.side_effect = lambda path: ("", path)
+
+        with self.file_manager.batch(local):
+            with self.file_manager.batch(local):
+                self.file_manager.remove_file(local, "a.gcode")
+            self.file_manager.remove_file(local, "b.gcode")
+            self.file_manager.add_folder(local, "folder")
+
+            self.assertNotIn(
+                mock.call(
+                    octoprint.filemanager.Events.UPDATED_FILES, {"type": "printables"}
+                ),
+                self.fire_event.call_args_list,
+            )
+
+        self.local_storage.batch.assert_called()
+        self.assertEqual(
+            [
+                octoprint.filemanager.Events.FILE_REMOVED,
+                octoprint.filemanager.Events.FILE_REMOVED,
+                octoprint.filemanager.Events.FOLDER_ADDED,
+                octoprint.filemanager.Events.UPDATED_FILES,
+            ],
+            [call.args[0] for call in self.fire_event.call_args_list],
+        )
+
+        # back to one event per operation
+        self.file_manager.remove_file(local, "c.gcode")
+        self.assertEqual(
+            octoprint.filemanager.Events.UPDATED_FILES,
+            self.fire_event.call_args_list[-1].args[0],
+        )
+        self.assertEqual(6, self.fire_event.call_count)
+
+    def test_batch_other_thread(self):
+        import threading
+
+        local = octoprint.filemanager.FileDestinations.LOCAL
+        self.local_storage.path_in_storage.side_effect = lambda path: path
+        self.local_storage.split_path.side_effect = lambda path: ("", path)
+
+        with self.file_manager.batch(local):
+            thread = threading.Thread(
+                target=self.file_manager.remove_file, args=(local, "other.gcode")
+            )
+            thread.start()
+            thread.join()
+
+            # not part of the batch, so not deferred
+            self.assertEqual(
+                [
+                    octoprint.filemanager.Events.FILE_REMOVED,
+                    octoprint.filemanager.Events.UPDATED_FILES,
+                ],
+                [call.args[0] for call in self.fire_event.call_args_list],
+            )
+
+            self.file_manager.remove_file(local, "a.gcode")
+            self.assertEqual(3, self.fire_event.call_count)
+
+        self.assertEqual(
+            octoprint.filemanager.Events.UPDATED_FILES,
+            self.fire_event.call_args_list[-1].args[0],
+        )
+        self.assertEqual(4, self.fire_event.call_count)
+
+    def test_add_analysis_result_markers(self):
+        local = octoprint.filemanager.FileDestinations.LOCAL
+        markers = {"strings": {}, "layers": [10, 20], "features": {}, "pauses": []}
+        result = {"estimatedPrintTime": 100, "markers": markers}
+
+        self.file_manager._add_analysis_result(local, "test.gcode", result)
+
+        self.local_storage.set_additional_metadata.assert_has_calls(
+            [
+                mock.call(
+                    "test.gcode",
+                    "analysis",
+                    {"estimatedPrintTime": 100},
+                    overwrite=True,
+                ),
+                mock.call("test.gcode", "markers", markers, overwrite=True),
+            ]
+        )
+        self.assertIn("markers", result)
+
+    def test_search_files(self):
+        import octoprint.filemanager
+
+        local = octoprint.filemanager.FileDestinations.LOCAL
+        events = octoprint.filemanager.Events
+
+        def node(name, display=None):
+            return {
+                "name": name,
+                "display": display or name,
+                "path": name,
+                "type": "machinecode",
+                "typePath": ["machinecode", "gcode"],
+            }
+
+        self.local_storage.list_files.return_value = {"cube.gcode": node("cube.gcode")}
+        self.local_storage.path_in_storage.side_effect = lambda path: path
+        self.local_storage.split_path.side_effect = lambda path: ("", path)
+
+        total, files = self.file_manager.search_files(local, "cube")
+        self.assertEqual(1, total)
+        self.assertEqual("cube.gcode", files[0]["path"])
+
+        subscribe = octoprint.filemanager.eventManager.return_value.subscribe
+        callbacks = {
+            c.args[0]: c.args[1]
+            for c in subscribe.call_args_list
+            if c.kwargs.get("immediate")
+        }
+        self.assertIn(events.FILE_ADDED, callbacks)
+        self.assertIn(events.METADATA_ANALYSIS_FINISHED, callbacks)
+
+        # updates are applied on the next search, without rebuilding the index
+        self.local_storage.list_files.return_value = {
+            "cube.gcode": node("cube.gcode", display="Cube v2.gcode")
+        }
+        callbacks[events.METADATA_ANALYSIS_FINISHED](
+            events.METADATA_ANALYSIS_FINISHED,
+            {"origin": local, "path": "cube.gcode", "name": "cube.gcode"},
+        )
+        self.assertEqual(1, self.file_manager.search_files(local, "v2")[0])
+        self.local_storage.list_files.assert_called_with(path="", recursive=False)
+
+        self.local_storage.list_files.return_value = {}
+        callbacks[events.FILE_REMOVED](
+            events.FILE_REMOVED, {"storage": local, "path": "cube.gcode"}
+        )
+        self.assertEqual((0, []), self.file_manager.search_files(local, "cube"))
+
+    def test_external_change(self):
+        local = octoprint.filemanager.FileDestinations.LOCAL
+        self.local_storage.list_files.return_value = {}
+        self.file_manager.search_files(local, "cube")
+        self.fire_event.reset_mock()
+
+        self.local_storage.add_change_listener.assert_called_once()
+        on_change = self.local_storage.add_change_listener.call_args.args[0]
+
+        self.local_storage.list_files.return_value = {
+            "cube.gcode": {
+                "name": "cube.gcode",
+                "display": "cube.gcode",
+                "path": "cube.gcode",
+                "type": "machinecode",
+                "typePath": ["machinecode", "gcode"],
+            }
+        }
+        on_change()
+
+        self.fire_event.assert_called_once_with(
+            octoprint.filemanager.Events.UPDATED_FILES, {"type": "printables"}
+        )
+        self.assertEqual(1, self.file_manager.search_files(local, "cube")[0])
+
+    def test_is_watched(self):
+        local = octoprint.filemanager.FileDestinations.LOCAL
+
+        self.local_storage.watched = True
+        self.assertTrue(self.file_manager.is_watched(local))
+
+        self.local_storage.watched = False
+        self.assertFalse(self.file_manager.is_watched(local))
+
+        self.assertFalse(self.file_manager.is_watched("unknown"))
+
     def test_add_folder(self):
         self.local_storage.add_folder.return_value = ("", "test_folder")
         self.local_storage.split_path.return_value = ("", "test_folder")
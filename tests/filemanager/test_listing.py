@@ -0,0 +1,221 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import unittest
+
+from ddt import data, ddt, unpack
+
+from octoprint.filemanager.listing import (
+    InvalidCursor,
+    ListingIndex,
+    paginate,
+    print_summary,
+)
+
+
+def _file(path, size=None, date=None, history=None, estimated=None, display=None):
+    node = {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": "machinecode",
+        "typePath": ["machinecode", "gcode"],
+    }
+    if display is not None:
+        node["display"] = display
+    if size is not None:
+        node["size"] = size
+    if date is not None:
+        node["date"] = date
+    if history is not None:
+        node["history"] = history
+    if estimated is not None:
+        node["analysis"] = {"estimatedPrintTime": estimated}
+    return node
+
+
+def _folder(path, *children):
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": "folder",
+        "typePath": ["folder"],
+        "size": sum(child.get("size", 0) for child in children),
+        "children": {child["name"]: child for child in children},
+    }
+
+
+LISTING = {
+    node["name"]: node
+    for node in (
+        _file("b.gcode", size=300, date=20, estimated=50.0),
+        _file(
+            "A.gcode",
+            size=100,
+            date=30,
+            history=[
+                {"success": True, "timestamp": 100},
+                {"success": False, "timestamp": 200},
+            ],
+        ),
+        _file("c.gcode", size=200, date=10, display="Zebra"),
+        _folder(
+            "folder",
+            _file(
+                "folder/d.gcode",
+                size=50,
+                date=5,
+                history=[{"success": True, "timestamp": 300, "printTime": 12.0}],
+                estimated=10.0,
+            ),
+            _folder("folder/sub", _file("folder/sub/e.gcode", size=10, date=1)),
+        ),
+    )
+}
+
+
+def _paths(nodes):
+    return [node["path"] for node in nodes]
+
+
+@ddt
+class ListingIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ListingIndex(LISTING)
+        self.recursive = ListingIndex(LISTING, recursive=True)
+
+    @data(
+        ("name", None, ["A.gcode", "b.gcode", "folder", "c.gcode"]),
+        ("name", "desc", ["c.gcode", "folder", "b.gcode", "A.gcode"]),
+        ("date", None, ["A.gcode", "b.gcode", "c.gcode", "folder"]),
+        ("size", None, ["b.gcode", "c.gcode", "A.gcode", "folder"]),
+        ("size", "asc", ["folder", "A.gcode", "c.gcode", "b.gcode"]),
+        ("last_print", None, ["folder", "A.gcode", "b.gcode", "c.gcode"]),
+        ("estimated_time", None, ["b.gcode", "A.gcode", "folder", "c.gcode"]),
+        ("estimated_time", "desc", ["b.gcode", "A.gcode", "folder", "c.gcode"]),
+    )
+    @unpack
+    def test_sort(self, sort, order, expected):
+        nodes, cursor = self.index.page(sort=sort, order=order)
+        self.assertEqual(expected, _paths(nodes))
+        self.assertIsNone(cursor)
+
+    def test_recursive(self):
+        nodes, _ = self.recursive.page(sort="size", order="asc")
+        self.assertEqual(
+            [
+                "folder/sub/e.gcode",
+                "folder/sub",
+                "folder/d.gcode",
+                "folder",
+                "A.gcode",
+                "c.gcode",
+                "b.gcode",
+            ],
+            _paths(nodes),
+        )
+
+    def test_folder_summary(self):
+        nodes, _ = self.index.page(query="folder")
+
+        self.assertEqual(1, len(nodes))
+        self.assertNotIn("children", nodes[0])
+        self.assertEqual(
+            {
+                "success": 1,
+                "failure": 0,
+                "last": {"success": True, "date": 300, "printTime": 12.0},
+            },
+            nodes[0]["prints"],
+        )
+
+    def test_pages(self):
+        paths = []
+        cursor = None
+        pages = 0
+        while True:
+            nodes, cursor = self.recursive.page(sort="date", cursor=cursor, limit=3)
+            paths += _paths(nodes)
+            pages += 1
+            if cursor is None:
+                break
+
+        self.assertEqual(3, pages)
+        self.assertEqual(_paths(self.recursive.page(sort="date")[0]), paths)
+
+    def test_cursor_survives_changes(self):
+        nodes, cursor = self.index.page(limit=2)
+        self.assertEqual(["A.gcode", "b.gcode"], _paths(nodes))
+
+        listing = dict(LISTING)
+        del listing["b.gcode"]
+        listing["B2.gcode"] = _file("B2.gcode")
+
+        nodes, cursor = ListingIndex(listing).page(cursor=cursor, limit=2)
+        self.assertEqual(["B2.gcode", "folder"], _paths(nodes))
+        self.assertIsNotNone(cursor)
+
+    def test_cursor_other_sort(self):
+        _, cursor = self.index.page(limit=1)
+        self.assertRaises(InvalidCursor, self.index.page, sort="size", cursor=cursor)
+        self.assertRaises(InvalidCursor, self.index.page, cursor="invalid")
+
+    @data(
+        ({"prints": "success"}, ["A.gcode", "folder"]),
+        ({"prints": "failure"}, ["A.gcode"]),
+        ({"prints": "none"}, ["b.gcode", "c.gcode"]),
+        ({"query": "ZEB"}, ["c.gcode"]),
+        ({"query": "c.g"}, ["c.gcode"]),
+        (
+            {"filter": lambda node: node["name"] != "A.gcode"},
+            ["b.gcode", "folder", "c.gcode"],
+        ),
+    )
+    @unpack
+    def test_filters(self, filters, expected):
+        nodes, _ = self.index.page(**filters)
+        self.assertEqual(expected, _paths(nodes))
+
+    def test_filtered_last_page(self):
+        nodes, cursor = self.index.page(prints="failure", limit=1)
+        self.assertEqual(["A.gcode"], _paths(nodes))
+        self.assertIsNone(cursor)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, self.index.page, sort="unknown")
+        self.assertRaises(ValueError, self.index.page, order="random")
+        self.assertRaises(ValueError, self.index.page, prints="maybe")
+
+    def test_merge(self):
+        sd = ListingIndex(
+            [_file("a.gco", size=250), _file("x.gco", size=5)], origin="sdcard"
+        )
+
+        nodes, cursor = paginate([self.index, sd], sort="size", limit=3)
+        self.assertEqual(["b.gcode", "a.gco", "c.gcode"], _paths(nodes))
+        self.assertEqual("sdcard", nodes[1]["origin"])
+        self.assertNotIn("origin", nodes[0])
+
+        nodes, cursor = paginate([self.index, sd], sort="size", cursor=cursor, limit=3)
+        self.assertEqual(["A.gcode", "folder", "x.gco"], _paths(nodes))
+        self.assertIsNone(cursor)
+
+
+class PrintSummaryTest(unittest.TestCase):
+    def test_never_printed(self):
+        self.assertIsNone(print_summary([]))
+
+    def test_summary(self):
+        self.assertEqual(
+            {
+                "success": 2,
+                "failure": 1,
+                "last": {"success": False, "date": 300, "printTime": 3.0},
+            },
+            print_summary(
+                [
+                    {"success": True, "timestamp": 100},
+                    {"success": False, "timestamp": 300, "printTime": 3.0},
+                    {"success": True, "timestamp": 200},
+                ]
+            ),
+        )
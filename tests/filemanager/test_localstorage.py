@@ -4,12 +4,21 @@ __copyright__ = "Copyright (C) 2014 The OctoPrint Project - Released under terms
 
 import os
 import os.path
+import time
 import unittest
 from contextlib import contextmanager
 from unittest import mock
 
 from ddt import data, ddt, unpack
 
+from octoprint.filemanager import compression
+from octoprint.filemanager.metadata import (
+    METADATA_JOURNAL,
+    METADATA_JSON,
+    JsonMetadataBackend,
+    SqliteMetadataBackend,
+    WriteBehindMetadataBackend,
+)
 from octoprint.filemanager.storage import LocalFileStorage, StorageError
 
 
@@ -79,6 +88,50 @@ class LocalStorageTest(unittest.TestCase):
     def test_add_file(self):
         self._add_and_verify_file("bp_case.stl", "bp_case.stl", FILE_BP_CASE_STL)
 
+    def test_add_file_known_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        slicer = {"name": "PrusaSlicer 2.6.0", "settings": {"layer_height": "0.2"}}
+        upload = DiskFileWrapper(
+            "bp_case.gcode",
+            FILE_BP_CASE_GCODE.path,
+            move=False,
+            hash=FILE_BP_CASE_GCODE.hash,
+            slicer=slicer,
+        )
+
+        with mock.patch.object(self.storage, "_create_hash") as create_hash:
+            self.storage.add_file("bp_case.gcode", upload)
+            create_hash.assert_not_called()
+
+        metadata = self.storage.get_metadata("bp_case.gcode")
+        self.assertEqual(FILE_BP_CASE_GCODE.hash, metadata["hash"])
+        self.assertEqual(slicer, metadata["slicer"])
+
+    def test_add_file_invalid_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        upload = DiskFileWrapper(
+            "bp_case.gcode", FILE_BP_CASE_GCODE.path, move=False, hash="../../x"
+        )
+        self.storage.add_file("bp_case.gcode", upload)
+
+        self.assertEqual(
+            FILE_BP_CASE_GCODE.hash, self.storage.get_metadata("bp_case.gcode")["hash"]
+        )
+
+    def test_staging_folder(self):
+        staging = self.storage.staging_folder
+        self.assertTrue(os.path.isdir(staging))
+        self.assertEqual(self.basefolder, os.path.dirname(staging))
+
+        with open(os.path.join(staging, "upload.tmp"), "wb") as f:
+            f.write(b"stale")
+        self.assertEqual({}, self.storage.list_files())
+
+        LocalFileStorage(self.basefolder)
+        self.assertEqual([], os.listdir(staging))
+
     def test_add_file_overwrite(self):
         self._add_and_verify_file("bp_case.stl", "bp_case.stl", FILE_BP_CASE_STL)
 
@@ -373,10 +426,8 @@ class LocalStorageTest(unittest.TestCase):
         self.assertTrue(
             os.path.isdir(os.path.join(self.basefolder, "destination", "copied"))
         )
-        self.assertTrue(
-            os.path.isfile(
-                os.path.join(self.basefolder, "destination", "copied", ".metadata.json")
-            )
+        self._assert_metadata_persisted(
+            os.path.join(self.basefolder, "destination", "copied")
         )
         self.assertTrue(
             os.path.isfile(
@@ -406,10 +457,8 @@ class LocalStorageTest(unittest.TestCase):
         self.assertTrue(
             os.path.isdir(os.path.join(self.basefolder, "destination", "copied"))
         )
-        self.assertTrue(
-            os.path.isfile(
-                os.path.join(self.basefolder, "destination", "copied", ".metadata.json")
-            )
+        self._assert_metadata_persisted(
+            os.path.join(self.basefolder, "destination", "copied")
         )
         self.assertTrue(
             os.path.isfile(
@@ -850,6 +899,93 @@ class LocalStorageTest(unittest.TestCase):
         self.assertEqual(expected_path, sanitized_path)
         return sanitized_path
 
+    def test_list_files_page(self):
+        self._add_folder("content")
+        self._add_file("content/crazyradio.stl", FILE_CRAZYRADIO_STL)
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+
+        files, cursor = self.storage.list_files_page(sort="name", limit=1)
+        self.assertEqual(["bp_case.stl"], [f["path"] for f in files])
+        self.assertIsNotNone(cursor)
+
+        files, cursor = self.storage.list_files_page(sort="name", cursor=cursor)
+        self.assertEqual(["content"], [f["path"] for f in files])
+        self.assertNotIn("children", files[0])
+        self.assertIsNone(cursor)
+
+        files, _ = self.storage.list_files_page(sort="size", recursive=True)
+        self.assertEqual(
+            ["content", "content/crazyradio.stl", "bp_case.stl"],
+            [f["path"] for f in files],
+        )
+
+        files, _ = self.storage.list_files_page(path="content", query="radio")
+        self.assertEqual(["content/crazyradio.stl"], [f["path"] for f in files])
+
+    def test_listing_index_cache(self):
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        self._settle()
+
+        index = self.storage.listing_index()
+        self.assertIs(index, self.storage.listing_index())
+        self.assertIsNot(index, self.storage.listing_index(recursive=True))
+
+        time.sleep(0.01)  # make sure mtimes differ without a watcher
+        self._add_file("crazyradio.stl", FILE_CRAZYRADIO_STL)
+
+        updated = self.storage.listing_index()
+        self.assertIsNot(index, updated)
+        self.assertEqual(2, len(updated))
+
+    def test_batch(self):
+        self._add_folder("content")
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        self._add_file("content/crazyradio.stl", FILE_CRAZYRADIO_STL)
+
+        backend = self.storage._metadata_backend
+        with mock.patch.object(backend, "save", wraps=backend.save) as save:
+            with self.storage.batch():
+                with self.storage.batch():
+                    self.storage.copy_file("bp_case.stl", "content/copy1.stl")
+                self.storage.copy_file("bp_case.stl", "content/copy2.stl")
+                self.storage.move_file("content/crazyradio.stl", "crazyradio.stl")
+                self.storage.set_additional_metadata("crazyradio.stl", "key", "value")
+
+                save.assert_not_called()
+                self.assertEqual(
+                    "value", self.storage.get_metadata("crazyradio.stl")["key"]
+                )
+
+        saved = [call.args[0] for call in save.call_args_list]
+        self.assertCountEqual(
+            [self.basefolder, os.path.join(self.basefolder, "content")], saved
+        )
+
+        self.storage._metadata_cache.clear()
+        self.assertEqual(
+            FILE_BP_CASE_STL.hash, self.storage.get_metadata("content/copy2.stl")["hash"]
+        )
+        self.assertEqual("value", self.storage.get_metadata("crazyradio.stl")["key"])
+
+    def test_batch_folders(self):
+        self._add_folder("content")
+        self._add_folder("other")
+
+        with self.storage.batch():
+            self.storage.add_file("content/bp_case.stl", FILE_BP_CASE_STL)
+            self.storage.add_file("other/crazyradio.stl", FILE_CRAZYRADIO_STL)
+            self.storage.copy_folder("content", "copy")
+            self.storage.move_folder("content", "moved")
+            self.storage.remove_folder("other")
+
+        self.storage._metadata_cache.clear()
+        for path in ("copy/bp_case.stl", "moved/bp_case.stl"):
+            self.assertEqual(
+                FILE_BP_CASE_STL.hash, self.storage.get_metadata(path)["hash"]
+            )
+        self.assertFalse(os.path.exists(os.path.join(self.basefolder, "other")))
+        self.assertFalse(os.path.exists(os.path.join(self.basefolder, "content")))
+
     def test_migrate_metadata_to_json(self):
         metadata = {"test.gco": {"hash": "aabbccddeeff", "links": [], "notes": []}}
         yaml_path = os.path.join(self.basefolder, ".metadata.yaml")
@@ -862,7 +998,7 @@ class LocalStorageTest(unittest.TestCase):
             yaml.safe_dump(metadata, f)
 
         # migrate
-        self.storage._migrate_metadata(self.basefolder)
+        JsonMetadataBackend()._migrate(self.basefolder)
 
         # verify
         self.assertTrue(os.path.exists(json_path))
@@ -874,6 +1010,12 @@ class LocalStorageTest(unittest.TestCase):
             json_metadata = json.load(f)
         self.assertDictEqual(metadata, json_metadata)
 
+    def _assert_metadata_persisted(self, folder_path):
+        self.assertTrue(os.path.isfile(os.path.join(folder_path, ".metadata.json")))
+
+    def _settle(self):
+        pass
+
     def _add_file(self, path, file_object, links=None, overwrite=False, display=None):
         """
         Adds a file to the storage.
@@ -896,7 +1038,7 @@ class LocalStorageTest(unittest.TestCase):
             folder_path = os.path.join(self.basefolder, os.path.join(*split_path[:-1]))
 
         self.assertTrue(os.path.isfile(file_path))
-        self.assertTrue(os.path.isfile(os.path.join(folder_path, ".metadata.json")))
+        self._assert_metadata_persisted(folder_path)
 
         metadata = self.storage.get_metadata(sanitized_path)
         self.assertIsNotNone(metadata)
@@ -934,6 +1076,461 @@ class LocalStorageTest(unittest.TestCase):
         return sanitized_path
 
 
+class WatchedLocalStorageTest(LocalStorageTest):
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalFileStorage(self.basefolder, watch=True)
+        self.assertIsNotNone(self.storage._watcher)
+
+    def tearDown(self):
+        self.storage._watcher.stop()
+        super().tearDown()
+
+    def _settle(self):
+        # notifications about our own changes arrive asynchronously
+        deadline = time.monotonic() + 5.0
+        generation = None
+        while (
+            generation != self.storage._watcher.generation and time.monotonic() < deadline
+        ):
+            generation = self.storage._watcher.generation
+            time.sleep(0.1)
+
+    def _wait_for_change(self, path, generation):
+        deadline = time.monotonic() + 5.0
+        while (
+            not self.storage._watcher.changed_since(path, generation)
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.05)
+
+    def test_external_changes(self):
+        content_folder = self._add_and_verify_folder("content", "content")
+        self.assertEqual(0, len(self.storage.list_files()["content"]["children"]))
+
+        generation = self.storage._watcher.generation
+        FILE_CRAZYRADIO_STL.save(
+            os.path.join(self.basefolder, content_folder, "crazyradio.stl")
+        )
+        self._wait_for_change(os.path.join(self.basefolder, content_folder), generation)
+
+        file_list = self.storage.list_files()
+        self.assertTrue("crazyradio.stl" in file_list["content"]["children"])
+
+    def test_change_listener(self):
+        listener = mock.MagicMock()
+        self.storage.add_change_listener(listener)
+
+        # our own changes don't count
+        self._add_and_verify_file(
+            "content/crazyradio.stl", "content/crazyradio.stl", FILE_CRAZYRADIO_STL
+        )
+        self._settle()
+        time.sleep(1.5)
+        listener.assert_not_called()
+
+        os.makedirs(os.path.join(self.basefolder, "external"))
+        FILE_BP_CASE_STL.save(os.path.join(self.basefolder, "external", "bp_case.stl"))
+
+        deadline = time.monotonic() + 5.0
+        while not listener.called and time.monotonic() < deadline:
+            time.sleep(0.05)
+        listener.assert_called_with()
+
+    def test_last_modified(self):
+        self._add_and_verify_folder("content", "content")
+        self._add_and_verify_file(
+            "content/crazyradio.stl", "content/crazyradio.stl", FILE_CRAZYRADIO_STL
+        )
+
+        def walked():
+            return max(
+                max(
+                    os.stat(root).st_mtime,
+                    os.stat(os.path.join(root, ".metadata.json")).st_mtime
+                    if os.path.exists(os.path.join(root, ".metadata.json"))
+                    else 0,
+                )
+                for root, _, _ in os.walk(self.basefolder)
+            )
+
+        self.assertEqual(walked(), self.storage.last_modified(recursive=True))
+
+        self._add_and_verify_file(
+            "content/bp_case.stl", "content/bp_case.stl", FILE_BP_CASE_STL
+        )
+        self.assertEqual(walked(), self.storage.last_modified(recursive=True))
+
+
+class SqliteLocalStorageTest(LocalStorageTest):
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalFileStorage(self.basefolder, metadata_backend="sqlite")
+        self.assertIsInstance(self.storage._metadata_backend, SqliteMetadataBackend)
+
+    def tearDown(self):
+        self.storage._metadata_backend.close()
+        super().tearDown()
+
+    def _assert_metadata_persisted(self, folder_path):
+        self.assertFalse(os.path.exists(os.path.join(folder_path, ".metadata.json")))
+        self.assertIn(
+            os.path.relpath(folder_path, self.basefolder).replace(os.sep, "/").strip("."),
+            self.storage._metadata_backend.export(),
+        )
+
+    def test_import_json(self):
+        import json
+
+        os.mkdir(os.path.join(self.basefolder, "content"))
+        FILE_CRAZYRADIO_STL.save(
+            os.path.join(self.basefolder, "content", "crazyradio.stl")
+        )
+        with open(os.path.join(self.basefolder, "content", ".metadata.json"), "w") as f:
+            json.dump({"crazyradio.stl": {"hash": "aabbccddeeff", "notes": []}}, f)
+
+        self.assertEqual(
+            "aabbccddeeff", self.storage.get_metadata("content/crazyradio.stl")["hash"]
+        )
+        self.assertEqual(
+            {"crazyradio.stl": {"hash": "aabbccddeeff", "notes": []}},
+            self.storage._metadata_backend.export()["content"],
+        )
+
+    def test_remove_folder_metadata(self):
+        self._add_folder("content")
+        self._add_folder("content/sub")
+        self._add_file("content/sub/crazyradio.stl", FILE_CRAZYRADIO_STL)
+
+        self.storage.remove_folder("content")
+
+        exported = self.storage._metadata_backend.export()
+        self.assertNotIn("content", exported)
+        self.assertNotIn("content/sub", exported)
+        self.assertNotIn("content", exported.get("", {}))
+
+    def test_move_folder_metadata(self):
+        self._add_folder("source")
+        self._add_folder("source/sub")
+        self._add_file("source/sub/crazyradio.stl", FILE_CRAZYRADIO_STL)
+        metadata = self.storage.get_metadata("source/sub/crazyradio.stl")
+
+        self.storage.move_folder("source", "destination")
+
+        exported = self.storage._metadata_backend.export()
+        self.assertNotIn("source/sub", exported)
+        self.assertEqual(metadata, exported["destination/sub"]["crazyradio.stl"])
+
+
+class WriteBehindLocalStorageTest(LocalStorageTest):
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalFileStorage(self.basefolder, metadata_flush_interval=3600)
+        self.assertIsInstance(self.storage._metadata_backend, WriteBehindMetadataBackend)
+
+    def tearDown(self):
+        self.storage.close()
+        super().tearDown()
+
+    def _assert_metadata_persisted(self, folder_path):
+        # either still in the journal or already flushed by a folder operation
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.basefolder, METADATA_JOURNAL))
+            or os.path.isfile(os.path.join(folder_path, METADATA_JSON))
+        )
+
+    def test_close(self):
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        self.assertFalse(os.path.exists(os.path.join(self.basefolder, METADATA_JSON)))
+
+        self.storage.close()
+
+        self.assertFalse(os.path.exists(os.path.join(self.basefolder, METADATA_JOURNAL)))
+        self.assertIn("bp_case.stl", JsonMetadataBackend().load(self.basefolder) or {})
+
+    def test_replay(self):
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+
+        # start over without writing the metadata
+        self.storage._metadata_backend._journal.close()
+        self.storage._metadata_backend._journal = None
+        self.storage._metadata_backend._pending.clear()
+
+        storage = LocalFileStorage(self.basefolder, metadata_flush_interval=3600)
+        self.assertEqual(
+            FILE_BP_CASE_STL.hash, storage.get_metadata("bp_case.stl")["hash"]
+        )
+        storage.close()
+
+
+class DeduplicatedLocalStorageTest(LocalStorageTest):
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalFileStorage(self.basefolder, deduplicate=True)
+
+    def _blob(self, file_object):
+        return os.path.join(
+            self.basefolder, ".blobs", file_object.hash[:2], file_object.hash
+        )
+
+    def _links(self, file_object):
+        blob = self._blob(file_object)
+        return os.stat(blob).st_nlink if os.path.exists(blob) else 0
+
+    def test_add_file_known_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        upload = DiskFileWrapper(
+            "bp_case.gcode",
+            FILE_BP_CASE_GCODE.path,
+            move=False,
+            hash=FILE_BP_CASE_GCODE.hash,
+        )
+
+        # the content gets linked to the blob named after its hash, so it gets verified
+        with mock.patch.object(
+            self.storage, "_create_hash", wraps=self.storage._create_hash
+        ) as create_hash:
+            self.storage.add_file("bp_case.gcode", upload)
+            create_hash.assert_called_once()
+
+        self.assertEqual(2, self._links(FILE_BP_CASE_GCODE))
+
+    def test_add_file_trusted_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        upload = DiskFileWrapper(
+            "bp_case.gcode",
+            FILE_BP_CASE_GCODE.path,
+            move=False,
+            hash=FILE_BP_CASE_GCODE.hash,
+            trusted=True,
+        )
+
+        # computed by the server while receiving the upload, no need to read it again
+        with mock.patch.object(
+            self.storage, "_create_hash", wraps=self.storage._create_hash
+        ) as create_hash:
+            self.storage.add_file("bp_case.gcode", upload)
+            create_hash.assert_not_called()
+
+        self.assertEqual(
+            FILE_BP_CASE_GCODE.hash, self.storage.get_metadata("bp_case.gcode")["hash"]
+        )
+        self.assertEqual(2, self._links(FILE_BP_CASE_GCODE))
+
+    def test_add_file_trusted_invalid_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        upload = DiskFileWrapper(
+            "bp_case.stl", FILE_BP_CASE_STL.path, move=False, hash="../x", trusted=True
+        )
+        self.storage.add_file("bp_case.stl", upload)
+
+        self.assertEqual(
+            FILE_BP_CASE_STL.hash, self.storage.get_metadata("bp_case.stl")["hash"]
+        )
+        self.assertEqual(2, self._links(FILE_BP_CASE_STL))
+
+    def test_add_file_malicious_hash(self):
+        import shutil
+        import tempfile
+
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside)
+
+        target = os.path.join(outside, "users.yaml")
+        with open(target, "wb") as f:
+            f.write(b"untouched")
+
+        # resolves to the target when joined with the blob folder and its ".." bucket
+        relative = os.path.relpath(target, self.basefolder)
+
+        for file_hash in (target, relative):
+            upload = DiskFileWrapper(
+                "bp_case.stl", FILE_BP_CASE_STL.path, move=False, hash=file_hash
+            )
+            self.storage.add_file("bp_case.stl", upload, allow_overwrite=True)
+
+            with open(target, "rb") as f:
+                self.assertEqual(b"untouched", f.read())
+            self.assertEqual(
+                FILE_BP_CASE_STL.hash, self.storage.get_metadata("bp_case.stl")["hash"]
+            )
+            self.assertEqual(2, self._links(FILE_BP_CASE_STL))
+
+    def test_add_file_spoofed_hash(self):
+        from octoprint.filemanager.util import DiskFileWrapper
+
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+
+        # claims to have the content of bp_case.stl
+        upload = DiskFileWrapper(
+            "crazyradio.stl",
+            FILE_CRAZYRADIO_STL.path,
+            move=False,
+            hash=FILE_BP_CASE_STL.hash,
+        )
+        self.storage.add_file("crazyradio.stl", upload)
+
+        for name, file_object in (
+            ("bp_case.stl", FILE_BP_CASE_STL),
+            ("crazyradio.stl", FILE_CRAZYRADIO_STL),
+        ):
+            with open(os.path.join(self.basefolder, name), "rb") as f:
+                with open(file_object.path, "rb") as expected:
+                    self.assertEqual(expected.read(), f.read())
+            self.assertEqual(2, self._links(file_object))
+
+    def test_blob_path_invalid_hash(self):
+        for file_hash in ("../../x", "/etc/passwd", "A" * 40, "a" * 39, None):
+            self.assertRaises(ValueError, self.storage._blob_path, file_hash)
+
+    def test_add_file_deduplicated(self):
+        self._add_folder("content")
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        self._add_file("content/bp_case.stl", FILE_BP_CASE_STL)
+
+        self.assertTrue(
+            os.path.samefile(
+                self._blob(FILE_BP_CASE_STL),
+                os.path.join(self.basefolder, "content", "bp_case.stl"),
+            )
+        )
+        self.assertEqual(3, self._links(FILE_BP_CASE_STL))
+        self.assertNotIn(".blobs", self.storage.list_files())
+
+    def test_overwrite_file(self):
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        self.storage.copy_file("bp_case.stl", "copy.stl")
+
+        self._add_file("copy.stl", FILE_CRAZYRADIO_STL, overwrite=True)
+
+        # the other file sharing the old content stays untouched
+        with open(os.path.join(self.basefolder, "bp_case.stl"), "rb") as f:
+            with open(FILE_BP_CASE_STL.path, "rb") as expected:
+                self.assertEqual(expected.read(), f.read())
+        self.assertEqual(2, self._links(FILE_BP_CASE_STL))
+        self.assertEqual(2, self._links(FILE_CRAZYRADIO_STL))
+
+        self._add_file("copy.stl", FILE_BP_CASE_STL, overwrite=True)
+        self.assertEqual(3, self._links(FILE_BP_CASE_STL))
+        self.assertEqual(0, self._links(FILE_CRAZYRADIO_STL))
+
+    def test_copy_and_remove_file(self):
+        self._add_folder("test")
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+
+        self.storage.copy_file("bp_case.stl", "test/copied.stl")
+        self.assertEqual(3, self._links(FILE_BP_CASE_STL))
+
+        self.storage.move_file("test/copied.stl", "moved.stl")
+        self.assertEqual(3, self._links(FILE_BP_CASE_STL))
+
+        self.storage.remove_file("bp_case.stl")
+        self.assertEqual(2, self._links(FILE_BP_CASE_STL))
+
+        self.storage.remove_file("moved.stl")
+        self.assertFalse(os.path.exists(self._blob(FILE_BP_CASE_STL)))
+
+    def test_copy_and_remove_folder(self):
+        self._add_folder("source")
+        self._add_file("source/bp_case.stl", FILE_BP_CASE_STL)
+
+        self.storage.copy_folder("source", "destination")
+        self.assertEqual(3, self._links(FILE_BP_CASE_STL))
+        self.assertEqual(
+            self.storage.get_metadata("source/bp_case.stl"),
+            self.storage.get_metadata("destination/bp_case.stl"),
+        )
+
+        self.storage.remove_folder("source")
+        self.assertEqual(2, self._links(FILE_BP_CASE_STL))
+
+        self.storage.remove_folder("destination")
+        self.assertFalse(os.path.exists(self._blob(FILE_BP_CASE_STL)))
+
+    def test_shared_analysis(self):
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE)
+        self.storage.set_additional_metadata(
+            "bp_case.gcode", "analysis", {"estimatedPrintTime": 100}, overwrite=True
+        )
+
+        self._add_file("other.gcode", FILE_BP_CASE_GCODE)
+        self.assertEqual(
+            {"estimatedPrintTime": 100},
+            self.storage.get_metadata("other.gcode")["analysis"],
+        )
+
+        # removing the last file also removes the shared analysis
+        self.storage.remove_file("bp_case.gcode")
+        self.storage.remove_file("other.gcode")
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE)
+        self.assertNotIn("analysis", self.storage.get_metadata("bp_case.gcode"))
+
+    def test_collect_blobs(self):
+        self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+        os.remove(os.path.join(self.basefolder, "bp_case.stl"))
+
+        LocalFileStorage(self.basefolder, deduplicate=True)
+        self.assertFalse(os.path.exists(self._blob(FILE_BP_CASE_STL)))
+
+    def test_link_unsupported(self):
+        with mock.patch("os.link", side_effect=OSError("not supported")):
+            self._add_file("bp_case.stl", FILE_BP_CASE_STL)
+            self.storage.copy_file("bp_case.stl", "copy.stl")
+
+        self.assertEqual(0, self._links(FILE_BP_CASE_STL))
+        self.assertTrue(os.path.isfile(os.path.join(self.basefolder, "copy.stl")))
+        self.assertEqual(
+            FILE_BP_CASE_STL.hash, self.storage.get_metadata("copy.stl")["hash"]
+        )
+
+
+class CompressedLocalStorageTest(LocalStorageTest):
+    def setUp(self):
+        super().setUp()
+        self.storage = LocalFileStorage(self.basefolder, compress=True)
+
+    def test_add_file_compressed(self):
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE)
+
+        path = os.path.join(self.basefolder, "bp_case.gcode")
+        size = os.path.getsize(FILE_BP_CASE_GCODE.path)
+        self.assertTrue(compression.is_compressed(path))
+        self.assertLess(os.path.getsize(path), size)
+        with compression.open_file(path) as f:
+            with open(FILE_BP_CASE_GCODE.path, "rb") as expected:
+                self.assertEqual(expected.read(), f.read())
+
+        self.assertEqual(
+            {"method": "gzip", "size": size},
+            self.storage.get_metadata("bp_case.gcode")["compression"],
+        )
+        self.assertEqual(size, self.storage.list_files()["bp_case.gcode"]["size"])
+        self.assertEqual(size, self.storage.get_size("bp_case.gcode"))
+
+    def test_hash_of_uncompressed_content(self):
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE)
+        self.assertEqual(
+            FILE_BP_CASE_GCODE.hash,
+            self.storage._create_hash(os.path.join(self.basefolder, "bp_case.gcode")),
+        )
+
+    def test_add_file_uncompressed(self):
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE)
+
+        self.storage._compress = False
+        self._add_file("bp_case.gcode", FILE_BP_CASE_GCODE, overwrite=True)
+
+        self.assertFalse(
+            compression.is_compressed(os.path.join(self.basefolder, "bp_case.gcode"))
+        )
+        self.assertNotIn("compression", self.storage.get_metadata("bp_case.gcode"))
+
+
 @contextmanager
 def _set_really_universal(storage, value):
     orig = storage._really_universal
@@ -0,0 +1,325 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from octoprint.filemanager.metadata import (
+    METADATA_DB,
+    METADATA_JOURNAL,
+    METADATA_JSON,
+    JsonMetadataBackend,
+    MetadataBackendError,
+    SqliteMetadataBackend,
+    WriteBehindMetadataBackend,
+    export_metadata,
+)
+
+
+class SqliteMetadataBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.basefolder = os.path.realpath(tempfile.mkdtemp())
+        self.backend = SqliteMetadataBackend(self.basefolder)
+
+    def tearDown(self):
+        if self.backend is not None:
+            self.backend.close()
+        shutil.rmtree(self.basefolder)
+
+    def _path(self, *parts):
+        return os.path.join(self.basefolder, *parts)
+
+    def test_wal(self):
+        mode = self.backend._connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual("wal", mode)
+
+    def test_save_load(self):
+        metadata = {"file.gcode": {"hash": "abc", "analysis": {"printingArea": {}}}}
+
+        self.assertIsNone(self.backend.load(self.basefolder))
+
+        self.backend.save(self.basefolder, metadata)
+        self.assertEqual(metadata, self.backend.load(self.basefolder))
+        self.assertFalse(os.path.exists(self._path(METADATA_JSON)))
+
+        self.backend.save(self.basefolder, {"other.gcode": {"hash": "def"}})
+        self.assertEqual(
+            {"other.gcode": {"hash": "def"}}, self.backend.load(self.basefolder)
+        )
+
+    def test_save_unchanged(self):
+        self.backend.save(self.basefolder, {"file.gcode": {"hash": "abc"}})
+        modified = self.backend.last_modified(self.basefolder)
+
+        self.backend.save(self.basefolder, {"file.gcode": {"hash": "abc"}})
+        self.assertEqual(modified, self.backend.last_modified(self.basefolder))
+
+    def test_save_invalid(self):
+        self.backend.save(
+            self.basefolder,
+            {"file.gcode": {"hash": "abc"}, "invalid.gcode": {"time": float("nan")}},
+        )
+        self.assertEqual(
+            {"file.gcode": {"hash": "abc"}}, self.backend.load(self.basefolder)
+        )
+
+    def test_import_json(self):
+        metadata = {"file.gcode": {"hash": "abc"}}
+        with open(self._path(METADATA_JSON), "w") as f:
+            json.dump(metadata, f)
+
+        self.assertEqual(metadata, self.backend.load(self.basefolder))
+        self.assertEqual({"": metadata}, self.backend.export())
+
+        # the database wins from now on
+        with open(self._path(METADATA_JSON), "w") as f:
+            json.dump({}, f)
+        self.assertEqual(metadata, self.backend.load(self.basefolder))
+
+    def test_delete(self):
+        for folder in ("a", "a/b", "ab", "a0"):
+            self.backend.save(self._path(folder), {"file.gcode": {"hash": folder}})
+
+        self.backend.delete(self._path("a"))
+
+        self.assertEqual(["a0", "ab"], sorted(self.backend.export()))
+
+    def test_copy(self):
+        self.backend.save(self._path("a"), {"file.gcode": {"hash": "a"}})
+        self.backend.save(self._path("a", "b"), {"file.gcode": {"hash": "b"}})
+        self.backend.save(self._path("c"), {"stale.gcode": {"hash": "stale"}})
+
+        self.backend.copy(self._path("a"), self._path("c"))
+
+        exported = self.backend.export()
+        self.assertEqual(["a", "a/b", "c", "c/b"], sorted(exported))
+        self.assertEqual({"file.gcode": {"hash": "a"}}, exported["c"])
+        self.assertEqual({"file.gcode": {"hash": "b"}}, exported["c/b"])
+
+    def test_move(self):
+        self.backend.save(self._path("a"), {"file.gcode": {"hash": "a"}})
+        self.backend.save(self._path("a", "b"), {"file.gcode": {"hash": "b"}})
+
+        self.backend.move(self._path("a"), self._path("x", "y"))
+
+        exported = self.backend.export()
+        self.assertEqual(["x/y", "x/y/b"], sorted(exported))
+        self.assertEqual({"file.gcode": {"hash": "b"}}, exported["x/y/b"])
+
+    def test_export_metadata(self):
+        self.backend.save(self.basefolder, {})
+        self.backend.save(self._path("a"), {"file.gcode": {"hash": "a"}})
+
+        self.assertEqual(
+            {"": {}, "a": {"file.gcode": {"hash": "a"}}},
+            export_metadata(self.basefolder),
+        )
+
+    def test_export_metadata_no_database(self):
+        folder = tempfile.mkdtemp()
+        try:
+            self.assertIsNone(export_metadata(folder))
+        finally:
+            shutil.rmtree(folder)
+
+    def test_unknown_schema_version(self):
+        self.backend.close()
+        self.backend = None
+
+        connection = sqlite3.connect(self._path(METADATA_DB))
+        connection.execute("PRAGMA user_version = 99")
+        connection.close()
+
+        self.assertRaises(MetadataBackendError, SqliteMetadataBackend, self.basefolder)
+
+
+class WriteBehindMetadataBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.basefolder = os.path.realpath(tempfile.mkdtemp())
+        os.mkdir(self._path("folder"))
+
+        self.json = JsonMetadataBackend()
+        self.save = mock.patch.object(self.json, "save", wraps=self.json.save).start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.backend = self._backend()
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.basefolder)
+
+    def _backend(self, journal_limit=WriteBehindMetadataBackend.DEFAULT_JOURNAL_LIMIT):
+        return WriteBehindMetadataBackend(
+            self.json, self.basefolder, interval=3600, journal_limit=journal_limit
+        )
+
+    def _path(self, *parts):
+        return os.path.join(self.basefolder, *parts)
+
+    def _journal(self):
+        with open(self._path(METADATA_JOURNAL), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_write_behind(self):
+        folder = self._path("folder")
+
+        self.backend.save(folder, {"a.gcode": {"hash": "a"}})
+        self.backend.save(folder, {"a.gcode": {"hash": "a"}, "b.gcode": {"hash": "b"}})
+        self.backend.save(folder, {"b.gcode": {"hash": "b", "notes": []}})
+
+        self.save.assert_not_called()
+        self.assertEqual(
+            {"b.gcode": {"hash": "b", "notes": []}}, self.backend.load(folder)
+        )
+        self.assertIsNotNone(self.backend.last_modified(folder))
+        self.assertEqual(
+            [
+                {"folder": "folder", "set": {"a.gcode": {"hash": "a"}}},
+                {"folder": "folder", "set": {"b.gcode": {"hash": "b"}}},
+                {
+                    "folder": "folder",
+                    "set": {"b.gcode": {"hash": "b", "notes": []}},
+                    "remove": ["a.gcode"],
+                },
+            ],
+            self._journal(),
+        )
+
+        self.backend.flush()
+
+        self.save.assert_called_once_with(folder, {"b.gcode": {"hash": "b", "notes": []}})
+        self.assertEqual({"b.gcode": {"hash": "b", "notes": []}}, self.json.load(folder))
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+
+    def test_save_unchanged(self):
+        self.json.save(self.basefolder, {"a.gcode": {"hash": "a"}})
+        self.save.reset_mock()
+
+        self.backend.save(self.basefolder, {"a.gcode": {"hash": "a"}})
+
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+        self.backend.flush()
+        self.save.assert_not_called()
+
+    def test_journal_limit(self):
+        self.backend.close()
+        self.backend = self._backend(journal_limit=100)
+
+        self.backend.save(self.basefolder, {"a.gcode": {"hash": "a"}})
+        self.save.assert_not_called()
+
+        self.backend.save(self.basefolder, {"a.gcode": {"hash": "a" * 100}})
+        self.save.assert_called_once()
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+
+    def test_replay(self):
+        folder = self._path("folder")
+        self.json.save(folder, {"a.gcode": {"hash": "a"}, "b.gcode": {"hash": "b"}})
+
+        self.backend.save(
+            folder, {"a.gcode": {"hash": "a", "notes": []}, "b.gcode": {"hash": "b"}}
+        )
+        self.backend.save(folder, {"a.gcode": {"hash": "a", "notes": []}})
+        self.backend.save(self.basefolder, {"folder": {"display": "Folder"}})
+
+        # crash while appending the next change
+        with open(self._path(METADATA_JOURNAL), "ab") as f:
+            f.write(b'{"folder":"folder","set":{"c.gc')
+        self.backend._journal.close()
+        self.backend._journal = None
+        self.backend._pending.clear()
+
+        self.backend.close()
+        self.backend = self._backend()
+
+        self.assertEqual({"a.gcode": {"hash": "a", "notes": []}}, self.json.load(folder))
+        self.assertEqual(
+            {"folder": {"display": "Folder"}}, self.json.load(self.basefolder)
+        )
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+
+    def test_folder_operations_flush(self):
+        folder = self._path("folder")
+        self.backend.save(folder, {"a.gcode": {"hash": "a"}})
+
+        self.backend.move(folder, self._path("moved"))
+
+        self.save.assert_called_once_with(folder, {"a.gcode": {"hash": "a"}})
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+
+    def test_close(self):
+        self.backend.save(self.basefolder, {"a.gcode": {"hash": "a"}})
+        self.backend.close()
+
+        self.assertEqual({"a.gcode": {"hash": "a"}}, self.json.load(self.basefolder))
+        self.assertFalse(os.path.exists(self._path(METADATA_JOURNAL)))
+
+    def test_grouped_sync(self):
+        self.backend.close()
+
+        with mock.patch("octoprint.filemanager.metadata.os.fsync") as fsync:
+            self.backend = WriteBehindMetadataBackend(
+                self.json, self.basefolder, interval=3600, sync_delay=0.05
+            )
+
+            for i in range(3):
+                self.backend.save(self.basefolder, {"a.gcode": {"hash": str(i)}})
+            fsync.assert_not_called()
+
+            deadline = time.monotonic() + 5.0
+            while not fsync.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.1)
+            fsync.assert_called_once()
+
+    def test_sync_every_change(self):
+        self.backend.close()
+
+        with mock.patch("octoprint.filemanager.metadata.os.fsync") as fsync:
+            self.backend = WriteBehindMetadataBackend(
+                self.json, self.basefolder, interval=3600, sync_delay=0
+            )
+
+            for i in range(3):
+                self.backend.save(self.basefolder, {"a.gcode": {"hash": str(i)}})
+            self.assertEqual(3, fsync.call_count)
+
+    def test_export_metadata_pending(self):
+        self.backend.close()
+        self.backend = WriteBehindMetadataBackend(
+            SqliteMetadataBackend(self.basefolder), self.basefolder, interval=3600
+        )
+        self.backend.backend.save(self._path("folder"), {"a.gcode": {"hash": "a"}})
+
+        self.backend.save(
+            self._path("folder"), {"a.gcode": {"hash": "a"}, "b.gcode": {"hash": "b"}}
+        )
+        self.backend.save(self.basefolder, {"folder": {"display": "Folder"}})
+
+        self.assertEqual(
+            {
+                "": {"folder": {"display": "Folder"}},
+                "folder": {"a.gcode": {"hash": "a"}, "b.gcode": {"hash": "b"}},
+            },
+            export_metadata(self.basefolder),
+        )
+
+    def test_export_metadata_pending_without_database(self):
+        folder = self._path("folder")
+        self.json.save(folder, {"a.gcode": {"hash": "a"}, "b.gcode": {"hash": "b"}})
+
+        self.backend.save(folder, {"a.gcode": {"hash": "a", "notes": []}})
+
+        self.assertEqual(
+            {"folder": {"a.gcode": {"hash": "a", "notes": []}}},
+            export_metadata(self.basefolder),
+        )
+
+        self.backend.flush()
+        self.assertIsNone(export_metadata(self.basefolder))
@@ -0,0 +1,184 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from ddt import data, ddt
+
+from octoprint.filemanager.resumable import (
+    MIN_CHUNK_SIZE,
+    IncompleteUpload,
+    InsufficientStorage,
+    InvalidChunk,
+    ResumableUploadManager,
+    TooManyUploads,
+    UnknownUpload,
+)
+
+CHUNK_SIZE = MIN_CHUNK_SIZE
+CONTENT = bytes(range(256)) * (CHUNK_SIZE * 5 // 256) + b"tail"
+
+
+def _chunk(index, content=CONTENT):
+    return content[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE]
+
+
+@ddt
+class ResumableUploadManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.manager = ResumableUploadManager(
+            self.folder, chunk_size=CHUNK_SIZE, max_size=len(CONTENT) * 2
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, upload, index, data=None, checksum=None):
+        if data is None:
+            data = _chunk(index)
+        upload.write_chunk(index, io.BytesIO(data), checksum=checksum)
+
+    def test_create(self):
+        upload = self.manager.create("test.gcode", len(CONTENT), owner="user")
+
+        self.assertEqual(6, upload.chunks)
+        self.assertEqual(4, upload.chunk_length(5))
+        self.assertEqual(list(range(6)), upload.missing)
+        self.assertEqual(len(CONTENT), os.path.getsize(upload.path))
+        self.assertEqual(self.folder, os.path.dirname(upload.path))
+        self.assertIs(upload, self.manager.get(upload.id, owner="user"))
+
+    def test_chunk_size(self):
+        self.assertEqual(
+            CHUNK_SIZE,
+            self.manager.create("test.gcode", 10, chunk_size=CHUNK_SIZE * 2).chunk_size,
+        )
+        self.assertEqual(
+            MIN_CHUNK_SIZE, self.manager.create("test.gcode", 10, chunk_size=1).chunk_size
+        )
+
+    @data(-1, None, "10", True, 10**12)
+    def test_create_invalid_size(self, size):
+        self.assertRaises(ValueError, self.manager.create, "test.gcode", size)
+
+    def test_out_of_order_and_parallel(self):
+        upload = self.manager.create("test.gcode", len(CONTENT))
+
+        threads = [
+            threading.Thread(target=self._write, args=(upload, index))
+            for index in reversed(range(upload.chunks))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(upload.complete)
+        upload.close()
+        with open(upload.path, "rb") as f:
+            self.assertEqual(CONTENT, f.read())
+
+    def test_checksum(self):
+        upload = self.manager.create("test.gcode", len(CONTENT))
+
+        self.assertRaises(InvalidChunk, self._write, upload, 1, checksum="0" * 40)
+        self.assertIn(1, upload.missing)
+
+        self._write(upload, 1, checksum=hashlib.sha1(_chunk(1)).hexdigest().upper())
+        self.assertNotIn(1, upload.missing)
+
+    @data(b"short", _chunk(0) + b"x")
+    def test_invalid_length(self, chunk):
+        upload = self.manager.create("test.gcode", len(CONTENT))
+        self.assertRaises(InvalidChunk, self._write, upload, 0, data=chunk)
+        self.assertIn(0, upload.missing)
+
+    def test_invalid_index(self):
+        upload = self.manager.create("test.gcode", len(CONTENT))
+        self.assertRaises(InvalidChunk, self._write, upload, 6)
+        self.assertRaises(InvalidChunk, self._write, upload, -1)
+
+    def test_close(self):
+        upload = self.manager.create("test.gcode", len(CONTENT))
+        self._write(upload, 0)
+        self.assertRaises(IncompleteUpload, upload.close)
+
+        for index in upload.missing:
+            self._write(upload, index)
+        upload.close()
+
+        self.assertRaises(UnknownUpload, upload.close)
+        self.assertRaises(UnknownUpload, self._write, upload, 0)
+
+        upload.reopen()
+        self._write(upload, 0)
+
+    def test_empty(self):
+        upload = self.manager.create("empty.gcode", 0)
+        self.assertEqual(0, upload.chunks)
+        self.assertTrue(upload.complete)
+        upload.close()
+
+    def test_owner(self):
+        upload = self.manager.create("test.gcode", 10, owner="user")
+        self.assertRaises(UnknownUpload, self.manager.get, upload.id, owner="other")
+        self.assertRaises(UnknownUpload, self.manager.remove, upload.id, owner="other")
+        self.assertRaises(UnknownUpload, self.manager.get, "unknown", owner="user")
+
+    def test_remove(self):
+        upload = self.manager.create("test.gcode", 10)
+        self.manager.remove(upload.id)
+
+        self.assertFalse(os.path.exists(upload.path))
+        self.assertRaises(UnknownUpload, self.manager.get, upload.id)
+        self.assertRaises(UnknownUpload, self._write, upload, 0, data=b"0" * 10)
+
+    def test_expire(self):
+        upload = self.manager.create("test.gcode", 10)
+
+        with mock.patch(
+            "octoprint.filemanager.resumable.time.monotonic",
+            return_value=upload.last_activity + self.manager.timeout + 1,
+        ):
+            self.assertRaises(UnknownUpload, self.manager.get, upload.id)
+
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_max_uploads(self):
+        manager = ResumableUploadManager(self.folder, max_uploads=2)
+        first = manager.create("test.gcode", 10, owner="user")
+        manager.create("test.gcode", 10, owner="user")
+
+        self.assertRaises(TooManyUploads, manager.create, "test.gcode", 10, owner="user")
+        manager.create("test.gcode", 10, owner="other")
+
+        manager.remove(first.id, owner="user")
+        manager.create("test.gcode", 10, owner="user")
+
+    def test_insufficient_storage(self):
+        usage = shutil.disk_usage(self.folder)._replace(free=len(CONTENT) + 10)
+
+        with mock.patch(
+            "octoprint.filemanager.resumable.shutil.disk_usage", return_value=usage
+        ):
+            upload = self.manager.create("test.gcode", len(CONTENT))
+
+            # still reserved for the first upload
+            self.assertRaises(
+                InsufficientStorage, self.manager.create, "test.gcode", len(CONTENT)
+            )
+            self.assertEqual(1, len(os.listdir(self.folder)))
+
+            # written chunks count as taken from the free space already
+            for index in range(upload.chunks):
+                self._write(upload, index)
+            self.assertEqual(0, upload.outstanding)
+            self.manager.create("test.gcode", len(CONTENT))
@@ -0,0 +1,207 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import unittest
+
+from ddt import data, ddt, unpack
+
+from octoprint.filemanager.search import InvalidQuery, SearchIndex, tokenize
+
+
+def _file(path, display=None, size=None, analysis=None, history=None):
+    node = {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": "machinecode",
+        "typePath": ["machinecode", "gcode"],
+        "size": size if size is not None else 100,
+        "date": 1000,
+    }
+    if display is not None:
+        node["display"] = display
+    if analysis is not None:
+        node["analysis"] = analysis
+    if history is not None:
+        node["history"] = history
+    return node
+
+
+def _folder(path, *children):
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": "folder",
+        "typePath": ["folder"],
+        "size": sum(child.get("size", 0) for child in children),
+        "children": {child["name"]: child for child in children},
+    }
+
+
+LISTING = {
+    node["name"]: node
+    for node in (
+        _file(
+            "benchy.gcode",
+            display="3D Benchy.gcode",
+            size=5000,
+            analysis={
+                "estimatedPrintTime": 3600.0,
+                "dimensions": {"width": 60.0, "depth": 31.0, "height": 48.0},
+                "filament": {
+                    "tool0": {"length": 4000.0, "volume": 9.5},
+                    "tool1": {"length": 1000.0, "volume": 2.5},
+                },
+                "slicer": {
+                    "name": "PrusaSlicer 2.6.0",
+                    "settings": {
+                        "layer_height": "0.2",
+                        "filament_type": "PETG",
+                        "fill_density": "15%",
+                    },
+                },
+            },
+            history=[
+                {"success": True, "timestamp": 100},
+                {"success": False, "timestamp": 200},
+            ],
+        ),
+        _file(
+            "calibration_cube.gcode",
+            size=200,
+            analysis={
+                "estimatedPrintTime": 600.0,
+                "dimensions": {"width": 20.0, "depth": 20.0, "height": 20.0},
+                "slicer": {
+                    "name": "Cura_SteamEngine 5.2.1",
+                    "settings": {"layer_height": "0.1", "filament_type": "PLA"},
+                },
+            },
+            history=[{"success": True, "timestamp": 300}],
+        ),
+        _folder(
+            "parts",
+            _file("parts/bracket.gcode", size=300),
+            _folder("parts/benchy", _file("parts/benchy/hull.gcode", size=400)),
+        ),
+    )
+}
+
+
+def _paths(result):
+    return [node["path"] for node in result[1]]
+
+
+@ddt
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex(LISTING)
+
+    def test_tokenize(self):
+        self.assertEqual(["3d", "benchy", "v2", "gcode"], tokenize("3D_Benchy-v2.gcode"))
+
+    @data(
+        ("calibration", ["calibration_cube.gcode"]),
+        ("cal cub", ["calibration_cube.gcode"]),
+        ('"3d benchy"', ["benchy.gcode"]),
+        ("bracket", ["parts/bracket.gcode"]),
+        ("prusa", ["benchy.gcode"]),
+        ("petg", ["benchy.gcode"]),
+        ("nothing", []),
+        ("name:cube", ["calibration_cube.gcode"]),
+        ("path:parts/benchy", ["parts/benchy", "parts/benchy/hull.gcode"]),
+        ("type:folder", ["parts/benchy", "parts"]),
+        ("slicer:cura", ["calibration_cube.gcode"]),
+        ("filament_type:pla", ["calibration_cube.gcode"]),
+        ("layer_height:0.2", ["benchy.gcode"]),
+        ("layer_height<0.2", ["calibration_cube.gcode"]),
+        ("fill_density>=15", ["benchy.gcode"]),
+        ("time<30m", ["calibration_cube.gcode"]),
+        ("time>=1h", ["benchy.gcode"]),
+        ("height>40", ["benchy.gcode"]),
+        ("filament:5000", ["benchy.gcode"]),
+        ("volume>10", ["benchy.gcode"]),
+        ("size>250 size<=400", ["parts/bracket.gcode", "parts/benchy/hull.gcode"]),
+        ("prints:success", ["benchy.gcode", "calibration_cube.gcode"]),
+        ("prints:failure", ["benchy.gcode"]),
+        ("prints:none", ["parts/bracket.gcode", "parts/benchy/hull.gcode"]),
+        ("last_print>=300", ["calibration_cube.gcode"]),
+        ("gcode prints:none size>350", ["parts/benchy/hull.gcode"]),
+    )
+    @unpack
+    def test_search(self, query, expected):
+        total, _ = result = self.index.search(query)
+        self.assertEqual(len(expected), total)
+        self.assertCountEqual(expected, _paths(result))
+
+    def test_ranking(self):
+        # name matches before path matches, then by display name
+        self.assertEqual(
+            ["benchy.gcode", "parts/benchy", "parts/benchy/hull.gcode"],
+            _paths(self.index.search("benchy")),
+        )
+
+    def test_ranking_exact(self):
+        self.index.add(_file("benchyboat.gcode", display="Benchyboat.gcode"))
+        self.assertEqual(
+            ["benchy.gcode", "parts/benchy", "benchyboat.gcode"],
+            _paths(self.index.search("benchy"))[:3],
+        )
+
+    def test_ranking_few_matches(self):
+        self.index.add_all(
+            [_file(f"filler_{i}.gcode", display=f"Filler {i}.gcode") for i in range(50)]
+        )
+        self.assertEqual(
+            ["benchy.gcode", "parts/benchy", "parts/benchy/hull.gcode"],
+            _paths(self.index.search("benchy")),
+        )
+
+    def test_limit(self):
+        total, nodes = self.index.search("type:gcode", limit=2)
+        self.assertEqual(4, total)
+        self.assertEqual(
+            ["benchy.gcode", "parts/bracket.gcode"], [node["path"] for node in nodes]
+        )
+
+    def test_folder_nodes(self):
+        _, nodes = self.index.search("type:folder")
+        for node in nodes:
+            self.assertNotIn("children", node)
+            self.assertNotIn("size", node)
+
+    def test_add_and_remove(self):
+        self.index.add(_file("parts/bracket.gcode", display="Bracket v2.gcode"))
+        self.assertEqual(["parts/bracket.gcode"], _paths(self.index.search("v2")))
+        self.assertEqual(6, len(self.index))
+
+        self.index.remove("parts/bracket.gcode")
+        self.assertEqual([], _paths(self.index.search("bracket")))
+        self.assertEqual([], _paths(self.index.search("v2")))
+
+        self.index.remove("parts", recursive=True)
+        self.assertEqual(2, len(self.index))
+        self.assertEqual([], _paths(self.index.search("hull")))
+        self.assertEqual(
+            ["calibration_cube.gcode"], _paths(self.index.search("size<1000"))
+        )
+
+    def test_add_all(self):
+        self.index.add_all([_folder("more", _file("more/cube_v2.gcode", size=1))])
+        self.assertEqual(
+            ["calibration_cube.gcode", "more/cube_v2.gcode"],
+            _paths(self.index.search("cube")),
+        )
+        self.assertEqual(["more/cube_v2.gcode"], _paths(self.index.search("size<100")))
+
+    @data(
+        "",
+        "   ",
+        "unknown:value",
+        "size>big",
+        "prints:maybe",
+        "name>3",
+        "time>3d",
+        'name:""',
+    )
+    def test_invalid_query(self, query):
+        self.assertRaises(InvalidQuery, self.index.search, query)
@@ -0,0 +1,64 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import hashlib
+import io
+import unittest
+
+from octoprint.filemanager.util import UploadIngest
+
+HEADER = b"; generated by PrusaSlicer 2.6.0 on 2023-08-01 at 10:00:00 UTC\n"
+FOOTER = b"; layer_height = 0.2\n; filament_type = PETG\n; fill_density = 15%\n"
+
+
+class UploadIngestTest(unittest.TestCase):
+    def _ingest(self, data, slicer=True, chunk_size=1000):
+        handle = io.BytesIO()
+        ingest = UploadIngest(handle, slicer=slicer)
+        for offset in range(0, len(data), chunk_size):
+            ingest.write(data[offset : offset + chunk_size])
+        return ingest, handle
+
+    def test_small(self):
+        data = HEADER + b"G28\nG1 X10\n" + FOOTER
+        ingest, handle = self._ingest(data, chunk_size=7)
+
+        self.assertEqual(data, handle.getvalue())
+        self.assertEqual(len(data), ingest.size)
+        self.assertEqual(hashlib.sha1(data).hexdigest(), ingest.hash)
+        self.assertEqual(
+            {
+                "name": "PrusaSlicer 2.6.0",
+                "settings": {
+                    "layer_height": "0.2",
+                    "filament_type": "PETG",
+                    "fill_density": "15%",
+                },
+            },
+            ingest.slicer,
+        )
+
+    def test_large(self):
+        body = b"G1 X10 Y10 E0.1 ; ignored = value\n" * 20000
+        data = HEADER + body + FOOTER
+        ingest, _ = self._ingest(data, chunk_size=4096)
+
+        self.assertEqual(len(data), ingest.size)
+        self.assertEqual(hashlib.sha1(data).hexdigest(), ingest.hash)
+        self.assertEqual("PrusaSlicer 2.6.0", ingest.slicer["name"])
+        self.assertEqual("15%", ingest.slicer["settings"]["fill_density"])
+        self.assertLessEqual(len(ingest._tail), 2 * UploadIngest.SLICER_BLOCK_SIZE)
+
+    def test_parameters(self):
+        data = HEADER + FOOTER
+        ingest, _ = self._ingest(data)
+
+        parameters = ingest.parameters()
+        self.assertEqual(hashlib.sha1(data).hexdigest(), parameters["hash"])
+        self.assertEqual(ingest.slicer, parameters["slicer"])
+
+    def test_no_slicer(self):
+        ingest, _ = self._ingest(HEADER + FOOTER, slicer=False)
+
+        self.assertIsNone(ingest.slicer)
+        self.assertNotIn("slicer", ingest.parameters())
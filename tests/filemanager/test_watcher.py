@@ -0,0 +1,189 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import watchdog.events
+
+from octoprint.filemanager.watcher import FileTreeWatcher
+
+
+class FileTreeWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.basefolder = os.path.realpath(tempfile.mkdtemp())
+        self.watcher = FileTreeWatcher(self.basefolder)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.basefolder)
+
+    def _path(self, *parts):
+        return os.path.join(self.basefolder, *parts)
+
+    def test_file_change_marks_ancestors(self):
+        generation = self.watcher.generation
+
+        self.watcher.on_any_event(
+            watchdog.events.FileCreatedEvent(self._path("a", "b", "file.gcode"))
+        )
+
+        self.assertEqual(generation + 1, self.watcher.generation)
+        self.assertTrue(self.watcher.changed_since(self._path("a", "b"), generation))
+        self.assertTrue(self.watcher.changed_since(self._path("a"), generation))
+        self.assertTrue(self.watcher.changed_since(self.basefolder, generation))
+        self.assertFalse(self.watcher.changed_since(self._path("c"), generation))
+        self.assertFalse(
+            self.watcher.changed_since(self._path("a", "b", "c"), generation)
+        )
+
+    def test_folder_modified_marks_folder(self):
+        generation = self.watcher.generation
+
+        self.watcher.on_any_event(watchdog.events.DirModifiedEvent(self._path("a")))
+
+        self.assertTrue(self.watcher.changed_since(self._path("a"), generation))
+        self.assertTrue(self.watcher.changed_since(self.basefolder, generation))
+        self.assertFalse(self.watcher.changed_since(self._path("a", "b"), generation))
+
+    def test_folder_moved_resets_subtrees(self):
+        generation = self.watcher.generation
+
+        self.watcher.on_any_event(
+            watchdog.events.DirMovedEvent(self._path("a"), self._path("b"))
+        )
+
+        self.assertTrue(self.watcher.changed_since(self._path("a", "x"), generation))
+        self.assertTrue(self.watcher.changed_since(self._path("b", "x"), generation))
+        self.assertFalse(self.watcher.changed_since(self._path("c"), generation))
+
+    def test_outside_of_folder(self):
+        generation = self.watcher.generation
+
+        self.watcher.mark_changed(self.basefolder + "2/file.gcode")
+
+        self.assertFalse(self.watcher.changed_since(self.basefolder, generation))
+
+    def test_closed_ignored(self):
+        generation = self.watcher.generation
+
+        self.watcher.on_any_event(
+            watchdog.events.FileClosedEvent(self._path("file.gcode"))
+        )
+
+        self.assertEqual(generation, self.watcher.generation)
+
+    def test_mark_folder_changed(self):
+        generation = self.watcher.generation
+
+        self.watcher.mark_folder_changed(self._path("a"))
+
+        self.assertTrue(self.watcher.changed_since(self._path("a"), generation))
+        self.assertTrue(self.watcher.changed_since(self.basefolder, generation))
+        self.assertFalse(self.watcher.changed_since(self._path("a", "b"), generation))
+
+    def test_ignored(self):
+        watcher = FileTreeWatcher(self.basefolder, ignored=[self._path("ignored.db")])
+        generation = watcher.generation
+
+        watcher.on_any_event(watchdog.events.FileModifiedEvent(self._path("ignored.db")))
+        self.assertEqual(generation, watcher.generation)
+
+        watcher.on_any_event(watchdog.events.FileModifiedEvent(self._path("file.gcode")))
+        self.assertTrue(watcher.changed_since(self.basefolder, generation))
+
+    def test_ignored_folder(self):
+        watcher = FileTreeWatcher(self.basefolder, ignored=[self._path(".staging")])
+        generation = watcher.generation
+
+        watcher.on_any_event(
+            watchdog.events.FileCreatedEvent(self._path(".staging", "upload.tmp"))
+        )
+        self.assertEqual(generation, watcher.generation)
+
+        watcher.on_any_event(
+            watchdog.events.FileMovedEvent(
+                self._path(".staging", "upload.tmp"), self._path("a", "file.gcode")
+            )
+        )
+        self.assertTrue(watcher.changed_since(self._path("a"), generation))
+        self.assertFalse(watcher.changed_since(self._path(".staging"), generation))
+
+    def test_notifications(self):
+        self.assertTrue(self.watcher.start())
+        self.assertTrue(self.watcher.active)
+
+        generation = self.watcher.generation
+        with open(self._path("file.gcode"), "w") as f:
+            f.write("G28\n")
+
+        deadline = time.monotonic() + 5.0
+        while (
+            not self.watcher.changed_since(self.basefolder, generation)
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.05)
+
+        self.assertTrue(self.watcher.changed_since(self.basefolder, generation))
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5.0
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_on_change(self):
+        on_change = mock.MagicMock()
+        watcher = FileTreeWatcher(self.basefolder, on_change=on_change, notify_delay=0.05)
+
+        for name in ("a.gcode", "b.gcode", "c.gcode"):
+            watcher.on_any_event(watchdog.events.FileCreatedEvent(self._path(name)))
+
+        self._wait_for(lambda: on_change.called)
+        time.sleep(0.1)
+        on_change.assert_called_once_with()
+
+    def test_on_change_owned(self):
+        on_change = mock.MagicMock()
+        watcher = FileTreeWatcher(self.basefolder, on_change=on_change, notify_delay=0.1)
+
+        watcher.mark_changed(self._path("a", "file.gcode"))
+        watcher.on_any_event(
+            watchdog.events.FileCreatedEvent(self._path("a", "file.gcode"))
+        )
+        watcher.on_any_event(watchdog.events.DirModifiedEvent(self._path("a")))
+
+        # notified before the owner reports its change
+        watcher.on_any_event(
+            watchdog.events.FileCreatedEvent(self._path("b", ".metadata.json"))
+        )
+        watcher.mark_folder_changed(self._path("b"))
+
+        time.sleep(0.3)
+        on_change.assert_not_called()
+
+        watcher.on_any_event(
+            watchdog.events.FileCreatedEvent(self._path("c", "file.gcode"))
+        )
+        self._wait_for(lambda: on_change.called)
+        on_change.assert_called_once_with()
+
+    def test_no_polling_fallback(self):
+        with mock.patch(
+            "octoprint.filemanager.watcher.Observer",
+            side_effect=lambda: mock.MagicMock(
+                schedule=mock.MagicMock(side_effect=OSError("inotify limit reached"))
+            ),
+        ):
+            self.assertFalse(self.watcher.start())
+        self.assertFalse(self.watcher.active)
+
+    def test_forced_polling(self):
+        watcher = FileTreeWatcher(self.basefolder, force_polling=True)
+        self.addCleanup(watcher.stop)
+
+        self.assertTrue(watcher.start())
+        self.assertTrue(watcher.polling)
@@ -0,0 +1,68 @@
+"""
+Load test for the event bridge, run with
+
+    python tests/manual_tests/eventbridge_load.py
+
+Fires a burst of events through an event bridge with a growing number of connected
+subscribers and reports the time spent on the publishing (event loop) side per event, which
+should stay flat, and the time until all subscribers have received the whole burst.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from octoprint.server.util.eventbridge import EventBridge
+from octoprint_client import EventBridgeClient
+
+EVENTS = 5000
+PAYLOAD = {"old": 0.2, "new": 0.4, "file": {"name": "test.gco", "path": "a/test.gco"}}
+
+
+def run(subscriber_count):
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, "eventbridge.sock")
+        bridge = EventBridge(path, event_manager=mock.MagicMock(), max_buffer=64 << 20)
+        bridge.start()
+
+        done = threading.Semaphore(0)
+        clients = []
+        for _ in range(subscriber_count):
+            counter = {"received": 0}
+
+            def on_event(event, payload, counter=counter):
+                counter["received"] += 1
+                if counter["received"] == EVENTS:
+                    done.release()
+
+            client = EventBridgeClient(path, on_event=on_event)
+            client.connect()
+            clients.append(client)
+
+        while bridge.subscriber_count < subscriber_count:
+            time.sleep(0.01)
+        time.sleep(0.2)
+
+        start = time.perf_counter()
+        for _ in range(EVENTS):
+            bridge._on_event("ZChange", PAYLOAD)
+        publish = time.perf_counter() - start
+
+        for _ in range(subscriber_count):
+            done.acquire(timeout=60)
+        delivered = time.perf_counter() - start
+
+        for client in clients:
+            client.disconnect()
+        bridge.stop()
+
+    return publish / EVENTS * 1e6, delivered
+
+
+if __name__ == "__main__":
+    print("subscribers | publish us/event | all delivered after s")
+    for count in (1, 2, 5, 10, 20, 50):
+        per_event, delivered = run(count)
+        print(f"{count:11d} | {per_event:16.1f} | {delivered:21.2f}")
@@ -0,0 +1,679 @@
+"""
+Load test for the push socket, run with
+
+    python tests/manual_tests/push_load.py --clients 50
+
+Starts a throwaway OctoPrint instance with the virtual printer in a temporary basedir,
+opens the requested number of push connections with a mix of users (admin, read-only,
+anonymous), transports (SockJS, raw websocket with binary encoding) and subscriptions,
+prints a generated file and reports
+
+  * server CPU usage,
+  * event loop lag,
+  * per client latency of ``current`` messages,
+  * serial send loop latency (from an ``ok`` to the next line sent) and jitter, and
+  * the code paths the server spent the most CPU time in.
+
+Server side measurements are taken by a small probe plugin installed into the temporary
+basedir. Note that the virtual printer runs inside the server process and hence shows up
+in its CPU usage and profile as well. Linux only, since the CPU profile is based on
+``/proc``.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+import requests
+import tornado.websocket
+import yaml
+
+from octoprint.util.msgpack import unpackb
+
+PASSWORD = "load-test"
+
+USERS = {
+    "admin": ["--admin"],
+    "viewer": ["-g", "readonly"],
+}
+
+ROLES = ("admin", "viewer", "anonymous")
+
+SUBSCRIPTIONS = {
+    "all": None,
+    "state": {
+        "state": {"logs": True, "messages": False},
+        "events": False,
+        "plugins": False,
+    },
+    "events": {"state": False, "events": True, "plugins": False},
+}
+
+PROBE = '''
+import collections
+import os
+import sys
+import sysconfig
+import threading
+import time
+
+import flask
+
+import octoprint.plugin
+
+
+class PushLoadProbePlugin(
+    octoprint.plugin.StartupPlugin, octoprint.plugin.SimpleApiPlugin
+):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._lag = []
+        self._ok_to_send = []
+        self._send_intervals = []
+        self._last_ok = None
+        self._last_sent = None
+        self._profile = collections.Counter()
+        self._profile_total = 0
+
+    def on_startup(self, host, port):
+        # called on the main thread, so that's the server's event loop
+        from tornado.ioloop import IOLoop
+
+        loop = IOLoop.current()
+        interval = 0.05
+
+        def tick(expected):
+            now = time.monotonic()
+            with self._lock:
+                self._lag.append(max(0.0, now - expected))
+            loop.call_later(interval, tick, time.monotonic() + interval)
+
+        loop.add_callback(
+            lambda: loop.call_later(interval, tick, time.monotonic() + interval)
+        )
+
+    def on_after_startup(self):
+
+        thread = threading.Thread(target=self._profiler, name="PushLoadProbe")
+        thread.daemon = True
+        thread.start()
+
+    def _profiler(self):
+        """Attributes the CPU time each thread used to the stack it's currently in."""
+        ticks = os.sysconf("SC_CLK_TCK")
+        stdlib = sysconfig.get_paths()["stdlib"]
+        own = threading.get_ident()
+        last = {}
+
+        while True:
+            time.sleep(0.01)
+
+            threads = {t.ident: t for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                thread = threads.get(ident)
+                if ident == own or thread is None or thread.native_id is None:
+                    continue
+
+                try:
+                    with open(f"/proc/self/task/{thread.native_id}/stat") as f:
+                        fields = f.read().rsplit(")", 1)[1].split()
+                    cpu = (int(fields[11]) + int(fields[12])) / ticks
+                except (OSError, IndexError, ValueError):
+                    continue
+
+                used = cpu - last.get(ident, cpu)
+                last[ident] = cpu
+                if used <= 0:
+                    continue
+
+                # skip the standard library's lock, queue and selector internals
+                top = frame
+                while frame is not None and frame.f_code.co_filename.startswith(stdlib):
+                    frame = frame.f_back
+                if frame is None:
+                    frame = top
+
+                stack = []
+                while frame is not None and len(stack) < 3:
+                    code = frame.f_code
+                    stack.append(
+                        f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"
+                    )
+                    frame = frame.f_back
+
+                with self._lock:
+                    self._profile[(thread.name, " <- ".join(stack))] += used
+                    self._profile_total += used
+
+    def on_gcode_received(self, comm, line, *args, **kwargs):
+        if line.startswith("ok"):
+            self._last_ok = time.monotonic()
+        return line
+
+    def on_gcode_sent(self, comm, phase, cmd, cmd_type, gcode, *args, **kwargs):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_ok is not None:
+                self._ok_to_send.append(now - self._last_ok)
+                self._last_ok = None
+            if self._last_sent is not None:
+                self._send_intervals.append(now - self._last_sent)
+            self._last_sent = now
+
+    def get_api_commands(self):
+        return {"reset": []}
+
+    def on_api_command(self, command, data):
+        with self._lock:
+            self._reset()
+
+    def on_api_get(self, request):
+        with self._lock:
+            return flask.jsonify(
+                lag=self._lag,
+                ok_to_send=self._ok_to_send,
+                send_intervals=self._send_intervals,
+                profile=[
+                    [thread, stack, cpu]
+                    for (thread, stack), cpu in self._profile.most_common(50)
+                ],
+                profile_total=self._profile_total,
+            )
+
+
+__plugin_name__ = "Push Load Probe"
+__plugin_pythoncompat__ = ">=3.7,<4"
+__plugin_implementation__ = PushLoadProbePlugin()
+__plugin_hooks__ = {
+    "octoprint.comm.protocol.gcode.received": __plugin_implementation__.on_gcode_received,
+    "octoprint.comm.protocol.gcode.sent": __plugin_implementation__.on_gcode_sent,
+}
+'''
+
+
+##~~ test instance
+
+
+class Instance:
+    def __init__(self, basedir, port):
+        self.basedir = basedir
+        self.port = port
+        self.baseurl = f"http://127.0.0.1:{port}"
+        self.process = None
+        self._log = None
+
+    def prepare(self):
+        config = {
+            "server": {
+                "firstRun": False,
+                "onlineCheck": {"enabled": False},
+                "pluginBlacklist": {"enabled": False},
+            },
+            "plugins": {
+                "virtual_printer": {"enabled": True},
+                "tracking": {"enabled": False},
+                "announcements": {"enabled": False},
+                "softwareupdate": {"check_overlay_url": "", "checks": {}},
+            },
+        }
+        with open(os.path.join(self.basedir, "config.yaml"), "w") as f:
+            yaml.safe_dump(config, f)
+
+        os.makedirs(os.path.join(self.basedir, "plugins"), exist_ok=True)
+        with open(os.path.join(self.basedir, "plugins", "push_load_probe.py"), "w") as f:
+            f.write(PROBE)
+
+        for name, args in USERS.items():
+            subprocess.run(
+                self._command("user add", name, "--password", PASSWORD, *args),
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+
+    def start(self, timeout=120):
+        self._log = open(os.path.join(self.basedir, "server.log"), "wb")
+        args = [
+            "--basedir",
+            self.basedir,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+        ]
+        if os.geteuid() == 0:
+            args.append("--iknowwhatimdoing")
+
+        self.process = subprocess.Popen(
+            self._command("serve", *args),
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited early, see {self.basedir}/server.log")
+            try:
+                if requests.get(self.baseurl + "/online.txt", timeout=5).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError("Server didn't come up in time")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._log is not None:
+            self._log.close()
+
+    def api(self):
+        """Returns a session for the REST API, authenticated with the global API key."""
+        with open(os.path.join(self.basedir, "config.yaml")) as f:
+            config = yaml.safe_load(f)
+
+        session = requests.Session()
+        session.headers["X-Api-Key"] = config["api"]["key"]
+        return session
+
+    def login(self, name):
+        """Returns the ``auth`` value for the push socket for a user, None for anonymous."""
+        if name == "anonymous":
+            return None
+
+        response = requests.post(
+            self.baseurl + "/api/login",
+            json={"user": name, "pass": PASSWORD, "remember": False},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return "{}:{}".format(data["name"], data["session"])
+
+    def _command(self, command, *args):
+        return [
+            sys.executable,
+            "-m",
+            "octoprint",
+            "--basedir",
+            self.basedir,
+            *command.split(),
+            *args,
+        ]
+
+
+##~~ push clients
+
+
+class PushClient:
+    def __init__(self, url, role, auth, subscription, binary):
+        self.url = url
+        self.role = role
+        self.auth = auth
+        self.subscription = subscription
+        self.binary = binary
+
+        self.connected = asyncio.Event()
+        self.messages = 0
+        self.bytes = 0
+        self.latencies = []
+        self.closed = False
+
+        self._ws = None
+
+    @property
+    def label(self):
+        subscription = next(k for k, v in SUBSCRIPTIONS.items() if v == self.subscription)
+        return "{}/{}/{}".format(
+            self.role, subscription, "binary" if self.binary else "sockjs"
+        )
+
+    async def run(self):
+        import random
+        import uuid
+
+        if self.binary:
+            url = self.url + "/sockjs/websocket"
+        else:
+            url = self.url + "/sockjs/{:0>3d}/{}/websocket".format(
+                random.randrange(0, 999), uuid.uuid4()
+            )
+
+        self._ws = await tornado.websocket.websocket_connect(
+            url.replace("http", "ws", 1), compression_options={}
+        )
+
+        while True:
+            frame = await self._ws.read_message()
+            if frame is None:
+                self.closed = True
+                return
+
+            received = time.time()
+            self.bytes += len(frame)
+
+            for message in self._decode(frame):
+                self._on_message(message, received)
+
+    def close(self):
+        if self._ws is not None:
+            self._ws.close()
+
+    def _decode(self, frame):
+        if isinstance(frame, bytes):
+            return [unpackb(frame)]
+        elif self.binary:
+            return [json.loads(frame)]
+        elif frame[0] == "a":
+            return json.loads(frame[1:])
+        else:
+            # open, heartbeat and close frames
+            return []
+
+    def _send(self, message):
+        data = json.dumps(message)
+        if not self.binary:
+            data = json.dumps([data])
+        self._ws.write_message(data)
+
+    def _on_message(self, message, received):
+        for key, payload in message.items():
+            self.messages += 1
+
+            if key == "connected":
+                if self.binary:
+                    self._send({"transport": {"encoding": "msgpack"}})
+                if self.subscription is not None:
+                    self._send({"subscribe": self.subscription})
+                if self.auth is not None:
+                    self._send({"auth": self.auth})
+                self.connected.set()
+
+            elif key == "current" and "serverTime" in payload:
+                self.latencies.append(received - payload["serverTime"])
+
+
+class ClientPool:
+    def __init__(self, instance, count, binary_ratio):
+        self._instance = instance
+        self._count = count
+        self._binary_ratio = binary_ratio
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self.clients = []
+
+    def start(self, timeout=60):
+        auths = {role: self._instance.login(role) for role in ROLES}
+
+        binary_every = round(1 / self._binary_ratio) if self._binary_ratio else 0
+        combinations = itertools.cycle(itertools.product(ROLES, SUBSCRIPTIONS.values()))
+        for index in range(self._count):
+            role, subscription = next(combinations)
+            self.clients.append(
+                PushClient(
+                    self._instance.baseurl,
+                    role,
+                    auths[role],
+                    subscription,
+                    binary=bool(binary_every) and index % binary_every == 0,
+                )
+            )
+
+        self._thread = threading.Thread(target=self._run, name="PushClients")
+        self._thread.daemon = True
+        self._thread.start()
+
+        async def wait_connected():
+            await asyncio.wait_for(
+                asyncio.gather(*(c.connected.wait() for c in self.clients)), timeout
+            )
+
+        asyncio.run_coroutine_threadsafe(wait_connected(), self._loop).result()
+
+    def stop(self):
+        for client in self.clients:
+            self._loop.call_soon_threadsafe(client.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        for client in self.clients:
+            self._loop.create_task(client.run())
+        self._loop.run_forever()
+
+
+##~~ the test
+
+
+def generate_gcode(path, lines):
+    with open(path, "w") as f:
+        f.write("G21\nG90\nM82\nG28\nG92 E0\n")
+        e = 0.0
+        for index in range(lines):
+            x = 10 + (index % 100)
+            y = 10 + (index // 100) % 100
+            e += 0.05
+            if index % 100 == 0:
+                f.write(f"M117 Line {index}\n")
+            f.write(f"G1 X{x} Y{y} E{e:.3f} F6000\n")
+        f.write("M84\n")
+
+
+def wait_for_state(session, baseurl, predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = session.get(baseurl + "/api/connection").json()["current"]["state"]
+        if predicate(state):
+            return state
+        time.sleep(0.5)
+    raise RuntimeError("Timed out waiting for printer state")
+
+
+def percentiles(values, scale=1000.0):
+    if not values:
+        return "n/a"
+    values = sorted(values)
+
+    def at(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    return "p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}  (n={})".format(
+        at(50) * scale, at(95) * scale, at(99) * scale, values[-1] * scale, len(values)
+    )
+
+
+def run(args):
+    basedir = tempfile.mkdtemp(prefix="octoprint-push-load-")
+    instance = Instance(basedir, args.port)
+    pool = None
+
+    try:
+        print(f"--- Preparing instance in {basedir}")
+        instance.prepare()
+        instance.start()
+
+        admin = instance.api()
+        baseurl = instance.baseurl
+
+        print("--- Connecting to the virtual printer")
+        admin.post(
+            baseurl + "/api/connection",
+            json={"command": "connect", "port": "VIRTUAL", "baudrate": 115200},
+        ).raise_for_status()
+        wait_for_state(admin, baseurl, lambda s: s.startswith("Operational"), 60)
+
+        gcode = os.path.join(basedir, "load_test.gcode")
+        generate_gcode(gcode, args.lines)
+        with open(gcode, "rb") as f:
+            admin.post(
+                baseurl + "/api/files/local", files={"file": ("load_test.gcode", f)}
+            ).raise_for_status()
+
+        print(f"--- Opening {args.clients} push connections")
+        pool = ClientPool(instance, args.clients, args.binary_ratio)
+        pool.start()
+        time.sleep(2)
+
+        process = psutil.Process(instance.process.pid)
+        process.cpu_percent(None)
+        admin.post(
+            baseurl + "/api/plugin/push_load_probe", json={"command": "reset"}
+        ).raise_for_status()
+
+        print("--- Printing")
+        start = time.monotonic()
+        admin.post(
+            baseurl + "/api/files/local/load_test.gcode",
+            json={"command": "select", "print": True},
+        ).raise_for_status()
+        wait_for_state(admin, baseurl, lambda s: s.startswith("Printing"), 30)
+
+        cpu = []
+        while time.monotonic() - start < args.timeout:
+            time.sleep(1.0)
+            cpu.append(process.cpu_percent(None))
+            state = admin.get(baseurl + "/api/connection").json()["current"]["state"]
+            if not state.startswith(("Printing", "Starting", "Finishing")):
+                break
+        duration = time.monotonic() - start
+
+        probe = admin.get(baseurl + "/api/plugin/push_load_probe").json()
+    finally:
+        if pool is not None:
+            pool.stop()
+        instance.stop()
+
+    report = {
+        "clients": args.clients,
+        "lines": args.lines,
+        "duration": duration,
+        "cpu": cpu,
+        "probe": probe,
+        "clients_detail": [
+            {
+                "label": client.label,
+                "messages": client.messages,
+                "bytes": client.bytes,
+                "latencies": client.latencies,
+                "closed": client.closed,
+            }
+            for client in pool.clients
+        ],
+    }
+
+    print_report(report, args.top)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f)
+        print(f"--- Raw results written to {args.json}")
+
+    if args.keep:
+        print(f"--- Kept instance basedir {basedir}")
+    else:
+        shutil.rmtree(basedir, ignore_errors=True)
+
+
+def print_report(report, top):
+    probe = report["probe"]
+
+    print()
+    print(
+        "=== {} clients, {} lines printed in {:.1f}s".format(
+            report["clients"], report["lines"], report["duration"]
+        )
+    )
+
+    cpu = report["cpu"]
+    if cpu:
+        print(
+            "Server CPU (%):          avg {:.1f}  max {:.1f}".format(
+                statistics.mean(cpu), max(cpu)
+            )
+        )
+    print("Event loop lag (ms):     " + percentiles(probe["lag"]))
+    print("ok -> next send (ms):    " + percentiles(probe["ok_to_send"]))
+
+    intervals = probe["send_intervals"]
+    if len(intervals) > 1:
+        print(
+            "Send interval (ms):      mean {:.2f}  stdev {:.2f}".format(
+                statistics.mean(intervals) * 1000, statistics.stdev(intervals) * 1000
+            )
+        )
+
+    print()
+    print("Latency of current messages per client group (ms):")
+    groups = {}
+    for client in report["clients_detail"]:
+        group = groups.setdefault(
+            client["label"], {"clients": 0, "latencies": [], "bytes": 0, "closed": 0}
+        )
+        group["clients"] += 1
+        group["latencies"] += client["latencies"]
+        group["bytes"] += client["bytes"]
+        group["closed"] += client["closed"]
+
+    for label, group in sorted(groups.items()):
+        print(
+            "  {:<28} {:>3} clients  {:>9.1f} kB/client  {}{}".format(
+                label,
+                group["clients"],
+                group["bytes"] / group["clients"] / 1024,
+                percentiles(group["latencies"]),
+                "  {} closed early".format(group["closed"]) if group["closed"] else "",
+            )
+        )
+
+    total = probe["profile_total"]
+    if total:
+        print()
+        print(f"Top {top} code paths by server CPU time ({total:.1f}s sampled):")
+        for thread, stack, used in probe["profile"][:top]:
+            print(f"  {used / total * 100:5.1f}%  [{thread}] {stack}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push socket load test")
+    parser.add_argument("--clients", type=int, default=20, help="Number of clients")
+    parser.add_argument(
+        "--binary-ratio",
+        type=float,
+        default=0.25,
+        help="Share of clients using the raw websocket with binary encoding",
+    )
+    parser.add_argument(
+        "--lines", type=int, default=20000, help="Number of moves in the printed file"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=600, help="Maximum print duration in seconds"
+    )
+    parser.add_argument("--port", type=int, default=5099, help="Port for the server")
+    parser.add_argument("--top", type=int, default=15, help="Number of code paths")
+    parser.add_argument("--json", help="Write the raw results to this file")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the temporary basedir for inspection"
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import io
+import math
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from ddt import data, ddt
+
+from octoprint.filemanager import compression
+from octoprint.plugins.gcodeviewer import layers
+
+GCODE = b"""\
+G28
+G90
+M82
+G1 Z0.2 F3000
+G1 X10 Y10
+G1 X20 Y10 E1 F1200
+G1 E0.5
+G1 Z0.6
+G1 X0 Y0
+G1 Z0.2
+G1 X20 Y20 E1.5
+G1 Z0.4
+G1 X30 Y20
+G1 X40 Y20 E2 ; second layer
+T1
+G92 E0
+G2 X50 Y30 I10 J0 E1
+"""
+
+
+def _records(data, layer):
+    raw = zlib.decompress(data[layer["offset"] : layer["offset"] + layer["length"]])
+    return [
+        layers.RECORD.unpack_from(raw, i * layers.RECORD.size)
+        for i in range(layer["count"])
+    ]
+
+
+@ddt
+class LayersTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.plain = os.path.join(self.folder, "plain.gcode")
+        with open(self.plain, "wb") as f:
+            f.write(GCODE)
+
+        self.compressed = os.path.join(self.folder, "compressed.gcode")
+        compression.compress_file(self.plain, self.compressed, block_size=64)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _build(self, path):
+        output = io.BytesIO()
+        index = layers.build(path, output)
+        return index, output.getvalue()
+
+    @data("plain", "compressed")
+    def test_build(self, name):
+        index, data = self._build(getattr(self, name))
+
+        self.assertEqual(layers.FORMAT_VERSION, index["version"])
+        self.assertEqual(len(GCODE), index["size"])
+        self.assertEqual([0.2, 0.4], [layer["z"] for layer in index["layers"]])
+        self.assertEqual(
+            [0, index["layers"][0]["length"]],
+            [layer["offset"] for layer in index["layers"]],
+        )
+        self.assertEqual(len(data), sum(layer["length"] for layer in index["layers"]))
+
+        first, second = index["layers"]
+        self.assertEqual((0, 0), (first["x"], first["y"]))
+        self.assertEqual(GCODE.index(b"G1 X20 Y10 E1"), first["base"])
+
+        # the travel during the z hop stays on the first layer
+        records = _records(data, first)
+        self.assertEqual(
+            [
+                (0, 10000, 10000),
+                (layers.FLAG_EXTRUDE, 20000, 10000),
+                (layers.FLAG_RETRACT | layers.FLAG_NO_XY, 20000, 10000),
+                (0, 0, 0),
+                (layers.FLAG_EXTRUDE | layers.FLAG_RESTART, 20000, 20000),
+            ],
+            [(flags, x, y) for flags, _, _, x, y, _, _ in records],
+        )
+        self.assertEqual(
+            [3000, 1200, 1200, 1200, 1200], [record[2] for record in records]
+        )
+        self.assertAlmostEqual(-0.5, records[2][5])
+        self.assertEqual(
+            GCODE.index(b"G1 E0.5") + len(b"G1 E0.5\n") - first["base"], records[2][6]
+        )
+
+        # the travel at the new height belongs to the second layer
+        records = _records(data, second)
+        self.assertEqual(20000, second["x"])
+        self.assertEqual((0, 30000, 20000), (records[0][0], records[0][3], records[0][4]))
+
+    def test_arc(self):
+        index, data = self._build(self.plain)
+        records = _records(data, index["layers"][1])
+
+        # the arc gets split into segments along its circle
+        arc = [record for record in records if record[1] == 1]
+        self.assertGreater(len(arc), 10)
+        self.assertEqual((50000, 30000), (arc[-1][3], arc[-1][4]))
+        self.assertAlmostEqual(1.0, sum(record[5] for record in arc), places=5)
+        for record in arc:
+            self.assertAlmostEqual(
+                10.0, math.hypot(record[3] / 1000 - 50, record[4] / 1000 - 20), places=2
+            )
+
+    def test_empty(self):
+        path = os.path.join(self.folder, "empty.gcode")
+        with open(path, "wb") as f:
+            f.write(b"; nothing to see here\nM104 S200\n")
+
+        index, data = self._build(path)
+        self.assertEqual([], index["layers"])
+        self.assertEqual(b"", data)
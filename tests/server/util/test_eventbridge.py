@@ -0,0 +1,154 @@
+"""
+Unit tests for ``octoprint.server.util.eventbridge``.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from octoprint.server.util.eventbridge import EventBridge, is_supported
+
+
+@unittest.skipUnless(is_supported(), "Unix domain sockets not supported")
+class EventBridgeTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "eventbridge.sock")
+
+        self.event_manager = mock.MagicMock()
+        self.bridge = EventBridge(self.path, event_manager=self.event_manager)
+        self.bridge.start()
+
+    def tearDown(self):
+        self.bridge.stop()
+        self.tempdir.cleanup()
+
+    def _client(self, events, on_event=None):
+        from octoprint_client import EventBridgeClient
+
+        received = []
+
+        def callback(event, payload):
+            received.append((event, payload))
+            if on_event is not None:
+                on_event(event, payload)
+
+        client = EventBridgeClient(self.path, events=events, on_event=callback)
+        client.connect()
+        self.addCleanup(client.disconnect)
+        return client, received
+
+    def _wait_for(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _wait_for_subscribers(self, count):
+        self._wait_for(lambda: self.bridge.subscriber_count == count)
+        # give the bridge a moment to process the subscription messages
+        time.sleep(0.1)
+
+    def test_subscribed_to_all_events(self):
+        self.event_manager.subscribe.assert_called_once_with("*", self.bridge._on_event)
+
+    def test_filtered_delivery(self):
+        _, all_events = self._client(["*"])
+        _, print_events = self._client(["Print*"])
+        _, z_events = self._client(["ZChange"])
+        self._wait_for_subscribers(3)
+
+        self.bridge._on_event("PrintStarted", {"name": "test.gco"})
+        self.bridge._on_event("ZChange", {"old": 0.2, "new": 0.4})
+
+        self._wait_for(lambda: len(all_events) == 2)
+        self._wait_for(lambda: len(print_events) == 1 and len(z_events) == 1)
+
+        self.assertEqual(
+            [
+                ("PrintStarted", {"name": "test.gco"}),
+                ("ZChange", {"old": 0.2, "new": 0.4}),
+            ],
+            all_events,
+        )
+        self.assertEqual([("PrintStarted", {"name": "test.gco"})], print_events)
+        self.assertEqual([("ZChange", {"old": 0.2, "new": 0.4})], z_events)
+
+    def test_resubscribe(self):
+        client, received = self._client(["ZChange"])
+        self._wait_for_subscribers(1)
+
+        client.subscribe(["PrintDone"])
+        time.sleep(0.1)
+
+        self.bridge._on_event("ZChange", {})
+        self.bridge._on_event("PrintDone", {})
+
+        self._wait_for(lambda: len(received) == 1)
+        self.assertEqual([("PrintDone", {})], received)
+
+    def test_serialized_once(self):
+        for _ in range(10):
+            self._client(["*"])
+        self._wait_for_subscribers(10)
+
+        with mock.patch(
+            "octoprint.server.util.eventbridge.dumps", wraps=__import__("json").dumps
+        ) as dumps:
+            self.bridge._on_event("PrintStarted", {})
+            self.assertEqual(1, dumps.call_count)
+
+    def test_no_serialization_without_subscribers(self):
+        with mock.patch("octoprint.server.util.eventbridge.dumps") as dumps:
+            self.bridge._on_event("PrintStarted", {})
+            dumps.assert_not_called()
+
+    def test_disconnect(self):
+        client, _ = self._client(["*"])
+        self._wait_for_subscribers(1)
+
+        client.disconnect()
+
+        self._wait_for(lambda: self.bridge.subscriber_count == 0)
+        self.assertEqual(0, self.bridge.subscriber_count)
+
+    def test_socket_permissions(self):
+        self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_overlong_line(self):
+        import socket
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.connect(self.path)
+        self._wait_for_subscribers(1)
+
+        try:
+            sock.sendall(b'{"subscribe": ["' + b"x" * 128 * 1024)
+        except OSError:
+            # the bridge might hang up on us before everything was sent
+            pass
+
+        self._wait_for(lambda: self.bridge.subscriber_count == 0)
+        self.assertEqual(0, self.bridge.subscriber_count)
+
+    def test_client_survives_errors(self):
+        def on_event(event, payload):
+            if event == "PrintFailed":
+                raise RuntimeError("boom")
+
+        client, received = self._client(["*"], on_event=on_event)
+        self._wait_for_subscribers(1)
+
+        connection = next(iter(self.bridge._connections))
+        connection.queue(b"not json\n")
+        self.bridge._on_event("PrintFailed", {})
+        self.bridge._on_event("PrintDone", {})
+
+        self._wait_for(lambda: len(received) == 2)
+        self.assertEqual([("PrintFailed", {}), ("PrintDone", {})], received)
+        self.assertTrue(client.is_connected)
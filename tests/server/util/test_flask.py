@@ -17,6 +17,11 @@ from octoprint.server.util.flask import (
     OctoPrintFlaskRequest,
     OctoPrintFlaskResponse,
     ReverseProxiedEnvironment,
+    cached_api_response,
+    get_cache_statistics,
+    invalidate_cache,
+    on_cache_invalidation_event,
+    with_revalidation_checking,
 )
 
 standard_environ = {
@@ -589,3 +594,109 @@ class OctoPrintFlaskResponseTest(unittest.TestCase):
                             path=expected_path_delete,
                             domain=None,
                         )
+
+
+class CachedApiResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.settings_patcher = mock.patch("octoprint.server.util.flask.settings")
+        settings_getter = self.settings_patcher.start()
+        settings_getter.return_value.getBoolean.return_value = True
+
+        self.user = mock.MagicMock()
+        self.user.needs = {"status"}
+        self.user_patcher = mock.patch("flask_login.current_user", new=self.user)
+        self.user_patcher.start()
+
+        self.calls = 0
+        self.name = f"test{id(self)}"
+
+        def view():
+            self.calls += 1
+            if flask.request.args.get("fail"):
+                flask.abort(500)
+            return flask.jsonify(calls=self.calls)
+
+        self.app = flask.Flask("testapp")
+        self.app.add_url_rule(
+            "/api/test",
+            "test",
+            cached_api_response(
+                self.name,
+                ["TestEvent"],
+                unless=lambda: "force" in flask.request.args,
+            )(with_revalidation_checking(etag_factory=lambda lm=None: "etag")(view)),
+        )
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        invalidate_cache(self.name)
+        self.user_patcher.stop()
+        self.settings_patcher.stop()
+
+    def _statistics(self):
+        return get_cache_statistics()[self.name]
+
+    def test_hit_and_miss(self):
+        first = self.client.get("/api/test")
+        second = self.client.get("/api/test")
+
+        self.assertEqual({"calls": 1}, first.json)
+        self.assertEqual({"calls": 1}, second.json)
+        self.assertEqual("true", second.headers.get("X-From-Cache"))
+        self.assertEqual(1, self.calls)
+        self.assertEqual({"hits": 1, "misses": 1, "invalidations": 0}, self._statistics())
+
+    def test_keyed_by_query_and_permissions(self):
+        self.client.get("/api/test")
+        self.client.get("/api/test?foo=bar")
+        self.user.needs = {"status", "admin"}
+        self.client.get("/api/test")
+
+        self.assertEqual(3, self.calls)
+
+    def test_invalidated_by_event(self):
+        self.client.get("/api/test")
+        on_cache_invalidation_event("OtherEvent", None)
+        self.client.get("/api/test")
+        on_cache_invalidation_event("TestEvent", None)
+        response = self.client.get("/api/test")
+
+        self.assertEqual({"calls": 2}, response.json)
+        self.assertEqual(1, self._statistics()["invalidations"])
+
+    def test_not_modified_from_cache(self):
+        self.client.get("/api/test")
+        response = self.client.get("/api/test", headers={"If-None-Match": '"etag"'})
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(1, self.calls)
+
+    def test_bypass(self):
+        self.client.get("/api/test")
+        response = self.client.get("/api/test?force=true")
+
+        self.assertEqual({"calls": 2}, response.json)
+        self.assertEqual(0, self._statistics()["hits"])
+
+    def test_errors_not_cached(self):
+        self.client.get("/api/test?fail=true")
+        self.client.get("/api/test?fail=true")
+
+        self.assertEqual(2, self.calls)
+
+    def test_not_stored_if_invalidated_while_rendering(self):
+        def view():
+            self.calls += 1
+            invalidate_cache(self.name)
+            return flask.jsonify(calls=self.calls)
+
+        self.app.add_url_rule(
+            "/api/racy",
+            "racy",
+            cached_api_response(self.name, ["TestEvent"])(view),
+        )
+
+        self.client.get("/api/racy")
+        self.client.get("/api/racy")
+
+        self.assertEqual(2, self.calls)
@@ -0,0 +1,870 @@
+"""
+Unit tests for ``octoprint.server.util.sockjs``.
+"""
+
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ddt import data, ddt, unpack
+
+from octoprint.access.permissions import Permissions
+from octoprint.events import Events
+from octoprint.server.util.sockjs import (
+    BinaryFrameEncoder,
+    Broadcast,
+    FrameEncoder,
+    PrinterStateConnection,
+    PushBroadcaster,
+    SplicedPayload,
+    ThrottleScheduler,
+)
+
+
+@ddt
+class FrameEncoderTest(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FrameEncoder()
+
+    def test_encode(self):
+        frame = self.encoder.encode("event", {"type": "ZChange", "payload": {"new": 1.2}})
+        self.assertEqual(
+            {"event": {"type": "ZChange", "payload": {"new": 1.2}}}, json.loads(frame)
+        )
+
+    @data(
+        (
+            {"state": {"text": "Printing"}, "currentZ": 0.2},
+            {"serverTime": 1, "temps": []},
+        ),
+        ({}, {"serverTime": 1}),
+        ({"state": {"text": "Printing"}}, {}),
+        ({}, {}),
+    )
+    @unpack
+    def test_splice(self, shared, extras):
+        frame = self.encoder.splice("current", self.encoder.encode_shared(shared), extras)
+
+        expected = dict(shared)
+        expected.update(extras)
+        self.assertEqual({"current": expected}, json.loads(frame))
+
+    def test_spliced_payload_is_merged_dict(self):
+        payload = SplicedPayload({"a": 1}, {"b": 2})
+        self.assertEqual({"a": 1, "b": 2}, payload)
+
+
+class BroadcastTest(unittest.TestCase):
+    def test_frame_encoded_once_per_group(self):
+        encoder = FrameEncoder()
+        broadcast = Broadcast({"new": 1.2})
+        encode = mock.MagicMock(
+            side_effect=lambda: encoder.encode("plugin", broadcast.payload)
+        )
+
+        first = broadcast.frame("readonly", encoder, encode)
+        second = broadcast.frame("readonly", encoder, encode)
+        third = broadcast.frame("admin", encoder, encode)
+
+        self.assertIs(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(2, encode.call_count)
+        self.assertEqual({"hits": 1, "misses": 2}, encoder.get_statistics())
+
+    def test_encoders_kept_apart(self):
+        from octoprint.util.msgpack import unpackb
+
+        json_encoder = FrameEncoder()
+        binary_encoder = BinaryFrameEncoder()
+        broadcast = Broadcast({"new": 1.2})
+
+        frame = broadcast.frame(
+            None, json_encoder, lambda: json_encoder.encode("plugin", broadcast.payload)
+        )
+        binary_frame = broadcast.frame(
+            None,
+            binary_encoder,
+            lambda: binary_encoder.encode("plugin", broadcast.payload),
+        )
+
+        self.assertEqual({"plugin": {"new": 1.2}}, json.loads(frame))
+        self.assertEqual({"plugin": {"new": 1.2}}, unpackb(binary_frame))
+
+
+class PushBroadcasterTest(unittest.TestCase):
+    def setUp(self):
+        self.printer = mock.MagicMock()
+        self.event_manager = mock.MagicMock()
+        self.plugin_manager = mock.MagicMock()
+        self.broadcaster = PushBroadcaster(
+            self.printer, self.event_manager, self.plugin_manager
+        )
+
+    def test_get(self):
+        broadcaster = PushBroadcaster.get(
+            self.printer, self.event_manager, self.plugin_manager
+        )
+        self.assertIs(
+            broadcaster,
+            PushBroadcaster.get(self.printer, self.event_manager, self.plugin_manager),
+        )
+        self.assertIsNot(
+            broadcaster,
+            PushBroadcaster.get(
+                mock.MagicMock(), self.event_manager, self.plugin_manager
+            ),
+        )
+
+    def test_register(self):
+        first = mock.MagicMock()
+        second = mock.MagicMock()
+
+        self.broadcaster.register(first)
+        self.broadcaster.register(second)
+        self.printer.register_callback.assert_called_once_with(self.broadcaster)
+
+        self.broadcaster.unregister(first)
+        self.printer.unregister_callback.assert_not_called()
+
+        self.broadcaster.unregister(second)
+        self.printer.unregister_callback.assert_called_once_with(self.broadcaster)
+
+    def test_current_data(self):
+        connections = [mock.MagicMock() for _ in range(3)]
+        for connection in connections:
+            self.broadcaster.register(connection)
+
+        data = {"state": {"text": "Printing"}}
+        self.broadcaster.on_printer_send_current_data(data)
+
+        broadcasts = set()
+        for connection in connections:
+            (passed,), kwargs = connection.on_printer_send_current_data.call_args
+            self.assertIs(data, passed)
+            broadcasts.add(kwargs["broadcast"])
+        self.assertEqual(1, len(broadcasts))
+
+    def test_events(self):
+        connections = [mock.MagicMock() for _ in range(2)]
+        for connection in connections:
+            self.broadcaster.register(connection)
+
+        subscribed = {c.args[0] for c in self.event_manager.subscribe.call_args_list}
+        self.assertIn(Events.PRINT_STARTED, subscribed)
+        self.assertEqual(
+            len(subscribed), len(self.event_manager.subscribe.call_args_list)
+        )
+
+        callback = self.event_manager.subscribe.call_args.args[1]
+        callback(Events.PRINT_STARTED, {"name": "test.gcode"})
+
+        broadcasts = set()
+        for connection in connections:
+            args, kwargs = connection._onEvent.call_args
+            self.assertEqual((Events.PRINT_STARTED, {"name": "test.gcode"}), args)
+            broadcasts.add(kwargs["broadcast"])
+        self.assertEqual(1, len(broadcasts))
+
+    def test_plugin_messages(self):
+        first = mock.MagicMock()
+        second = mock.MagicMock()
+
+        self.broadcaster.add_receiver(first)
+        self.broadcaster.add_receiver(second)
+        self.plugin_manager.register_message_receiver.assert_called_once_with(
+            self.broadcaster.on_plugin_message
+        )
+
+        self.broadcaster.on_plugin_message("test", {"a": 1})
+        self.assertIs(
+            first.on_plugin_message.call_args.kwargs["broadcast"],
+            second.on_plugin_message.call_args.kwargs["broadcast"],
+        )
+
+        self.broadcaster.remove_receiver(first)
+        self.broadcaster.remove_receiver(second)
+        self.plugin_manager.unregister_message_receiver.assert_called_once_with(
+            self.broadcaster.on_plugin_message
+        )
+
+    def test_initial_data(self):
+        first = mock.MagicMock()
+        second = mock.MagicMock()
+        unregistered = mock.MagicMock()
+
+        self.printer.send_initial_callback.side_effect = (
+            lambda callback: callback.on_printer_send_initial_data({"logs": []})
+        )
+
+        self.broadcaster.register(first)
+        self.broadcaster.register(second)
+
+        self.broadcaster.send_initial_data(first)
+        first.on_printer_send_initial_data.assert_called_once_with({"logs": []})
+        second.on_printer_send_initial_data.assert_not_called()
+
+        self.broadcaster.send_initial_data(unregistered)
+        self.assertEqual(1, self.printer.send_initial_callback.call_count)
+        unregistered.on_printer_send_initial_data.assert_not_called()
+
+
+class PrinterStateConnectionBroadcastTest(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FrameEncoder()
+
+    def _connection(self, admin=False):
+        from octoprint.server.util.sockjs import JsonEncodingSessionWrapper
+
+        permissions = [Permissions.STATUS, Permissions.MONITOR_TERMINAL]
+        if admin:
+            permissions.append(Permissions.ADMIN)
+
+        user = mock.MagicMock()
+        user.has_permission.side_effect = lambda p: p in permissions
+        user.effective_permissions = permissions
+
+        user_manager = mock.MagicMock()
+        user_manager.anonymous_user_factory.return_value = user
+
+        printer = mock.MagicMock()
+        printer.get_markings.return_value = []
+        printer.is_printing.return_value = False
+        printer.is_paused.return_value = False
+
+        file_manager = mock.MagicMock()
+        file_manager.get_busy_files.return_value = []
+
+        plugin_manager = mock.MagicMock()
+        plugin_manager.get_hooks.return_value = {}
+
+        connection = PrinterStateConnection(
+            printer,
+            file_manager,
+            mock.MagicMock(),
+            user_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+            plugin_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+        )
+        connection._initial_data_sent = True
+        connection._frame_encoder = self.encoder
+        connection.session = mock.MagicMock(spec=JsonEncodingSessionWrapper)
+        connection.session.is_closed = False
+        return connection
+
+    def _frames(self, connection):
+        return [c.args[0] for c in connection.session.send_encoded.call_args_list]
+
+    def test_event_shared_within_group(self):
+        readonly = [self._connection() for _ in range(2)]
+        admin = self._connection(admin=True)
+
+        payload = {"remoteAddress": "127.0.0.1"}
+        broadcast = Broadcast(payload)
+        for connection in readonly + [admin]:
+            connection._onEvent(Events.CLIENT_OPENED, payload, broadcast=broadcast)
+
+        (first,) = self._frames(readonly[0])
+        (second,) = self._frames(readonly[1])
+        (admin_frame,) = self._frames(admin)
+
+        self.assertIs(first, second)
+        self.assertEqual(
+            {"event": {"type": Events.CLIENT_OPENED, "payload": {}}}, json.loads(first)
+        )
+        self.assertEqual(
+            {"event": {"type": Events.CLIENT_OPENED, "payload": payload}},
+            json.loads(admin_frame),
+        )
+        self.assertEqual({"hits": 1, "misses": 2}, self.encoder.get_statistics())
+
+    def test_current_shares_state(self):
+        connections = [self._connection() for _ in range(3)]
+        connections[0].on_printer_add_log("Recv: ok")
+
+        data = {"state": {"text": "Printing"}, "currentZ": 0.2}
+        broadcast = Broadcast(data)
+        for connection in connections:
+            connection.on_printer_send_current_data(data, broadcast=broadcast)
+
+        frames = [json.loads(self._frames(c)[0])["current"] for c in connections]
+        for frame in frames:
+            self.assertEqual({"text": "Printing"}, frame["state"])
+            self.assertEqual(0.2, frame["currentZ"])
+        self.assertEqual(["Recv: ok"], frames[0]["logs"])
+        self.assertEqual([], frames[1]["logs"])
+
+        self.assertEqual({"hits": 2, "misses": 1}, self.encoder.get_statistics())
+
+    def test_group(self):
+        first = self._connection()
+        second = self._connection()
+        self.assertEqual(first._get_group(), second._get_group())
+        self.assertNotEqual(first._get_group(), self._connection(admin=True)._get_group())
+
+        second.on_message(json.dumps({"subscribe": {"events": ["PrintStarted"]}}))
+        self.assertNotEqual(first._get_group(), second._get_group())
+
+        first.on_message(json.dumps({"subscribe": {"events": ["PrintStarted"]}}))
+        self.assertEqual(first._get_group(), second._get_group())
+
+
+class ThrottleSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ThrottleScheduler()
+
+    def test_schedule(self):
+        called = threading.Event()
+        self.scheduler.schedule("key", 0.01, called.set)
+        self.assertTrue(called.wait(1.0))
+        self.assertFalse(self.scheduler.is_pending("key"))
+
+    def test_schedule_replaces_pending(self):
+        calls = []
+        done = threading.Event()
+
+        def callback(value):
+            calls.append(value)
+            done.set()
+
+        self.scheduler.schedule("key", 0.05, callback, 1)
+        self.scheduler.schedule("key", 0.05, callback, 2)
+
+        self.assertTrue(done.wait(1.0))
+        time.sleep(0.1)
+        self.assertEqual([2], calls)
+
+    def test_cancel(self):
+        callback = mock.MagicMock()
+        self.scheduler.schedule("key", 0.01, callback)
+        self.scheduler.cancel("key")
+        time.sleep(0.05)
+        callback.assert_not_called()
+
+
+@ddt
+class BinaryFrameEncoderTest(unittest.TestCase):
+    def test_encode(self):
+        from octoprint.util.msgpack import unpackb
+
+        encoder = BinaryFrameEncoder()
+        payload = {"state": {"text": "Operational"}, "temps": [{"time": 1}]}
+
+        frame = encoder.encode("current", payload)
+
+        self.assertIsInstance(frame, bytes)
+        self.assertEqual({"current": payload}, unpackb(frame))
+
+    @data(
+        ({"state": {"text": "Operational"}}, {"logs": ["Send"]}),
+        ({}, {"serverTime": 1}),
+        ({"state": {"text": "Operational"}}, {}),
+        ({}, {}),
+        ({str(i): i for i in range(10)}, {str(i): i for i in range(10, 20)}),
+    )
+    @unpack
+    def test_splice(self, shared, extras):
+        from octoprint.util.msgpack import unpackb
+
+        encoder = BinaryFrameEncoder()
+        frame = encoder.splice("current", encoder.encode_shared(shared), extras)
+
+        expected = dict(shared)
+        expected.update(extras)
+        self.assertEqual({"current": expected}, unpackb(frame))
+
+    def test_splice_reuses_shared(self):
+        encoder = BinaryFrameEncoder()
+        shared = encoder.encode_shared({"state": {"text": "Operational"}})
+
+        with mock.patch(
+            "octoprint.server.util.sockjs.msgpack_packb"
+        ) as packb, mock.patch(
+            "octoprint.server.util.sockjs.packb_map_items", return_value=b"\xc0\xc0"
+        ) as packb_map_items:
+            packb.side_effect = lambda obj: b"\xa7current"
+            encoder.splice("current", shared, {"logs": []})
+            encoder.splice("current", shared, {"logs": []})
+
+        # only the session specific extras got packed again
+        self.assertEqual([mock.call({"logs": []})] * 2, packb_map_items.call_args_list)
+        self.assertEqual(1, packb.call_count)
+
+
+class PrinterStateConnectionThrottleTest(unittest.TestCase):
+    def _connection(self):
+        user = mock.MagicMock()
+        user.has_permission.return_value = True
+
+        user_manager = mock.MagicMock()
+        user_manager.anonymous_user_factory.return_value = user
+
+        printer = mock.MagicMock()
+        printer.get_markings.return_value = []
+        printer.is_printing.return_value = False
+        printer.is_paused.return_value = False
+
+        file_manager = mock.MagicMock()
+        file_manager.get_busy_files.return_value = []
+
+        plugin_manager = mock.MagicMock()
+        plugin_manager.get_hooks.return_value = {}
+
+        connection = PrinterStateConnection(
+            printer,
+            file_manager,
+            mock.MagicMock(),
+            user_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+            plugin_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+        )
+        connection._initial_data_sent = True
+        connection._base_rate_limit = 0.05
+        connection.send = mock.MagicMock()
+        return connection
+
+    def _sent_current(self, connection):
+        return [
+            args[0]["current"]
+            for args, _ in connection.send.call_args_list
+            if "current" in args[0]
+        ]
+
+    def test_thread_count_constant_under_load(self):
+        connections = [self._connection() for _ in range(10)]
+
+        # make sure the shared scheduler thread is already up
+        connections[0]._throttle_scheduler.schedule("warmup", 0, lambda: None)
+        time.sleep(0.05)
+        threads = threading.active_count()
+
+        for i in range(50):
+            for connection in connections:
+                connection.on_printer_send_current_data({"counter": i})
+            self.assertLessEqual(threading.active_count(), threads)
+            time.sleep(0.002)
+
+        time.sleep(0.2)
+        self.assertEqual(threads, threading.active_count())
+
+        for connection in connections:
+            sent = self._sent_current(connection)
+            self.assertLess(len(sent), 50)
+            self.assertEqual(49, sent[-1]["counter"])
+
+    def test_throttle_factor(self):
+        fast = self._connection()
+        slow = self._connection()
+        slow._throttle_factor = 4
+
+        start = time.monotonic()
+        while time.monotonic() - start < 0.5:
+            fast.on_printer_send_current_data({})
+            slow.on_printer_send_current_data({})
+            time.sleep(0.005)
+
+        self.assertGreater(
+            len(self._sent_current(fast)), 2 * len(self._sent_current(slow))
+        )
+
+
+class SessionSendQueueTest(unittest.TestCase):
+    def setUp(self):
+        from octoprint.vendor.sockjs.tornado.session import Session
+
+        patcher = mock.patch(
+            "octoprint.vendor.sockjs.tornado.session.get_current_ioloop",
+            return_value=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        server = mock.MagicMock()
+        server.settings = {
+            "heartbeat_delay": 25,
+            "immediate_flush": True,
+            "verify_ip": True,
+            "send_queue_limit": 100,
+            "send_queue_replace": ["current"],
+        }
+
+        self.session = Session(mock.MagicMock(), server, "session_id")
+        self.session.handler = mock.MagicMock()
+
+    def test_sent_right_away(self):
+        self.session.handler.active = True
+        self.session.send_jsonified('{"event":1}', kind="event")
+        self.session.handler.send_pack.assert_called_once_with('a[{"event":1}]')
+        self.assertEqual(0, self.session.send_queue_depth)
+
+    def test_queued_without_active_handler(self):
+        self.session.handler.active = False
+        self.session.send_jsonified('{"event":1}', kind="event")
+        self.session.send_jsonified('{"event":2}', kind="event")
+
+        self.assertEqual(2, self.session.send_queue_depth)
+        self.assertEqual(22, self.session.send_queue_size)
+
+        self.session.handler.active = True
+        self.session.flush()
+        self.session.handler.send_pack.assert_called_once_with(
+            'a[{"event":1},{"event":2}]'
+        )
+        self.assertEqual(0, self.session.send_queue_depth)
+        self.assertEqual(0, self.session.send_queue_size)
+
+    def test_replaced_kind(self):
+        self.session.handler.active = False
+        self.session.send_jsonified('{"current":1}', kind="current")
+        self.session.send_jsonified('{"event":1}', kind="event")
+        self.session.send_jsonified('{"current":22}', kind="current")
+
+        self.assertEqual(2, self.session.send_queue_depth)
+        self.assertEqual(
+            [("current", '{"current":22}'), ("event", '{"event":1}')],
+            self.session.send_queue,
+        )
+        self.assertEqual(25, self.session.send_queue_size)
+
+    def test_limit(self):
+        self.session.handler.active = False
+        self.session.close = mock.MagicMock()
+
+        for _ in range(10):
+            self.session.send_jsonified('{"event":1}', kind="event")
+
+        self.session.close.assert_called_once_with(3001, "Send queue limit exceeded")
+        self.assertEqual(0, self.session.send_queue_depth)
+
+
+@ddt
+class PrinterStateConnectionTransportTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("octoprint.server.util.sockjs.settings")
+        self.settings = patcher.start()
+        self.settings.return_value.getBoolean.return_value = True
+        self.addCleanup(patcher.stop)
+
+    def _connection(self, raw=True):
+        from octoprint.vendor.sockjs.tornado.transports.rawwebsocket import RawSession
+
+        user = mock.MagicMock()
+        user.has_permission.return_value = True
+
+        user_manager = mock.MagicMock()
+        user_manager.anonymous_user_factory.return_value = user
+
+        plugin_manager = mock.MagicMock()
+        plugin_manager.get_hooks.return_value = {}
+
+        session = mock.MagicMock(spec=RawSession) if raw else mock.MagicMock()
+
+        connection = PrinterStateConnection(
+            mock.MagicMock(),
+            mock.MagicMock(),
+            mock.MagicMock(),
+            user_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+            plugin_manager,
+            mock.MagicMock(),
+            session,
+        )
+        connection.send = mock.MagicMock()
+        return connection
+
+    def _sent(self, connection):
+        # raw sessions get pre-encoded JSON frames
+        return [
+            json.loads(c.args[0]) if isinstance(c.args[0], str) else c.args[0]
+            for c in connection.send.call_args_list
+        ]
+
+    def test_msgpack(self):
+        from octoprint.util.msgpack import unpackb
+
+        connection = self._connection()
+        connection.on_message(json.dumps({"transport": {"encoding": "msgpack"}}))
+
+        self.assertEqual(
+            [{"transport": {"encoding": "msgpack", "types": ["current", "history"]}}],
+            self._sent(connection),
+        )
+        connection.send.reset_mock()
+
+        connection._do_emit("current", {"state": {"text": "Printing"}})
+        connection._do_emit("event", {"type": "PrintStarted"})
+
+        (binary_frame,), binary_kwargs = connection.send.call_args_list[0]
+        self.assertEqual({"binary": True}, binary_kwargs)
+        self.assertEqual(
+            {"current": {"state": {"text": "Printing"}}}, unpackb(binary_frame)
+        )
+
+        self.assertEqual({"event": {"type": "PrintStarted"}}, self._sent(connection)[1])
+        self.assertEqual({}, connection.send.call_args_list[1].kwargs)
+
+    @data(
+        (False, True),
+        (True, False),
+    )
+    @unpack
+    def test_msgpack_unsupported(self, raw, enabled):
+        self.settings.return_value.getBoolean.return_value = enabled
+
+        connection = self._connection(raw=raw)
+        connection.on_message(json.dumps({"transport": {"encoding": "msgpack"}}))
+
+        self.assertEqual(
+            [{"transport": {"encoding": "json", "types": []}}], self._sent(connection)
+        )
+        connection.send.reset_mock()
+
+        connection._do_emit("current", {"state": {"text": "Printing"}})
+        self.assertEqual(
+            [{"current": {"state": {"text": "Printing"}}}], self._sent(connection)
+        )
+        self.assertEqual({}, connection.send.call_args.kwargs)
+
+    @data({"encoding": "bson"}, "msgpack")
+    def test_invalid(self, transport):
+        connection = self._connection()
+        connection.on_message(json.dumps({"transport": transport}))
+
+        connection.send.assert_not_called()
+        self.assertEqual("json", connection._encoding)
+
+
+class StalledWebSocketTest(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            mock.patch(
+                f"octoprint.vendor.sockjs.tornado.{module}.get_current_ioloop",
+                return_value=True,
+            )
+            for module in ("session", "transports.websocket", "transports.rawwebsocket")
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.server = mock.MagicMock()
+        self.server.io_loop = True
+        self.server.settings = {
+            "heartbeat_delay": 25,
+            "immediate_flush": True,
+            "verify_ip": False,
+            "send_queue_limit": 100,
+            "send_queue_replace": ["current"],
+        }
+
+        # writes never complete until the test resolves them
+        self.writes = []
+
+    def _handler(self, cls, session):
+        import concurrent.futures
+
+        def write_message(message, binary=False):
+            future = concurrent.futures.Future()
+            self.writes.append((message, future))
+            return future
+
+        handler = cls.__new__(cls)
+        handler.initialize(self.server)
+        handler.write_message = write_message
+        handler.on_close = mock.MagicMock()
+        handler.session = session
+        session.handler = handler
+        return handler
+
+    def _sent(self):
+        return [message for message, _ in self.writes]
+
+    def test_websocket(self):
+        from octoprint.vendor.sockjs.tornado.session import Session
+        from octoprint.vendor.sockjs.tornado.transports import WebSocketTransport
+
+        session = Session(mock.MagicMock(), self.server, "session_id")
+        self._handler(WebSocketTransport, session)
+
+        session.send_jsonified('{"event":1}', kind="event")
+        session.send_jsonified('{"current":1}', kind="current")
+        session.send_jsonified('{"event":2}', kind="event")
+        session.send_jsonified('{"current":2}', kind="current")
+
+        self.assertEqual(['a[{"event":1}]'], self._sent())
+        self.assertEqual(
+            [("current", '{"current":2}'), ("event", '{"event":2}')], session.send_queue
+        )
+
+        self.writes[0][1].set_result(None)
+        self.assertEqual(['a[{"event":1}]', 'a[{"current":2},{"event":2}]'], self._sent())
+        self.assertEqual(0, session.send_queue_depth)
+
+    def test_websocket_limit(self):
+        from octoprint.vendor.sockjs.tornado.session import Session
+        from octoprint.vendor.sockjs.tornado.transports import WebSocketTransport
+
+        session = Session(mock.MagicMock(), self.server, "session_id")
+        session.close = mock.MagicMock()
+        self._handler(WebSocketTransport, session)
+
+        for _ in range(11):
+            session.send_jsonified('{"event":1}', kind="event")
+
+        self.assertEqual(1, len(self.writes))
+        session.close.assert_called_once_with(3001, "Send queue limit exceeded")
+
+    def test_raw_websocket(self):
+        from octoprint.vendor.sockjs.tornado.transports import RawWebSocketTransport
+        from octoprint.vendor.sockjs.tornado.transports.rawwebsocket import RawSession
+
+        session = RawSession(mock.MagicMock(), self.server)
+        session.close = mock.MagicMock()
+        self._handler(RawWebSocketTransport, session)
+
+        session.send_message("first")
+        session.send_message("second")
+        session.send_message("third")
+
+        self.assertEqual(["first"], self._sent())
+        self.assertEqual(2, session.send_queue_depth)
+
+        self.writes[0][1].set_result(None)
+        self.assertEqual(["first", "second", "third"], self._sent())
+        self.assertEqual(0, session.send_queue_depth)
+
+        for _ in range(20):
+            session.send_message("x" * 10)
+        session.close.assert_called_once_with(3001, "Send queue limit exceeded")
+
+
+class PrinterStateConnectionEmitHookTest(unittest.TestCase):
+    def _connection(self, emit_hooks=None):
+        from octoprint.server.util.sockjs import JsonEncodingSessionWrapper
+
+        user = mock.MagicMock()
+        user.has_permission.return_value = True
+
+        user_manager = mock.MagicMock()
+        user_manager.anonymous_user_factory.return_value = user
+
+        plugin_manager = mock.MagicMock()
+        plugin_manager.get_hooks.side_effect = (
+            lambda name: dict(emit_hooks or {})
+            if name == "octoprint.server.sockjs.emit"
+            else {}
+        )
+
+        connection = PrinterStateConnection(
+            mock.MagicMock(),
+            mock.MagicMock(),
+            mock.MagicMock(),
+            user_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+            plugin_manager,
+            mock.MagicMock(),
+            mock.MagicMock(),
+        )
+        connection._user = user
+        connection.session = mock.MagicMock(spec=JsonEncodingSessionWrapper)
+        connection.session.is_closed = False
+        return connection
+
+    def _sent(self, connection):
+        return [
+            json.loads(c.args[0]) for c in connection.session.send_encoded.call_args_list
+        ]
+
+    def test_modified_by_hook(self):
+        def hook(connection, user, type, payload):
+            payload["hooked"] = True
+            return True
+
+        payload = {"type": "PrintStarted", "payload": {"name": "test.gcode"}}
+        plain = self._connection()
+        hooked = self._connection(emit_hooks={"test": hook})
+
+        plain._emit("event", payload=payload)
+        hooked._emit("event", payload=payload)
+
+        self.assertEqual(
+            [{"event": {"type": "PrintStarted", "payload": {"name": "test.gcode"}}}],
+            self._sent(plain),
+        )
+        self.assertEqual(
+            [
+                {
+                    "event": {
+                        "type": "PrintStarted",
+                        "payload": {"name": "test.gcode"},
+                        "hooked": True,
+                    }
+                }
+            ],
+            self._sent(hooked),
+        )
+
+    def test_spliced_modified_by_hook(self):
+        def hook(connection, user, type, payload):
+            payload["state"]["text"] = "Hooked"
+            return True
+
+        data = {"state": {"text": "Printing"}}
+        broadcast = Broadcast(data)
+        plain = self._connection()
+        hooked = self._connection(emit_hooks={"test": hook})
+
+        hooked._emit(
+            "current",
+            payload=SplicedPayload(data, {"serverTime": 1}),
+            broadcast=broadcast,
+        )
+        plain._emit(
+            "current",
+            payload=SplicedPayload(data, {"serverTime": 1}),
+            broadcast=broadcast,
+        )
+
+        self.assertEqual(
+            [{"current": {"state": {"text": "Printing"}, "serverTime": 1}}],
+            self._sent(plain),
+        )
+        self.assertEqual(
+            [{"current": {"state": {"text": "Hooked"}, "serverTime": 1}}],
+            self._sent(hooked),
+        )
+        self.assertEqual({"state": {"text": "Printing"}}, data)
+
+    def test_broadcast_modified_by_hook(self):
+        def hook(connection, user, type, payload):
+            payload["payload"]["name"] = "hooked.gcode"
+            return True
+
+        payload = {"name": "test.gcode"}
+        broadcast = Broadcast(payload)
+        plain = self._connection()
+        hooked = self._connection(emit_hooks={"test": hook})
+
+        hooked._onEvent(Events.PRINT_STARTED, payload, broadcast=broadcast)
+        plain._onEvent(Events.PRINT_STARTED, payload, broadcast=broadcast)
+
+        self.assertEqual(
+            [{"event": {"type": "PrintStarted", "payload": {"name": "test.gcode"}}}],
+            self._sent(plain),
+        )
+        self.assertEqual(
+            [{"event": {"type": "PrintStarted", "payload": {"name": "hooked.gcode"}}}],
+            self._sent(hooked),
+        )
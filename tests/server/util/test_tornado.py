@@ -7,8 +7,12 @@ __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agp
 __copyright__ = "Copyright (C) 2016 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
 
+import os
 import unittest
+from unittest import mock
 
+import tornado.testing
+import tornado.web
 from ddt import data, ddt, unpack
 
 ##~~ _parse_header
@@ -102,3 +106,757 @@ class ExtendedHeaderValueTest(unittest.TestCase):
         actual = _extended_header_value(value)
 
         self.assertEqual(expected, actual)
+
+
+##~~ _limit_server_window_bits
+
+
+@ddt
+class LimitServerWindowBitsTest(unittest.TestCase):
+    @data(
+        (None, None),
+        ("permessage-deflate", "permessage-deflate; server_max_window_bits=12"),
+        (
+            "permessage-deflate; client_max_window_bits",
+            "permessage-deflate; client_max_window_bits; server_max_window_bits=12",
+        ),
+        (
+            "permessage-deflate; server_max_window_bits=10",
+            "permessage-deflate; server_max_window_bits=10",
+        ),
+        (
+            "permessage-deflate; server_max_window_bits=15",
+            "permessage-deflate; server_max_window_bits=12",
+        ),
+        ("x-webkit-deflate-frame", "x-webkit-deflate-frame"),
+    )
+    @unpack
+    def test_limit(self, header, expected):
+        from tornado.httputil import HTTPHeaders
+
+        from octoprint.server.util.tornado import _limit_server_window_bits
+
+        headers = HTTPHeaders()
+        if header is not None:
+            headers["Sec-WebSocket-Extensions"] = header
+
+        _limit_server_window_bits(headers, 12)
+
+        self.assertEqual(expected, headers.get("Sec-WebSocket-Extensions"))
+
+
+##~~ WsgiInputContainer
+
+
+def _streaming_wsgi_app(environ, start_response):
+    path = environ["PATH_INFO"]
+    if path == "/single":
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Server", "test")])
+        return [b"single chunk"]
+
+    elif path == "/chunks":
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Server", "test")])
+        return (chunk for chunk in (b"first ", b"", "second ", b"third"))
+
+    elif path == "/length":
+        start_response(
+            "200 OK", [("Content-Type", "text/plain"), ("Content-Length", "10")]
+        )
+        return (chunk for chunk in (b"01234", b"56789"))
+
+    elif path == "/error":
+
+        def generate():
+            yield b"first"
+            yield b"second"
+            raise RuntimeError("Broken")
+
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return generate()
+
+
+class WsgiInputContainerTest(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        from octoprint.server.util.tornado import (
+            UploadStorageFallbackHandler,
+            WsgiInputContainer,
+        )
+
+        container = WsgiInputContainer(
+            _streaming_wsgi_app,
+            headers={"X-Default": "default"},
+            forced_headers={"X-Forced": "forced"},
+            removed_headers=["server"],
+        )
+        return tornado.web.Application(
+            [(r".*", UploadStorageFallbackHandler, {"fallback": container})]
+        )
+
+    def test_single_chunk(self):
+        response = self.fetch("/single")
+
+        self.assertEqual(200, response.code)
+        self.assertEqual(b"single chunk", response.body)
+        self.assertEqual("12", response.headers["Content-Length"])
+        self.assertNotIn("Transfer-Encoding", response.headers)
+        self.assertEqual("default", response.headers["X-Default"])
+        self.assertEqual("forced", response.headers["X-Forced"])
+        self.assertNotIn("Server", response.headers)
+
+    def test_streamed_chunks(self):
+        response = self.fetch("/chunks")
+
+        self.assertEqual(200, response.code)
+        self.assertEqual(b"first second third", response.body)
+        self.assertEqual("chunked", response.headers["Transfer-Encoding"])
+        self.assertNotIn("Content-Length", response.headers)
+        self.assertEqual("default", response.headers["X-Default"])
+        self.assertEqual("forced", response.headers["X-Forced"])
+        self.assertNotIn("Server", response.headers)
+
+    def test_streamed_chunks_with_length(self):
+        response = self.fetch("/length")
+
+        self.assertEqual(200, response.code)
+        self.assertEqual(b"0123456789", response.body)
+        self.assertEqual("10", response.headers["Content-Length"])
+        self.assertNotIn("Transfer-Encoding", response.headers)
+
+    def test_error_while_streaming(self):
+        with self.assertRaises(Exception):
+            self.fetch("/error", raise_error=True)
+
+
+##~~ UploadStorageFallbackHandler
+
+
+def _form_wsgi_app(environ, start_response):
+    import json
+
+    from werkzeug.wrappers import Request
+
+    form = Request(environ).form.to_dict()
+    if "file.path" in form:
+        with open(form["file.path"], "rb") as f:
+            form["content"] = f.read().decode("utf-8")
+    form["ingests"] = environ.get("octoprint.upload_ingests")
+
+    body = json.dumps(form).encode("utf-8")
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [body]
+
+
+def _multipart(*parts):
+    body = b""
+    for name, filename, value in parts:
+        body += b"--boundary\r\n"
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += f"Content-Disposition: {disposition}\r\n\r\n".encode("utf-8")
+        body += value + b"\r\n"
+    return body + b"--boundary--\r\n"
+
+
+class UploadStorageFallbackHandlerTest(tornado.testing.AsyncHTTPTestCase):
+    GCODE = b"; generated by PrusaSlicer 2.6.0\n; layer_height = 0.2\nG28\nG1 X10\n"
+
+    def setUp(self):
+        import tempfile
+
+        self.staging = tempfile.TemporaryDirectory()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.staging.cleanup()
+
+    def get_app(self):
+        from octoprint.filemanager.util import UploadIngest
+        from octoprint.server.util.tornado import (
+            UploadStorageFallbackHandler,
+            WsgiInputContainer,
+        )
+
+        container = WsgiInputContainer(_form_wsgi_app)
+        return tornado.web.Application(
+            [
+                (
+                    r"/ingest",
+                    UploadStorageFallbackHandler,
+                    {
+                        "fallback": container,
+                        "path": self.staging.name,
+                        "ingest": lambda filename, handle: UploadIngest(
+                            handle, slicer=filename.endswith(".gcode")
+                        ),
+                    },
+                ),
+                (r".*", UploadStorageFallbackHandler, {"fallback": container}),
+            ]
+        )
+
+    def _upload(self, url, *parts):
+        import json
+
+        response = self.fetch(
+            url,
+            method="POST",
+            body=_multipart(*parts),
+            headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+        )
+        self.assertEqual(200, response.code)
+        return json.loads(response.body)
+
+    def test_upload(self):
+        form = self._upload(
+            "/plain", ("file", "test.gcode", self.GCODE), ("select", None, b"true")
+        )
+
+        self.assertEqual("test.gcode", form["file.name"])
+        self.assertEqual(str(len(self.GCODE)), form["file.size"])
+        self.assertEqual("true", form["select"])
+        self.assertEqual(self.GCODE.decode("utf-8"), form["content"])
+        self.assertNotIn("file.hash", form)
+        self.assertEqual({}, form["ingests"])
+        self.assertFalse(os.path.exists(form["file.path"]))
+
+    def test_upload_ingest(self):
+        import hashlib
+
+        form = self._upload(
+            "/ingest",
+            ("file", "test.gcode", self.GCODE),
+            ("file.hash", None, b"spoofed"),
+            ("file.slicer", None, b'{"name": "spoofed"}'),
+        )
+
+        self.assertEqual(self.staging.name, os.path.dirname(form["file.path"]))
+        self.assertEqual(str(len(self.GCODE)), form["file.size"])
+        self.assertEqual(self.GCODE.decode("utf-8"), form["content"])
+        self.assertEqual(
+            {
+                "file": {
+                    "hash": hashlib.sha1(self.GCODE).hexdigest(),
+                    "slicer": {
+                        "name": "PrusaSlicer 2.6.0",
+                        "settings": {"layer_height": "0.2"},
+                    },
+                }
+            },
+            form["ingests"],
+        )
+
+    def test_upload_ingest_no_slicer(self):
+        form = self._upload(
+            "/ingest",
+            ("file", "test.stl", b"solid test"),
+            ("file.slicer", None, b'{"name": "spoofed"}'),
+        )
+        self.assertEqual({"file"}, set(form["ingests"]))
+        self.assertNotIn("slicer", form["ingests"]["file"])
+
+    def test_upload_ingest_spoofed_without_ingest(self):
+        # e.g. /api/files%2Flocal, which doesn't match the ingesting route
+        form = self._upload(
+            "/plain",
+            ("file", "test.gcode", self.GCODE),
+            ("file.hash", None, b"../../spoofed"),
+            ("file.slicer", None, b'{"name": "spoofed"}'),
+        )
+        self.assertEqual({}, form["ingests"])
+
+    def test_upload_ingest_spoofed_without_file(self):
+        form = self._upload(
+            "/ingest",
+            ("file.path", None, os.devnull.encode("utf-8")),
+            ("file.hash", None, b"../../spoofed"),
+            ("file.slicer", None, b'{"name": "spoofed"}'),
+        )
+        self.assertEqual({}, form["ingests"])
+
+
+##~~ NativeApiHandler
+
+
+class FakePrinter:
+    @classmethod
+    def get_connection_options(cls):
+        return {
+            "ports": ["/dev/ttyUSB0", "VIRTUAL"],
+            "baudrates": [115200, 250000],
+            "portPreference": "VIRTUAL",
+            "baudratePreference": None,
+        }
+
+    def __init__(self):
+        self.operational = True
+
+    def is_operational(self):
+        return self.operational
+
+    def is_sd_ready(self):
+        return False
+
+    def get_current_data(self):
+        return {
+            "state": {
+                "text": "Printing",
+                "flags": {"operational": True, "printing": True, "error": False},
+                "error": "",
+            },
+            "job": {
+                "file": {"name": "tëst.gcode", "path": "folder/tëst.gcode", "size": 1234},
+                "estimatedPrintTime": 3600.5,
+                "filament": None,
+            },
+            "progress": {"completion": 12.5, "printTime": 600, "printTimeLeft": None},
+        }
+
+    def get_current_temperatures(self):
+        return {
+            "tool0": {"actual": 210.3, "target": 210.0, "offset": 0},
+            "bed": {"actual": 59.8, "target": 60.0, "offset": 0},
+            "chamber": {"actual": None, "target": None, "offset": 0},
+        }
+
+    def get_temperature_history(self):
+        return [
+            {"time": 1, "tool0": {"actual": 200.0, "target": 210.0}, "chamber": {}},
+            {"time": 2, "tool0": {"actual": 205.0, "target": 210.0}, "chamber": {}},
+        ]
+
+    def get_current_connection(self):
+        return "Printing", "VIRTUAL", 115200, {"id": "_default"}
+
+
+class FakeProfileManager:
+    def get_current_or_default(self):
+        return {"id": "_default", "heatedBed": True, "heatedChamber": False}
+
+    def get_all(self):
+        return {"_default": {"id": "_default", "name": "Default"}}
+
+    def get_default(self):
+        return {"id": "_default"}
+
+
+@ddt
+class NativeApiHandlerTest(tornado.testing.AsyncHTTPTestCase):
+    def setUp(self):
+        import flask
+
+        from octoprint.server.util.flask import OctoPrintJsonProvider
+
+        self.flask_app = flask.Flask("test")
+        self.flask_app.json = OctoPrintJsonProvider(self.flask_app)
+        self.flask_app.json.compact = False
+
+        self.printer = FakePrinter()
+        profile_manager = FakeProfileManager()
+
+        settings = mock.MagicMock()
+        settings.getBoolean.return_value = True
+
+        self.user = mock.MagicMock()
+        self.user.is_anonymous = False
+        self.user.is_active = True
+        self.user.has_permission.return_value = True
+
+        patches = [
+            mock.patch("octoprint.server.api.job.printer", self.printer),
+            mock.patch("octoprint.server.api.printer.printer", self.printer),
+            mock.patch(
+                "octoprint.server.api.printer.printerProfileManager", profile_manager
+            ),
+            mock.patch("octoprint.server.api.printer.settings", return_value=settings),
+            mock.patch("octoprint.server.api.connection.printer", self.printer),
+            mock.patch(
+                "octoprint.server.api.connection.printerProfileManager", profile_manager
+            ),
+            mock.patch(
+                "octoprint.server.util.get_user_for_apikey",
+                side_effect=lambda key: self.user if key == "secret" else None,
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        super().setUp()
+
+    def get_app(self):
+        from octoprint.access.permissions import Permissions
+        from octoprint.server.api.connection import get_connection_state
+        from octoprint.server.api.job import get_job_state
+        from octoprint.server.api.printer import get_printer_state
+        from octoprint.server.util.tornado import NativeApiHandler, WsgiInputContainer
+
+        def fallback_app(environ, start_response):
+            start_response("418 I'm a teapot", [("Content-Type", "text/plain")])
+            return [b"fallback"]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+
+        kwargs = {
+            "fallback": WsgiInputContainer(fallback_app, executor=executor),
+            "app": self.flask_app,
+            "permission": Permissions.STATUS,
+        }
+
+        return tornado.web.Application(
+            [
+                (
+                    r"/api/job",
+                    NativeApiHandler,
+                    dict(kwargs, payload=lambda values: get_job_state()),
+                ),
+                (
+                    r"/api/printer",
+                    NativeApiHandler,
+                    dict(kwargs, payload=get_printer_state),
+                ),
+                (
+                    r"/api/connection",
+                    NativeApiHandler,
+                    dict(
+                        kwargs,
+                        payload=lambda values: get_connection_state(),
+                        blocking=True,
+                    ),
+                ),
+            ]
+        )
+
+    def _flask_response(self, view, path):
+        with self.flask_app.test_request_context(path):
+            return view.__wrapped__()
+
+    def _assert_identical(self, view, path):
+        native = self.fetch(path, headers={"X-Api-Key": "secret"})
+        flask_response = self._flask_response(view, path)
+
+        self.assertEqual(200, native.code)
+        self.assertEqual(flask_response.get_data(), native.body)
+        self.assertEqual(flask_response.content_type, native.headers["Content-Type"])
+        self.assertEqual("max-age=0", native.headers["Cache-Control"])
+        self.assertNotIn("Etag", native.headers)
+
+    def test_job(self):
+        from octoprint.server.api.job import jobState
+
+        self._assert_identical(jobState, "/api/job")
+
+    def test_printer(self):
+        from octoprint.server.api.printer import printerState
+
+        self._assert_identical(printerState, "/api/printer")
+
+    def test_printer_query(self):
+        from octoprint.server.api.printer import printerState
+
+        self._assert_identical(
+            printerState, "/api/printer?exclude=sd,%20state&history=true&limit=1"
+        )
+
+    def test_connection(self):
+        from octoprint.server.api.connection import connectionState
+
+        self._assert_identical(connectionState, "/api/connection")
+
+    def test_blocking_payload_on_executor(self):
+        import threading
+
+        threads = []
+        original = FakePrinter.get_connection_options
+
+        def get_connection_options():
+            threads.append(threading.current_thread())
+            return original()
+
+        with mock.patch.object(
+            FakePrinter, "get_connection_options", side_effect=get_connection_options
+        ):
+            connection = self.fetch("/api/connection", headers={"X-Api-Key": "secret"})
+        self.assertEqual(200, connection.code)
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def test_apikey_query(self):
+        response = self.fetch("/api/job?apikey=secret")
+        self.assertEqual(200, response.code)
+
+    @data(True, False)
+    def test_cors(self, allow_cross_origin):
+        settings = mock.MagicMock()
+        settings.getBoolean.side_effect = (
+            lambda path: allow_cross_origin
+            if path == ["api", "allowCrossOrigin"]
+            else None
+        )
+
+        with mock.patch("octoprint.settings.settings", return_value=settings):
+            response = self.fetch(
+                "/api/job",
+                headers={"X-Api-Key": "secret", "Origin": "http://example.com"},
+            )
+
+        self.assertEqual(200, response.code)
+        if allow_cross_origin:
+            self.assertEqual(
+                "http://example.com", response.headers["Access-Control-Allow-Origin"]
+            )
+        else:
+            self.assertNotIn("Access-Control-Allow-Origin", response.headers)
+
+    def test_fallback_invalid_apikey(self):
+        response = self.fetch("/api/job", headers={"X-Api-Key": "invalid"})
+        self.assertEqual(418, response.code)
+        self.assertEqual(b"fallback", response.body)
+
+    def test_fallback_basic_auth(self):
+        response = self.fetch(
+            "/api/job",
+            headers={"X-Api-Key": "secret", "Authorization": "Basic Zm9vOmJhcg=="},
+        )
+        self.assertEqual(418, response.code)
+
+    def test_fallback_missing_permission(self):
+        self.user.has_permission.return_value = False
+        response = self.fetch("/api/job", headers={"X-Api-Key": "secret"})
+        self.assertEqual(418, response.code)
+
+    def test_fallback_not_operational(self):
+        self.printer.operational = False
+        response = self.fetch("/api/printer", headers={"X-Api-Key": "secret"})
+        self.assertEqual(418, response.code)
+
+    def test_fallback_post(self):
+        response = self.fetch(
+            "/api/connection",
+            method="POST",
+            body=b"{}",
+            headers={"X-Api-Key": "secret", "Content-Type": "application/json"},
+        )
+        self.assertEqual(418, response.code)
+
+
+##~~ LargeResponseHandler
+
+
+@ddt
+class LargeResponseHandlerTest(tornado.testing.AsyncHTTPTestCase):
+    CONTENT = b"".join(b"G1 X%d Y%d E%.5f\n" % (i, i * 2, i / 7) for i in range(2000))
+
+    def setUp(self):
+        import tempfile
+
+        self.folder = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.folder.name, "test.gcode"), "wb") as f:
+            f.write(self.CONTENT)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.cache._executor.shutdown(wait=True)
+        self.folder.cleanup()
+
+    def get_app(self):
+        from octoprint.server.util.precompressed import PrecompressedCache
+        from octoprint.server.util.tornado import LargeResponseHandler
+
+        self.cache = PrecompressedCache(
+            os.path.join(self.folder.name, "cache"), min_age=0
+        )
+        return tornado.web.Application(
+            [
+                (
+                    r"/plain/(.*)",
+                    LargeResponseHandler,
+                    {"path": self.folder.name},
+                ),
+                (
+                    r"/sendfile/(.*)",
+                    LargeResponseHandler,
+                    {"path": self.folder.name, "sendfile": True},
+                ),
+                (
+                    r"/precompressed/(.*)",
+                    LargeResponseHandler,
+                    {
+                        "path": self.folder.name,
+                        "sendfile": True,
+                        "precompressed_cache": self.cache,
+                    },
+                ),
+            ]
+        )
+
+    def _fetch(self, url, **headers):
+        return self.fetch(url, headers=headers, decompress_response=False)
+
+    def _precompress(self):
+        response = self._fetch("/precompressed/test.gcode", **{"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+        self.cache._executor.submit(lambda: None).result()
+
+    @data("plain", "sendfile")
+    def test_get(self, mode):
+        response = self._fetch(f"/{mode}/test.gcode")
+        self.assertEqual(200, response.code)
+        self.assertEqual(self.CONTENT, response.body)
+        self.assertEqual(str(len(self.CONTENT)), response.headers["Content-Length"])
+
+    @data("plain", "sendfile")
+    def test_get_range(self, mode):
+        response = self._fetch(f"/{mode}/test.gcode", Range="bytes=100-1099")
+        self.assertEqual(206, response.code)
+        self.assertEqual(self.CONTENT[100:1100], response.body)
+
+    def test_sendfile_keepalive(self):
+        # the connection needs to stay usable for further requests
+        for _ in range(3):
+            response = self._fetch("/sendfile/test.gcode")
+            self.assertEqual(self.CONTENT, response.body)
+
+    def test_sendfile_fallback(self):
+        # without the private content length tracking of the connection, the regular path needs to be taken
+        with mock.patch(
+            "octoprint.server.util.tornado._can_mark_response_complete",
+            return_value=False,
+        ), mock.patch(
+            "octoprint.server.util.tornado.LargeResponseHandler._send_file"
+        ) as send_file:
+            response = self._fetch("/sendfile/test.gcode")
+            self.assertEqual(200, response.code)
+            self.assertEqual(self.CONTENT, response.body)
+            send_file.assert_not_called()
+
+    def test_precompressed(self):
+        import gzip
+
+        self._precompress()
+
+        response = self._fetch("/precompressed/test.gcode", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(200, response.code)
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(
+            str(len(self.CONTENT)), response.headers["X-Original-Content-Length"]
+        )
+        self.assertLess(len(response.body), len(self.CONTENT))
+        self.assertEqual(self.CONTENT, gzip.decompress(response.body))
+
+    def test_precompressed_identity(self):
+        self._precompress()
+
+        response = self._fetch("/precompressed/test.gcode")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(self.CONTENT, response.body)
+
+    def test_precompressed_range(self):
+        self._precompress()
+
+        response = self._fetch(
+            "/precompressed/test.gcode",
+            Range="bytes=100-1099",
+            **{"Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(206, response.code)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(self.CONTENT[100:1100], response.body)
+
+    def test_precompressed_invalidated(self):
+        self._precompress()
+
+        path = os.path.join(self.folder.name, "test.gcode")
+        cached = self.cache.get(path)
+        self.assertIsNotNone(cached)
+
+        with open(path, "ab") as f:
+            f.write(b"G28\n")
+
+        self.assertIsNone(self.cache.get(path))
+        self.cache._executor.submit(lambda: None).result()
+
+        self.assertFalse(os.path.exists(cached))
+        self.assertIsNotNone(self.cache.get(path))
+
+
+##~~ StaticZipBundleHandler
+
+
+class StaticZipBundleHandlerTest(tornado.testing.AsyncHTTPTestCase):
+    CONTENT = b"".join(b"line %d\n" % i for i in range(10000))
+
+    def setUp(self):
+        import tempfile
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.folder.name, "octoprint.log")
+        with open(self.log, "wb") as f:
+            f.write(self.CONTENT)
+        self.video = os.path.join(self.folder.name, "timelapse.mp4")
+        with open(self.video, "wb") as f:
+            f.write(os.urandom(1000))
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.folder.cleanup()
+
+    def get_app(self):
+        from octoprint.server.util.tornado import StaticZipBundleHandler
+
+        return tornado.web.Application(
+            [
+                (
+                    r"/logs",
+                    StaticZipBundleHandler,
+                    {
+                        "files": [self.log, self.video],
+                        "attachment_name": "logs.zip",
+                        "compress": True,
+                    },
+                ),
+                (
+                    r"/timelapses",
+                    StaticZipBundleHandler,
+                    {
+                        "files": [self.video],
+                        "attachment_name": "timelapses.zip",
+                        "compress": True,
+                    },
+                ),
+            ]
+        )
+
+    def _zip(self, response):
+        import io
+        import zipfile
+
+        self.assertEqual(200, response.code)
+        result = zipfile.ZipFile(io.BytesIO(response.body))
+        self.assertIsNone(result.testzip())
+        return result
+
+    def test_compressed(self):
+        import zipfile
+
+        result = self._zip(self.fetch("/logs"))
+        self.assertEqual(self.CONTENT, result.read("octoprint.log"))
+        self.assertEqual(
+            zipfile.ZIP_DEFLATED, result.getinfo("octoprint.log").compress_type
+        )
+        self.assertEqual(
+            zipfile.ZIP_STORED, result.getinfo("timelapse.mp4").compress_type
+        )
+
+    def test_sized(self):
+        response = self.fetch("/timelapses")
+        self.assertEqual(str(len(response.body)), response.headers["Content-Length"])
+        self._zip(response)
@@ -1,7 +1,10 @@
 __license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
 __copyright__ = "Copyright (C) 2022 The OctoPrint Project - Released under terms of the AGPLv3 License"
 
+import threading
+import time
 import unittest
+from unittest import mock
 
 import ddt
 
@@ -20,3 +23,177 @@ class TestEvents(unittest.TestCase):
     def test_to_identifier(self, value, expected):
         actual = octoprint.events.Events._to_identifier(value)
         self.assertEqual(actual, expected)
+
+
+class TestEventHandlerIndex(unittest.TestCase):
+    def setUp(self):
+        import octoprint.plugin
+
+        self.event_manager = octoprint.events.EventManager()
+
+        self.plugin_manager = mock.MagicMock()
+        self.plugin_manager.implementation_generation = 1
+        self.plugin_manager.get_implementations.side_effect = (
+            lambda *args, **kwargs: list(self.implementations)
+        )
+
+        patcher = mock.patch.object(
+            octoprint.plugin, "plugin_manager", return_value=self.plugin_manager
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.wildcard = self._plugin("wildcard", None)
+        self.exact = self._plugin("exact", [octoprint.events.Events.Z_CHANGE])
+        self.prefixed = self._plugin("prefixed", ["Print*"])
+        self.implementations = [self.wildcard, self.exact, self.prefixed]
+
+    def _plugin(self, identifier, subscriptions):
+        plugin = mock.MagicMock()
+        plugin._identifier = identifier
+        plugin.get_event_subscriptions.return_value = subscriptions
+        return plugin
+
+    def _handlers(self, event):
+        return [name for name, _ in self.event_manager._get_event_handlers(event)]
+
+    def test_index(self):
+        self.assertEqual(["wildcard", "exact"], self._handlers("ZChange"))
+        self.assertEqual(["wildcard", "prefixed"], self._handlers("PrintStarted"))
+        self.assertEqual(["wildcard"], self._handlers("Startup"))
+
+    def test_index_cached(self):
+        self._handlers("ZChange")
+        self._handlers("ZChange")
+        self.assertEqual(1, self.plugin_manager.get_implementations.call_count)
+        self.assertEqual(1, self.exact.get_event_subscriptions.call_count)
+
+    def test_index_invalidated_on_generation_change(self):
+        self.assertEqual(["wildcard", "exact"], self._handlers("ZChange"))
+
+        self.implementations = [self.exact]
+        self.plugin_manager.implementation_generation = 2
+
+        self.assertEqual(["exact"], self._handlers("ZChange"))
+
+    def test_broken_subscriptions_fall_back_to_wildcard(self):
+        self.exact.get_event_subscriptions.side_effect = RuntimeError()
+        self.assertEqual(["wildcard", "exact"], self._handlers("Startup"))
+
+    def test_call_event_handlers(self):
+        self.event_manager._call_event_handlers("ZChange", {"new": 1.0})
+
+        self.wildcard.on_event.assert_called_once_with("ZChange", {"new": 1.0})
+        self.exact.on_event.assert_called_once_with("ZChange", {"new": 1.0})
+        self.prefixed.on_event.assert_not_called()
+
+
+class TestEventCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.event_manager = octoprint.events.EventManager()
+        self.event_manager._call_event_handlers = mock.MagicMock()
+        self.event_manager._startup_signaled = True
+        self.event_manager.set_coalescing_windows({"ZChange": 0.2, "Invalid": "foo"})
+
+        self.received = []
+        self.delivered = threading.Event()
+
+        def listener(event, payload):
+            self.received.append((event, payload))
+            self.delivered.set()
+
+        self.event_manager.subscribe("ZChange", listener)
+        self.event_manager.subscribe("PrintStarted", listener)
+
+    def tearDown(self):
+        self.event_manager.fire("Shutdown")
+        self.event_manager.join(timeout=1.0)
+
+    def _wait_for(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while len(self.received) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_coalescing(self):
+        self.event_manager.fire("ZChange", {"old": 0.0, "new": 0.2})
+        self.event_manager.fire("ZChange", {"old": 0.2, "new": 0.4})
+        self.event_manager.fire("ZChange", {"old": 0.4, "new": 0.6})
+        self.event_manager.fire("ZChange", {"old": 0.6, "new": 0.8})
+
+        self._wait_for(2)
+        time.sleep(0.3)
+
+        self.assertEqual(
+            [
+                ("ZChange", {"old": 0.0, "new": 0.2}),
+                ("ZChange", {"old": 0.2, "new": 0.8}),
+            ],
+            self.received,
+        )
+
+        statistics = self.event_manager.get_statistics()
+        self.assertEqual(2, statistics["coalesced"])
+        self.assertEqual({"ZChange": 2}, statistics["coalesced_by_event"])
+
+    def test_no_coalescing_without_window(self):
+        for _ in range(5):
+            self.event_manager.fire("PrintStarted", {})
+
+        self._wait_for(5)
+        self.assertEqual(5, len(self.received))
+        self.assertEqual(0, self.event_manager.get_statistics()["coalesced"])
+
+    def test_dropped_after_shutdown(self):
+        self.event_manager.fire("Shutdown")
+        self.event_manager.join(timeout=1.0)
+
+        self.event_manager.fire("PrintStarted", {})
+        self.assertEqual(1, self.event_manager.get_statistics()["dropped"])
+
+
+class TestImmediateListeners(unittest.TestCase):
+    def setUp(self):
+        self.event_manager = octoprint.events.EventManager()
+        self.event_manager._call_event_handlers = mock.MagicMock()
+        self.event_manager._startup_signaled = True
+
+    def tearDown(self):
+        self.event_manager.fire("Shutdown")
+        self.event_manager.join(timeout=1.0)
+
+    def test_called_synchronously(self):
+        received = []
+        self.event_manager.subscribe(
+            "PrintStarted", lambda e, p: received.append((e, p)), immediate=True
+        )
+        self.event_manager.subscribe(
+            octoprint.events.ALL_EVENTS,
+            lambda e, p: received.append(("*", e)),
+            immediate=True,
+        )
+
+        self.event_manager.fire("PrintStarted", {"name": "test.gcode"})
+
+        self.assertEqual(
+            [("PrintStarted", {"name": "test.gcode"}), ("*", "PrintStarted")], received
+        )
+
+    def test_exception_does_not_prevent_delivery(self):
+        delivered = threading.Event()
+
+        def broken(event, payload):
+            raise RuntimeError("broken")
+
+        self.event_manager.subscribe("PrintStarted", broken, immediate=True)
+        self.event_manager.subscribe("PrintStarted", lambda e, p: delivered.set())
+
+        self.event_manager.fire("PrintStarted", {})
+        self.assertTrue(delivered.wait(timeout=2.0))
+
+    def test_unsubscribe(self):
+        listener = mock.MagicMock()
+        self.event_manager.subscribe("PrintStarted", listener, immediate=True)
+        self.event_manager.unsubscribe("PrintStarted", listener, immediate=True)
+
+        self.event_manager.fire("PrintStarted", {})
+        listener.assert_not_called()
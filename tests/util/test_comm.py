@@ -1,9 +1,13 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
 import ddt
 import pytest
 
+import octoprint.filemanager.compression
 import octoprint.util.comm
 from octoprint.util.files import m20_timestamp_to_unix_timestamp
 
@@ -291,6 +295,61 @@ class TestCommErrorHandling(unittest.TestCase):
         self.assert_not_cleared_to_send()
 
 
+@ddt.ddt
+class TestPrintingGcodeFileInformation(unittest.TestCase):
+    CONTENT = "\ufeffG28\r\n" + "".join(f"G1 X{i} ; ümlaut\n" for i in range(5000))
+
+    def setUp(self):
+        self._folder = tempfile.mkdtemp()
+        self._plain = os.path.join(self._folder, "plain.gcode")
+        with open(self._plain, "w", encoding="utf-8", newline="") as f:
+            f.write(self.CONTENT)
+
+        self._compressed = os.path.join(self._folder, "compressed.gcode")
+        octoprint.filemanager.compression.compress_file(
+            self._plain, self._compressed, block_size=4096
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self._folder)
+
+    def _open(self, compressed):
+        info = octoprint.util.comm.PrintingGcodeFileInformation(
+            self._compressed if compressed else self._plain
+        )
+        info.start()
+        return info
+
+    @ddt.data(False, True)
+    def test_progress(self, compressed):
+        info = self._open(compressed)
+        self.assertEqual(len(self.CONTENT.encode("utf-8")), info.getFilesize())
+
+        lines = []
+        while True:
+            line, _, _ = info.getNext()
+            if line is None:
+                break
+            lines.append(line)
+
+        self.assertEqual(5001, len(lines))
+        self.assertEqual("G28", lines[0])
+        self.assertEqual("G1 X4999", lines[-1])
+        self.assertEqual(1.0, info.getProgress())
+
+    @ddt.data(False, True)
+    def test_seek(self, compressed):
+        offset = self.CONTENT.encode("utf-8").index(b"G1 X3000 ")
+
+        info = self._open(compressed)
+        info.seek(offset)
+        line, pos, _ = info.getNext()
+
+        self.assertEqual("G1 X3000", line)
+        self.assertEqual(offset + len(b"G1 X3000 ; \xc3\xbcmlaut\n"), pos)
+        info.close()
+
+
 @pytest.mark.parametrize(
     "val,expected",
     [
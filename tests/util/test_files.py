@@ -4,11 +4,13 @@ __copyright__ = "Copyright (C) 2021 The OctoPrint Project - Released under terms
 import datetime
 import os
 import re
+import tempfile
 import unittest
 
 import pytest
 from ddt import data, ddt, unpack
 
+from octoprint.filemanager import compression
 from octoprint.util.files import (
     m20_timestamp_to_unix_timestamp,
     sanitize_filename,
@@ -71,6 +73,22 @@ class FilesUtilTest(unittest.TestCase):
         actual = search_through_file_python(path, term, compiled)
         self.assertEqual(actual, expected)
 
+    @data(
+        ("umlaut", True),
+        ("nothing", False),
+    )
+    @unpack
+    def test_search_through_compressed_file(self, term, expected):
+        path = os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), "_files", "utf8_without_bom.txt"
+        )
+        with tempfile.TemporaryDirectory() as folder:
+            compressed = os.path.join(folder, "compressed.gcode")
+            compression.compress_file(path, compressed)
+
+            actual = search_through_file(compressed, term)
+        self.assertEqual(actual, expected)
+
 
 # based on https://github.com/nathanhi/pyfatfs/blob/master/tests/test_DosDateTime.py
 m20_timestamp_tests = [
@@ -0,0 +1,98 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ddt import data, ddt, unpack
+
+from octoprint.filemanager import compression
+from octoprint.util.gcodeInterpreter import MAX_PAUSE_MARKERS, MarkerIndex, gcode
+
+GCODE = (
+    ";FLAVOR:Marlin\r\n"
+    "G28 ; home all ❤\r\n"
+    ";LAYER:0\r\n"
+    ";TYPE:SKIRT\r\n"
+    "G1 X10 Y10 E1\r\n"
+    ";TYPE:WALL-OUTER\r\n"
+    "G1 X20 Y10 E2\r\n"
+    ";LAYER:1\r\n"
+    ";TYPE:SKIRT\r\n"
+    "M600 ; filament change\r\n"
+    "G1 X20 Y20 E3\r\n"
+    "@pause\r\n"
+    ";custom marker\r\n"
+)
+
+
+def _offset(needle):
+    return GCODE.encode("utf-8").index(needle.encode("utf-8"))
+
+
+@ddt
+class MarkerIndexTest(unittest.TestCase):
+    @data(
+        ("LAYER:12", True),
+        ("LAYER_CHANGE", True),
+        ("layer 3, Z = 0.6", True),
+        ("LAYER_COUNT:12", False),
+        ("layer_height = 0.2", False),
+    )
+    @unpack
+    def test_layers(self, comment, expected):
+        index = MarkerIndex()
+        index.record(10, ";" + comment, comment=comment)
+        self.assertEqual([10] if expected else [], index.layers)
+
+    def test_strings(self):
+        index = MarkerIndex(strings=["foo", "bar", ""])
+        index.record(0, "G28 ; foo")
+        index.record(10, "G1 X10 ; foo")
+
+        self.assertEqual({"foo": 0, "bar": None}, index.strings)
+
+    def test_pause_limit(self):
+        index = MarkerIndex()
+        for offset in range(MAX_PAUSE_MARKERS + 10):
+            index.record(offset, "M0", command="M0")
+
+        self.assertEqual(MAX_PAUSE_MARKERS, len(index.pauses))
+
+
+@ddt
+class GcodeInterpreterMarkersTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.plain = os.path.join(self.folder, "plain.gcode")
+        with open(self.plain, "wb") as f:
+            f.write(GCODE.encode("utf-8"))
+
+        self.compressed = os.path.join(self.folder, "compressed.gcode")
+        compression.compress_file(self.plain, self.compressed, block_size=64)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    @data("plain", "compressed")
+    def test_markers(self, name):
+        interpreter = gcode(markers=[";custom", "missing"])
+        interpreter.load(getattr(self, name))
+
+        self.assertEqual(
+            {
+                "strings": {";custom": _offset(";custom"), "missing": None},
+                "layers": [_offset(";LAYER:0"), _offset(";LAYER:1")],
+                "features": {
+                    "SKIRT": _offset(";TYPE:SKIRT"),
+                    "WALL-OUTER": _offset(";TYPE:WALL-OUTER"),
+                },
+                "pauses": [
+                    {"offset": _offset("M600"), "command": "M600"},
+                    {"offset": _offset("@pause"), "command": "@pause"},
+                ],
+            },
+            interpreter.get_result()["markers"],
+        )
@@ -0,0 +1,129 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import json
+
+import pytest
+from frozendict import frozendict
+
+from octoprint.util import msgpack
+
+
+@pytest.mark.parametrize(
+    "val",
+    [
+        pytest.param(None, id="nil"),
+        pytest.param(True, id="true"),
+        pytest.param(False, id="false"),
+        pytest.param(0, id="int_zero"),
+        pytest.param(127, id="int_fixpos"),
+        pytest.param(-32, id="int_fixneg"),
+        pytest.param(255, id="uint8"),
+        pytest.param(65535, id="uint16"),
+        pytest.param(2**32 - 1, id="uint32"),
+        pytest.param(2**64 - 1, id="uint64"),
+        pytest.param(-128, id="int8"),
+        pytest.param(-32768, id="int16"),
+        pytest.param(-(2**31), id="int32"),
+        pytest.param(-(2**63), id="int64"),
+        pytest.param(210.3, id="float"),
+        pytest.param("", id="str_empty"),
+        pytest.param("Operational", id="fixstr"),
+        pytest.param("ä" * 100, id="str8"),
+        pytest.param("x" * 1000, id="str16"),
+        pytest.param("x" * 70000, id="str32"),
+        pytest.param(list(range(15)), id="fixarray"),
+        pytest.param(list(range(100)), id="array16"),
+        pytest.param({str(i): i for i in range(15)}, id="fixmap"),
+        pytest.param({str(i): i for i in range(100)}, id="map16"),
+        pytest.param(
+            {
+                "state": {"text": "Printing", "flags": {"printing": True}},
+                "temps": [
+                    {"time": 1700000000, "tool0": {"actual": 210.5, "target": 210}}
+                ],
+                "logs": ["Recv: ok"],
+            },
+            id="current",
+        ),
+    ],
+)
+def test_roundtrip(val):
+    assert msgpack.unpackb(msgpack.packb(val)) == val
+
+
+@pytest.mark.parametrize(
+    "val",
+    [
+        pytest.param((1, 2), id="tuple"),
+        pytest.param(frozendict({"foo": "bar"}), id="frozendict"),
+        pytest.param(b"foo", id="bytes"),
+        pytest.param({"nested": frozendict({"foo": b"bar"})}, id="nested"),
+    ],
+)
+def test_same_as_json(val):
+    from octoprint.util.json import dumps
+
+    assert msgpack.unpackb(msgpack.packb(val)) == json.loads(dumps(val))
+
+
+def test_smaller_than_json():
+    from octoprint.util.json import dumps
+
+    val = {
+        "temps": [
+            {"time": 1700000000 + i, "tool0": {"actual": 210.5, "target": 210.0}}
+            for i in range(100)
+        ]
+    }
+    assert len(msgpack.packb(val)) < len(dumps(val))
+
+
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        pytest.param({}, {}, id="empty"),
+        pytest.param({"a": 1}, {"b": [True, None]}, id="fixmap"),
+        pytest.param(
+            {str(i): i for i in range(10)},
+            {str(i): i for i in range(10, 20)},
+            id="map16",
+        ),
+    ],
+)
+def test_map_parts(first, second):
+    expected = dict(first)
+    expected.update(second)
+
+    packed = (
+        msgpack.packb_map_header(len(first) + len(second))
+        + msgpack.packb_map_items(first)
+        + msgpack.packb_map_items(second)
+    )
+    assert packed == msgpack.packb(expected)
+
+
+def test_unserializable():
+    with pytest.raises(TypeError):
+        msgpack.packb(object())
+
+
+def test_out_of_range():
+    with pytest.raises(ValueError):
+        msgpack.packb(2**64)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        pytest.param(b"", id="empty"),
+        pytest.param(b"\xa5abc", id="truncated_str"),
+        pytest.param(b"\x92\x01", id="truncated_array"),
+        pytest.param(b"\xcd\x01", id="truncated_int"),
+        pytest.param(b"\xc1", id="unsupported"),
+        pytest.param(b"\x01\x02", id="extra_data"),
+    ],
+)
+def test_unpack_invalid(data):
+    with pytest.raises(msgpack.UnpackException):
+        msgpack.unpackb(data)
@@ -0,0 +1,159 @@
+__license__ = "GNU Affero General Public License http://www.gnu.org/licenses/agpl.html"
+__copyright__ = "Copyright (C) 2024 The OctoPrint Project - Released under terms of the AGPLv3 License"
+
+import concurrent.futures
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import zlib
+from unittest import mock
+
+from ddt import data, ddt
+
+from octoprint.util.zip import ParallelDeflater, create_bundle
+
+CONTENT = b"".join(b"G1 X%d Y%d E%.5f\n" % (i, i * 2, i / 7) for i in range(20000))
+
+
+@ddt
+class ParallelDeflaterTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    @data(0, 1, 4096, len(CONTENT))
+    def test_roundtrip(self, length):
+        deflater = ParallelDeflater(self.executor, block_size=4096, max_pending=2)
+
+        compressed = b""
+        for offset in range(0, length, 1000):
+            compressed += deflater.compress(CONTENT[offset : min(offset + 1000, length)])
+        compressed += deflater.flush()
+
+        self.assertEqual(CONTENT[:length], zlib.decompress(compressed, -zlib.MAX_WBITS))
+        if length > 4096:
+            self.assertLess(len(compressed), length)
+
+
+class CreateBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        self.log = self._file("octoprint.log", CONTENT)
+        self.video = self._file("timelapse.mp4", os.urandom(10000))
+
+    def tearDown(self):
+        self.executor.shutdown()
+        shutil.rmtree(self.folder)
+
+    def _file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def _open(self, z):
+        content = bytes(z)
+        if z.sized:
+            self.assertEqual(len(z), len(content))
+
+        result = zipfile.ZipFile(io.BytesIO(content))
+        self.assertIsNone(result.testzip())
+        return result
+
+    def test_compressed(self):
+        z = create_bundle(
+            [
+                {"path": self.log},
+                {"path": self.video, "arcname": "videos/timelapse.mp4"},
+                {"data": b"some data", "arcname": "data.txt"},
+            ],
+            compress=True,
+            executor=self.executor,
+        )
+        self.assertFalse(z.sized)
+
+        result = self._open(z)
+        self.assertEqual(
+            [
+                ("octoprint.log", zipfile.ZIP_DEFLATED),
+                ("videos/timelapse.mp4", zipfile.ZIP_STORED),
+                ("data.txt", zipfile.ZIP_DEFLATED),
+            ],
+            [(info.filename, info.compress_type) for info in result.infolist()],
+        )
+        self.assertEqual(CONTENT, result.read("octoprint.log"))
+        self.assertEqual(b"some data", result.read("data.txt"))
+        self.assertLess(result.getinfo("octoprint.log").compress_size, len(CONTENT))
+
+    def test_already_compressed(self):
+        z = create_bundle([{"path": self.video}], compress=True, executor=self.executor)
+        self.assertTrue(z.sized)
+        self.assertEqual(
+            zipfile.ZIP_STORED, self._open(z).getinfo("timelapse.mp4").compress_type
+        )
+
+    def test_uncompressed(self):
+        z = create_bundle([{"path": self.log}, {"path": self.video}])
+        self.assertTrue(z.sized)
+        self.assertEqual(CONTENT, self._open(z).read("octoprint.log"))
+
+    def test_parallel(self):
+        with mock.patch.object(
+            self.executor, "submit", wraps=self.executor.submit
+        ) as submit:
+            z = create_bundle([{"path": self.log}], compress=True, executor=self.executor)
+            self.assertEqual(CONTENT, self._open(z).read("octoprint.log"))
+            submit.assert_called()
+
+    def test_parallel_unsupported(self):
+        with mock.patch("octoprint.util.zip.PARALLEL_COMPRESSION", False):
+            z = create_bundle([{"path": self.log}], compress=True, executor=self.executor)
+        self.assertIsNone(z._executor)
+
+        result = self._open(z)
+        self.assertEqual(
+            zipfile.ZIP_DEFLATED, result.getinfo("octoprint.log").compress_type
+        )
+        self.assertEqual(CONTENT, result.read("octoprint.log"))
+
+
+class ZipstreamInternalsTest(unittest.TestCase):
+    """The private parts of zipstream-ng that ZipBundle hooks into."""
+
+    def test_supported(self):
+        from octoprint.util.zip import PARALLEL_COMPRESSION
+
+        self.assertTrue(PARALLEL_COMPRESSION)
+
+    def test_internals(self):
+        import inspect
+
+        from zipstream.ng import ZipStream, ZipStreamInfo
+
+        self.assertLessEqual(
+            {
+                "path",
+                "iterable",
+                "data",
+                "size",
+                "arcname",
+                "compress_type",
+                "compress_level",
+            },
+            set(inspect.signature(ZipStream._gen_file_entry).parameters),
+        )
+
+        z = ZipStream()
+        for name in ("_track", "_pos", "_filelist", "_compress_type", "_compress_level"):
+            self.assertTrue(hasattr(z, name), name)
+
+        zinfo = ZipStreamInfo("test")
+        for name in ("_compresslevel", "FileHeader", "DataDescriptor"):
+            self.assertTrue(hasattr(zinfo, name), name)